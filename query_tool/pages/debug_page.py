@@ -38,10 +38,14 @@ from query_tool.utils.theme_manager import t
 from query_tool.utils.siot_debug import (
     DEFAULT_COMMAND_TIMEOUT_MS,
     SiotDebugWorker,
+    format_rate,
     is_getsystemcfg_command,
     is_startlogp2p_command,
     is_syscmd_family_command,
     parse_startlogp2p_level,
+    prune_output_spool,
+    should_spool_output,
+    spool_output,
 )
 from query_tool.widgets.adaptive_dialog import AdaptiveDialog
 from query_tool.widgets.custom_widgets import prompt_configure_account, set_dark_title_bar
@@ -523,6 +527,7 @@ class DebugConsoleEdit(QTextEdit):
     history_next_requested = pyqtSignal()
     clear_requested = pyqtSignal()
     input_text_changed = pyqtSignal(str)
+    spooled_output_requested = pyqtSignal(str)
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -533,6 +538,10 @@ class DebugConsoleEdit(QTextEdit):
         self._input_start = 0
         self._show_timestamps = True
         self._entries = []
+        self._progress_entries = {}
+        # 文本块 userState -> 落盘输出路径，点击对应行时打开完整输出
+        self._spool_paths = {}
+        self._next_spool_id = 1
         self._pressed_in_input_line = False
         self._browse_mode = False
         self._visible_cursor_width = 2
@@ -570,6 +579,8 @@ class DebugConsoleEdit(QTextEdit):
 
     def clear_console(self):
         self._entries = []
+        self._progress_entries = {}
+        self._spool_paths = {}
         self.clear()
         self._input_prompt_start = 0
         self._input_start = 0
@@ -590,8 +601,8 @@ class DebugConsoleEdit(QTextEdit):
 
     def append_message(self, message: str, color: str = None, label: str = ""):
         color_role = self._infer_color_role(color)
-        for line in (message or "").splitlines() or [""]:
-            self._entries.append(
+        self._append_entries(
+            [
                 {
                     "timestamp": datetime.now(),
                     "text": line,
@@ -599,36 +610,42 @@ class DebugConsoleEdit(QTextEdit):
                     "color_role": color_role,
                     "label": label,
                 }
-            )
-        self._trim_entries()
-        self._rebuild_document_with_scroll_restore()
+                for line in (message or "").splitlines() or [""]
+            ]
+        )
 
     def append_command(self, command: str):
-        self._entries.append(
-            {
-                "timestamp": datetime.now(),
-                "text": command or "",
-                "color_role": "status_info",
-                "kind": "command",
-            }
+        self._append_entries(
+            [
+                {
+                    "timestamp": datetime.now(),
+                    "text": command or "",
+                    "color_role": "status_info",
+                    "kind": "command",
+                }
+            ]
         )
-        self._trim_entries()
-        self._rebuild_document_with_scroll_restore()
 
-    def commit_command_submission(self, command: str):
-        """一次重绘内完成命令回显和输入锁定，减少回车时的顿感。"""
-        self._entries.append(
-            {
-                "timestamp": datetime.now(),
-                "text": command or "",
-                "color_role": "status_info",
-                "kind": "command",
-            }
+    def append_spooled_output(self, path: str, preview: str, summary: str, color: str = None):
+        """大段输出只显示开头几行和一行摘要，摘要行可点击打开完整输出。"""
+        color_role = self._infer_color_role(color)
+        entries = [
+            {"timestamp": datetime.now(), "text": line, "color": color, "color_role": color_role}
+            for line in (preview or "").splitlines()
+        ]
+        spool_id = self._next_spool_id
+        self._next_spool_id += 1
+        self._spool_paths[spool_id] = str(path)
+        entries.append(
+            {"timestamp": datetime.now(), "text": summary, "color_role": "status_info", "spool_id": spool_id}
         )
-        self._trim_entries()
+        self._append_entries(entries)
+
+    def commit_command_submission(self, command: str):
+        """一次追加内完成命令回显和输入锁定，减少回车时的顿感。"""
         self._input_locked = True
         self._browse_mode = False
-        self._rebuild_document_with_scroll_restore()
+        self.append_command(command)
 
     def commit_console_submission_live(self, command: str):
         """控制台直接回车时，原地追加命令和新提示行，避免整页重绘。"""
@@ -653,6 +670,7 @@ class DebugConsoleEdit(QTextEdit):
         command_fmt.setForeground(QColor(t("status_info")))
         cursor.insertText(command or "", command_fmt)
         cursor.insertBlock()
+        self._trim_document_blocks(self.MAX_ENTRIES + 1)
 
         self._input_prompt_start = cursor.position()
         self._render_input_prompt(cursor, "")
@@ -664,24 +682,25 @@ class DebugConsoleEdit(QTextEdit):
         if not progress_id or message is None:
             return
 
-        for entry in self._entries:
-            if entry.get("kind") == "progress" and entry.get("progress_id") == progress_id:
-                entry["timestamp"] = datetime.now()
-                entry["text"] = str(message)
+        entry = self._progress_entries.get(progress_id)
+        if entry is not None:
+            entry["timestamp"] = datetime.now()
+            entry["text"] = str(message)
+            if not self._rerender_entry_in_place(entry):
                 self._rebuild_document_with_scroll_restore()
-                self.scroll_to_prompt()
-                return
+            self.scroll_to_prompt()
+            return
 
-        self._entries.append(
-            {
-                "timestamp": datetime.now(),
-                "text": str(message),
-                "kind": "progress",
-                "progress_id": progress_id,
-            }
+        self._append_entries(
+            [
+                {
+                    "timestamp": datetime.now(),
+                    "text": str(message),
+                    "kind": "progress",
+                    "progress_id": progress_id,
+                }
+            ]
         )
-        self._trim_entries()
-        self._rebuild_document_with_scroll_restore()
         self.scroll_to_prompt()
 
     def refresh_content_style(self):
@@ -765,6 +784,10 @@ class DebugConsoleEdit(QTextEdit):
 
     def mouseReleaseEvent(self, event):
         super().mouseReleaseEvent(event)
+        if event.button() == Qt.LeftButton and not self.textCursor().hasSelection():
+            spool_path = self._spool_path_at(event.pos())
+            if spool_path:
+                self.spooled_output_requested.emit(spool_path)
         if not self._input_enabled or self._input_locked:
             return
         if self.textCursor().hasSelection():
@@ -803,11 +826,18 @@ class DebugConsoleEdit(QTextEdit):
                 color: {t('text_primary')};
             }}
         """)
+        spool_path = self._spool_path_at(pos)
+        open_action = menu.addAction("打开完整输出") if spool_path else None
         clear_action = menu.addAction("清空窗口内容")
         clear_action.setEnabled(bool(self._entries))
         selected_action = menu.exec_(self.viewport().mapToGlobal(pos))
         if selected_action == clear_action:
             self.clear_requested.emit()
+        elif open_action is not None and selected_action == open_action:
+            self.spooled_output_requested.emit(spool_path)
+
+    def _spool_path_at(self, pos) -> str:
+        return self._spool_paths.get(self.cursorForPosition(pos).block().userState(), "")
 
     def _rebuild_document(self):
         current_input = self.current_input() if self._input_enabled else ""
@@ -846,6 +876,10 @@ class DebugConsoleEdit(QTextEdit):
             h_scroll_bar.setValue(min(h_value, h_scroll_bar.maximum()))
 
     def _render_entry(self, cursor: QTextCursor, entry: dict):
+        self._render_entry_line(cursor, entry)
+        cursor.insertBlock()
+
+    def _render_entry_line(self, cursor: QTextCursor, entry: dict):
         timestamp_fmt = QTextCharFormat()
         timestamp_fmt.setForeground(QColor(t("text_hint")))
 
@@ -863,7 +897,12 @@ class DebugConsoleEdit(QTextEdit):
             label_fmt.setForeground(QColor(entry.get("color") or t("text_primary")))
             cursor.insertText(entry["label"], label_fmt)
         cursor.insertText(entry.get("text", ""), content_fmt)
-        cursor.insertBlock()
+        if entry.get("kind") == "progress":
+            # 记下所在文本块与渲染结果，进度刷新时原地改写这一行
+            entry["block"] = cursor.block()
+            entry["rendered"] = cursor.block().text()
+        if entry.get("spool_id"):
+            cursor.block().setUserState(entry["spool_id"])
 
     def _render_input_prompt(self, cursor: QTextCursor, current_input: str):
         if self._show_timestamps:
@@ -885,8 +924,79 @@ class DebugConsoleEdit(QTextEdit):
     def _trim_entries(self):
         overflow = len(self._entries) - self.MAX_ENTRIES
         if overflow > 0:
+            for entry in self._entries[:overflow]:
+                if entry.get("kind") == "progress" and self._progress_entries.get(entry.get("progress_id")) is entry:
+                    del self._progress_entries[entry["progress_id"]]
+                self._spool_paths.pop(entry.get("spool_id"), None)
             del self._entries[:overflow]
 
+    def _append_entries(self, entries: list):
+        """新条目追加在文档末尾（提示行之前），超出上限时删除开头的文本块，不整页重绘。"""
+        should_follow = self._is_scrolled_to_bottom()
+        v_scroll = self.verticalScrollBar().value()
+        h_scroll = self.horizontalScrollBar().value()
+        current_input = self.current_input() if self._input_enabled else ""
+
+        for entry in entries:
+            if entry.get("kind") == "progress":
+                self._progress_entries[entry["progress_id"]] = entry
+        self._entries.extend(entries)
+        self._trim_entries()
+
+        cursor = self.textCursor()
+        cursor.setPosition(min(self._input_prompt_start, self.document().characterCount() - 1))
+        cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+        # 一次追加超过上限时，只渲染仍保留的条目
+        for entry in entries[-self.MAX_ENTRIES:]:
+            self._render_entry(cursor, entry)
+        self._trim_document_blocks(self.MAX_ENTRIES + 1)
+
+        self._input_prompt_start = cursor.position()
+        if self._input_enabled:
+            self._render_input_prompt(cursor, current_input)
+        else:
+            self._input_start = self._input_prompt_start
+
+        self.setTextCursor(cursor)
+        if self._input_enabled and not self._browse_mode and not self._input_locked:
+            self._show_input_cursor()
+        else:
+            self._hide_input_cursor()
+        if should_follow:
+            self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
+        else:
+            self.verticalScrollBar().setValue(min(v_scroll, self.verticalScrollBar().maximum()))
+            self.horizontalScrollBar().setValue(min(h_scroll, self.horizontalScrollBar().maximum()))
+
+    def _rerender_entry_in_place(self, entry: dict) -> bool:
+        """按记下的文本块原地改写一行；该行已被裁掉或文档已变化时返回 False，由调用方整页重绘。"""
+        block = entry.get("block")
+        if block is None or not block.isValid() or block.text() != entry.get("rendered"):
+            return False
+        doc = self.document()
+        length_before = doc.characterCount()
+        cursor = QTextCursor(block)
+        cursor.beginEditBlock()
+        cursor.movePosition(QTextCursor.EndOfBlock, QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+        self._render_entry_line(cursor, entry)
+        cursor.endEditBlock()
+        delta = doc.characterCount() - length_before
+        self._input_prompt_start += delta
+        self._input_start += delta
+
+        # 提示行时间戳跟随最后一条记录
+        if self._input_enabled and self._show_timestamps and self._entries and self._entries[-1] is entry:
+            current_input = self.current_input()
+            cursor = QTextCursor(doc)
+            cursor.setPosition(self._input_prompt_start)
+            cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
+            cursor.removeSelectedText()
+            self._render_input_prompt(cursor, current_input)
+            self.setTextCursor(cursor)
+        return True
+
     def append_stream_log_batch(self, message: str):
         if not message:
             return
@@ -913,7 +1023,7 @@ class DebugConsoleEdit(QTextEdit):
             cursor.insertText(line, content_fmt)
             cursor.insertBlock()
 
-        self._trim_stream_blocks()
+        self._trim_document_blocks(self.MAX_STREAM_LOG_BLOCKS)
         self._input_prompt_start = cursor.position()
         if self._input_enabled:
             self._render_input_prompt(cursor, current_input)
@@ -927,17 +1037,16 @@ class DebugConsoleEdit(QTextEdit):
             self.verticalScrollBar().setValue(v_scroll)
             self.horizontalScrollBar().setValue(h_scroll)
 
-    def _trim_stream_blocks(self):
+    def _trim_document_blocks(self, max_blocks: int):
+        """文本块超过上限时一次删除开头多出的块。"""
         doc = self.document()
-        excess = doc.blockCount() - self.MAX_STREAM_LOG_BLOCKS
+        excess = doc.blockCount() - max_blocks
         if excess <= 0:
             return
         cursor = QTextCursor(doc)
         cursor.movePosition(QTextCursor.Start)
-        for _ in range(excess):
-            cursor.select(QTextCursor.BlockUnderCursor)
-            cursor.removeSelectedText()
-            cursor.deleteChar()
+        cursor.setPosition(doc.findBlockByNumber(excess).position(), QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
 
     def _replace_current_input(self, text: str):
         cursor = self.textCursor()
@@ -1136,6 +1245,7 @@ class DebugPage(BasePage):
         "P2P设备连接成功，正在初始化交互",
     )
     DOWNLOAD_OUTPUT_PREFIX = "文件已下载到:"
+    SPOOL_PREVIEW_LINES = 20
     AUTO_OPEN_TEXT_SUFFIXES = {
         ".txt",
         ".log",
@@ -1194,6 +1304,7 @@ class DebugPage(BasePage):
         self._stream_log_flush_timer = QTimer(self)
         self._stream_log_flush_timer.setInterval(180)
         self._stream_log_flush_timer.timeout.connect(self._flush_pending_stream_logs)
+        prune_output_spool()
 
         self.init_ui()
         self.init_worker()
@@ -1287,9 +1398,14 @@ class DebugPage(BasePage):
         command_hint_label = QLabel("（交互卡顿时右键清空一下窗口）")
         command_hint_label.setStyleSheet(f"color: {t('text_hint')};")
 
+        self.throughput_label = QLabel("")
+        self.throughput_label.setStyleSheet(f"color: {t('text_hint')};")
+        self.throughput_label.setVisible(False)
+
         command_header.addWidget(command_title_label)
         command_header.addWidget(command_hint_label)
         command_header.addStretch(1)
+        command_header.addWidget(self.throughput_label)
         command_layout.addLayout(command_header)
 
         self.console_edit = DebugConsoleEdit()
@@ -1299,6 +1415,7 @@ class DebugPage(BasePage):
         self.console_edit.history_prev_requested.connect(self.on_history_prev_requested_from_console)
         self.console_edit.history_next_requested.connect(self.on_history_next_requested_from_console)
         self.console_edit.clear_requested.connect(self.on_console_clear_requested)
+        self.console_edit.spooled_output_requested.connect(self.on_spooled_output_requested)
         self.console_edit.input_text_changed.connect(self.on_console_input_text_changed)
         self.console_edit.installEventFilter(self)
         command_layout.addWidget(self.console_edit, 1)
@@ -1465,6 +1582,7 @@ class DebugPage(BasePage):
         self.worker.command_progress.connect(self.on_command_progress)
         self.worker.command_failed.connect(self.on_command_failed)
         self.worker.command_finished.connect(self.on_command_finished)
+        self.worker.transport_metrics.connect(self.on_transport_metrics)
 
         self.worker_thread.start()
 
@@ -2240,6 +2358,7 @@ class DebugPage(BasePage):
         self.update_shortcut_controls()
         self.update_send_button()
         self.append_output(failure_message, color=t("status_offline"))
+        self._clear_throughput_indicator()
         self.show_error(failure_message)
 
     def on_disconnected(self, message):
@@ -2267,6 +2386,7 @@ class DebugPage(BasePage):
         self.update_shortcut_controls()
         self.update_send_button()
         self._hide_history_suggestions()
+        self._clear_throughput_indicator()
         self.append_output(disconnected_message)
         self.show_info(disconnected_message)
         self._schedule_pending_connect()
@@ -2277,6 +2397,35 @@ class DebugPage(BasePage):
         self.append_output(message, color=t("status_offline"))
         self.show_error(message)
 
+    def on_transport_metrics(self, metrics: dict):
+        if not self.connected:
+            return
+        packets_per_s = float(metrics.get("packets_per_s") or 0)
+        stream_lines_per_s = float(metrics.get("stream_lines_per_s") or 0)
+        if packets_per_s <= 0 and stream_lines_per_s <= 0:
+            self._clear_throughput_indicator()
+            return
+        text = f"↓ {format_rate(metrics.get('bytes_per_s'))} · {packets_per_s:.0f} 包/s"
+        if stream_lines_per_s > 0:
+            text += f" · {stream_lines_per_s:.0f} 行/s"
+        lag_s = max(time.time() - float(metrics.get("sent_at") or time.time()), 0.0)
+        self.throughput_label.setText(text)
+        self.throughput_label.setToolTip(
+            f"平均速率: {format_rate(metrics.get('avg_bytes_per_s'))}\n"
+            f"解密: {float(metrics.get('decrypt_ms_per_packet') or 0):.3f} ms/包\n"
+            f"处理: {float(metrics.get('handle_ms_per_packet') or 0):.3f} ms/包\n"
+            f"事件延迟: {lag_s * 1000:.0f} ms\n"
+            f"累计: {int(metrics.get('total_packets') or 0)} 包 / {int(metrics.get('total_bytes') or 0) / (1024 * 1024):.2f} MB"
+        )
+        self.throughput_label.setVisible(True)
+
+    def _clear_throughput_indicator(self):
+        if not hasattr(self, "throughput_label"):
+            return
+        self.throughput_label.clear()
+        self.throughput_label.setToolTip("")
+        self.throughput_label.setVisible(False)
+
     def on_command_progress(self, progress_id, message):
         if not message:
             return
@@ -2325,6 +2474,8 @@ class DebugPage(BasePage):
         self._collect_auto_open_download_path(text)
         if time.monotonic() < self._console_suppress_until:
             return
+        if should_spool_output(text) and self._append_spooled_output(str(text), color):
+            return
         self._pending_output_entries.append((str(text), color))
         if len(self._pending_output_entries) >= 20:
             self._flush_pending_output()
@@ -2332,6 +2483,35 @@ class DebugPage(BasePage):
         if not self._output_flush_timer.isActive():
             self._output_flush_timer.start()
 
+    def _append_spooled_output(self, text, color=None) -> bool:
+        """超长输出写入文件，控制台只显示开头几行和摘要；写文件失败时返回 False，按原方式显示。"""
+        sn = str(self.current_context.get("sn") or self.sn_input.text() or "").strip()
+        path = spool_output(text, label=sn)
+        if path is None:
+            return False
+        # 先刷出排队中的输出，保证显示顺序
+        self._flush_pending_output()
+        line_count = text.count("\n") + 1
+        preview = "\n".join(text.split("\n", self.SPOOL_PREVIEW_LINES)[: self.SPOOL_PREVIEW_LINES])
+        summary = (
+            f"输出共 {line_count} 行（{path.stat().st_size / 1024:.0f} KB），仅显示前 {self.SPOOL_PREVIEW_LINES} 行，"
+            f"已保存到 {path}，点击此行打开完整输出"
+        )
+        self.console_edit.append_spooled_output(str(path), preview, summary, color=color)
+        if not self._stream_log_active or self.console_edit._is_scrolled_to_bottom():
+            self.console_edit.scroll_to_prompt()
+        return True
+
+    def on_spooled_output_requested(self, path):
+        from query_tool.widgets.large_output_viewer import LargeOutputViewerDialog
+
+        path = Path(path)
+        if not path.is_file():
+            self.append_output(f"完整输出文件不存在: {path}", color=t("status_offline"))
+            return
+        dialog = LargeOutputViewerDialog(path, title=path.name, parent=self)
+        dialog.show()
+
     def append_stream_log_output(self, text):
         if not text:
             return
@@ -27,6 +27,7 @@ from PyQt5.QtWidgets import (
     QHBoxLayout,
     QHeaderView,
     QLabel,
+    QLineEdit,
     QPushButton,
     QStyledItemDelegate,
     QStyle,
@@ -43,13 +44,32 @@ from query_tool.utils import StyleManager, config_manager, get_account_config, g
 from query_tool.utils.internal_launch import build_internal_command
 from query_tool.utils.logger import logger
 from query_tool.utils.siot_debug import (
+    BatchArchiveWriter,
     CloudCredentialPrefetcher,
+    CommandOutputGrouper,
+    ContentStore,
     DEFAULT_COMMAND_TIMEOUT_MS,
+    DeviceStatusPrefetcher,
+    LaneScheduler,
+    LogIndex,
+    LogIndexer,
+    PhaseHistogram,
+    PooledRunner,
+    SLEEPER_LANE_LIMIT,
     build_connect_payload,
+    compare_device_files,
+    format_comparison_lines,
+    format_rate,
+    get_session_pool,
     is_getsystemcfg_command,
     is_syscmd_family_command,
+    save_comparison_report,
+)
+from query_tool.utils.siot_debug.service import (
+    prefetch_device_credentials,
+    record_device_protocol,
+    resolve_device_credentials,
 )
-from query_tool.utils.siot_debug.service import resolve_device_credentials
 from query_tool.utils.theme_manager import t
 from query_tool.widgets import PlainTextEdit, prompt_configure_account
 
@@ -149,6 +169,9 @@ class RichTextItemDelegate(QStyledItemDelegate):
 class BatchLogFetchThread(QThread):
     """批量拉日志线程。"""
 
+    # 这些失败多为瞬时状态，批次末尾按退避时间自动重试
+    AUTO_RETRY_STATUSES = ("唤醒失败", "设备离线")
+
     device_updated = pyqtSignal(dict)
     summary_ready = pyqtSignal(dict)
     error_signal = pyqtSignal(str)
@@ -165,6 +188,11 @@ class BatchLogFetchThread(QThread):
         seetong_password,
         max_workers=20,
         timeout_ms=DEFAULT_COMMAND_TIMEOUT_MS,
+        dedup_storage=False,
+        archive_output=False,
+        sleeper_workers=SLEEPER_LANE_LIMIT,
+        session_pool=None,
+        output_groups=None,
     ):
         super().__init__()
         self.sn_list = list(sn_list)
@@ -177,11 +205,21 @@ class BatchLogFetchThread(QThread):
         self.seetong_password = seetong_password
         self.max_workers = max(1, int(max_workers or 20))
         self.timeout_ms = int(timeout_ms or DEFAULT_COMMAND_TIMEOUT_MS)
+        self.dedup_storage = bool(dedup_storage)
         self._stop_event = threading.Event()
         self._process_lock = threading.Lock()
         self._active_processes = set()
         self._executor = None
         self._cloud_prefetcher = CloudCredentialPrefetcher(seetong_username, seetong_password)
+        self._status_prefetcher = DeviceStatusPrefetcher(self.sn_list, self._cloud_prefetcher)
+        self._phase_histogram = PhaseHistogram()
+        self._log_indexer = LogIndexer(self.download_root)
+        self._device_file_hashes = {}
+        self._archive = BatchArchiveWriter(self.download_root) if archive_output else None
+        self._scheduler = LaneScheduler(self.max_workers, sleeper_workers)
+        self._session_pool = session_pool
+        # 输出分组模式：syscmd 输出按内容归并，设备详情里只记分组编号
+        self.output_groups = output_groups
 
     def cancel(self):
         self._stop_event.set()
@@ -207,22 +245,71 @@ class BatchLogFetchThread(QThread):
         total_files = 0
 
         self._cloud_prefetcher.start()
-        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        ready_queue = queue.Queue()
+        status_queue = queue.Queue()
+        threading.Thread(
+            target=self._prefetch_credentials,
+            args=(ready_queue,),
+            name="log-fetch-credential-prefetch",
+            daemon=True,
+        ).start()
+        threading.Thread(
+            target=self._probe_device_statuses,
+            args=(status_queue,),
+            name="log-fetch-status-probe",
+            daemon=True,
+        ).start()
+        scheduler = self._scheduler
+        executor = ThreadPoolExecutor(max_workers=scheduler.total_limit)
         self._executor = executor
-        pending_futures = set()
+        pending_futures = {}
+        credential_ready = []
+        device_statuses = {}
+        admitted = 0
+        auto_retried = set()
         try:
-            pending_futures = {
-                executor.submit(self._process_single_device, sn)
-                for sn in self.sn_list
-            }
-            while pending_futures and not self._stop_event.is_set():
-                done_futures, pending_futures = wait(
-                    pending_futures,
+            while scheduler.has_work() and not self._stop_event.is_set():
+                # 凭据已预解析、在线状态已探测的设备才进入调度
+                admitted += self._admit_ready_devices(ready_queue, status_queue, credential_ready, device_statuses)
+                if admitted >= total:
+                    scheduler.close_input()
+                while True:
+                    item = scheduler.next_ready()
+                    if item is None:
+                        break
+                    sn, lane = item
+                    pending_futures[executor.submit(self._process_single_device, sn)] = (sn, lane)
+                if not pending_futures:
+                    self._stop_event.wait(0.2)
+                    continue
+                done_futures, _ = wait(
+                    list(pending_futures),
                     timeout=0.2,
                     return_when=FIRST_COMPLETED,
                 )
                 for future in done_futures:
+                    sn, lane = pending_futures.pop(future)
                     result = future.result()
+                    retry_delay = scheduler.finish(
+                        sn,
+                        lane,
+                        retryable=result.get("status") in self.AUTO_RETRY_STATUSES and not self._stop_event.is_set(),
+                    )
+                    if retry_delay is not None:
+                        auto_retried.add(sn)
+                        self._emit_retry_pending(result, retry_delay, scheduler.attempts(sn))
+                        continue
+                    if result.get("downloaded_file_count"):
+                        self._log_indexer.enqueue(Path(self.download_root).expanduser() / result["sn"])
+                    if result.get("file_hashes"):
+                        self._device_file_hashes[result["sn"]] = result["file_hashes"]
+                    if self._archive is not None:
+                        self._archive.add_device(
+                            result["sn"],
+                            result.get("status") or "",
+                            result.get("saved_paths") or [],
+                            result.get("detail") or "",
+                        )
                     total_files += int(result.get("downloaded_file_count") or 0)
                     if result.get("status") == "完成":
                         success_devices += 1
@@ -238,13 +325,15 @@ class BatchLogFetchThread(QThread):
             return
         finally:
             if self._stop_event.is_set():
-                for future in pending_futures:
+                for future in list(pending_futures):
                     future.cancel()
             try:
                 executor.shutdown(wait=False, cancel_futures=True)
             except Exception:
                 pass
             self._executor = None
+            # 索引线程排空队列后自行退出，不阻塞汇总
+            self._log_indexer.close(timeout=0)
 
         if self._stop_event.is_set():
             self.summary_ready.emit(
@@ -256,6 +345,12 @@ class BatchLogFetchThread(QThread):
                     "total_files": total_files,
                     "duration_seconds": max(0.0, time.monotonic() - started_at),
                     "cancelled": True,
+                    "auto_retried": len(auto_retried),
+                    "phase_timings": self._phase_histogram.summary(),
+                    "phase_timing_lines": self._phase_histogram.format_lines(),
+                    **self._build_file_comparison(save=False),
+                    **self._build_output_group_summary(save=False),
+                    "archive_path": self._close_archive(cancelled=True),
                 }
             )
             return
@@ -269,10 +364,156 @@ class BatchLogFetchThread(QThread):
                 "total_files": total_files,
                 "duration_seconds": max(0.0, time.monotonic() - started_at),
                 "cancelled": False,
+                "auto_retried": len(auto_retried),
+                "phase_timings": self._phase_histogram.summary(),
+                "phase_timing_lines": self._phase_histogram.format_lines(),
+                "phase_timings_path": self._save_phase_timings(),
+                **self._build_file_comparison(save=True),
+                **self._build_output_group_summary(save=True),
+                "archive_path": self._close_archive(cancelled=False),
             }
         )
 
-    def _process_single_device(self, sn: str):
+    def _close_archive(self, cancelled: bool) -> str:
+        if self._archive is None:
+            return ""
+        try:
+            archive_path = self._archive.close(cancelled=cancelled)
+        except Exception as exc:
+            logger.warning(f"写入批量归档失败: {exc}")
+            return ""
+        return str(archive_path or "")
+
+    def _build_file_comparison(self, save: bool) -> dict:
+        """按文件名对比各设备下载内容的哈希，报告一致与不同的设备；save 为真时把完整分组写入下载目录。"""
+        report = compare_device_files(self._device_file_hashes)
+        if not report:
+            return {}
+        result = {
+            "file_comparison": report,
+            "file_comparison_lines": format_comparison_lines(report),
+        }
+        if save:
+            saved_path = save_comparison_report(
+                self.download_root,
+                report,
+                f"file_compare_{time.strftime('%Y%m%d_%H%M%S')}.json",
+            )
+            result["file_comparison_path"] = str(saved_path or "")
+        return result
+
+    def _build_output_group_summary(self, save: bool) -> dict:
+        """输出分组模式下汇总各命令的输出种类；save 为真时导出每组一行的 CSV 到下载目录。"""
+        if self.output_groups is None or not self.output_groups.group_count():
+            return {}
+        result = {
+            "output_group_count": self.output_groups.group_count(),
+            "output_group_lines": self.output_groups.format_lines(),
+        }
+        if save:
+            saved_path = self.output_groups.export_csv(
+                Path(self.download_root).expanduser() / f"output_groups_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+            )
+            result["output_groups_path"] = str(saved_path or "")
+        return result
+
+    def _save_phase_timings(self) -> str:
+        """把本批次的连接阶段耗时汇总写入下载目录，返回文件路径；无数据或写入失败返回空串。"""
+        phase_timings = self._phase_histogram.summary()
+        if not phase_timings:
+            return ""
+        try:
+            root = Path(self.download_root).expanduser()
+            root.mkdir(parents=True, exist_ok=True)
+            file_path = root / f"connect_timings_{time.strftime('%Y%m%d_%H%M%S')}.json"
+            file_path.write_text(
+                json.dumps({"devices": len(self.sn_list), "phases": phase_timings}, ensure_ascii=False, indent=2),
+                encoding="utf-8",
+            )
+            return str(file_path)
+        except Exception as exc:
+            logger.warning(f"保存连接阶段耗时失败: {exc}")
+            return ""
+
+    def _probe_device_statuses(self, status_queue):
+        """批量开始前按块探测设备在线状态，每块完成即交给调度分通道；探测不到的设备按状态未知处理。"""
+        try:
+            self._status_prefetcher.probe_all(on_chunk=lambda chunk, statuses: status_queue.put((chunk, statuses)))
+        except Exception as exc:
+            logger.warning(f"批量探测设备状态异常: {exc}")
+        finally:
+            status_queue.put(None)
+
+    def _admit_ready_devices(self, ready_queue, status_queue, credential_ready, device_statuses) -> int:
+        while True:
+            try:
+                credential_ready.append(ready_queue.get_nowait())
+            except queue.Empty:
+                break
+        while True:
+            try:
+                item = status_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # 探测结束，剩余设备状态未知
+                for sn in self.sn_list:
+                    device_statuses.setdefault(sn.upper(), None)
+                continue
+            chunk, statuses = item
+            probed = {str(key).upper(): status for key, status in statuses.items()}
+            for sn in chunk:
+                device_statuses[sn.upper()] = probed.get(sn.upper())
+        admitted = 0
+        waiting = []
+        for sn in credential_ready:
+            if sn.upper() not in device_statuses:
+                waiting.append(sn)
+                continue
+            status = device_statuses[sn.upper()]
+            if self._session_pool is not None and self._session_pool.contains(sn, self.env):
+                # 连接池里还有已登录的会话，按在线设备优先调度
+                status = {"online": 1}
+            self._scheduler.add(sn, status)
+            admitted += 1
+        credential_ready[:] = waiting
+        return admitted
+
+    def _emit_retry_pending(self, result: dict, delay_s: float, attempt: int):
+        detail = str(result.get("detail") or "")
+        self._emit_device(
+            result["sn"],
+            "等待重试",
+            result.get("success_count", 0),
+            result.get("failed_count", 0),
+            result.get("files") or [],
+            f"{detail}\n{int(delay_s)} 秒后自动重试（第 {attempt} 次）".strip(),
+            total_commands=result.get("total_commands", 0),
+            downloaded_file_count=result.get("downloaded_file_count", 0),
+        )
+
+    def _prefetch_credentials(self, ready_queue):
+        """按块批量预解析设备凭据，每块完成后把 SN 交给执行器；失败的 SN 由单设备流程重试并报错。"""
+        chunk_size = max(self.max_workers, 1)
+        for index in range(0, len(self.sn_list), chunk_size):
+            chunk = self.sn_list[index:index + chunk_size]
+            try:
+                if not self._stop_event.is_set():
+                    errors = prefetch_device_credentials(
+                        chunk,
+                        self.env,
+                        self.device_username,
+                        self.device_password,
+                    )
+                    if errors:
+                        logger.warning(f"批量预解析设备凭据失败 {len(errors)} 台: {errors}")
+            except Exception as exc:
+                logger.warning(f"批量预解析设备凭据异常: {exc}")
+            finally:
+                for sn in chunk:
+                    ready_queue.put(sn)
+
+    def _process_single_device(self, sn: str, use_pool: bool = True):
         if self._stop_event.is_set():
             return {
                 "sn": sn,
@@ -288,118 +529,148 @@ class BatchLogFetchThread(QThread):
         failed_count = 0
         downloaded_file_count = 0
         file_entries = []
+        file_hashes = {}
+        saved_paths = []
         details = []
         connect_details = []
         connected_ok = False
+        transfer_stats = {"avg_bytes_per_s": 0.0}
         commands = [self._normalize_command(raw) for raw in self.commands]
         commands = [command for command in commands if command]
         total_commands = len(commands)
 
-        self._emit_device(
-            sn,
-            "查询设备密码中",
-            success_count,
-            failed_count,
-            file_entries,
-            "正在获取设备密码",
-            total_commands=total_commands,
-            downloaded_file_count=downloaded_file_count,
-        )
-        try:
-            credentials, _ = resolve_device_credentials(
+        pooled = self._session_pool.acquire(sn, self.env) if self._session_pool is not None and use_pool else None
+        reused = pooled is not None
+        if pooled is None:
+            self._emit_device(
                 sn,
-                self.env,
-                self.device_username,
-                self.device_password,
+                "查询设备密码中",
+                success_count,
+                failed_count,
+                file_entries,
+                "正在获取设备密码",
+                total_commands=total_commands,
+                downloaded_file_count=downloaded_file_count,
             )
-        except Exception as exc:
+            lookup_started_at = time.perf_counter()
+            try:
+                credentials, _ = resolve_device_credentials(
+                    sn,
+                    self.env,
+                    self.device_username,
+                    self.device_password,
+                )
+            except Exception as exc:
+                if self._stop_event.is_set():
+                    return self._build_cancelled_result(
+                        sn,
+                        success_count,
+                        failed_count,
+                        downloaded_file_count,
+                        file_entries,
+                    )
+                normalized_message = self._normalize_error_detail(str(exc))
+                detail_message = "设备离线" if self._is_device_offline_message(normalized_message) else normalized_message
+                status_text = self._map_failure_status(normalized_message)
+                self._emit_device(
+                    sn,
+                    status_text,
+                    success_count,
+                    failed_count + 1,
+                    file_entries,
+                    detail_message,
+                    total_commands=total_commands,
+                    downloaded_file_count=downloaded_file_count,
+                )
+                return {
+                    "sn": sn,
+                    "status": status_text,
+                    "success_count": success_count,
+                    "failed_count": failed_count + 1,
+                    "downloaded_file_count": downloaded_file_count,
+                    "total_commands": total_commands,
+                    "files": file_entries,
+                    "detail": detail_message,
+                }
+            self._phase_histogram.add_spans(
+                [{"phase": "credential_lookup", "ms": round((time.perf_counter() - lookup_started_at) * 1000, 1)}]
+            )
+
             if self._stop_event.is_set():
-                return self._build_cancelled_result(
+                self._emit_device(
                     sn,
+                    "已取消",
                     success_count,
                     failed_count,
-                    downloaded_file_count,
                     file_entries,
+                    "已取消",
+                    total_commands=total_commands,
+                    downloaded_file_count=downloaded_file_count,
                 )
-            normalized_message = self._normalize_error_detail(str(exc))
-            detail_message = "设备离线" if self._is_device_offline_message(normalized_message) else normalized_message
-            status_text = self._map_failure_status(normalized_message)
-            self._emit_device(
-                sn,
-                status_text,
-                success_count,
-                failed_count + 1,
-                file_entries,
-                detail_message,
-                total_commands=total_commands,
-                downloaded_file_count=downloaded_file_count,
-            )
-            return {
-                "sn": sn,
-                "status": status_text,
-                "success_count": success_count,
-                "failed_count": failed_count + 1,
-                "downloaded_file_count": downloaded_file_count,
-                "total_commands": total_commands,
-                "files": file_entries,
-                "detail": detail_message,
-            }
+                return {
+                    "sn": sn,
+                    "status": "已取消",
+                    "success_count": success_count,
+                    "failed_count": failed_count,
+                    "downloaded_file_count": downloaded_file_count,
+                    "total_commands": total_commands,
+                    "files": file_entries,
+                    "detail": "已取消",
+                }
 
-        if self._stop_event.is_set():
             self._emit_device(
                 sn,
-                "已取消",
+                "连接设备中",
                 success_count,
                 failed_count,
                 file_entries,
-                "已取消",
+                "正在登录设备",
                 total_commands=total_commands,
                 downloaded_file_count=downloaded_file_count,
             )
-            return {
-                "sn": sn,
-                "status": "已取消",
-                "success_count": success_count,
-                "failed_count": failed_count,
-                "downloaded_file_count": downloaded_file_count,
-                "total_commands": total_commands,
-                "files": file_entries,
-                "detail": "已取消",
-            }
-
-        self._emit_device(
-            sn,
-            "连接设备中",
-            success_count,
-            failed_count,
-            file_entries,
-            "正在登录设备",
-            total_commands=total_commands,
-            downloaded_file_count=downloaded_file_count,
-        )
         process = None
         event_queue = None
+        keep_alive = False
+        # 命令超时、断开或子进程退出后，子进程可能仍在执行旧命令，不能再交还连接池
+        session_healthy = True
+        stale_reused = False
         try:
-            prefetched_cloud_credentials = None
-            protocol = str(credentials.protocol or "").strip().lower()
-            if protocol != "p2p":
-                prefetched_cloud_credentials = self._cloud_prefetcher.get(require=protocol == "siot")
-            process, event_queue = self._start_process(
-                credentials,
-                prefetched_cloud_credentials=prefetched_cloud_credentials,
-            )
-            self._wait_for_connect(
-                event_queue,
-                status_callback=lambda text: self._on_connect_status(
-                    sn,
-                    text,
-                    connect_details,
-                    success_count,
-                    failed_count,
-                    file_entries,
-                ),
-            )
-            connected_ok = True
+            if pooled is not None:
+                process, event_queue = pooled.process, pooled.event_queue
+                with self._process_lock:
+                    self._active_processes.add(process)
+                connected_ok = True
+                connect_details.append("复用已有连接")
+            else:
+                prefetched_cloud_credentials = None
+                device_status = None
+                protocol = str(credentials.protocol or "").strip().lower()
+                if protocol != "p2p":
+                    prefetched_cloud_credentials = self._cloud_prefetcher.get(require=protocol == "siot")
+                if prefetched_cloud_credentials is not None:
+                    device_status = self._status_prefetcher.get(sn)
+                process, event_queue = self._start_process(
+                    credentials,
+                    prefetched_cloud_credentials=prefetched_cloud_credentials,
+                    device_status=device_status,
+                )
+                connected_protocol = self._wait_for_connect(
+                    event_queue,
+                    status_callback=lambda text: self._on_connect_status(
+                        sn,
+                        text,
+                        connect_details,
+                        success_count,
+                        failed_count,
+                        file_entries,
+                    ),
+                    timing_callback=self._phase_histogram.add_spans,
+                )
+                connected_ok = True
+                if credentials.protocol == "auto" and connected_protocol:
+                    record_device_protocol(credentials.sn, connected_protocol)
+                if self._session_pool is not None:
+                    pooled = PooledRunner(sn, self.env, process, event_queue, protocol=connected_protocol)
 
             for index, command in enumerate(commands, 1):
                 if self._stop_event.is_set():
@@ -418,11 +689,33 @@ class BatchLogFetchThread(QThread):
                     downloaded_file_count=downloaded_file_count,
                 )
 
+                def on_metrics(metrics, index=index, command=command):
+                    transfer_stats["avg_bytes_per_s"] = float(metrics.get("avg_bytes_per_s") or 0)
+                    if float(metrics.get("bytes_per_s") or 0) <= 0:
+                        return
+                    self._emit_device(
+                        sn,
+                        f"执行中 {index}/{total_commands}",
+                        success_count,
+                        failed_count,
+                        file_entries,
+                        f"执行命令: {command}",
+                        total_commands=total_commands,
+                        current_command_index=index,
+                        current_command=command,
+                        downloaded_file_count=downloaded_file_count,
+                        throughput=format_rate(metrics.get("bytes_per_s")),
+                    )
+
                 try:
-                    command_result = self._run_command(process, event_queue, command)
+                    command_result = self._run_command(process, event_queue, command, metrics_callback=on_metrics)
                     if is_getsystemcfg_command(command):
                         if command_result.get("saved_file"):
                             file_entries.append(command_result["saved_file"])
+                            if command_result.get("sha256"):
+                                file_hashes[command_result["saved_file"]] = command_result["sha256"]
+                            if command_result.get("saved_path"):
+                                saved_paths.append(command_result["saved_path"])
                             success_count += 1
                             downloaded_file_count += 1
                             details.append(f"{command_result['saved_file']}: 成功")
@@ -434,6 +727,10 @@ class BatchLogFetchThread(QThread):
                             else:
                                 file_entries.append(f"{target_name} 获取失败")
                             details.append(f"{command}: {command_result.get('message') or '获取失败'}")
+                    elif self.output_groups is not None and is_syscmd_family_command(command) and command_result.get("success"):
+                        success_count += 1
+                        group = self.output_groups.add(command, sn, command_result.get("output") or "")
+                        details.append(f"{command}: 输出 #{group['index']}（当前 {group['count']} 台相同）")
                     else:
                         if command_result.get("success"):
                             success_count += 1
@@ -442,6 +739,13 @@ class BatchLogFetchThread(QThread):
                             failed_count += 1
                             details.append(f"{command}: {command_result.get('message') or '执行失败'}")
                 except Exception as exc:
+                    # _run_command 只在超时、断开、子进程退出等传输异常时抛出
+                    session_healthy = False
+                    if reused and success_count == 0 and failed_count == 0:
+                        # 池中连接可能已空闲超时或被设备断开，首条命令就失败时丢弃它，改为重新连接
+                        stale_reused = True
+                        logger.info(f"复用连接已失效 {sn}: {exc}，重新连接")
+                        break
                     failed_count += 1
                     details.append(f"{command}: {exc}")
 
@@ -457,6 +761,7 @@ class BatchLogFetchThread(QThread):
                     current_command=command,
                     downloaded_file_count=downloaded_file_count,
                 )
+            keep_alive = pooled is not None and session_healthy and not self._stop_event.is_set()
         except Exception as exc:
             if self._stop_event.is_set():
                 return self._build_cancelled_result(
@@ -493,9 +798,14 @@ class BatchLogFetchThread(QThread):
                 "total_commands": total_commands,
                 "files": file_entries,
                 "detail": "\n".join(detail_lines),
+                "file_hashes": file_hashes,
+                "saved_paths": saved_paths,
             }
         finally:
-            if process is not None and connected_ok:
+            released = keep_alive and self._release_to_pool(pooled)
+            if stale_reused:
+                self._terminate_process_nowait(process)
+            elif process is not None and connected_ok and not released:
                 try:
                     self._emit_device(
                         sn,
@@ -512,9 +822,15 @@ class BatchLogFetchThread(QThread):
                 except Exception as exc:
                     logger.warning(f"关闭日志设备子进程失败 {sn}: {exc}")
                 finally:
-                    self._close_process(process)
+                    if session_healthy:
+                        self._close_process(process)
+                    else:
+                        self._terminate_process_nowait(process)
                     time.sleep(0.05)
 
+        if stale_reused and not self._stop_event.is_set():
+            return self._process_single_device(sn, use_pool=False)
+
         if self._stop_event.is_set():
             return self._build_cancelled_result(
                 sn,
@@ -532,6 +848,7 @@ class BatchLogFetchThread(QThread):
             final_status = "失败"
 
         final_detail = "\n".join(details) if details else "执行完成"
+        avg_bytes_per_s = transfer_stats["avg_bytes_per_s"]
         self._emit_device(
             sn,
             final_status,
@@ -541,6 +858,7 @@ class BatchLogFetchThread(QThread):
             final_detail,
             total_commands=total_commands,
             downloaded_file_count=downloaded_file_count,
+            throughput=f"均速 {format_rate(avg_bytes_per_s)}" if avg_bytes_per_s > 0 else "",
         )
         return {
             "sn": sn,
@@ -551,8 +869,21 @@ class BatchLogFetchThread(QThread):
             "total_commands": total_commands,
             "files": file_entries,
             "detail": final_detail,
+            "avg_bytes_per_s": avg_bytes_per_s,
+            "file_hashes": file_hashes,
+            "saved_paths": saved_paths,
         }
 
+    def _release_to_pool(self, runner) -> bool:
+        """命令全部正常结束后把仍在线的子进程交还连接池，下一批命令直接复用。"""
+        with self._process_lock:
+            self._active_processes.discard(runner.process)
+        try:
+            return self._session_pool.release(runner)
+        except Exception as exc:
+            logger.warning(f"归还设备连接失败 {runner.sn}: {exc}")
+            return False
+
     def _emit_device(self, sn, status, success_count, failed_count, files, detail, **extra):
         payload = {
             "sn": sn,
@@ -583,6 +914,11 @@ class BatchLogFetchThread(QThread):
         sn_dir.mkdir(parents=True, exist_ok=True)
         output_name = self._resolve_output_filename(command, filename)
         file_path = sn_dir / output_name
+        if self.dedup_storage:
+            ContentStore(root).put_bytes(payload, file_path)
+            return str(file_path)
+        # 目标可能是去重存储的硬链接，先断开再写，避免改到共享内容
+        file_path.unlink(missing_ok=True)
         file_path.write_bytes(payload)
         return str(file_path)
 
@@ -607,7 +943,7 @@ class BatchLogFetchThread(QThread):
             return command
         return f"GetSystemCfg {command}"
 
-    def _start_process(self, credentials, prefetched_cloud_credentials=None):
+    def _start_process(self, credentials, prefetched_cloud_credentials=None, device_status=None):
         process = subprocess.Popen(
             build_internal_command("--siot-subprocess-runner"),
             stdin=subprocess.PIPE,
@@ -633,11 +969,12 @@ class BatchLogFetchThread(QThread):
                 cloud_username=self.seetong_username,
                 cloud_password=self.seetong_password,
                 prefetched_cloud_credentials=prefetched_cloud_credentials,
+                device_status=device_status,
             ),
         )
         return process, event_queue
 
-    def _wait_for_connect(self, event_queue, status_callback=None):
+    def _wait_for_connect(self, event_queue, status_callback=None, timing_callback=None):
         deadline = time.monotonic() + 35.0
         last_status = ""
         saw_wakeup = False
@@ -653,8 +990,12 @@ class BatchLogFetchThread(QThread):
                 if self._is_device_offline_message(last_status):
                     raise RuntimeError("设备离线")
                 continue
+            if event_name == "timing":
+                if callable(timing_callback):
+                    timing_callback(event.get("spans") or [])
+                continue
             if event_name == "connected":
-                return
+                return str(event.get("protocol") or "")
             if event_name == "connect_failed":
                 message = str(event.get("message") or "登录失败")
                 if self._is_wakeup_failed_message(message) or saw_wakeup:
@@ -673,7 +1014,7 @@ class BatchLogFetchThread(QThread):
             raise RuntimeError("唤醒失败")
         raise RuntimeError(last_status or "登录设备超时")
 
-    def _run_command(self, process, event_queue, command: str):
+    def _run_command(self, process, event_queue, command: str, metrics_callback=None):
         self._send_payload(
             process,
             {
@@ -681,27 +1022,37 @@ class BatchLogFetchThread(QThread):
                 "command": command,
                 "timeout_ms": self.timeout_ms,
                 "download_root": self.download_root,
+                "dedup": self.dedup_storage,
             },
         )
 
         deadline = time.monotonic() + (self.timeout_ms / 1000.0) + 5.0
         message = ""
         saved_file = ""
+        saved_path = ""
+        saved_sha256 = ""
         failed_message = ""
         missing_file = ""
+        text_outputs = []
         while time.monotonic() < deadline:
             event = self._get_next_event(event_queue, max(0.1, deadline - time.monotonic()))
             event_name = event.get("event")
             if event_name in ("status", "progress"):
                 continue
+            if event_name == "metrics":
+                if callable(metrics_callback):
+                    metrics_callback(event)
+                continue
             if event_name == "output":
                 current = str(event.get("message") or "")
                 if current.startswith("文件已下载到:"):
                     saved_path = current.split(":", 1)[1].strip()
                     saved_file = str(Path(saved_path).name)
+                    saved_sha256 = str(event.get("sha256") or "")
                     message = current
                 elif current:
                     message = current
+                    text_outputs.append(current)
                 continue
             if event_name == "command_failed":
                 failed_message = str(event.get("message") or "执行失败")
@@ -713,7 +1064,10 @@ class BatchLogFetchThread(QThread):
                     "success": not bool(failed_message),
                     "message": failed_message or message,
                     "saved_file": saved_file,
+                    "saved_path": saved_path,
+                    "sha256": saved_sha256,
                     "missing_file": missing_file,
+                    "output": "\n".join(text_outputs),
                 }
             if event_name == "disconnected":
                 raise RuntimeError(str(event.get("message") or "连接已断开"))
@@ -918,15 +1272,55 @@ class BatchLogFetchThread(QThread):
                 detail_lines.append(normalized)
 
 
+class LogSearchThread(QThread):
+    """增量更新下载目录的日志索引后执行检索。"""
+
+    results_ready = pyqtSignal(dict)
+    error_signal = pyqtSignal(str)
+
+    def __init__(self, download_root, query, time_from="", time_to=""):
+        super().__init__()
+        self.download_root = str(download_root)
+        self.query = str(query or "")
+        self.time_from = time_from
+        self.time_to = time_to
+
+    def run(self):
+        started_at = time.monotonic()
+        index = None
+        try:
+            index = LogIndex(Path(self.download_root))
+            indexed_files = index.scan()
+            hits = index.search(self.query, time_from=self.time_from, time_to=self.time_to)
+        except Exception as exc:
+            logger.error(f"日志检索失败: {exc}")
+            self.error_signal.emit(str(exc))
+            return
+        finally:
+            if index is not None:
+                index.close()
+        self.results_ready.emit(
+            {
+                "query": self.query,
+                "hits": hits,
+                "indexed_files": indexed_files,
+                "duration_ms": (time.monotonic() - started_at) * 1000,
+            }
+        )
+
+
 @register_page("命令", order=3, icon=":/icons/system/cmd.png")
 class LogPage(BasePage):
     """日志批量拉取页面。"""
 
     MAX_WORKERS = 20
+    DEFAULT_SESSION_IDLE_S = 300
     MAX_COMMANDS = 50
     RESULT_ROW_HEIGHT = 34
     RESULT_HEADERS = ("选择", "SN", "状态", "概览")
     RESULT_MIN_WIDTHS = {0: 56, 1: 170, 2: 110, 3: 220}
+    OUTPUT_GROUP_SHOWN_DEVICES = 20
+    OUTPUT_GROUP_SAMPLE_CHARS = 4000
     DEFAULT_LOG_COMMANDS = [
         "GetSystemCfg /mnt/nand/keylog.data",
         "GetSystemCfg /mnt/nand/dmsg1.txt",
@@ -946,7 +1340,11 @@ class LogPage(BasePage):
         self.download_root = self._default_download_root()
         self._row_map = {}
         self._device_payloads = {}
+        self._output_groups = None
+        self._showing_output_groups = False
+        self._rendered_output_groups = None
         self.worker_thread = None
+        self.search_thread = None
         self.fetch_running = False
         self.fetch_canceling = False
         self._config_loading = False
@@ -955,6 +1353,7 @@ class LogPage(BasePage):
         self._resizing_columns = False
         self._result_checkbox_updating = False
         self._current_run_mode = "execute"
+        self._session_idle_s = self.DEFAULT_SESSION_IDLE_S
         self.init_ui()
         self.load_config()
 
@@ -1048,6 +1447,25 @@ class LogPage(BasePage):
         self.choose_download_path_btn.setStyleSheet(StyleManager.get_ACTION_BUTTON())
         self.choose_download_path_btn.clicked.connect(self.choose_download_directory)
 
+        self.dedup_storage_checkbox = QCheckBox("去重存储")
+        self.dedup_storage_checkbox.setFixedHeight(28)
+        self.dedup_storage_checkbox.setToolTip("相同内容的下载文件只保存一份，各设备目录下放置硬链接")
+        self.dedup_storage_checkbox.toggled.connect(self.save_config)
+
+        self.archive_output_checkbox = QCheckBox("打包归档")
+        self.archive_output_checkbox.setFixedHeight(28)
+        self.archive_output_checkbox.setToolTip("设备完成后即把下载文件追加到本批次的压缩包，附带状态与哈希清单")
+        self.archive_output_checkbox.toggled.connect(self.save_config)
+
+        self.group_outputs_checkbox = QCheckBox("输出分组")
+        self.group_outputs_checkbox.setFixedHeight(28)
+        self.group_outputs_checkbox.setToolTip("syscmd 输出按内容归并，显示每种输出的设备数，可导出每组一行的 CSV")
+        self.group_outputs_checkbox.toggled.connect(self.save_config)
+
+        self.session_pool_checkbox = QCheckBox("保持连接")
+        self.session_pool_checkbox.setFixedHeight(28)
+        self.session_pool_checkbox.toggled.connect(self.on_session_pool_toggled)
+
         self.fetch_btn = QPushButton("发送")
         self.fetch_btn.setIcon(QIcon(":/icons/common/run.png"))
         self.fetch_btn.setIconSize(QSize(16, 16))
@@ -1060,6 +1478,11 @@ class LogPage(BasePage):
         bottom_layout.addWidget(self.download_path_label, 1)
         bottom_layout.addWidget(self.choose_download_path_btn)
         bottom_layout.addSpacing(6)
+        bottom_layout.addWidget(self.dedup_storage_checkbox)
+        bottom_layout.addWidget(self.archive_output_checkbox)
+        bottom_layout.addWidget(self.group_outputs_checkbox)
+        bottom_layout.addWidget(self.session_pool_checkbox)
+        bottom_layout.addSpacing(6)
         bottom_layout.addWidget(self.fetch_btn)
         query_layout.addWidget(self.bottom_frame)
 
@@ -1142,6 +1565,20 @@ class LogPage(BasePage):
         self.reset_btn.setStyleSheet(StyleManager.get_ACTION_BUTTON())
         self.reset_btn.setEnabled(False)
         self.reset_btn.clicked.connect(self.on_reset_clicked)
+        self.output_groups_btn = QPushButton("分组")
+        self.output_groups_btn.setFixedSize(72, 28)
+        self.output_groups_btn.setToolTip("查看相同输出的设备分组")
+        self.output_groups_btn.setStyleSheet(StyleManager.get_ACTION_BUTTON())
+        self.output_groups_btn.setEnabled(False)
+        self.output_groups_btn.clicked.connect(self.on_output_groups_clicked)
+        self.export_groups_btn = QPushButton("导出")
+        self.export_groups_btn.setFixedSize(72, 28)
+        self.export_groups_btn.setToolTip("导出输出分组，每组一行并附 SN 列表")
+        self.export_groups_btn.setStyleSheet(StyleManager.get_ACTION_BUTTON())
+        self.export_groups_btn.setEnabled(False)
+        self.export_groups_btn.clicked.connect(self.on_export_output_groups_clicked)
+        table_action_row.addWidget(self.output_groups_btn)
+        table_action_row.addWidget(self.export_groups_btn)
         table_action_row.addWidget(self.reset_btn)
         table_action_row.addWidget(self.retry_btn)
 
@@ -1164,7 +1601,27 @@ class LogPage(BasePage):
         detail_panel.setStyleSheet(self._get_borderless_panel_stylesheet())
         detail_layout = QVBoxLayout(detail_panel)
         detail_layout.setContentsMargins(0, 0, 0, 0)
-        detail_layout.setSpacing(0)
+        detail_layout.setSpacing(6)
+
+        search_row = QHBoxLayout()
+        search_row.setContentsMargins(0, 0, 0, 0)
+        search_row.setSpacing(6)
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("搜索已下载日志，如 error timeout")
+        self.search_input.returnPressed.connect(self.on_search_clicked)
+        self.search_time_input = QLineEdit()
+        self.search_time_input.setPlaceholderText("时间段 02:00-03:00")
+        self.search_time_input.setFixedWidth(130)
+        self.search_time_input.returnPressed.connect(self.on_search_clicked)
+        self.search_btn = QPushButton("搜索")
+        self.search_btn.setFixedSize(72, 28)
+        self.search_btn.setToolTip("在下载目录的全部设备日志中检索")
+        self.search_btn.setStyleSheet(StyleManager.get_ACTION_BUTTON())
+        self.search_btn.clicked.connect(self.on_search_clicked)
+        search_row.addWidget(self.search_input, 1)
+        search_row.addWidget(self.search_time_input)
+        search_row.addWidget(self.search_btn)
+        detail_layout.addLayout(search_row)
 
         self.detail_view = QTextEdit()
         self.detail_view.setReadOnly(True)
@@ -1190,6 +1647,12 @@ class LogPage(BasePage):
             self.sn_input.setPlainText(app_config.last_log_sn or "")
             self.download_root = self._normalize_download_root(app_config.log_download_path)
             self.update_download_path_label()
+            self.dedup_storage_checkbox.setChecked(app_config.log_dedup_storage)
+            self.archive_output_checkbox.setChecked(app_config.log_archive_output)
+            self.group_outputs_checkbox.setChecked(app_config.log_group_outputs)
+            self._session_idle_s = max(int(app_config.log_session_idle_s or 0), 0)
+            self.session_pool_checkbox.setChecked(app_config.log_session_pool)
+            self._update_session_pool_tooltip()
             self._set_command_list(command_list)
             self.set_command_editing(False)
         finally:
@@ -1204,6 +1667,10 @@ class LogPage(BasePage):
         app_config = config_manager.load_app_config()
         app_config.last_log_sn = self.sn_input.toPlainText().strip()
         app_config.log_download_path = self.download_root
+        app_config.log_dedup_storage = self.dedup_storage_checkbox.isChecked()
+        app_config.log_archive_output = self.archive_output_checkbox.isChecked()
+        app_config.log_group_outputs = self.group_outputs_checkbox.isChecked()
+        app_config.log_session_pool = self.session_pool_checkbox.isChecked()
         app_config.log_commands = self.get_command_list()[:self.MAX_COMMANDS]
         app_config.log_commands_initialized = True
         config_manager.save_app_config(app_config)
@@ -1333,6 +1800,12 @@ class LogPage(BasePage):
             self._prepare_result_table(sn_list)
         else:
             self._prepare_retry_rows(sn_list)
+        # 重试沿用本批次的分组，重试设备的新输出会移到对应分组
+        if not self.group_outputs_checkbox.isChecked():
+            self._output_groups = None
+        elif reset_table or self._output_groups is None:
+            self._output_groups = CommandOutputGrouper()
+        self._update_output_group_buttons()
 
         self._set_running_state(True)
         action_text = "正在重试失败设备" if run_mode == "retry" else "正在批量拉取日志"
@@ -1349,6 +1822,10 @@ class LogPage(BasePage):
             seetong_username=context["seetong_username"],
             seetong_password=context["seetong_password"],
             max_workers=self.MAX_WORKERS,
+            dedup_storage=self.dedup_storage_checkbox.isChecked(),
+            archive_output=self.archive_output_checkbox.isChecked(),
+            session_pool=self._active_session_pool(),
+            output_groups=self._output_groups,
         )
         self.worker_thread.device_updated.connect(self.on_device_updated)
         self.worker_thread.summary_ready.connect(self.on_summary_ready)
@@ -1377,6 +1854,7 @@ class LogPage(BasePage):
             "total_commands": int(payload.get("total_commands") or 0),
             "current_command_index": int(payload.get("current_command_index") or 0),
             "current_command": str(payload.get("current_command") or ""),
+            "throughput": str(payload.get("throughput") or ""),
         }
 
         status_text = str(payload.get("status") or "")
@@ -1392,6 +1870,9 @@ class LogPage(BasePage):
             item.setText(value)
             item.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
             self._apply_item_color(item, column, value)
+        throughput = str(payload.get("throughput") or "")
+        if throughput:
+            self.result_table.item(row, 2).setText(f"{status_text}\n{throughput}")
 
         overview_item = self.result_table.item(row, 3)
         if overview_item is None:
@@ -1400,8 +1881,10 @@ class LogPage(BasePage):
         self._update_overview_item(overview_item, payload, file_text)
         self._update_result_row_height(row)
 
-        current_row = self.result_table.currentRow()
-        if current_row == row:
+        self._update_output_group_buttons()
+        if self._showing_output_groups:
+            self._refresh_output_groups()
+        elif self.result_table.currentRow() == row:
             self._update_detail_view(sn)
 
     def on_result_item_double_clicked(self, item):
@@ -1414,6 +1897,7 @@ class LogPage(BasePage):
         self.show_success("已复制单元格内容", 1200)
 
     def on_result_selection_changed(self):
+        self._showing_output_groups = False
         row = self.result_table.currentRow()
         if row < 0:
             self._update_detail_view()
@@ -1432,6 +1916,7 @@ class LogPage(BasePage):
                 f"耗时 {self._format_duration(summary.get('duration_seconds', 0.0))}"
             )
             self.summary_label.setText(message)
+            self._apply_summary_tooltip(summary)
             self.show_warning(message, 5000)
             return
         completed_devices = int(summary.get("success_devices", 0)) + int(summary.get("partial_devices", 0))
@@ -1444,9 +1929,101 @@ class LogPage(BasePage):
             f"下载文件 {summary.get('total_files', 0)} 个，"
             f"耗时 {self._format_duration(summary.get('duration_seconds', 0.0))}"
         )
+        phase_timings = summary.get("phase_timings") or {}
+        if phase_timings:
+            slowest = max(phase_timings.values(), key=lambda item: item.get("total_ms", 0))
+            message += f"，连接最耗时阶段 {slowest.get('label')} p90 {float(slowest.get('p90_ms') or 0) / 1000:.1f}s"
+        file_comparison = summary.get("file_comparison") or {}
+        if file_comparison:
+            differ_count = sum(1 for item in file_comparison.values() if item.get("outliers"))
+            message += f"，文件比对 {len(file_comparison) - differ_count} 个一致 / {differ_count} 个有差异"
+        if summary.get("output_group_count"):
+            message += f"，命令输出 {summary['output_group_count']} 种"
+        if summary.get("auto_retried"):
+            message += f"，自动重试 {summary['auto_retried']} 台"
+        if summary.get("archive_path"):
+            message += f"，已归档 {Path(summary['archive_path']).name}"
         self.summary_label.setText(message)
+        self._apply_summary_tooltip(summary)
         self.show_success(message, 5000)
 
+    def _apply_summary_tooltip(self, summary: dict):
+        sections = []
+        lines = list(summary.get("phase_timing_lines") or [])
+        if summary.get("phase_timings_path"):
+            lines.append(f"已保存: {summary['phase_timings_path']}")
+        if lines:
+            sections.append("连接阶段耗时\n" + "\n".join(lines))
+        lines = list(summary.get("file_comparison_lines") or [])
+        if summary.get("file_comparison_path"):
+            lines.append(f"已保存: {summary['file_comparison_path']}")
+        if lines:
+            sections.append("文件内容比对\n" + "\n".join(lines))
+        lines = list(summary.get("output_group_lines") or [])
+        if summary.get("output_groups_path"):
+            lines.append(f"已保存: {summary['output_groups_path']}")
+        if lines:
+            sections.append("命令输出分组\n" + "\n".join(lines))
+        if summary.get("archive_path"):
+            sections.append(f"批次归档\n{summary['archive_path']}")
+        self.summary_label.setToolTip("\n\n".join(sections))
+
+    def on_search_clicked(self):
+        query = self.search_input.text().strip()
+        if not query:
+            self.show_warning("请输入要搜索的内容")
+            return
+        if self.search_thread is not None:
+            return
+        time_from, time_to = self._parse_search_time_range(self.search_time_input.text())
+        self.search_btn.setEnabled(False)
+        self.search_thread = LogSearchThread(self.download_root, query, time_from, time_to)
+        self.search_thread.results_ready.connect(self.on_search_results)
+        self.search_thread.error_signal.connect(self.on_worker_error)
+        self.search_thread.finished.connect(self.on_search_finished)
+        self.search_thread.start()
+
+    def on_search_finished(self):
+        self.search_btn.setEnabled(True)
+        if self.search_thread is not None:
+            self.search_thread.deleteLater()
+            self.search_thread = None
+
+    def on_search_results(self, result: dict):
+        hits = list(result.get("hits") or [])
+        self.detail_view.setHtml(self._render_search_results(result.get("query", ""), hits, result.get("duration_ms", 0.0)))
+
+    @staticmethod
+    def _parse_search_time_range(text: str):
+        parts = re.split(r"\s*[-~～]\s*", str(text or "").strip(), maxsplit=1)
+        time_from = parts[0].strip() if parts else ""
+        time_to = parts[1].strip() if len(parts) > 1 else ""
+        return time_from, time_to
+
+    def _render_search_results(self, query: str, hits, duration_ms: float) -> str:
+        if not hits:
+            return (
+                f'<div style="color: {t("text_secondary")};"><b>日志检索</b><br/><br/>'
+                f"未找到 “{html.escape(query)}”（{duration_ms:.0f} ms）</div>"
+            )
+        device_count = len({hit.sn for hit in hits})
+        parts = [
+            f'<div style="color: {t("text_primary")};"><b>日志检索:</b> {html.escape(query)}'
+            f"<br/>{len(hits)} 条结果，涉及 {device_count} 台设备（{duration_ms:.0f} ms）</div>"
+        ]
+        current_sn = None
+        for hit in hits:
+            if hit.sn != current_sn:
+                current_sn = hit.sn
+                parts.append(f'<div style="margin-top: 6px;"><b>{html.escape(hit.sn or "-")}</b></div>')
+            location = f"{Path(hit.path).name}:{hit.line_no}"
+            parts.append(
+                f'<div style="color: {t("text_secondary")}; white-space: pre-wrap;">{html.escape(location)} '
+                f'{html.escape(hit.ts)}</div>'
+                f'<div style="color: {t("text_primary")}; white-space: pre-wrap;">{html.escape(hit.text)}</div>'
+            )
+        return "".join(parts)
+
     def on_worker_error(self, message: str):
         self.show_error(message)
 
@@ -1460,6 +2037,24 @@ class LogPage(BasePage):
         self._apply_result_column_widths()
         self._update_result_selection_state()
 
+    def on_session_pool_toggled(self, checked: bool):
+        if not checked:
+            get_session_pool().close_all()
+        self._update_session_pool_tooltip()
+        self.save_config()
+
+    def _active_session_pool(self):
+        if not self.session_pool_checkbox.isChecked():
+            return None
+        pool = get_session_pool()
+        pool.set_idle_s(self._session_idle_s)
+        return pool
+
+    def _update_session_pool_tooltip(self):
+        self.session_pool_checkbox.setToolTip(
+            f"执行完后保留设备连接，空闲 {max(self._session_idle_s // 60, 1)} 分钟内再次执行直接复用，无需重新登录"
+        )
+
     def choose_download_directory(self):
         selected_dir = QFileDialog.getExistingDirectory(
             self,
@@ -1488,6 +2083,7 @@ class LogPage(BasePage):
             self.fetch_canceling = False
             self.worker_thread.cancel()
             self.worker_thread.wait(3000)
+        get_session_pool().close_all()
 
     def fast_cleanup(self):
         if self.worker_thread is not None and self.worker_thread.isRunning():
@@ -1498,6 +2094,7 @@ class LogPage(BasePage):
                 self.worker_thread.wait(500)
             except Exception:
                 pass
+        get_session_pool().close_all()
 
     def _prepare_result_table(self, sn_list):
         self._row_map = {}
@@ -1530,6 +2127,9 @@ class LogPage(BasePage):
     def _reset_result_view(self):
         self._row_map = {}
         self._device_payloads = {}
+        self._output_groups = None
+        self._showing_output_groups = False
+        self._update_output_group_buttons()
         self.result_table.clearSelection()
         self.result_table.setRowCount(0)
         self.summary_label.setText("等待开始")
@@ -2029,6 +2629,67 @@ class LogPage(BasePage):
 
         return "\n".join(result_lines)
 
+    def _update_output_group_buttons(self):
+        has_groups = self._output_groups is not None and self._output_groups.group_count() > 0
+        self.output_groups_btn.setEnabled(has_groups)
+        self.export_groups_btn.setEnabled(has_groups)
+
+    def on_output_groups_clicked(self):
+        if self._output_groups is None:
+            return
+        self._showing_output_groups = True
+        self._render_output_groups()
+
+    def on_export_output_groups_clicked(self):
+        if self._output_groups is None or not self._output_groups.group_count():
+            return
+        default_path = Path(self.download_root).expanduser() / f"output_groups_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出输出分组", str(default_path), "CSV 文件 (*.csv)")
+        if not file_path:
+            return
+        saved_path = self._output_groups.export_csv(Path(file_path))
+        if saved_path is None:
+            self.show_warning("导出输出分组失败")
+            return
+        self.show_success(f"已导出 {self._output_groups.group_count()} 个分组", 2000)
+
+    def _refresh_output_groups(self):
+        """设备更新（含吞吐指标刷新）频繁到达，只在分组内容变化后才重绘详情区。"""
+        grouper = self._output_groups
+        rendered = self._rendered_output_groups
+        if grouper is not None and rendered is not None and rendered[0] is grouper and rendered[1] == grouper.version:
+            return
+        self._render_output_groups()
+
+    def _render_output_groups(self):
+        """在详情区按命令列出每种输出：设备数、SN 列表与一份输出样本。"""
+        grouper = self._output_groups
+        # 先记版本再取快照，取快照期间的新变化会在下次刷新时重绘
+        self._rendered_output_groups = (grouper, grouper.version) if grouper is not None else None
+        snapshot = grouper.snapshot() if grouper is not None else {}
+        sections = []
+        for command, groups in snapshot.items():
+            device_count = sum(len(group["devices"]) for group in groups)
+            items = []
+            for group in groups:
+                devices = group["devices"]
+                shown = "、".join(devices[:self.OUTPUT_GROUP_SHOWN_DEVICES])
+                if len(devices) > self.OUTPUT_GROUP_SHOWN_DEVICES:
+                    shown += f" 等 {len(devices)} 台"
+                sample = group["sample"]
+                if len(sample) > self.OUTPUT_GROUP_SAMPLE_CHARS or group.get("truncated"):
+                    sample = sample[:self.OUTPUT_GROUP_SAMPLE_CHARS] + "\n...（导出可查看完整输出）"
+                items.append(
+                    f'<div><b>#{group["index"]}</b> {len(devices)} 台返回此输出: '
+                    f'<span style="color: {t("text_secondary")};">{html.escape(shown)}</span></div>'
+                    f'<pre style="margin: 2px 0 8px 0;">{html.escape(sample) or html.escape("（空输出）")}</pre>'
+                )
+            sections.append(
+                f"<div><b>{html.escape(command)}</b> — {len(groups)} 种输出 / {device_count} 台</div>" + "".join(items)
+            )
+        body = "<br/>".join(sections) or f'<div style="color: {t("text_secondary")};">暂无命令输出</div>'
+        self.detail_view.setHtml(f'<div style="color: {t("text_primary")};">{body}</div>')
+
     def _update_detail_view(self, sn: str = ""):
         if not hasattr(self, "detail_view"):
             return
@@ -2116,7 +2777,8 @@ class LogPage(BasePage):
 
     @staticmethod
     def _status_color(status: str) -> str:
-        status = (status or "").strip()
+        # 状态列第二行可能附带传输速率
+        status = (status or "").strip().split("\n", 1)[0].strip()
         if status in ("完成", "部分完成"):
             return t("status_online")
         if status in ("失败", "设备离线", "唤醒失败"):
@@ -2209,7 +2871,7 @@ class LogPage(BasePage):
         status = (status or "").strip()
         if not status:
             return False
-        if status.startswith("执行中") or status in ("等待执行", "查询设备密码中", "连接设备中", "正在注销", "已取消"):
+        if status.startswith("执行中") or status in ("等待执行", "等待重试", "查询设备密码中", "连接设备中", "正在注销", "已取消"):
             return False
         return status not in ("完成", "部分完成")
 
@@ -2218,7 +2880,7 @@ class LogPage(BasePage):
         for row in self._selected_result_rows():
             status_item = self.result_table.item(row, 2)
             sn_item = self.result_table.item(row, 1)
-            status_text = status_item.text().strip() if status_item is not None else ""
+            status_text = status_item.text().strip().split("\n", 1)[0] if status_item is not None else ""
             sn = sn_item.text().strip() if sn_item is not None else ""
             if sn and self._is_retryable_status(status_text):
                 sn_list.append(sn)
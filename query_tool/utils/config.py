@@ -2,13 +2,19 @@
 配置管理器
 统一管理应用程序配置（注册表）
 """
-import winreg
 import base64
 import hashlib
 import json
 import os
 from dataclasses import dataclass, field
 from typing import List
+
+try:
+    import winreg
+except ImportError:  # 非 Windows（离线回放/基准脚本、CI）没有注册表：读取返回默认值，写入返回失败
+    winreg = None
+
+REG_SZ = winreg.REG_SZ if winreg is not None else 1
 
 # 注册表路径
 REGISTRY_PATH = r"Software\TPQueryTool"
@@ -50,6 +56,11 @@ class AppConfig:
     log_download_path: str = ''
     log_commands: List[str] = field(default_factory=list)
     log_commands_initialized: bool = False
+    log_dedup_storage: bool = False
+    log_archive_output: bool = False
+    log_group_outputs: bool = False
+    log_session_pool: bool = False
+    log_session_idle_s: int = 300
     last_page_index: int = 0
     theme: str = 'dark'  # 'dark' 或 'light'
     tray_minimize_tip_shown: bool = False
@@ -69,6 +80,8 @@ class ConfigManager:
     
     def _get_value(self, key, default=None):
         """从注册表读取值"""
+        if winreg is None:
+            return default
         reg_key = None
         try:
             reg_key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, self.registry_path, 0, winreg.KEY_READ)
@@ -84,8 +97,10 @@ class ConfigManager:
                     from query_tool.utils.logger import logger
                     logger.debug(f"关闭注册表键失败: {e}")
     
-    def _set_value(self, key, value, value_type=winreg.REG_SZ):
+    def _set_value(self, key, value, value_type=REG_SZ):
         """写入值到注册表"""
+        if winreg is None:
+            return False
         reg_key = None
         try:
             reg_key = winreg.CreateKey(winreg.HKEY_CURRENT_USER, self.registry_path)
@@ -253,6 +268,11 @@ class ConfigManager:
         log_commands_str = self._get_value('log_commands', '')
         log_commands = self._decode_string_list(log_commands_str)
         log_commands_initialized = self._get_value('log_commands_initialized', '0') == '1'
+        log_dedup_storage = self._get_value('log_dedup_storage', '0') == '1'
+        log_archive_output = self._get_value('log_archive_output', '0') == '1'
+        log_group_outputs = self._get_value('log_group_outputs', '0') == '1'
+        log_session_pool = self._get_value('log_session_pool', '0') == '1'
+        log_session_idle_s = int(self._get_value('log_session_idle_s', '300'))
         last_page_index = int(self._get_value('last_page_index', '0'))
         theme = self._get_value('theme', 'dark')
         tray_minimize_tip_shown = self._get_value('tray_minimize_tip_shown', '0') == '1'
@@ -269,6 +289,11 @@ class ConfigManager:
             log_download_path=log_download_path,
             log_commands=log_commands,
             log_commands_initialized=log_commands_initialized,
+            log_dedup_storage=log_dedup_storage,
+            log_archive_output=log_archive_output,
+            log_group_outputs=log_group_outputs,
+            log_session_pool=log_session_pool,
+            log_session_idle_s=log_session_idle_s,
             last_page_index=last_page_index,
             theme=theme,
             tray_minimize_tip_shown=tray_minimize_tip_shown
@@ -292,6 +317,11 @@ class ConfigManager:
             log_commands_str = json.dumps(config.log_commands[:50], ensure_ascii=False)
             self._set_value('log_commands', log_commands_str)
             self._set_value('log_commands_initialized', '1' if config.log_commands_initialized else '0')
+            self._set_value('log_dedup_storage', '1' if config.log_dedup_storage else '0')
+            self._set_value('log_archive_output', '1' if config.log_archive_output else '0')
+            self._set_value('log_group_outputs', '1' if config.log_group_outputs else '0')
+            self._set_value('log_session_pool', '1' if config.log_session_pool else '0')
+            self._set_value('log_session_idle_s', str(config.log_session_idle_s))
             self._set_value('last_page_index', str(config.last_page_index))
             self._set_value('theme', config.theme)
             self._set_value('tray_minimize_tip_shown', '1' if config.tray_minimize_tip_shown else '0')
@@ -324,6 +354,8 @@ class ConfigManager:
         """加载token缓存"""
         import time
         
+        if winreg is None:
+            return None, None
         reg_key = None
         try:
             reg_key = winreg.OpenKey(
@@ -424,6 +456,8 @@ class ConfigManager:
 
     def clear_seetong_cloud_cache(self, username, password):
         """清理 Seetong 云登录缓存。"""
+        if winreg is None:
+            return False
         reg_key = None
         try:
             scoped_key = self._build_scoped_key(
@@ -511,7 +545,7 @@ def get_registry_value(key_name, value_name, default=None):
     return config_manager._get_value(value_name, default)
 
 
-def set_registry_value(key_name, value_name, value, value_type=winreg.REG_SZ):
+def set_registry_value(key_name, value_name, value, value_type=REG_SZ):
     """写入值到注册表（向后兼容）"""
     return config_manager._set_value(value_name, value, value_type)
 
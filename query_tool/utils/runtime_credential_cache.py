@@ -14,10 +14,12 @@ if TYPE_CHECKING:
 
 DEVICE_QUERY_TTL_S = 90 * 60
 SEETONG_CLOUD_CACHE_TTL_S = 60 * 60
+DEVICE_CONTEXT_TTL_S = 30 * 60
 
 _cache_lock = threading.RLock()
 _device_query_cache: Dict[str, dict] = {}
 _cloud_credentials_cache: Dict[str, dict] = {}
+_device_context_store: Dict[str, dict] = {}
 
 
 def _account_key(env: str, username: str, password: str) -> str:
@@ -57,6 +59,64 @@ def get_shared_device_query(
     return query
 
 
+def _device_context_key(env: str, username: str, password: str, sn: str) -> str:
+    return f"{_account_key(env, username, password)}|{str(sn or '').strip().upper()}"
+
+
+def publish_device_context(
+    env: str,
+    username: str,
+    password: str,
+    *,
+    sn: str,
+    dev_id: str = "",
+    device_password: str = "",
+    is_siot: Optional[bool] = None,
+    model: str = "",
+) -> None:
+    """设备查询结果写入进程内共享的设备上下文，调试/批量拉日志可直接复用，不再重复查询。"""
+    sn = str(sn or "").strip()
+    if not sn:
+        return
+    fields = {
+        "sn": sn,
+        "dev_id": str(dev_id or "").strip(),
+        "device_password": str(device_password or "").strip(),
+        "is_siot": is_siot,
+        "model": str(model or "").strip(),
+    }
+    key = _device_context_key(env, username, password, sn)
+    now = time.time()
+    with _cache_lock:
+        entry = _device_context_store.get(key)
+        context = dict(entry["context"]) if entry else {}
+        # 新结果中缺失的字段保留旧值，避免部分失败的查询覆盖已知信息
+        context.update({name: value for name, value in fields.items() if value not in ("", None)})
+        context.setdefault("is_siot", None)
+        _device_context_store[key] = {
+            "context": context,
+            "created_at": now,
+        }
+
+
+def load_device_context(
+    env: str,
+    username: str,
+    password: str,
+    sn: str,
+    *,
+    ttl_seconds: float = DEVICE_CONTEXT_TTL_S,
+) -> Optional[dict]:
+    """读取共享设备上下文，过期返回 None。"""
+    key = _device_context_key(env, username, password, sn)
+    with _cache_lock:
+        entry = _device_context_store.get(key)
+        if entry and (time.time() - entry["created_at"]) < ttl_seconds:
+            return dict(entry["context"])
+        _device_context_store.pop(key, None)
+    return None
+
+
 def load_cached_cloud_credentials(
     username: str,
     password: str,
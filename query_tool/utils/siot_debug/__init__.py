@@ -1,20 +1,52 @@
+from .batch_archive import BatchArchiveWriter
+from .batch_scheduler import SLEEPER_LANE_LIMIT, LaneScheduler, classify_device_status
 from .command_catalog import build_catalog_text, is_getsystemcfg_command, is_startlogp2p_command, is_syscmd_family_command, parse_startlogp2p_level
 from .config import DEFAULT_COMMAND_TIMEOUT_MS
-from .connect_payload import CloudCredentialPrefetcher, build_connect_payload
+from .content_store import ContentStore, compare_device_files, format_comparison_lines, save_comparison_report
+from .connect_payload import CloudCredentialPrefetcher, DeviceStatusPrefetcher, build_connect_payload
+from .log_index import LogIndex, LogIndexer, LogSearchHit
+from .output_groups import CommandOutputGrouper
+from .output_spool import SpooledOutput, prune_output_spool, should_spool_output, spool_output
 from .service import SiotDebugWorker, resolve_device_credentials, validate_seetong_login
+from .session_pool import PooledRunner, RunnerSessionPool, get_session_pool
 from .siot_client import SiotError
+from .telemetry import format_rate
+from .timing import PhaseHistogram, PhaseTimer
 
 __all__ = [
+    "BatchArchiveWriter",
     "DEFAULT_COMMAND_TIMEOUT_MS",
     "CloudCredentialPrefetcher",
+    "CommandOutputGrouper",
+    "ContentStore",
+    "DeviceStatusPrefetcher",
+    "LaneScheduler",
+    "LogIndex",
+    "LogIndexer",
+    "LogSearchHit",
+    "PhaseHistogram",
+    "PhaseTimer",
+    "PooledRunner",
+    "RunnerSessionPool",
+    "SLEEPER_LANE_LIMIT",
     "SiotDebugWorker",
     "SiotError",
+    "SpooledOutput",
     "build_connect_payload",
     "build_catalog_text",
+    "classify_device_status",
+    "compare_device_files",
+    "format_comparison_lines",
+    "format_rate",
+    "get_session_pool",
     "is_getsystemcfg_command",
     "is_startlogp2p_command",
     "is_syscmd_family_command",
     "parse_startlogp2p_level",
+    "prune_output_spool",
     "resolve_device_credentials",
+    "save_comparison_report",
+    "should_spool_output",
+    "spool_output",
     "validate_seetong_login",
 ]
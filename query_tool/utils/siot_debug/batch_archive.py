@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import logging
+import queue
+import tarfile
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 仅开发环境可能缺失
+    zstandard = None
+
+
+ARCHIVE_ZSTD_LEVEL = 3
+ARCHIVE_MANIFEST_NAME = "manifest.json"
+ARCHIVE_MANIFEST_SUFFIX = ".manifest.json"
+
+
+class _HashingReader:
+    """tar 写入时顺带计算 sha256，文件只读一遍。"""
+
+    def __init__(self, handle) -> None:
+        self._handle = handle
+        self.digest = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._handle.read(size)
+        self.digest.update(data)
+        return data
+
+
+class BatchArchiveWriter:
+    """批量拉取的流式归档：设备完成后把其下载文件追加进同一个 tar.zst，
+    结束时在归档末尾写入 manifest.json（设备状态、文件、大小、哈希），并在旁边保留一份同名清单。
+
+    写入在后台线程进行，不阻塞调度；缺少 zstandard 时退化为 tar.gz。
+    """
+
+    def __init__(self, root: Path, archive_name: str = "") -> None:
+        self.root = Path(root).expanduser()
+        suffix = ".tar.zst" if zstandard is not None else ".tar.gz"
+        self.path = self.root / f"{archive_name or 'logs_' + time.strftime('%Y%m%d_%H%M%S')}{suffix}"
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._devices: List[dict] = []
+        self._cancelled = False
+        self._failed = False
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.path.with_name(self.path.name + ARCHIVE_MANIFEST_SUFFIX)
+
+    def add_device(self, sn: str, status: str, paths: Iterable[str], detail: str = "") -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="log-archive", daemon=True)
+            self._thread.start()
+        self._queue.put({"sn": sn, "status": status, "paths": [str(path) for path in paths or ()], "detail": detail})
+
+    def close(self, cancelled: bool = False) -> Optional[Path]:
+        """写入清单并结束归档，返回归档路径；没有任何设备或写入失败时返回 None。"""
+        if self._thread is None:
+            return None
+        self._cancelled = cancelled
+        self._queue.put(None)
+        self._thread.join()
+        return None if self._failed else self.path
+
+    def _run(self) -> None:
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            handle = self.path.open("wb")
+        except OSError as exc:
+            logging.warning("Create log archive failed: %s", exc)
+            self._failed = True
+            self._drain()
+            return
+        stream = None
+        if zstandard is not None:
+            stream = zstandard.ZstdCompressor(level=ARCHIVE_ZSTD_LEVEL).stream_writer(handle)
+        try:
+            if stream is not None:
+                tar = tarfile.open(fileobj=stream, mode="w|")
+            else:
+                tar = tarfile.open(fileobj=handle, mode="w|gz")
+            with tar:
+                while True:
+                    item = self._queue.get()
+                    if item is None:
+                        break
+                    self._devices.append(self._append_device(tar, item))
+                self._append_manifest(tar)
+        except Exception:
+            logging.exception("Write log archive failed: %s", self.path)
+            self._failed = True
+            self._drain()
+        finally:
+            try:
+                (stream or handle).close()
+            except Exception:
+                pass
+            if not handle.closed:
+                handle.close()
+
+    def _drain(self) -> None:
+        while self._queue.get() is not None:
+            pass
+
+    def _append_device(self, tar: tarfile.TarFile, item: dict) -> dict:
+        sn = item["sn"]
+        entry = {"sn": sn, "status": item["status"], "detail": item["detail"], "files": []}
+        for raw_path in item["paths"]:
+            path = Path(raw_path)
+            arcname = f"{sn}/{path.name}"
+            try:
+                with path.open("rb") as reader:
+                    # 去重存储下的文件是硬链接，手工构造普通文件条目，避免 tar 写成链接成员
+                    stat = path.stat()
+                    info = tarfile.TarInfo(arcname)
+                    info.size = stat.st_size
+                    info.mtime = int(stat.st_mtime)
+                    info.mode = 0o644
+                    hashing = _HashingReader(reader)
+                    tar.addfile(info, hashing)
+            except OSError as exc:
+                logging.warning("Add file to log archive failed %s: %s", path, exc)
+                entry["files"].append({"name": path.name, "error": str(exc)})
+                continue
+            entry["files"].append(
+                {"name": path.name, "arcname": arcname, "size": info.size, "sha256": hashing.digest.hexdigest()}
+            )
+        return entry
+
+    def _append_manifest(self, tar: tarfile.TarFile) -> None:
+        manifest = {
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "cancelled": self._cancelled,
+            "devices": self._devices,
+        }
+        data = json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")
+        info = tarfile.TarInfo(ARCHIVE_MANIFEST_NAME)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        tar.addfile(info, io.BytesIO(data))
+        try:
+            self.manifest_path.write_bytes(data)
+        except OSError as exc:
+            logging.warning("Write log archive manifest failed: %s", exc)
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+
+LANE_ONLINE = "online"
+LANE_SLEEPER = "sleeper"
+SLEEPER_LANE_LIMIT = 6
+RETRY_BACKOFF_S = (15.0, 45.0)
+
+# 在线通道内的先后：已在线 → 状态未知 → 探测为离线（大概率快速失败后进入重试队列）
+_ONLINE_PRIORITY = {"online": 0, "unknown": 1, "offline": 2}
+
+
+def classify_device_status(status: Optional[dict]) -> str:
+    """按预探测状态归类：online / sleeping / offline，无状态为 unknown。"""
+    if not status:
+        return "unknown"
+    if int(status.get("online", 0) or 0) != 0:
+        return "online"
+    if int(status.get("online4g", 0) or 0) != 0:
+        return "sleeping"
+    return "offline"
+
+
+class LaneScheduler:
+    """批量拉取的分通道调度：在线设备与需唤醒的休眠设备各自排队、各自限并发，
+    瞬时失败的设备按退避时间进入重试队列，主队列全部派发完后才处理重试。"""
+
+    def __init__(
+        self,
+        online_limit: int,
+        sleeper_limit: int = SLEEPER_LANE_LIMIT,
+        retry_backoff_s: Sequence[float] = RETRY_BACKOFF_S,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._limits = {LANE_ONLINE: max(int(online_limit), 1), LANE_SLEEPER: max(int(sleeper_limit), 1)}
+        self._retry_backoff_s = tuple(float(delay) for delay in retry_backoff_s)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._queues: Dict[str, list] = {LANE_ONLINE: [], LANE_SLEEPER: []}
+        self._inflight: Dict[str, int] = {LANE_ONLINE: 0, LANE_SLEEPER: 0}
+        self._retries: list = []
+        self._attempts: Dict[str, int] = {}
+        self._input_closed = False
+
+    @property
+    def total_limit(self) -> int:
+        return sum(self._limits.values())
+
+    def add(self, sn: str, status: Optional[dict] = None) -> str:
+        state = classify_device_status(status)
+        lane = LANE_SLEEPER if state == "sleeping" else LANE_ONLINE
+        with self._lock:
+            heapq.heappush(self._queues[lane], (_ONLINE_PRIORITY.get(state, 0), next(self._seq), sn))
+        return lane
+
+    def close_input(self) -> None:
+        """所有 SN 都已加入；此后主队列排空即开始处理重试队列。"""
+        with self._lock:
+            self._input_closed = True
+
+    def next_ready(self) -> Optional[Tuple[str, str]]:
+        """取下一个可派发的 (SN, 通道)；通道已满或暂无可派发设备时返回 None。"""
+        with self._lock:
+            for lane in (LANE_ONLINE, LANE_SLEEPER):
+                queue = self._queues[lane]
+                if queue and self._inflight[lane] < self._limits[lane]:
+                    _, _, sn = heapq.heappop(queue)
+                    return self._dispatch_locked(sn, lane)
+            if not self._retry_phase_locked():
+                return None
+            now = self._clock()
+            deferred = []
+            result = None
+            while self._retries and self._retries[0][0] <= now:
+                item = heapq.heappop(self._retries)
+                _, _, sn, lane = item
+                if self._inflight[lane] < self._limits[lane]:
+                    result = self._dispatch_locked(sn, lane)
+                    break
+                deferred.append(item)
+            for item in deferred:
+                heapq.heappush(self._retries, item)
+            return result
+
+    def finish(self, sn: str, lane: str, retryable: bool) -> Optional[float]:
+        """设备本轮结束；可重试且未超过次数时放入重试队列并返回退避秒数，否则返回 None。"""
+        with self._lock:
+            self._inflight[lane] = max(self._inflight[lane] - 1, 0)
+            retry_index = self._attempts.get(sn, 1) - 1
+            if not retryable or retry_index >= len(self._retry_backoff_s):
+                return None
+            delay = self._retry_backoff_s[retry_index]
+            heapq.heappush(self._retries, (self._clock() + delay, next(self._seq), sn, lane))
+            return delay
+
+    def attempts(self, sn: str) -> int:
+        with self._lock:
+            return self._attempts.get(sn, 0)
+
+    def has_work(self) -> bool:
+        with self._lock:
+            return bool(
+                any(self._queues.values()) or any(self._inflight.values()) or self._retries or not self._input_closed
+            )
+
+    def _dispatch_locked(self, sn: str, lane: str) -> Tuple[str, str]:
+        self._inflight[lane] += 1
+        self._attempts[sn] = self._attempts.get(sn, 0) + 1
+        return sn, lane
+
+    def _retry_phase_locked(self) -> bool:
+        return self._input_closed and not any(self._queues.values())
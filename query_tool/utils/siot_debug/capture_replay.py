@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import ctypes
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional
+
+from .packet_capture import SOURCE_P2P_LOG, SOURCE_PEER, CapturedPacket
+from .p2p_session import P2PDeviceSession, _P2PCommandWaiter
+from .protocol import BINARY_SEPARATOR, PAYLOAD_TYPE_XML, pack_message
+from .session import DeviceSession, _CommandWaiter
+
+
+REPLAY_ENCRYPT_METHOD = 1
+REPLAY_SECRET_KEY = b"replay"
+
+_CRYPT_FN = ctypes.CFUNCTYPE(
+    ctypes.c_int,
+    ctypes.c_int,
+    ctypes.c_void_p,
+    ctypes.c_int,
+    ctypes.c_void_p,
+    ctypes.c_int,
+    ctypes.c_char_p,
+)
+
+
+def _identity_crypt(method, source, source_len, output, output_len, key):
+    if source_len > output_len:
+        return -1
+    ctypes.memmove(output, source, source_len)
+    return source_len
+
+
+class FakeCryptLib:
+    """恒等加解密：抓包中的加密报文体已是明文，回放时只走缓冲与拷贝路径。"""
+
+    TpsProtocolEncode = _CRYPT_FN(_identity_crypt)
+    TpsProtocolDecode = _CRYPT_FN(_identity_crypt)
+
+    @staticmethod
+    def TpsProtocolEncryptVersionNegotiate(version: int) -> int:
+        return int(version)
+
+
+class _ReplaySdk:
+    """不加载任何 DLL 的 SDK 替身，回放只调用接收路径，不会用到 lib。"""
+
+    def __init__(self) -> None:
+        self.lib = None
+        self.crypt = FakeCryptLib()
+
+    def configure_callbacks(self, *callbacks) -> None:
+        pass
+
+    def ensure_initialized(self) -> None:
+        pass
+
+
+@dataclass
+class ReplayStats:
+    packets: int = 0
+    bytes: int = 0
+    elapsed_s: float = 0.0
+
+    @property
+    def packets_per_s(self) -> float:
+        return self.packets / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    @property
+    def megabytes_per_s(self) -> float:
+        return self.bytes / 1024 / 1024 / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+
+def capture_protocol(packets: Iterable[CapturedPacket]) -> str:
+    """根据报文来源判断抓包对应的会话类型；SIOT 与 P2P 报文混在同一文件时无法回放到单个会话。"""
+    sources = {packet.source for packet in packets}
+    if SOURCE_P2P_LOG not in sources:
+        return "siot"
+    if sources == {SOURCE_P2P_LOG}:
+        return "p2p"
+    raise ValueError("抓包文件中同时包含 SIOT 与 P2P 报文，无法回放到同一个会话，请重新抓包")
+
+
+def create_replay_session(protocol: str = "siot"):
+    """构造已认证、已建链状态的离线会话对象，供回放驱动直接喂入报文。"""
+    if protocol == "p2p":
+        session = P2PDeviceSession(sdk=_ReplaySdk())
+        session._connected = True
+        return session
+    session = DeviceSession("", "", sdk=_ReplaySdk())
+    session._authenticated = True
+    session._peer_connected = True
+    session._encrypt_method = REPLAY_ENCRYPT_METHOD
+    session._secret_key = REPLAY_SECRET_KEY
+    return session
+
+
+def attach_waiter(session, command: str, expects_file: bool = False) -> _CommandWaiter:
+    """挂上一个命令等待器，回放的报文按真实命令执行时的路径进入 _CommandWaiter.feed。"""
+    waiter_cls = _P2PCommandWaiter if isinstance(session, P2PDeviceSession) else _CommandWaiter
+    waiter = waiter_cls(command=command, command_kind="system_log", expects_file=expects_file)
+    with session._waiter_lock:
+        session._active_waiter = waiter
+    return waiter
+
+
+def replay_packets(
+    session,
+    packets: Iterable[CapturedPacket],
+    speed: float = 0.0,
+    on_packet: Optional[Callable[[CapturedPacket], None]] = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> ReplayStats:
+    """按抓包顺序把报文喂给会话；speed<=0 为全速回放，1.0 为按录制时间间隔回放（从第一个报文起算）。"""
+    is_p2p = isinstance(session, P2PDeviceSession)
+    stats = ReplayStats()
+    started_at = time.perf_counter()
+    first_offset_s: Optional[float] = None
+    for packet in packets:
+        if first_offset_s is None:
+            first_offset_s = packet.offset_s
+        if speed > 0:
+            delay = started_at + (packet.offset_s - first_offset_s) / speed - time.perf_counter()
+            if delay > 0:
+                sleep(delay)
+        if (packet.source == SOURCE_P2P_LOG) != is_p2p:
+            raise ValueError(f"{packet.source} 报文与回放会话类型不符，抓包可能混有 SIOT 与 P2P 报文")
+        if is_p2p:
+            session._receive_log_payload(packet.payload)
+        else:
+            session._handle_transport_packet(packet.payload, packet.source)
+        stats.packets += 1
+        stats.bytes += len(packet.payload)
+        if on_packet is not None:
+            on_packet(packet)
+    stats.elapsed_s = time.perf_counter() - started_at
+    return stats
+
+
+def _frame(xml: str, tail: bytes = b"", encrypted: bool = True) -> bytes:
+    return pack_message(
+        xml.encode("ascii") + tail,
+        PAYLOAD_TYPE_XML,
+        encrypt=encrypted,
+        method=REPLAY_ENCRYPT_METHOD,
+        key=REPLAY_SECRET_KEY,
+        crypt_lib=FakeCryptLib(),
+    )
+
+
+def _log_xml(message_type: str, body: str) -> str:
+    return (
+        '<?xml version="1.0" encoding="GB2312" ?>\n<XML_TOPSEE>\n'
+        f'  <MESSAGE_HEADER Msg_type="{message_type}" Msg_code="1" Msg_flag="0"/>\n'
+        f"  <MESSAGE_BODY>\n    {body}\n  </MESSAGE_BODY>\n</XML_TOPSEE>"
+    )
+
+
+def synthetic_file_packets(
+    filename: str,
+    data: bytes,
+    chunk_size: int = 16 * 1024,
+    interval_s: float = 0.002,
+    encrypted: bool = True,
+) -> List[CapturedPacket]:
+    """构造一次 GetSystemCfg 文件传输的报文序列（分片 + DataLen=0 结束包），没有真实抓包时用于基准与回归测试。"""
+    packets = []
+    chunk_size = max(int(chunk_size), 1)
+    for index, start in enumerate(range(0, len(data), chunk_size)):
+        chunk = data[start: start + chunk_size]
+        xml = _log_xml("SYSTEM_LOG_DATA", f'<POS Filename="{filename}" StartPos="{start}" DataLen="{len(chunk)}"/>')
+        packets.append(CapturedPacket(index * interval_s, SOURCE_PEER, _frame(xml, BINARY_SEPARATOR + chunk, encrypted)))
+    end_xml = _log_xml("SYSTEM_LOG_DATA", f'<POS Filename="{filename}" StartPos="{len(data)}" DataLen="0"/>')
+    packets.append(CapturedPacket(len(packets) * interval_s, SOURCE_PEER, _frame(end_xml, encrypted=encrypted)))
+    return packets
+
+
+def synthetic_text_packets(lines: Iterable[str], interval_s: float = 0.01, encrypted: bool = True) -> List[CapturedPacket]:
+    """构造多包文本应答（每行一个 RESPONSE_PARAM 报文）。"""
+    packets = []
+    for index, line in enumerate(lines):
+        text = str(line).replace("&", "&amp;").replace('"', "&quot;").replace("<", "&lt;")
+        xml = _log_xml("SYSTEM_LOG_MESSAGE", f'<RESPONSE_PARAM RespStr="{text}"/>')
+        packets.append(CapturedPacket(index * interval_s, SOURCE_PEER, _frame(xml, encrypted=encrypted)))
+    return packets
@@ -1,8 +1,89 @@
 from __future__ import annotations
 
+import json
 import os
 import sys
+import threading
 from pathlib import Path
+from typing import Callable, Dict, Optional
+
+
+# 解析出的 SDK / P2P 运行库目录跨进程缓存，每个 runner、helper 子进程启动时不必重新扫描目录
+SDK_PATH_CACHE_PATH = Path.home() / ".TPQueryTool" / "sdk_paths.json"
+SDK_PATH_CACHE_MAX_ENTRIES = 16
+
+_SDK_PATH_MEMO: Dict[str, str] = {}
+_SDK_PATH_LOCK = threading.Lock()
+
+
+def _sdk_path_cache_key(kind: str, preferred, env_var: str) -> str:
+    """缓存键：库类型、首选目录、环境变量覆盖，以及可执行文件路径与修改时间（升级或换位置即失效）。"""
+    executable = sys.executable or ""
+    try:
+        mtime_ns = os.stat(executable).st_mtime_ns if executable else 0
+    except OSError:
+        mtime_ns = 0
+    argv0 = sys.argv[0] if sys.argv else ""
+    return json.dumps(
+        [kind, str(preferred or ""), os.environ.get(env_var) or "", executable, mtime_ns, argv0],
+        ensure_ascii=False,
+    )
+
+
+def _read_sdk_path_cache() -> Dict[str, str]:
+    try:
+        payload = json.loads(SDK_PATH_CACHE_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return payload if isinstance(payload, dict) else {}
+
+
+def _write_sdk_path_cache(key: str, path: Path) -> None:
+    entries = _read_sdk_path_cache()
+    entries.pop(key, None)
+    entries[key] = str(path)
+    entries = dict(list(entries.items())[-SDK_PATH_CACHE_MAX_ENTRIES:])
+    temp_path = SDK_PATH_CACHE_PATH.with_name(f"{SDK_PATH_CACHE_PATH.name}.{os.getpid()}.tmp")
+    try:
+        SDK_PATH_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        temp_path.write_text(json.dumps(entries, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(temp_path, SDK_PATH_CACHE_PATH)
+    except OSError:
+        try:
+            temp_path.unlink()
+        except OSError:
+            pass
+
+
+def resolve_sdk_dir_cached(
+    kind: str,
+    preferred,
+    env_var: str,
+    is_valid: Callable[[Path], bool],
+    scan: Callable[[Optional[Path]], Path],
+) -> Path:
+    """首选目录有效时直接返回；否则先查缓存（只做存在性校验），未命中或已失效才调用 scan 全量扫描。"""
+    if preferred:
+        try:
+            path = Path(preferred).resolve()
+        except Exception:
+            path = Path(preferred)
+        if is_valid(path):
+            return path
+
+    key = _sdk_path_cache_key(kind, preferred, env_var)
+    with _SDK_PATH_LOCK:
+        cached = _SDK_PATH_MEMO.get(key) or _read_sdk_path_cache().get(key)
+    if cached and is_valid(Path(cached)):
+        _SDK_PATH_MEMO.setdefault(key, cached)
+        return Path(cached)
+
+    path = scan(preferred)
+    if is_valid(path):
+        with _SDK_PATH_LOCK:
+            _SDK_PATH_MEMO[key] = str(path)
+            _write_sdk_path_cache(key, path)
+    return path
 
 
 def _is_sdk_bin_dir(path: Path) -> bool:
@@ -68,6 +149,10 @@ def _iter_sdk_search_roots():
 
 
 def resolve_sdk_bin_dir(preferred: str | Path | None = None) -> Path:
+    return resolve_sdk_dir_cached("siot", preferred, "TPQUERYTOOL_SDK_BIN_DIR", _is_sdk_bin_dir, _scan_sdk_bin_dir)
+
+
+def _scan_sdk_bin_dir(preferred: str | Path | None = None) -> Path:
     candidates = []
     if preferred:
         candidates.append(Path(preferred))
@@ -109,6 +194,11 @@ SDK_BIN_DIR = resolve_sdk_bin_dir(PROJECT_ROOT / "query_tool" / "dll")
 
 APP_LOG_DIR = Path.home() / ".TPQueryTool" / "logs"
 RUN_LOG_PATH = APP_LOG_DIR / "siot_debug_run.log"
+# 每个 runner 子进程一个日志文件，需要时再用 merge_run_logs 归并到 RUN_LOG_PATH
+RUN_LOG_DIR = APP_LOG_DIR / "siot_runs"
+TRANSFER_SPOOL_DIR = APP_LOG_DIR.parent / "transfers"
+# 调试控制台中过长的命令输出落盘到这里，由大输出查看器分页读取
+OUTPUT_SPOOL_DIR = APP_LOG_DIR.parent / "outputs"
 
 CLOUD_LOGIN_URL = "https://app-auth.seetong.com/seetong-member-auth/oauth/token"
 CLOUD_ACCESS_URL = "https://app-auth.seetong.com/seetong-client/client/access-node"
@@ -1,11 +1,23 @@
 from __future__ import annotations
 
 from dataclasses import asdict
+import json
+import logging
+import subprocess
 import threading
-from typing import Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
 
+from query_tool.utils.internal_launch import build_internal_command
+
+from .config import SDK_BIN_DIR, resolve_sdk_bin_dir
 from .models import CloudCredentials, DeviceCredentials
-from .session import fetch_cloud_credentials
+from .session import PREFETCHED_DEVICE_STATUS_TTL_S, fetch_cloud_credentials
+
+DEVICE_STATUS_PROBE_CHUNK = 16
+DEVICE_STATUS_PROBE_TIMEOUT_S = 40
+DEVICE_STATUS_PROBE_PARALLEL = 4
 
 
 class CloudCredentialPrefetcher:
@@ -51,12 +63,165 @@ class CloudCredentialPrefetcher:
             self._error = exc
 
 
+class DeviceStatusPrefetcher:
+    """批量拉取时按块预探测设备在线状态：一次 helper 调用、一条信令连接查询一批 SN。"""
+
+    def __init__(
+        self,
+        sn_list: Iterable[str],
+        cloud_prefetcher: CloudCredentialPrefetcher,
+        chunk_size: int = DEVICE_STATUS_PROBE_CHUNK,
+    ) -> None:
+        self._order: List[str] = []
+        self._index: Dict[str, int] = {}
+        for sn in sn_list or ():
+            sn = str(sn or "").strip()
+            if sn and sn.upper() not in self._index:
+                self._index[sn.upper()] = len(self._order)
+                self._order.append(sn)
+        self._cloud_prefetcher = cloud_prefetcher
+        self._chunk_size = max(int(chunk_size or 1), 1)
+        self._lock = threading.Lock()
+        self._statuses: Dict[str, dict] = {}
+        self._inflight: Dict[str, threading.Event] = {}
+        self._claimed = set()
+
+    def get(self, sn: str) -> Optional[dict]:
+        """取该 SN 的预探测状态（只取一次）；未探测时连同后续未探测的 SN 一起发起一次批量探测。"""
+        key = str(sn or "").strip().upper()
+        if not key:
+            return None
+        chunk = []
+        with self._lock:
+            event = self._inflight.get(key)
+            if event is None and key not in self._statuses:
+                chunk = self._claim_chunk(key)
+                event = threading.Event()
+                for item in chunk:
+                    self._inflight[item.upper()] = event
+        if chunk:
+            self._probe_and_store(chunk, event)
+        elif event is not None:
+            event.wait(DEVICE_STATUS_PROBE_TIMEOUT_S)
+        with self._lock:
+            status = self._statuses.pop(key, None)
+        if status is None or time.time() - float(status.get("probed_at") or 0) > PREFETCHED_DEVICE_STATUS_TTL_S:
+            return None
+        return status
+
+    def probe_all(
+        self,
+        on_chunk: Optional[Callable[[List[str], Dict[str, dict]], None]] = None,
+        max_parallel: int = DEVICE_STATUS_PROBE_PARALLEL,
+    ) -> None:
+        """批量开始前按块并行探测所有未探测的 SN；每块完成即回调 (块内 SN, {SN: 状态})，
+        结果同时留给 get() 在连接时取用。"""
+        chunks = []
+        with self._lock:
+            remaining = [sn for sn in self._order if sn.upper() not in self._claimed]
+            for index in range(0, len(remaining), self._chunk_size):
+                chunk = remaining[index:index + self._chunk_size]
+                event = threading.Event()
+                for item in chunk:
+                    self._claimed.add(item.upper())
+                    self._inflight[item.upper()] = event
+                chunks.append((chunk, event))
+        if not chunks:
+            return
+
+        def run(chunk, event):
+            statuses = self._probe_and_store(chunk, event)
+            if on_chunk is not None:
+                on_chunk(chunk, statuses)
+
+        with ThreadPoolExecutor(max_workers=max(min(int(max_parallel), len(chunks)), 1)) as pool:
+            for future in [pool.submit(run, chunk, event) for chunk, event in chunks]:
+                future.result()
+
+    def _probe_and_store(self, chunk: List[str], event: threading.Event) -> Dict[str, dict]:
+        try:
+            statuses = self._probe(chunk)
+        except Exception as exc:
+            logging.warning("Batch device status probe failed: %s", exc)
+            statuses = {}
+        with self._lock:
+            for item in chunk:
+                self._inflight.pop(item.upper(), None)
+            for item_sn, status in statuses.items():
+                self._statuses[item_sn.upper()] = status
+        event.set()
+        return {item_sn: dict(status) for item_sn, status in statuses.items()}
+
+    def _claim_chunk(self, key: str) -> List[str]:
+        chunk = [self._order[self._index[key]] if key in self._index else key]
+        self._claimed.add(key)
+        start = self._index.get(key, len(self._order)) + 1
+        for candidate in self._order[start:]:
+            if len(chunk) >= self._chunk_size:
+                break
+            candidate_key = candidate.upper()
+            if candidate_key in self._claimed:
+                continue
+            self._claimed.add(candidate_key)
+            chunk.append(candidate)
+        return chunk
+
+    def _probe(self, sns: List[str]) -> Dict[str, dict]:
+        try:
+            credentials = self._cloud_prefetcher.get()
+        except Exception:
+            credentials = None
+        if credentials is None:
+            return {}
+        probe_params = {
+            "access_node": credentials.access_node,
+            "access_token": credentials.access_jwt_token,
+            "client_id": credentials.client_id,
+            "key_version": credentials.jwt_key_version,
+            "sns": list(sns),
+        }
+        try:
+            proc = subprocess.run(
+                build_internal_command(
+                    "--siot-helper-probe",
+                    str(resolve_sdk_bin_dir(SDK_BIN_DIR)),
+                    json.dumps(probe_params, separators=(",", ":")),
+                ),
+                capture_output=True,
+                text=True,
+                timeout=DEVICE_STATUS_PROBE_TIMEOUT_S,
+            )
+        except (OSError, subprocess.SubprocessError) as exc:
+            logging.warning("Batch device status probe failed: %s", exc)
+            return {}
+        probed_at = time.time()
+        for line in reversed((proc.stdout or "").splitlines()):
+            line = line.strip()
+            if not line.startswith("{"):
+                continue
+            try:
+                payload = json.loads(line)
+            except ValueError:
+                continue
+            statuses = payload.get("statuses") if isinstance(payload, dict) else None
+            if not isinstance(statuses, dict):
+                break
+            result = {}
+            for item_sn, status in statuses.items():
+                if isinstance(status, dict) and "probe_error" not in status:
+                    result[str(item_sn)] = dict(status, probed_at=probed_at)
+            return result
+        logging.warning("Batch device status probe returned no statuses: %s", (proc.stdout or proc.stderr or "").strip())
+        return {}
+
+
 def build_connect_payload(
     *,
     device_credentials: DeviceCredentials,
     cloud_username: str,
     cloud_password: str,
     prefetched_cloud_credentials: Optional[CloudCredentials] = None,
+    device_status: Optional[dict] = None,
 ) -> dict:
     return {
         "action": "connect",
@@ -74,5 +239,6 @@ def build_connect_payload(
             "dev_id": device_credentials.dev_id,
             "protocol": device_credentials.protocol,
             "is_siot": device_credentials.is_siot,
+            "status": dict(device_status) if isinstance(device_status, dict) else None,
         },
     }
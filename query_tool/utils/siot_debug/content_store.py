@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .file_sink import discard_spooled_file, move_spooled_file
+
+
+CONTENT_STORE_DIRNAME = ".blobs"
+CONTENT_MANIFEST_FILENAME = ".content_manifest.json"
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as reader:
+        for chunk in iter(lambda: reader.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentStore:
+    """下载目录内的内容寻址存储：相同内容只在 <root>/.blobs/ 保存一份，
+    各设备目录下的同名文件为指向该份内容的硬链接，并在目录清单中记录哈希。
+
+    文件系统不支持硬链接（如 FAT/exFAT、跨盘）时退化为复制，清单照常记录。
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root).expanduser()
+        self.blob_dir = self.root / CONTENT_STORE_DIRNAME
+        self._lock = threading.Lock()
+
+    def blob_path(self, digest: str) -> Path:
+        return self.blob_dir / digest[:2] / digest
+
+    def put_file(self, source: Path, destination: Path) -> str:
+        """把临时文件收进存储（源文件会被移走或删除），在 destination 放置硬链接，返回 sha256。"""
+        source = Path(source)
+        digest = hash_file(source)
+        blob_path = self.blob_path(digest)
+        if blob_path.exists():
+            discard_spooled_file(source)
+        else:
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            # 先落到同目录临时名再原子替换，多个子进程并发写同一内容时互不破坏
+            temp_path = self._temp_blob_path(blob_path)
+            move_spooled_file(source, temp_path)
+            os.replace(temp_path, blob_path)
+        self._place(blob_path, Path(destination), digest)
+        return digest
+
+    def put_bytes(self, payload: bytes, destination: Path) -> str:
+        digest = hashlib.sha256(payload).hexdigest()
+        blob_path = self.blob_path(digest)
+        if not blob_path.exists():
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self._temp_blob_path(blob_path)
+            temp_path.write_bytes(payload)
+            os.replace(temp_path, blob_path)
+        self._place(blob_path, Path(destination), digest)
+        return digest
+
+    def _temp_blob_path(self, blob_path: Path) -> Path:
+        fd, raw_path = tempfile.mkstemp(prefix=blob_path.name[:8] + "_", suffix=".tmp", dir=str(blob_path.parent))
+        os.close(fd)
+        return Path(raw_path)
+
+    def _place(self, blob_path: Path, destination: Path, digest: str) -> None:
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            destination.unlink()
+        except OSError:
+            pass
+        try:
+            os.link(blob_path, destination)
+            linked = True
+        except OSError as exc:
+            logging.info("Hard link unsupported for %s, copying instead: %s", destination, exc)
+            shutil.copyfile(blob_path, destination)
+            linked = False
+        self._record_manifest(destination, digest, blob_path.stat().st_size, linked)
+
+    def _record_manifest(self, destination: Path, digest: str, size: int, linked: bool) -> None:
+        manifest_path = destination.parent / CONTENT_MANIFEST_FILENAME
+        with self._lock:
+            entries = load_content_manifest(destination.parent)
+            entries[destination.name] = {
+                "sha256": digest,
+                "size": size,
+                "blob": str(self.blob_path(digest).relative_to(self.root)).replace(os.sep, "/"),
+                "linked": linked,
+            }
+            temp_path = manifest_path.with_suffix(".json.tmp")
+            try:
+                temp_path.write_text(json.dumps(entries, ensure_ascii=False, indent=2), encoding="utf-8")
+                os.replace(temp_path, manifest_path)
+            except OSError as exc:
+                logging.warning("Write content manifest failed: %s", exc)
+
+
+def load_content_manifest(directory: Path) -> Dict[str, dict]:
+    try:
+        payload = json.loads((Path(directory) / CONTENT_MANIFEST_FILENAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return payload if isinstance(payload, dict) else {}
+
+
+def compare_device_files(device_hashes: Dict[str, Dict[str, str]], min_devices: int = 2) -> Dict[str, dict]:
+    """按文件名对比各设备下载到的内容，只有不少于 min_devices 台设备的文件才参与对比。
+
+    device_hashes 为 {SN: {文件名: sha256}}；返回 {文件名: {"groups": [{"sha256", "devices"}], "outliers": [SN]}}，
+    设备数最多的一组视为基准，其余组的设备为差异设备。
+    """
+    by_file: Dict[str, Dict[str, List[str]]] = {}
+    for sn, files in device_hashes.items():
+        for filename, digest in (files or {}).items():
+            if digest:
+                by_file.setdefault(filename, {}).setdefault(digest, []).append(sn)
+    report = {}
+    for filename, groups in sorted(by_file.items()):
+        if sum(len(devices) for devices in groups.values()) < min_devices:
+            continue
+        ordered = sorted(groups.items(), key=lambda item: (-len(item[1]), item[0]))
+        report[filename] = {
+            "groups": [{"sha256": digest, "devices": sorted(devices)} for digest, devices in ordered],
+            "outliers": sorted(sn for _, devices in ordered[1:] for sn in devices),
+        }
+    return report
+
+
+def format_comparison_lines(report: Dict[str, dict], max_devices: int = 10) -> List[str]:
+    lines = []
+    for filename, item in report.items():
+        groups = item.get("groups") or []
+        device_count = sum(len(group["devices"]) for group in groups)
+        if len(groups) <= 1:
+            lines.append(f"{filename}: {device_count} 台一致")
+            continue
+        outliers = item.get("outliers") or []
+        shown = "、".join(outliers[:max_devices]) + (" 等" if len(outliers) > max_devices else "")
+        lines.append(
+            f"{filename}: {len(groups)} 种内容，{len(groups[0]['devices'])} 台与多数一致，"
+            f"{len(outliers)} 台不同: {shown}"
+        )
+    return lines
+
+
+def save_comparison_report(root: Path, report: Dict[str, dict], file_name: str) -> Optional[Path]:
+    try:
+        root = Path(root).expanduser()
+        root.mkdir(parents=True, exist_ok=True)
+        path = root / file_name
+        path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        return path
+    except OSError as exc:
+        logging.warning("Save file comparison report failed: %s", exc)
+        return None
@@ -0,0 +1,462 @@
+from __future__ import annotations
+
+import ctypes
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .capture_replay import FakeCryptLib, synthetic_file_packets, synthetic_text_packets
+from .command_catalog import get_command_keyword, is_getsystemcfg_command, is_startlogp2p_command
+from .models import CloudCredentials, DeviceCredentials
+from .protocol import MSG_HEAD_LEN, PAYLOAD_TYPE_XML, pack_message
+from .siot_client import TPSIOT_DeviceMessage
+
+
+SIMULATED_RAND_KEY = "simkey"
+
+# 与 session.py / p2p_session.py 中的 SDK 常量一致
+_TPSIOT_CONN_HANDSHAKED = 4
+_TPSIOT_CONN_APP_RECEIVED_DATA = 10
+_TPSIOT_FB_QUERY_DEVICE = 0x1
+_TPSRTC_PEER_EVENT_DATA_CHANNEL_CONNECTED = 1
+_TPSRTC_PEER_DATATYPE_MSG = 0
+_TPS_MSG_NOTIFY_AUTH_FAILED = 0x2000 + 23
+_TPS_MSG_P2P_CONNECT_OK = 0x2000 + 10
+_TPS_MSG_P2P_OFFLINE = 0x2000 + 13
+_TPS_MSG_P2P_LOG = 0x2000 + 46
+
+_WAKEUP_TIMEOUT_ERROR = "device wakeup timed out"
+
+
+@dataclass
+class SimulatorProfile:
+    """模拟设备群的行为参数：各阶段延迟、应答报文规模与失败率。
+
+    设备在线/休眠/离线按 seed 与 SN 固定（批量探测与连接看到的一致），其余失败每次连接重新抽样。
+    """
+
+    protocol: str = "siot"
+    connect_latency_s: float = 0.2
+    status_latency_s: float = 0.05
+    auth_latency_s: float = 0.1
+    peer_latency_s: float = 0.3
+    wakeup_delay_s: float = 3.0
+    command_latency_s: float = 0.05
+    packet_interval_s: float = 0.001
+    chunk_size: int = 16 * 1024
+    file_size: int = 1024 * 1024
+    text_lines: int = 20
+    sleeping_rate: float = 0.0
+    offline_rate: float = 0.0
+    wakeup_failure_rate: float = 0.0
+    auth_failure_rate: float = 0.0
+    file_missing_rate: float = 0.0
+    seed: int = 0
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> "SimulatorProfile":
+        known = {item.name for item in fields(cls)}
+        return cls(**{key: value for key, value in (payload or {}).items() if key in known})
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def device_state(self, sn: str) -> str:
+        """online / sleeping / offline，按 seed 与 SN 固定。"""
+        draw = random.Random(f"{self.seed}:{str(sn).upper()}:state").random()
+        if draw < self.offline_rate:
+            return "offline"
+        if draw < self.offline_rate + self.sleeping_rate:
+            return "sleeping"
+        return "online"
+
+    def cloud_status(self, sn: str) -> dict:
+        """云端视角的设备状态，即批量预探测应返回的内容。"""
+        state = self.device_state(sn)
+        return {"online": int(state == "online"), "online4g": int(state == "sleeping"), "netType": 1}
+
+
+def load_simulator_profile(value) -> Optional[SimulatorProfile]:
+    """连接请求的 simulator 字段为参数字典（或 true 使用默认参数）时返回模拟参数，否则返回 None。"""
+    if not value:
+        return None
+    if value is True:
+        return SimulatorProfile()
+    try:
+        return SimulatorProfile.from_dict(value)
+    except (AttributeError, TypeError) as exc:
+        logging.warning("Invalid simulator profile, using defaults: %s", exc)
+        return SimulatorProfile()
+
+
+def simulated_cloud_credentials() -> CloudCredentials:
+    return CloudCredentials(
+        client_id="simulator",
+        access_node="127.0.0.1:0",
+        access_jwt_token="simulator",
+        relay_jwt_token="simulator",
+        relay_nodes="",
+        vip_relay_nodes="",
+        jwt_key_version=1,
+    )
+
+
+def simulated_device_credentials(sn: str, protocol: str = "siot") -> DeviceCredentials:
+    return DeviceCredentials(
+        sn=sn,
+        username="admin",
+        password="simulator",
+        dev_id=sn,
+        is_siot=protocol == "siot",
+        protocol=protocol,
+    )
+
+
+class _EventLoop:
+    """单线程定时执行回调，模拟 SDK 在自身线程上按时序回调；同一时刻的任务保持提交顺序。"""
+
+    def __init__(self, name: str) -> None:
+        self._cond = threading.Condition()
+        self._tasks: list = []
+        self._seq = itertools.count()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def call_later(self, delay_s: float, callback: Callable[[], None]) -> None:
+        with self._cond:
+            heapq.heappush(self._tasks, (time.monotonic() + max(delay_s, 0.0), next(self._seq), callback))
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._tasks or self._tasks[0][0] > time.monotonic():
+                    self._cond.wait(self._tasks[0][0] - time.monotonic() if self._tasks else None)
+                _, _, callback = heapq.heappop(self._tasks)
+            try:
+                callback()
+            except Exception:
+                logging.exception("Simulated device callback failed")
+
+
+class SimulatedDevice:
+    """一台模拟设备：按命令生成应答报文（带传输报文头、恒等“加密”）。"""
+
+    def __init__(self, sn: str, profile: SimulatorProfile) -> None:
+        self.sn = sn
+        self.profile = profile
+        self.state = profile.device_state(sn)
+        self._rng = random.Random()
+
+    def roll(self, rate: float) -> bool:
+        return rate > 0 and self._rng.random() < rate
+
+    def status_reply(self) -> Tuple[float, dict]:
+        """连接时设备状态查询的 (延迟, 状态)；休眠设备在唤醒延迟后上线或唤醒失败。"""
+        profile = self.profile
+        if self.state == "offline":
+            return profile.status_latency_s, {"online": 0, "online4g": 0}
+        if self.state == "sleeping":
+            if self.roll(profile.wakeup_failure_rate):
+                return profile.wakeup_delay_s, {"probe_error": _WAKEUP_TIMEOUT_ERROR}
+            return profile.wakeup_delay_s, {"online": 1, "online4g": 1, "netType": 1}
+        return profile.status_latency_s, {"online": 1, "online4g": 0, "netType": 1}
+
+    def auth_reply(self) -> bytes:
+        flag = "-1" if self.roll(self.profile.auth_failure_rate) else "0"
+        xml = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n<XML_TOPSEE>\n'
+            f'  <MESSAGE_HEADER Msg_type="USER_AUTH_MESSAGE" Msg_code="CMD_USER_AUTH" Msg_flag="{flag}"/>\n'
+            "  <MESSAGE_BODY>\n"
+            f'    <USER_AUTH_RESPONSE Sessionid="sim-{self.sn}" RandKey="{SIMULATED_RAND_KEY}"/>\n'
+            '    <ENCRYPT Version="1"/>\n'
+            "  </MESSAGE_BODY>\n</XML_TOPSEE>"
+        )
+        return pack_message(xml.encode("utf-8"), PAYLOAD_TYPE_XML, encrypt=False, method=0, key=b"", crypt_lib=None)
+
+    def command_reply(self, command: str) -> List[Tuple[float, bytes]]:
+        """返回 [(相对命令发出的延迟, 报文)]。"""
+        profile = self.profile
+        command = command.strip()
+        if is_getsystemcfg_command(command):
+            path = command.split(None, 1)[1].strip() if len(command.split(None, 1)) > 1 else "config.bin"
+            if self.roll(profile.file_missing_rate):
+                packets = synthetic_text_packets(["file fail"])
+            else:
+                filename = path.replace("\\", "/").rsplit("/", 1)[-1] or "config.bin"
+                packets = synthetic_file_packets(
+                    filename,
+                    _file_content(path, profile.file_size),
+                    chunk_size=profile.chunk_size,
+                    interval_s=profile.packet_interval_s,
+                )
+        elif command.lower().endswith(" start") or is_startlogp2p_command(command):
+            packets = synthetic_text_packets([f"{get_command_keyword(command)} ok"])
+        else:
+            lines = [f"{self.sn} {command} line {index}" for index in range(max(profile.text_lines, 1))]
+            packets = synthetic_text_packets(lines, interval_s=profile.packet_interval_s)
+        return [(profile.command_latency_s + packet.offset_s, packet.payload) for packet in packets]
+
+
+_CONTENT_CACHE: Dict[Tuple[str, int], bytes] = {}
+_CONTENT_LOCK = threading.Lock()
+
+
+def _file_content(path: str, size: int) -> bytes:
+    """同一路径在所有模拟设备上内容相同，便于去重与一致性对比。"""
+    key = (path, max(int(size), 0))
+    with _CONTENT_LOCK:
+        data = _CONTENT_CACHE.get(key)
+        if data is None:
+            block = hashlib.sha256(path.encode("utf-8")).digest() * 128
+            data = (block * (key[1] // len(block) + 1))[: key[1]]
+            _CONTENT_CACHE[key] = data
+        return data
+
+
+def _extract_command(body: bytes) -> str:
+    start = body.find(b"<cmd>")
+    end = body.find(b"</cmd>", start)
+    if start < 0 or end < 0:
+        return ""
+    return body[start + 5: end].decode("gb18030", errors="replace")
+
+
+def _transport_body(raw: bytes) -> bytes:
+    """去掉传输报文头；模拟设备与会话间的“加密”为恒等变换，报文体即明文。"""
+    if len(raw) < MSG_HEAD_LEN:
+        return raw
+    return raw[MSG_HEAD_LEN:]
+
+
+class SimulatedSiotLib:
+    """libsiot 的模拟实现：信令握手、query_dev、认证与 P2P 数据通道，命令应答经数据回调送回会话。"""
+
+    def __init__(self, profile: SimulatorProfile) -> None:
+        self.profile = profile
+        self._loop = _EventLoop("siot-simulator")
+        self._handles = itertools.count(1)
+        self._lock = threading.Lock()
+        self._conns: Dict[int, Callable] = {}
+        self._peers: Dict[int, Tuple[Callable, Callable, SimulatedDevice]] = {}
+        self._devices: Dict[str, SimulatedDevice] = {}
+
+    def _device(self, sn: str) -> SimulatedDevice:
+        key = sn.upper()
+        with self._lock:
+            device = self._devices.get(key)
+            if device is None:
+                device = self._devices[key] = SimulatedDevice(sn, self.profile)
+            return device
+
+    def TPSRTC_SetProperties(self, key, value) -> int:
+        return 0
+
+    def TPSIOT_SetProperties(self, key, value) -> int:
+        return 0
+
+    def TPSRTC_Startup(self, *args) -> int:
+        return 0
+
+    def TPSRTC_Init(self, *args) -> int:
+        return 0
+
+    def TPSRTC_Cleanup(self) -> None:
+        return None
+
+    def TPSRTC_ParseAnswer(self, *args) -> int:
+        return 0
+
+    def TPSRTC_ParseCandidates(self, *args) -> int:
+        return 0
+
+    def TPSIOT_RedirectAccess(self, *args) -> int:
+        return 0
+
+    def TPSIOT_Connect(self, role, protocol, terminal, callback, arg) -> int:
+        handle = next(self._handles)
+        with self._lock:
+            self._conns[handle] = callback
+        self._loop.call_later(
+            self.profile.connect_latency_s,
+            lambda: self._signal(handle, _TPSIOT_CONN_HANDSHAKED),
+        )
+        return handle
+
+    def TPSIOT_Close(self, conn) -> int:
+        with self._lock:
+            self._conns.pop(conn, None)
+        return 0
+
+    def TPSIOT_AppSend(self, conn, protocol, sn, gateway, buffer, length, topic, flag, feedback) -> int:
+        with self._lock:
+            if conn not in self._conns:
+                return -1
+        device = self._device(sn.decode("utf-8", errors="replace"))
+        if topic == b"query_dev":
+            delay, status = device.status_reply()
+            payload = json.dumps(status).encode("utf-8")
+            self._loop.call_later(delay, lambda: self._deliver(conn, device.sn, payload, _TPSIOT_FB_QUERY_DEVICE))
+            return 0
+        raw = ctypes.string_at(buffer, length) if buffer and length else b""
+        if b"USER_AUTH_MESSAGE" in raw:
+            reply = device.auth_reply()
+            self._loop.call_later(self.profile.auth_latency_s, lambda: self._deliver(conn, device.sn, reply, 0))
+        return 0
+
+    def TPSRTC_ConnectPeer(self, mode, net_type, sn, gateway, peer_callback, recv_callback, *args) -> int:
+        handle = next(self._handles)
+        device = self._device(sn.decode("utf-8", errors="replace"))
+        with self._lock:
+            self._peers[handle] = (peer_callback, recv_callback, device)
+        self._loop.call_later(self.profile.peer_latency_s, lambda: self._peer_event(handle))
+        return handle
+
+    def TPSRTC_DisconnectPeer(self, peer) -> int:
+        with self._lock:
+            self._peers.pop(peer, None)
+        return 0
+
+    def TPSRTC_SendData(self, peer, buffer, length, stream, extra) -> int:
+        with self._lock:
+            entry = self._peers.get(peer)
+        if entry is None:
+            return -1
+        command = _extract_command(_transport_body(ctypes.string_at(buffer, length)))
+        for delay, packet in entry[2].command_reply(command):
+            self._loop.call_later(delay, lambda packet=packet: self._peer_data(peer, packet))
+        return 0
+
+    def _signal(self, conn: int, event: int) -> None:
+        with self._lock:
+            callback = self._conns.get(conn)
+        if callback is not None:
+            callback(conn, event, 0, None, 0, None)
+
+    def _deliver(self, conn: int, sn: str, payload: bytes, feedback: int) -> None:
+        with self._lock:
+            callback = self._conns.get(conn)
+        if callback is None:
+            return
+        data = ctypes.create_string_buffer(payload, len(payload))
+        message = TPSIOT_DeviceMessage(
+            sn.encode("utf-8"),
+            ctypes.cast(data, ctypes.POINTER(ctypes.c_uint8)),
+            len(payload),
+            feedback,
+        )
+        callback(
+            conn,
+            _TPSIOT_CONN_APP_RECEIVED_DATA,
+            0,
+            ctypes.cast(ctypes.pointer(message), ctypes.POINTER(ctypes.c_uint8)),
+            ctypes.sizeof(message),
+            None,
+        )
+
+    def _peer_event(self, peer: int) -> None:
+        with self._lock:
+            entry = self._peers.get(peer)
+        if entry is not None:
+            entry[0](peer, _TPSRTC_PEER_EVENT_DATA_CHANNEL_CONNECTED, 0, None, 0, None)
+
+    def _peer_data(self, peer: int, packet: bytes) -> None:
+        with self._lock:
+            entry = self._peers.get(peer)
+        if entry is None:
+            return
+        data = ctypes.create_string_buffer(packet, len(packet))
+        entry[1](peer, b"", _TPSRTC_PEER_DATATYPE_MSG, ctypes.cast(data, ctypes.POINTER(ctypes.c_uint8)), len(packet), None)
+
+
+class SimulatedFunclib:
+    """Funclib（P2P）的模拟实现：登录回调 CONNECT_OK / 离线 / 认证失败，命令应答经 TPS_MSG_P2P_LOG 回调送回。"""
+
+    def __init__(self, profile: SimulatorProfile) -> None:
+        self.profile = profile
+        self._loop = _EventLoop("p2p-simulator")
+        self._message_callback = None
+        self._device: Optional[SimulatedDevice] = None
+        self._generation = 0
+
+    def FC_init(self) -> int:
+        return 0
+
+    def FC_SetMsgRspCallBack(self, callback) -> int:
+        self._message_callback = callback
+        return 0
+
+    def FC_SetfcLogCallBack(self, callback) -> int:
+        return 0
+
+    def FC_Login(self, username, password, target_id, port, *args) -> int:
+        device = SimulatedDevice(target_id.decode("utf-8", errors="replace"), self.profile)
+        self._device = device
+        self._generation += 1
+        generation = self._generation
+        delay = self.profile.connect_latency_s + self.profile.peer_latency_s
+        if device.state == "offline":
+            event = _TPS_MSG_P2P_OFFLINE
+        elif device.state == "sleeping" and device.roll(self.profile.wakeup_failure_rate):
+            delay += self.profile.wakeup_delay_s
+            event = _TPS_MSG_P2P_OFFLINE
+        elif device.roll(self.profile.auth_failure_rate):
+            event = _TPS_MSG_NOTIFY_AUTH_FAILED
+        else:
+            if device.state == "sleeping":
+                delay += self.profile.wakeup_delay_s
+            event = _TPS_MSG_P2P_CONNECT_OK
+        self._loop.call_later(delay, lambda: self._notify(generation, event, b""))
+        return 0
+
+    def FC_Logout(self) -> int:
+        self._generation += 1
+        return 0
+
+    def FC_RemoteDiagnose(self, target_id, command_type, payload, channel) -> int:
+        device = self._device
+        if device is None:
+            return -1
+        generation = self._generation
+        for delay, packet in device.command_reply(_extract_command(payload or b"")):
+            body = _transport_body(packet)
+            self._loop.call_later(delay, lambda body=body: self._notify(generation, _TPS_MSG_P2P_LOG, body))
+        return 0
+
+    def _notify(self, generation: int, msg_type: int, payload: bytes) -> None:
+        callback = self._message_callback
+        if callback is None or generation != self._generation:
+            return
+        if not payload:
+            callback(msg_type, None, 0, None, 0)
+            return
+        data = ctypes.create_string_buffer(payload, len(payload))
+        callback(msg_type, ctypes.cast(data, ctypes.c_void_p), len(payload), None, 0)
+
+
+class SimulatedSdk:
+    """替代 SdkLibraries / P2PLibraries 的 SDK 对象，会话构造时通过 sdk 参数注入。"""
+
+    def __init__(self, lib) -> None:
+        self.lib = lib
+        self.crypt = FakeCryptLib()
+
+    def configure_callbacks(self, message_callback, log_callback) -> None:
+        self.lib.FC_SetMsgRspCallBack(message_callback)
+        self.lib.FC_SetfcLogCallBack(log_callback)
+
+    def ensure_initialized(self) -> None:
+        pass
+
+
+def create_simulated_sdk(profile: SimulatorProfile, protocol: str) -> SimulatedSdk:
+    if protocol == "p2p":
+        return SimulatedSdk(SimulatedFunclib(profile))
+    return SimulatedSdk(SimulatedSiotLib(profile))
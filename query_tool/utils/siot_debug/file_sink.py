@@ -0,0 +1,431 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+
+FILE_SINK_PREALLOCATE_STEP = 4 * 1024 * 1024
+RESUME_STATE_MAX_AGE_S = 24 * 60 * 60
+RESUME_CHECKPOINT_INTERVAL_S = 1.0
+# 续传锁超过该时间未被检查点刷新时视为进程已退出留下的陈旧锁
+RESUME_LOCK_STALE_S = 120.0
+_SPOOL_SUFFIXES = (".part", ".json", ".tmp", ".lock")
+
+
+class ReceivedRanges:
+    """已接收字节区间集合，区间为左闭右开，写入时自动合并重叠/相邻区间。"""
+
+    def __init__(self, ranges: Optional[Sequence[Sequence[int]]] = None) -> None:
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+        for item in ranges or ():
+            if len(item) >= 2:
+                self.add(int(item[0]), int(item[1]))
+
+    def add(self, start: int, end: int) -> None:
+        start = max(int(start), 0)
+        end = int(end)
+        if end <= start:
+            return
+        left = bisect.bisect_left(self._ends, start)
+        right = bisect.bisect_right(self._starts, end)
+        if left < right:
+            start = min(start, self._starts[left])
+            end = max(end, self._ends[right - 1])
+        self._starts[left:right] = [start]
+        self._ends[left:right] = [end]
+
+    def contains(self, start: int, end: int) -> bool:
+        if end <= start:
+            return True
+        index = bisect.bisect_right(self._starts, start) - 1
+        return index >= 0 and self._ends[index] >= end
+
+    @property
+    def covered_bytes(self) -> int:
+        return sum(end - start for start, end in zip(self._starts, self._ends))
+
+    @property
+    def high_water(self) -> int:
+        return self._ends[-1] if self._ends else 0
+
+    def contiguous_prefix(self) -> int:
+        if not self._starts or self._starts[0] != 0:
+            return 0
+        return self._ends[0]
+
+    def missing(self, total: Optional[int] = None) -> List[Tuple[int, int]]:
+        limit = self.high_water if total is None else max(int(total), 0)
+        gaps = []
+        cursor = 0
+        for start, end in zip(self._starts, self._ends):
+            if start >= limit:
+                break
+            if start > cursor:
+                gaps.append((cursor, start))
+            cursor = max(cursor, end)
+        if cursor < limit:
+            gaps.append((cursor, limit))
+        return gaps
+
+    def clip(self, limit: int) -> None:
+        """丢弃 limit 之后的区间。"""
+        limit = max(int(limit), 0)
+        index = bisect.bisect_left(self._starts, limit)
+        del self._starts[index:]
+        del self._ends[index:]
+        if self._ends and self._ends[-1] > limit:
+            self._ends[-1] = limit
+
+    def to_list(self) -> List[List[int]]:
+        return [[start, end] for start, end in zip(self._starts, self._ends)]
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return iter(zip(self._starts, self._ends))
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __bool__(self) -> bool:
+        return bool(self._starts)
+
+
+class FileChunkSink:
+    """把文件分片按 StartPos 直接写入预分配的临时文件，避免整文件驻留内存。"""
+
+    def __init__(
+        self,
+        path: Path,
+        handle,
+        preallocate_step: int = FILE_SINK_PREALLOCATE_STEP,
+        state_path: Optional[Path] = None,
+        ranges: Optional[ReceivedRanges] = None,
+        remote_path: str = "",
+        lock_path: Optional[Path] = None,
+    ) -> None:
+        self.path = Path(path)
+        self.state_path = Path(state_path) if state_path else None
+        self.lock_path = Path(lock_path) if lock_path else None
+        self.remote_path = remote_path
+        self.ranges = ranges if ranges is not None else ReceivedRanges()
+        self.resumed_bytes = self.ranges.covered_bytes
+        self._handle = handle
+        self._lock = threading.Lock()
+        self._capacity = self.ranges.high_water
+        self._preallocate_step = max(int(preallocate_step or 0), 0)
+        self._finalized = False
+        self._last_checkpoint_at = 0.0
+        # 本次传输写入/校验过的最高位置与结束包的 StartPos；续传时文件大小以本次传输为准，
+        # 不能沿用上次保留区间的末尾
+        self._attempt_high_water = 0
+        self._end_pos: Optional[int] = None
+
+    @classmethod
+    def create(cls, spool_dir: Path, prefix: str = "getsystemcfg_") -> Optional["FileChunkSink"]:
+        try:
+            spool_dir = Path(spool_dir)
+            spool_dir.mkdir(parents=True, exist_ok=True)
+            fd, raw_path = tempfile.mkstemp(prefix=prefix, suffix=".part", dir=str(spool_dir))
+            handle = os.fdopen(fd, "r+b")
+        except OSError as exc:
+            logging.warning("Create file sink failed, falling back to memory buffer: %s", exc)
+            return None
+        return cls(Path(raw_path), handle)
+
+    @classmethod
+    def open_resumable(cls, spool_dir: Path, device_sn: str, remote_path: str) -> Optional["FileChunkSink"]:
+        """按 SN + 远端路径打开可续传的落盘文件，已接收区间从 sidecar 状态文件恢复。
+
+        同一文件已有其他进程在拉取时不共享 .part，改用独立的临时文件（不可续传）。
+        """
+        key = resume_key(device_sn, remote_path)
+        spool_dir = Path(spool_dir)
+        part_path = spool_dir / f"{key}.part"
+        state_path = spool_dir / f"{key}.json"
+        lock_path = spool_dir / f"{key}.lock"
+        locked = False
+        try:
+            spool_dir.mkdir(parents=True, exist_ok=True)
+            locked = _acquire_resume_lock(lock_path)
+            if not locked:
+                logging.info("Transfer %s is being fetched by another runner, using a private temp file", remote_path)
+                return cls.create(spool_dir)
+            ranges = _load_resume_ranges(part_path, state_path, remote_path)
+            if not ranges:
+                discard_spooled_file(state_path)
+            handle = part_path.open("r+b" if ranges else "w+b")
+        except OSError as exc:
+            logging.warning("Open resumable file sink failed, falling back to temp sink: %s", exc)
+            if locked:
+                discard_spooled_file(lock_path)
+            return cls.create(spool_dir)
+        sink = cls(
+            part_path,
+            handle,
+            state_path=state_path,
+            ranges=ranges,
+            remote_path=remote_path,
+            lock_path=lock_path,
+        )
+        if ranges:
+            logging.info("Resuming spooled transfer %s with %s bytes kept", remote_path, ranges.covered_bytes)
+        return sink
+
+    @property
+    def size(self) -> int:
+        if self._end_pos is not None and self._end_pos >= self._attempt_high_water:
+            return self._end_pos
+        if self._attempt_high_water:
+            return self._attempt_high_water
+        return self.ranges.high_water
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing()
+
+    def missing(self) -> List[Tuple[int, int]]:
+        """[0, size) 内尚未收到的区间。"""
+        return self.ranges.missing(self.size)
+
+    def mark_end(self, end_pos: int) -> None:
+        """收到结束包（DataLen=0）时记录其 StartPos，即文件总长度。"""
+        with self._lock:
+            self._end_pos = max(int(end_pos), 0)
+
+    @property
+    def closed(self) -> bool:
+        return self._handle is None
+
+    @property
+    def resumable(self) -> bool:
+        return self.state_path is not None
+
+    def write(self, start_pos: int, chunk) -> bool:
+        length = len(chunk)
+        if length <= 0:
+            return False
+        offset = max(int(start_pos), 0)
+        with self._lock:
+            handle = self._handle
+            if handle is None:
+                return False
+            required = offset + length
+            self._attempt_high_water = max(self._attempt_high_water, required)
+            if self.resumed_bytes and self.ranges.contains(offset, required):
+                # 续传时设备重发已保留的区间：只校验不重写，内容变化则丢弃旧区间
+                handle.seek(offset)
+                if handle.read(length) == bytes(chunk):
+                    return True
+                logging.warning("Spooled transfer content changed at offset %s, dropping kept ranges", offset)
+                self.ranges = ReceivedRanges()
+                self.resumed_bytes = 0
+            if required > self._capacity and self._preallocate_step:
+                self._capacity = max(required, self._capacity + self._preallocate_step)
+                handle.truncate(self._capacity)
+            handle.seek(offset)
+            handle.write(chunk)
+            self.ranges.add(offset, required)
+            self._checkpoint_locked(force=False)
+        return True
+
+    def checkpoint(self) -> None:
+        with self._lock:
+            self._checkpoint_locked(force=True)
+
+    def _checkpoint_locked(self, force: bool) -> None:
+        if self.state_path is None or self._handle is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_checkpoint_at < RESUME_CHECKPOINT_INTERVAL_S:
+            return
+        self._last_checkpoint_at = now
+        self._handle.flush()
+        state = {
+            "remote_path": self.remote_path,
+            "ranges": self.ranges.to_list(),
+            "updated_at": time.time(),
+        }
+        temp_path = self.state_path.with_suffix(".json.tmp")
+        try:
+            temp_path.write_text(json.dumps(state), encoding="utf-8")
+            os.replace(temp_path, self.state_path)
+            if self.lock_path is not None:
+                os.utime(self.lock_path, None)
+        except OSError as exc:
+            logging.warning("Write transfer resume state failed: %s", exc)
+
+    def read_all(self) -> bytes:
+        with self._lock:
+            handle = self._handle
+            if handle is None:
+                return self.path.read_bytes()[: self.size] if self.path.exists() else b""
+            handle.flush()
+            handle.seek(0)
+            return handle.read(self.size)
+
+    def finalize(self) -> str:
+        """收尾：截断到本次传输的文件长度（去掉预分配空间与上次残留的尾部）并关闭句柄，返回临时文件路径。
+
+        [0, size) 内仍有缺口时拒绝收尾，调用方应先检查 complete。
+        """
+        with self._lock:
+            size = self.size
+            gaps = self.ranges.missing(size)
+            if gaps:
+                raise ValueError(f"spooled transfer incomplete, missing {gaps[:3]}")
+            self.ranges.clip(size)
+            handle = self._handle
+            self._handle = None
+            if handle is not None:
+                try:
+                    handle.truncate(size)
+                    handle.flush()
+                finally:
+                    handle.close()
+            self._finalized = True
+        discard_spooled_file(self.state_path)
+        self._release_lock()
+        return str(self.path)
+
+    def suspend(self) -> int:
+        """传输中断：落盘当前区间并关闭句柄，保留临时文件供下次续传，返回已保留字节数。"""
+        if self.state_path is None:
+            self.discard()
+            return 0
+        with self._lock:
+            self._checkpoint_locked(force=True)
+            handle = self._handle
+            self._handle = None
+            self._finalized = True
+        if handle is not None:
+            try:
+                handle.close()
+            except OSError:
+                pass
+        self._release_lock()
+        return self.ranges.contiguous_prefix()
+
+    def discard(self) -> None:
+        with self._lock:
+            handle = self._handle
+            self._handle = None
+            self._finalized = True
+        if handle is not None:
+            try:
+                handle.close()
+            except OSError:
+                pass
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+        discard_spooled_file(self.state_path)
+        self._release_lock()
+
+    def _release_lock(self) -> None:
+        lock_path, self.lock_path = self.lock_path, None
+        discard_spooled_file(lock_path)
+
+    @property
+    def finalized(self) -> bool:
+        return self._finalized
+
+
+def move_spooled_file(source: str | Path, destination: str | Path) -> None:
+    """优先同盘 rename，跨盘时退化为流式复制，均不经过内存整块拷贝。"""
+    source = Path(source)
+    destination = Path(destination)
+    try:
+        os.replace(source, destination)
+        return
+    except OSError:
+        pass
+    shutil.copyfile(source, destination)
+    try:
+        source.unlink()
+    except OSError:
+        pass
+
+
+def discard_spooled_file(path: Optional[str | Path]) -> None:
+    if not path:
+        return
+    try:
+        Path(path).unlink()
+    except OSError:
+        pass
+
+
+def prune_transfer_spool(directory: Path, max_age_s: float = RESUME_STATE_MAX_AGE_S) -> int:
+    """删除超过续传有效期的 .part/.json/.lock 等残留文件，返回删除的文件数；
+    拉取彻底失败后不会再有同一 SN+命令来清理它们。"""
+    directory = Path(directory).expanduser()
+    if not directory.is_dir():
+        return 0
+    deadline = time.time() - max_age_s
+    removed = 0
+    for path in directory.iterdir():
+        if path.suffix not in _SPOOL_SUFFIXES:
+            continue
+        try:
+            if path.stat().st_mtime < deadline:
+                path.unlink()
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+def _acquire_resume_lock(lock_path: Path) -> bool:
+    """以 O_EXCL 创建锁文件；锁已被持有返回 False，陈旧锁清理后重试一次。"""
+    for _ in range(2):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                age = time.time() - lock_path.stat().st_mtime
+            except OSError:
+                continue
+            if age < RESUME_LOCK_STALE_S:
+                return False
+            logging.warning("Removing stale transfer lock: %s", lock_path)
+            discard_spooled_file(lock_path)
+            continue
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            handle.write(str(os.getpid()))
+        return True
+    return False
+
+
+def resume_key(device_sn: str, remote_path: str) -> str:
+    safe_sn = "".join(ch for ch in (device_sn or "unknown") if ch.isalnum() or ch in "-_") or "unknown"
+    digest = hashlib.sha1((remote_path or "").strip().encode("utf-8")).hexdigest()[:16]
+    return f"{safe_sn}_{digest}"
+
+
+def _load_resume_ranges(part_path: Path, state_path: Path, remote_path: str) -> ReceivedRanges:
+    if not part_path.exists() or not state_path.exists():
+        return ReceivedRanges()
+    try:
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return ReceivedRanges()
+    if not isinstance(state, dict) or state.get("remote_path") != remote_path:
+        return ReceivedRanges()
+    if time.time() - float(state.get("updated_at") or 0) > RESUME_STATE_MAX_AGE_S:
+        return ReceivedRanges()
+    file_size = part_path.stat().st_size
+    ranges = ReceivedRanges()
+    for item in state.get("ranges") or ():
+        if isinstance(item, list) and len(item) >= 2:
+            ranges.add(int(item[0]), min(int(item[1]), file_size))
+    return ranges
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+
+HEARTBEAT_INTERVAL_S = 10.0
+HEARTBEAT_RECONNECT_WORKERS = 2
+
+
+@dataclass
+class _HeartbeatEntry:
+    generation: int
+    send: Callable[[], None]
+    needs_reconnect: Callable[[], bool]
+    reconnect: Callable[[], None]
+
+
+class HeartbeatScheduler:
+    """进程级心跳调度：单线程按定时堆为所有已注册会话发送心跳，重连交给独立的小线程池，
+    避免某台设备重连阻塞时拖慢其他会话的心跳。
+
+    条目以会话对象本身为键；unregister 返回前会等该会话正在执行的心跳或重连结束，
+    调用方随后释放 SDK 连接时不会与回调并发。"""
+
+    def __init__(
+        self,
+        interval_s: float = HEARTBEAT_INTERVAL_S,
+        reconnect_workers: int = HEARTBEAT_RECONNECT_WORKERS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._interval_s = max(float(interval_s), 0.01)
+        self._reconnect_workers = max(int(reconnect_workers), 1)
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._heap: list = []
+        self._entries: dict = {}
+        self._reconnecting: set = set()
+        # 正在执行回调的会话 -> 执行线程
+        self._running: dict = {}
+        self._generations = itertools.count(1)
+        self._thread: Optional[threading.Thread] = None
+        self._reconnect_pool: Optional[ThreadPoolExecutor] = None
+
+    def register(
+        self,
+        owner,
+        *,
+        send: Callable[[], None],
+        needs_reconnect: Callable[[], bool],
+        reconnect: Callable[[], None],
+    ) -> None:
+        """注册会话；重复注册会替换旧条目并从当前时刻重新计时。"""
+        with self._cond:
+            entry = _HeartbeatEntry(next(self._generations), send, needs_reconnect, reconnect)
+            self._entries[owner] = entry
+            heapq.heappush(self._heap, (self._clock() + self._interval_s, entry.generation, owner))
+            self._ensure_thread()
+            self._cond.notify()
+
+    def unregister(self, owner) -> None:
+        """注销会话并等待其正在执行的心跳或重连结束；在该会话自己的回调中调用时不等待。"""
+        # 堆中残留的条目在出堆时按 generation 丢弃
+        with self._cond:
+            self._entries.pop(owner, None)
+            self._cond.notify_all()
+            current = threading.current_thread()
+            while self._running.get(owner) not in (None, current):
+                self._cond.wait()
+
+    def is_registered(self, owner) -> bool:
+        with self._cond:
+            return owner in self._entries
+
+    def session_count(self) -> int:
+        with self._cond:
+            return len(self._entries)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="siot-heartbeat", daemon=True)
+        self._thread.start()
+
+    def _next_due(self):
+        """阻塞到堆顶到期，返回 (owner, entry)；调用方需持有 _cond。"""
+        while True:
+            if not self._heap:
+                self._cond.wait()
+                continue
+            due, generation, owner = self._heap[0]
+            now = self._clock()
+            if due > now:
+                self._cond.wait(due - now)
+                continue
+            heapq.heappop(self._heap)
+            entry = self._entries.get(owner)
+            if entry is None or entry.generation != generation:
+                continue
+            next_due = due + self._interval_s
+            if next_due <= now:
+                # 调度落后时不补发积压的心跳
+                next_due = now + self._interval_s
+            heapq.heappush(self._heap, (next_due, generation, owner))
+            if owner in self._reconnecting:
+                continue
+            return owner, entry
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                owner, entry = self._next_due()
+                self._running[owner] = threading.current_thread()
+            try:
+                self._tick(owner, entry)
+            finally:
+                self._finish(owner)
+
+    def _finish(self, owner) -> None:
+        with self._cond:
+            # 提交重连的心跳线程可能晚于重连线程登记结束，不能清掉对方的登记
+            if self._running.get(owner) is threading.current_thread():
+                del self._running[owner]
+            self._cond.notify_all()
+
+    def _tick(self, owner, entry: _HeartbeatEntry) -> None:
+        try:
+            if entry.needs_reconnect():
+                self._submit_reconnect(owner, entry)
+                return
+            entry.send()
+        except Exception as exc:
+            logging.warning("Heartbeat failed: %s", exc)
+
+    def _submit_reconnect(self, owner, entry: _HeartbeatEntry) -> None:
+        with self._cond:
+            if owner in self._reconnecting:
+                return
+            self._reconnecting.add(owner)
+            if self._reconnect_pool is None:
+                self._reconnect_pool = ThreadPoolExecutor(
+                    max_workers=self._reconnect_workers,
+                    thread_name_prefix="siot-reconnect",
+                )
+            pool = self._reconnect_pool
+        pool.submit(self._reconnect, owner, entry)
+
+    def _reconnect(self, owner, entry: _HeartbeatEntry) -> None:
+        with self._cond:
+            # 排队期间会话已注销则放弃；登记后 unregister 会等重连结束
+            if self._entries.get(owner) is not entry:
+                self._reconnecting.discard(owner)
+                return
+            self._running[owner] = threading.current_thread()
+        try:
+            entry.reconnect()
+            with self._cond:
+                still_registered = self._entries.get(owner) is entry
+            if still_registered:
+                entry.send()
+        except Exception as exc:
+            logging.warning("Heartbeat reconnect failed: %s", exc)
+        finally:
+            with self._cond:
+                self._reconnecting.discard(owner)
+            self._finish(owner)
+
+
+_SCHEDULER: Optional[HeartbeatScheduler] = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_heartbeat_scheduler() -> HeartbeatScheduler:
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            _SCHEDULER = HeartbeatScheduler()
+        return _SCHEDULER
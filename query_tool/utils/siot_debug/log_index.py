@@ -0,0 +1,310 @@
+from __future__ import annotations
+
+import logging
+import queue
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from .content_store import CONTENT_MANIFEST_FILENAME, CONTENT_STORE_DIRNAME
+from .protocol import decode_text
+from .stream_log_sink import SEGMENT_INDEX_SUFFIX, read_segment_text
+
+
+LOG_INDEX_FILENAME = ".log_index.sqlite3"
+LOG_INDEX_SCHEMA_VERSION = 1
+LOG_INDEX_MAX_FILE_BYTES = 256 * 1024 * 1024
+LOG_INDEX_INSERT_BATCH = 2000
+LOG_SEARCH_DEFAULT_LIMIT = 500
+# trigram 分词支持子串与中文检索，但少于 3 个字符的词只能走 LIKE
+TRIGRAM_MIN_TOKEN_CHARS = 3
+
+_TIME_RE = re.compile(r"(?<!\d)([01]\d|2[0-3]):([0-5]\d):([0-5]\d)(?!\d)")
+
+
+@dataclass
+class LogSearchHit:
+    sn: str
+    path: str
+    line_no: int
+    ts: str
+    text: str
+
+
+def extract_line_time(line: str) -> str:
+    """提取行内第一个 HH:MM:SS 时间，设备日志只带时分秒。"""
+    match = _TIME_RE.search(line)
+    return match.group(0) if match else ""
+
+
+def normalize_time_bound(value: str) -> str:
+    """把 "2"、"02:00"、"02:00:30" 规整为 HH:MM:SS，无法识别返回空串。"""
+    parts = [part for part in str(value or "").strip().split(":") if part != ""]
+    if not parts or len(parts) > 3 or not all(part.isdigit() for part in parts):
+        return ""
+    numbers = [int(part) for part in parts] + [0] * (3 - len(parts))
+    hours, minutes, seconds = numbers
+    if hours > 23 or minutes > 59 or seconds > 59:
+        return ""
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+class LogIndex:
+    """下载目录的本地日志索引：按 <root>/<SN>/ 收录文本文件与实时日志段，
+    记录每个文件的时间范围，行内容写入 SQLite FTS5 倒排索引。连接不可跨线程共享。"""
+
+    def __init__(self, root: Path, db_path: Optional[Path] = None) -> None:
+        self.root = Path(root).expanduser()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.db_path = Path(db_path) if db_path else self.root / LOG_INDEX_FILENAME
+        self._conn = sqlite3.connect(str(self.db_path), timeout=10.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._trigram = True
+        self._ensure_schema()
+
+    def close(self) -> None:
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+
+    def _ensure_schema(self) -> None:
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != LOG_INDEX_SCHEMA_VERSION:
+            self._conn.executescript("DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS lines;")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, sn TEXT, kind TEXT, size INTEGER, mtime REAL, "
+            "line_count INTEGER, first_ts TEXT, last_ts TEXT)"
+        )
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS lines USING fts5("
+                "text, path UNINDEXED, sn UNINDEXED, line_no UNINDEXED, ts UNINDEXED, tokenize='trigram')"
+            )
+        except sqlite3.OperationalError:
+            self._trigram = False
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS lines USING fts5("
+                "text, path UNINDEXED, sn UNINDEXED, line_no UNINDEXED, ts UNINDEXED)"
+            )
+        tokenizer_sql = self._conn.execute("SELECT sql FROM sqlite_master WHERE name = 'lines'").fetchone()
+        self._trigram = bool(tokenizer_sql and "trigram" in tokenizer_sql[0])
+        self._conn.execute(f"PRAGMA user_version = {LOG_INDEX_SCHEMA_VERSION}")
+        self._conn.commit()
+
+    def scan(self, paths: Optional[Iterable[Path]] = None) -> int:
+        """增量索引：未变化（大小与修改时间相同）的文件跳过，已删除的文件移出索引；返回新索引的文件数。"""
+        targets = [Path(path) for path in paths] if paths is not None else [self.root]
+        indexed = 0
+        seen = set()
+        for target in targets:
+            for file_path in self._iter_candidate_files(target):
+                seen.add(str(file_path))
+                if self.index_file(file_path):
+                    indexed += 1
+        if paths is None:
+            self._remove_missing(seen)
+        return indexed
+
+    def index_file(self, file_path: Path) -> bool:
+        file_path = Path(file_path)
+        try:
+            stat = file_path.stat()
+        except OSError:
+            return False
+        key = str(file_path)
+        row = self._conn.execute("SELECT size, mtime FROM files WHERE path = ?", (key,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime:
+            return False
+
+        lines = self._read_lines(file_path, stat.st_size)
+        sn = self._sn_for(file_path)
+        kind = "serial" if "_serial_" in file_path.name else "file"
+        with self._conn:
+            self._conn.execute("DELETE FROM lines WHERE path = ?", (key,))
+            first_ts = last_ts = ""
+            current_ts = ""
+            batch = []
+            for line_no, line in enumerate(lines, 1):
+                text = line.strip()
+                if not text:
+                    continue
+                # 无时间戳的续行沿用上一行的时间
+                current_ts = extract_line_time(text) or current_ts
+                if current_ts:
+                    first_ts = first_ts or current_ts
+                    last_ts = current_ts
+                batch.append((text, key, sn, line_no, current_ts))
+                if len(batch) >= LOG_INDEX_INSERT_BATCH:
+                    self._insert_lines(batch)
+                    batch = []
+            if batch:
+                self._insert_lines(batch)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, sn, kind, size, mtime, line_count, first_ts, last_ts) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, sn, kind, stat.st_size, stat.st_mtime, len(lines), first_ts, last_ts),
+            )
+        return True
+
+    def search(
+        self,
+        query: str,
+        *,
+        sn: str = "",
+        time_from: str = "",
+        time_to: str = "",
+        limit: int = LOG_SEARCH_DEFAULT_LIMIT,
+    ) -> List[LogSearchHit]:
+        tokens = [token for token in str(query or "").split() if token]
+        if not tokens:
+            return []
+        match_tokens = [token for token in tokens if not self._trigram or len(token) >= TRIGRAM_MIN_TOKEN_CHARS]
+        like_tokens = [token for token in tokens if token not in match_tokens]
+
+        clauses = []
+        params: list = []
+        if match_tokens:
+            clauses.append("lines MATCH ?")
+            params.append(" ".join('"' + token.replace('"', '""') + '"' for token in match_tokens))
+        for token in like_tokens:
+            clauses.append("text LIKE ? ESCAPE '\\'")
+            params.append("%" + token.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        if sn:
+            clauses.append("sn = ?")
+            params.append(sn.strip())
+        time_from = normalize_time_bound(time_from)
+        time_to = normalize_time_bound(time_to)
+        if time_from and time_to and time_from > time_to:
+            # 跨零点的时间段
+            clauses.append("(ts >= ? OR (ts != '' AND ts <= ?))")
+            params.extend([time_from, time_to])
+        else:
+            if time_from:
+                clauses.append("ts >= ?")
+                params.append(time_from)
+            if time_to:
+                clauses.append("ts != '' AND ts <= ?")
+                params.append(time_to)
+        params.append(max(int(limit), 1))
+        rows = self._conn.execute(
+            f"SELECT sn, path, line_no, ts, text FROM lines WHERE {' AND '.join(clauses)} "
+            "ORDER BY sn, path, line_no LIMIT ?",
+            params,
+        ).fetchall()
+        return [LogSearchHit(sn=row[0], path=row[1], line_no=int(row[2]), ts=row[3], text=row[4]) for row in rows]
+
+    def file_ranges(self, sn: str = "") -> List[dict]:
+        sql = "SELECT path, sn, kind, line_count, first_ts, last_ts FROM files"
+        params: tuple = ()
+        if sn:
+            sql += " WHERE sn = ?"
+            params = (sn,)
+        rows = self._conn.execute(sql + " ORDER BY sn, path", params).fetchall()
+        return [
+            {"path": row[0], "sn": row[1], "kind": row[2], "line_count": row[3], "first_ts": row[4], "last_ts": row[5]}
+            for row in rows
+        ]
+
+    def _insert_lines(self, batch) -> None:
+        self._conn.executemany("INSERT INTO lines (text, path, sn, line_no, ts) VALUES (?, ?, ?, ?, ?)", batch)
+
+    def _remove_missing(self, seen: set) -> None:
+        stale = [row[0] for row in self._conn.execute("SELECT path FROM files") if row[0] not in seen]
+        if not stale:
+            return
+        with self._conn:
+            for path in stale:
+                self._conn.execute("DELETE FROM lines WHERE path = ?", (path,))
+                self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def _iter_candidate_files(self, target: Path):
+        if target.is_file():
+            if self._is_candidate(target):
+                yield target
+            return
+        if not target.is_dir():
+            return
+        for file_path in sorted(target.rglob("*")):
+            if file_path.is_file() and self._is_candidate(file_path):
+                yield file_path
+
+    def _is_candidate(self, file_path: Path) -> bool:
+        name = file_path.name
+        if name.startswith(LOG_INDEX_FILENAME) or name.endswith(SEGMENT_INDEX_SUFFIX):
+            return False
+        if name.startswith("connect_timings_") or name.startswith(CONTENT_MANIFEST_FILENAME):
+            return False
+        try:
+            relative = file_path.resolve().relative_to(self.root.resolve())
+        except (ValueError, OSError):
+            return False
+        # 去重存储的 blob 已通过设备目录下的硬链接收录
+        return len(relative.parts) > 1 and relative.parts[0] != CONTENT_STORE_DIRNAME
+
+    def _sn_for(self, file_path: Path) -> str:
+        try:
+            return file_path.resolve().relative_to(self.root.resolve()).parts[0]
+        except (ValueError, IndexError, OSError):
+            return ""
+
+    @staticmethod
+    def _read_lines(file_path: Path, size: int) -> List[str]:
+        if size > LOG_INDEX_MAX_FILE_BYTES:
+            logging.info("Skip indexing oversized file: %s", file_path)
+            return []
+        try:
+            if file_path.suffix == ".zst":
+                return read_segment_text(file_path).splitlines()
+            raw = file_path.read_bytes()
+        except Exception as exc:
+            logging.warning("Read file for log index failed %s: %s", file_path, exc)
+            return []
+        # 二进制配置文件只登记不建行索引
+        if b"\x00" in raw[:4096]:
+            return []
+        return decode_text(raw).splitlines()
+
+
+class LogIndexer:
+    """后台增量索引线程：批量拉取过程中按设备目录排队索引，不阻塞拉取与界面。"""
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root).expanduser()
+        self._queue: "queue.Queue[Optional[Path]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def enqueue(self, path: Path) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="log-indexer", daemon=True)
+            self._thread.start()
+        self._queue.put(Path(path))
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        try:
+            index = LogIndex(self.root)
+        except Exception as exc:
+            logging.warning("Open log index failed: %s", exc)
+            return
+        try:
+            while True:
+                path = self._queue.get()
+                if path is None:
+                    return
+                try:
+                    index.scan([path])
+                except Exception as exc:
+                    logging.warning("Index log files failed %s: %s", path, exc)
+        finally:
+            index.close()
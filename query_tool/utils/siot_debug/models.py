@@ -57,6 +57,8 @@ class CommandResult:
     display_text: str
     acknowledged: bool = False
     binary_payload: bytes = b""
+    payload_path: Optional[str] = None
+    transfer_interrupted: bool = False
     filename: Optional[str] = None
     received_bytes: int = 0
     streamed_packets: int = 0
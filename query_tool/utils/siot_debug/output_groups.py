@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import csv
+import hashlib
+import logging
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+# 每组只保留一份输出样本，超长部分截断（哈希仍按完整输出计算）
+OUTPUT_GROUP_SAMPLE_MAX_CHARS = 64 * 1024
+
+_INLINE_SPACE_RE = re.compile(r"[ \t]+")
+_ANSI_ESCAPE_RE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+
+
+def normalize_command_output(text: str) -> str:
+    """归一化命令输出：去掉控制序列与 NUL、统一换行、合并行内连续空白、去掉首尾空行，
+    仅因对齐或换行符不同的输出视为相同。"""
+    text = _ANSI_ESCAPE_RE.sub("", str(text or "")).replace("\x00", "")
+    lines = [_INLINE_SPACE_RE.sub(" ", line).strip() for line in text.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    while lines and not lines[0]:
+        lines.pop(0)
+    while lines and not lines[-1]:
+        lines.pop()
+    return "\n".join(lines)
+
+
+def output_digest(normalized: str) -> str:
+    return hashlib.sha256(normalized.encode("utf-8", errors="replace")).hexdigest()
+
+
+class CommandOutputGrouper:
+    """批量执行同一命令时按归一化后的输出内容分组：每种输出只存一份样本与设备列表，
+    内存随不同输出的种类数增长，而不是随设备数。
+
+    设备结果陆续到达时调用 add；同一设备重试后再次 add 会从原分组移到新分组。
+    分组内容每次变化 version 加一，界面据此判断是否需要重绘。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # {命令: {摘要: 分组}}，分组为 {"index", "digest", "sample", "devices"}
+        self._groups: Dict[str, Dict[str, dict]] = {}
+        self._assignments: Dict[Tuple[str, str], str] = {}
+        self._next_index = 1
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        with self._lock:
+            return self._version
+
+    def add(self, command: str, sn: str, text: str) -> dict:
+        """记录一台设备的输出，返回 {"index": 分组编号, "count": 该组设备数, "digest": 摘要}。"""
+        command = str(command or "").strip()
+        normalized = normalize_command_output(text)
+        digest = output_digest(normalized)
+        with self._lock:
+            groups = self._groups.setdefault(command, {})
+            previous = self._assignments.get((command, sn))
+            if previous == digest:
+                group = groups[digest]
+                return {"index": group["index"], "count": len(group["devices"]), "digest": digest}
+            if previous is not None:
+                self._remove_device(groups, previous, sn)
+            group = groups.get(digest)
+            if group is None:
+                group = {
+                    "index": self._next_index,
+                    "digest": digest,
+                    "sample": normalized[:OUTPUT_GROUP_SAMPLE_MAX_CHARS],
+                    "truncated": len(normalized) > OUTPUT_GROUP_SAMPLE_MAX_CHARS,
+                    "devices": [],
+                }
+                self._next_index += 1
+                groups[digest] = group
+            group["devices"].append(sn)
+            self._assignments[(command, sn)] = digest
+            self._version += 1
+            return {"index": group["index"], "count": len(group["devices"]), "digest": digest}
+
+    @staticmethod
+    def _remove_device(groups: Dict[str, dict], digest: str, sn: str) -> None:
+        group = groups.get(digest)
+        if group is None:
+            return
+        try:
+            group["devices"].remove(sn)
+        except ValueError:
+            pass
+        if not group["devices"]:
+            groups.pop(digest, None)
+
+    def group_count(self) -> int:
+        with self._lock:
+            return sum(len(groups) for groups in self._groups.values())
+
+    def snapshot(self) -> Dict[str, List[dict]]:
+        """{命令: [分组]}，每条命令内按设备数从多到少排列；返回副本，可在界面线程中随意使用。"""
+        with self._lock:
+            result = {}
+            for command, groups in self._groups.items():
+                ordered = sorted(groups.values(), key=lambda group: (-len(group["devices"]), group["index"]))
+                result[command] = [{**group, "devices": sorted(group["devices"])} for group in ordered]
+            return result
+
+    def format_lines(self, max_devices: int = 10) -> List[str]:
+        lines = []
+        for command, groups in self.snapshot().items():
+            device_count = sum(len(group["devices"]) for group in groups)
+            if len(groups) <= 1:
+                lines.append(f"{command}: {device_count} 台输出一致")
+                continue
+            outliers = sorted(sn for group in groups[1:] for sn in group["devices"])
+            shown = "、".join(outliers[:max_devices]) + (" 等" if len(outliers) > max_devices else "")
+            lines.append(
+                f"{command}: {len(groups)} 种输出，{len(groups[0]['devices'])} 台与多数一致，"
+                f"{len(outliers)} 台不同: {shown}"
+            )
+        return lines
+
+    def export_csv(self, path: Path) -> Optional[Path]:
+        """每个分组一行：命令、分组编号、设备数、SN 列表、输出内容；utf-8-sig 编码便于 Excel 直接打开。"""
+        try:
+            path = Path(path).expanduser()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("w", encoding="utf-8-sig", newline="") as handle:
+                writer = csv.writer(handle)
+                writer.writerow(["命令", "分组", "设备数", "SN", "输出"])
+                for command, groups in self.snapshot().items():
+                    for group in groups:
+                        sample = group["sample"] + ("\n...（已截断）" if group.get("truncated") else "")
+                        writer.writerow(
+                            [command, group["index"], len(group["devices"]), " ".join(group["devices"]), sample]
+                        )
+            return path
+        except OSError as exc:
+            logging.warning("Export command output groups failed: %s", exc)
+            return None
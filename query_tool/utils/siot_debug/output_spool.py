@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import logging
+import mmap
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Optional, Tuple
+
+from .config import OUTPUT_SPOOL_DIR
+
+
+# 超过任一阈值的命令输出不再整段插入控制台，而是落盘后由查看器分页读取
+SPOOL_OUTPUT_MIN_CHARS = 64 * 1024
+SPOOL_OUTPUT_MIN_LINES = 2000
+OUTPUT_SPOOL_RETENTION_DAYS = 3
+OUTPUT_SPOOL_SUFFIX = ".txt"
+
+# 查看器每页读取的字节数与每次搜索扫描的字节数
+SPOOL_PAGE_BYTES = 256 * 1024
+SPOOL_SEARCH_CHUNK_BYTES = 8 * 1024 * 1024
+
+_LABEL_RE = re.compile(r"[^0-9A-Za-z_.-]+")
+
+
+def should_spool_output(text: str) -> bool:
+    text = str(text or "")
+    if len(text) > SPOOL_OUTPUT_MIN_CHARS:
+        return True
+    return len(text) > SPOOL_OUTPUT_MIN_LINES and text.count("\n") >= SPOOL_OUTPUT_MIN_LINES
+
+
+def spool_output(text: str, label: str = "", directory: Path = OUTPUT_SPOOL_DIR) -> Optional[Path]:
+    """把一段命令输出写入独立的 utf-8 文件，返回文件路径；写入失败时返回 None，由调用方按原方式显示。"""
+    label = _LABEL_RE.sub("_", str(label or "").strip()).strip("_") or "output"
+    try:
+        directory = Path(directory).expanduser()
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{label[:40]}_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}{OUTPUT_SPOOL_SUFFIX}"
+        with path.open("w", encoding="utf-8", errors="replace", newline="") as handle:
+            # 统一为 \n 换行，查看器按行对齐分页时无需处理 \r
+            handle.write(str(text or "").replace("\r\n", "\n"))
+        return path
+    except OSError as exc:
+        logging.warning("Spool command output failed: %s", exc)
+        return None
+
+
+def prune_output_spool(directory: Path = OUTPUT_SPOOL_DIR, retention_days: float = OUTPUT_SPOOL_RETENTION_DAYS) -> int:
+    """删除超过保留天数的输出文件，返回删除的文件数。"""
+    directory = Path(directory).expanduser()
+    if not directory.is_dir():
+        return 0
+    deadline = time.time() - retention_days * 86400
+    removed = 0
+    for path in directory.glob(f"*{OUTPUT_SPOOL_SUFFIX}"):
+        try:
+            if path.stat().st_mtime < deadline:
+                path.unlink()
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+class SpooledOutput:
+    """通过 mmap 按需读取落盘输出：每次只解码当前页，搜索直接在映射上分段扫描，
+    文件多大都不会整体读入内存。所有位置均为字节偏移。
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._handle = self.path.open("rb")
+        self.size = self.path.stat().st_size
+        # 空文件无法映射
+        self._map = mmap.mmap(self._handle.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._handle.close()
+
+    def __enter__(self) -> "SpooledOutput":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def line_start(self, offset: int) -> int:
+        offset = min(max(int(offset), 0), self.size)
+        if self._map is None or offset == 0:
+            return 0
+        return self._map.rfind(b"\n", 0, offset) + 1
+
+    def read_page(self, offset: int, max_bytes: int = SPOOL_PAGE_BYTES) -> Tuple[int, int, str]:
+        """从 offset 所在行的行首读取至多 max_bytes，结尾对齐到整行，返回 (起始, 结束, 文本)。"""
+        start = self.line_start(offset)
+        if self._map is None:
+            return 0, 0, ""
+        end = min(start + max(int(max_bytes), 1), self.size)
+        if end < self.size:
+            newline = self._map.rfind(b"\n", start, end)
+            if newline >= 0:
+                end = newline + 1
+            else:
+                # 单行超过一页时按字节截断，避开 utf-8 多字节字符中间
+                while end > start + 1 and (self._map[end] & 0xC0) == 0x80:
+                    end -= 1
+        return start, end, self.decode(start, end)
+
+    def previous_page_offset(self, start: int, max_bytes: int = SPOOL_PAGE_BYTES) -> int:
+        """start 之前一页的起始位置（对齐到行首）。"""
+        target = int(start) - max(int(max_bytes), 1)
+        if target <= 0 or self._map is None:
+            return 0
+        newline = self._map.find(b"\n", target, start)
+        return newline + 1 if newline >= 0 else self.line_start(target)
+
+    def decode(self, start: int, end: int) -> str:
+        if self._map is None or end <= start:
+            return ""
+        return self._map[start:end].decode("utf-8", errors="replace")
+
+    def find(self, query: str, start: int = 0, end: Optional[int] = None, case_sensitive: bool = False) -> int:
+        """查找起点落在 [start, end) 内的第一个匹配，返回字节偏移，未找到返回 -1。
+        不区分大小写时只折叠 ASCII 字母，字节偏移保持不变。"""
+        needle = str(query or "").encode("utf-8")
+        if self._map is None or not needle:
+            return -1
+        start = max(int(start), 0)
+        end = self.size if end is None else min(int(end), self.size)
+        if start >= end:
+            return -1
+        # 允许跨越 end 的匹配，只要求起点在范围内
+        limit = min(end + len(needle) - 1, self.size)
+        if case_sensitive:
+            return self._map.find(needle, start, limit)
+        index = self._map[start:limit].lower().find(needle.lower())
+        return start + index if index >= 0 else -1
+
+    def rfind(self, query: str, start: int = 0, end: Optional[int] = None, case_sensitive: bool = False) -> int:
+        """查找起点落在 [start, end) 内的最后一个匹配，返回字节偏移，未找到返回 -1。"""
+        needle = str(query or "").encode("utf-8")
+        if self._map is None or not needle:
+            return -1
+        start = max(int(start), 0)
+        end = self.size if end is None else min(int(end), self.size)
+        if start >= end:
+            return -1
+        limit = min(end + len(needle) - 1, self.size)
+        if case_sensitive:
+            return self._map.rfind(needle, start, limit)
+        index = self._map[start:limit].lower().rfind(needle.lower())
+        return start + index if index >= 0 else -1
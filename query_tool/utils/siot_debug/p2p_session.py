@@ -21,16 +21,22 @@ from .config import (
     DEFAULT_TEXT_RESULT_SETTLE_S,
     PROJECT_ROOT,
     SDK_BIN_DIR,
+    resolve_sdk_dir_cached,
 )
 from .models import CommandResult, DeviceCredentials, ParsedPayload, ProgressCallback
+from .packet_capture import SOURCE_P2P_LOG, PacketCapture
 from .protocol import decode_text, extract_printable_text, parse_device_payload
-from .session import INTERACTIVE_COMMAND_START_TIMEOUT_MS, _CommandWaiter, _safe_log_text
+from .run_logging import PacketLogSampler
+from .session import INTERACTIVE_COMMAND_START_TIMEOUT_MS, _CommandWaiter, _safe_log_text, open_transfer_sink
 from .siot_client import SiotError
+from .telemetry import TransportMetrics
+from .timing import PhaseTimer
 
 
 P2P_CONNECT_TIMEOUT_S = 30.0
 REMOTE_DIAGNOSE_COMMAND = 1
 REMOTE_DIAGNOSE_CHANNEL = -1
+P2P_FILE_IDLE_SETTLE_S = 0.35
 
 TPS_MSG_BASE = 0x2000
 TPS_MSG_NOTIFY_LOGIN_OK = TPS_MSG_BASE + 1
@@ -180,6 +186,10 @@ def _iter_p2p_search_roots():
 
 
 def resolve_p2p_sdk_dir(preferred: str | Path | None = None) -> Path:
+    return resolve_sdk_dir_cached("p2p", preferred, "TPQUERYTOOL_P2P_SDK_DIR", _is_p2p_sdk_dir, _scan_p2p_sdk_dir)
+
+
+def _scan_p2p_sdk_dir(preferred: str | Path | None = None) -> Path:
     candidates = []
     if preferred:
         candidates.append(Path(preferred))
@@ -215,12 +225,9 @@ def resolve_p2p_sdk_dir(preferred: str | Path | None = None) -> Path:
 
 
 class _P2PCommandWaiter(_CommandWaiter):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.transport_error = ""
-
     def build_result(self) -> CommandResult:
-        if self.transport_error and not self.responses and not self.text_parts and not self.binary_chunks:
+        if self.transport_error and not self.responses and not self.text_parts and not self.has_binary():
+            self.discard_file_sink()
             return CommandResult(
                 command=self.command,
                 command_kind=self.command_kind,
@@ -347,8 +354,8 @@ class P2PLibraries:
 
 
 class P2PDeviceSession:
-    def __init__(self) -> None:
-        self.sdk = P2PLibraries()
+    def __init__(self, sdk: Optional[P2PLibraries] = None) -> None:
+        self.sdk = sdk if sdk is not None else P2PLibraries()
         self.lib = self.sdk.lib
         self.device: Optional[DeviceCredentials] = None
 
@@ -362,11 +369,16 @@ class P2PDeviceSession:
         self._disconnect_reason = ""
 
         self._active_waiter: Optional[_P2PCommandWaiter] = None
+        self._packet_gap_estimate: Optional[float] = None
         self._stream_log_listener: Optional[Callable[[str], None]] = None
         self._stream_log_enabled = False
         self._interactive_command_ready = False
         self._interactive_command_keyword = ""
         self._status_callback: Optional[Callable[[str], None]] = None
+        self.connect_timer = PhaseTimer()
+        self.transport_metrics = TransportMetrics()
+        self.packet_capture: Optional[PacketCapture] = None
+        self._packet_log_sampler = PacketLogSampler()
 
         self._cb_message = MsgRspCallback(self._on_message)
         self._cb_log = FcLogCallback(self._on_log)
@@ -380,6 +392,7 @@ class P2PDeviceSession:
 
         self.device = device
         self._status_callback = status_callback
+        self.connect_timer = PhaseTimer()
 
         with self._state_lock:
             if self._connected and self._target_id == target_id:
@@ -393,15 +406,16 @@ class P2PDeviceSession:
 
         self._logout_quietly()
 
-        rc = self.lib.FC_Login(
-            P2P_DEVICE_USERNAME.encode("utf-8"),
-            (device.password or "").encode("utf-8"),
-            target_id.encode("utf-8"),
-            80,
-            b"",
-            b"",
-            b"",
-        )
+        with self.connect_timer.span("p2p_login"):
+            rc = self.lib.FC_Login(
+                P2P_DEVICE_USERNAME.encode("utf-8"),
+                (device.password or "").encode("utf-8"),
+                target_id.encode("utf-8"),
+                80,
+                b"",
+                b"",
+                b"",
+            )
         if rc != 0 and not _is_benign_p2p_login_return_code(rc):
             raise SiotError(f"P2P登录失败: {rc}")
         if rc != 0:
@@ -411,7 +425,9 @@ class P2PDeviceSession:
                 target_id,
             )
 
-        if not self._connect_ready.wait(P2P_CONNECT_TIMEOUT_S) or not self._connected:
+        with self.connect_timer.span("peer_connect"):
+            connect_ready = self._connect_ready.wait(P2P_CONNECT_TIMEOUT_S)
+        if not connect_ready or not self._connected:
             self._logout_quietly()
             timeout_message = self._connect_error or self._disconnect_reason
             if not timeout_message and rc != 0:
@@ -515,6 +531,7 @@ class P2PDeviceSession:
             and not result.responses
             and result.streamed_packets == 0
             and not result.binary_payload
+            and not result.payload_path
         )
 
     @staticmethod
@@ -544,6 +561,8 @@ class P2PDeviceSession:
             command_kind="system_log",
             expects_file=is_file_command,
             progress_callback=progress_callback,
+            file_sink=open_transfer_sink(self.device, command) if is_file_command else None,
+            gap_estimate=self._packet_gap_estimate,
         )
         log_level = parse_startlogp2p_level(command)
         enable_stream_log = is_startlogp2p_command(command) and log_level is not None and log_level != 0
@@ -563,54 +582,14 @@ class P2PDeviceSession:
             if ret != 0:
                 raise SiotError(f"FC_RemoteDiagnose failed: {ret}")
 
-            deadline = time.monotonic() + timeout_ms / 1000.0
-            lowered = command.lower()
-
-            while time.monotonic() < deadline:
-                remaining = deadline - time.monotonic()
-                waiter.event.wait(timeout=min(0.5, max(remaining, 0.0)))
-                waiter.event.clear()
-
-                if waiter.has_text():
-                    settle_deadline = time.monotonic() + DEFAULT_TEXT_RESULT_SETTLE_S
-                    while time.monotonic() < settle_deadline:
-                        settle_remaining = settle_deadline - time.monotonic()
-                        waiter.event.wait(timeout=min(0.1, max(settle_remaining, 0.0)))
-                        waiter.event.clear()
-                    result = waiter.build_result()
-                    self._apply_stream_log_state(result, enable_stream_log, disable_stream_log, stream_log_callback)
-                    return result
-
-                if is_file_command and waiter.file_finished:
-                    result = waiter.build_result()
-                    self._apply_stream_log_state(result, enable_stream_log, disable_stream_log, stream_log_callback)
-                    return result
-
-                if is_file_command and waiter.file_started:
-                    if time.monotonic() - waiter.last_progress >= 0.35:
-                        result = waiter.build_result()
-                        self._apply_stream_log_state(result, enable_stream_log, disable_stream_log, stream_log_callback)
-                        return result
-
-                if waiter.transport_error and not waiter.responses:
-                    result = waiter.build_result()
-                    self._apply_stream_log_state(result, enable_stream_log, disable_stream_log, stream_log_callback)
-                    return result
-
-                if not is_file_command and waiter.has_ack_only():
-                    settle_s = DEFAULT_EMPTY_RESULT_SETTLE_S
-                    if lowered == "syscmd start":
-                        settle_s = DEFAULT_TEXT_RESULT_SETTLE_S
-                    if time.monotonic() - waiter.last_activity >= settle_s:
-                        result = waiter.build_result()
-                        self._apply_stream_log_state(result, enable_stream_log, disable_stream_log, stream_log_callback)
-                        return result
-
-                if lowered == "syscmd start" and waiter.responses:
-                    result = waiter.build_result()
-                    self._apply_stream_log_state(result, enable_stream_log, disable_stream_log, stream_log_callback)
-                    return result
-
+            waiter.wait_for_completion(
+                timeout_ms / 1000.0,
+                file_idle_s=P2P_FILE_IDLE_SETTLE_S,
+                ack_settle_s=DEFAULT_TEXT_RESULT_SETTLE_S if command.lower() == "syscmd start" else DEFAULT_EMPTY_RESULT_SETTLE_S,
+                terminal_on_response=command.lower() == "syscmd start",
+            )
+            if waiter.gap_estimate is not None:
+                self._packet_gap_estimate = waiter.gap_estimate
             result = waiter.build_result()
             self._apply_stream_log_state(result, enable_stream_log, disable_stream_log, stream_log_callback)
             return result
@@ -618,6 +597,7 @@ class P2PDeviceSession:
             with self._waiter_lock:
                 if self._active_waiter is waiter:
                     self._active_waiter = None
+            waiter.discard_file_sink()
 
     def _apply_stream_log_state(
         self,
@@ -637,12 +617,15 @@ class P2PDeviceSession:
     def _handle_transport_payload(self, raw: bytes) -> None:
         parsed = parse_device_payload(raw)
         if parsed.message_type:
-            logging.info(
-                "Received P2P payload type=%s code=%s flag=%s",
-                parsed.message_type,
-                parsed.msg_code,
-                parsed.msg_flag,
-            )
+            packet_index = self._packet_log_sampler.hit(parsed.message_type)
+            if packet_index:
+                logging.info(
+                    "Received P2P payload type=%s code=%s flag=%s #%s",
+                    parsed.message_type,
+                    parsed.msg_code,
+                    parsed.msg_flag,
+                    packet_index,
+                )
             self._handle_parsed_payload(parsed)
             return
 
@@ -719,12 +702,22 @@ class P2PDeviceSession:
             if msg_type != TPS_MSG_P2P_LOG or not data_ptr or data_len == 0:
                 return 0
 
-            raw = ctypes.string_at(data_ptr, data_len)
-            self._handle_transport_payload(raw)
+            self._receive_log_payload(ctypes.string_at(data_ptr, data_len))
         except Exception:
             logging.exception("P2P callback handling failed, msg_type=%s", msg_type)
         return 0
 
+    def _receive_log_payload(self, raw: bytes) -> None:
+        capture = self.packet_capture
+        if capture is not None:
+            capture.record(SOURCE_P2P_LOG, raw)
+        started_at = time.perf_counter()
+        try:
+            self._handle_transport_payload(raw)
+        finally:
+            # Funclib 回调前已完成解密，这里只统计处理耗时
+            self.transport_metrics.record_packet(len(raw), 0.0, time.perf_counter() - started_at)
+
     def _handle_disconnect(self, message: str) -> None:
         message = (message or "").strip() or "P2P连接已断开"
         if self._connect_error and _is_generic_disconnect_message(message):
@@ -737,8 +730,7 @@ class P2PDeviceSession:
         with self._waiter_lock:
             waiter = self._active_waiter
         if waiter is not None:
-            waiter.transport_error = message
-            waiter.event.set()
+            waiter.set_transport_error(message)
         logging.warning("P2P transport disconnected: %s", message)
 
     def _on_log(self, level, message_ptr) -> None:
@@ -820,8 +812,7 @@ class P2PDeviceSession:
             waiter = self._active_waiter
             self._active_waiter = None
         if waiter is not None:
-            waiter.transport_error = self._disconnect_reason or "连接已断开"
-            waiter.event.set()
+            waiter.set_transport_error(self._disconnect_reason or "连接已断开")
 
         self._logout_quietly()
         self._connected = False
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import logging
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from .protocol import HEADER_ENCRYPT_FLAG, MSG_HEAD_LEN
+
+
+CAPTURE_MAGIC = b"SIOTCAP1"
+CAPTURE_SUFFIX = ".siotcap"
+CAPTURE_MAX_BYTES = 512 * 1024 * 1024
+CAPTURE_ENV_VAR = "SIOT_CAPTURE_DIR"
+
+SOURCE_SIGNALING = "signaling"
+SOURCE_PEER = "p2p"
+# P2P(Funclib) 会话的 TPS_MSG_P2P_LOG 回调，库内已解密，没有传输报文头
+SOURCE_P2P_LOG = "p2p_log"
+
+_SOURCE_CODES = {SOURCE_SIGNALING: 1, SOURCE_PEER: 2, SOURCE_P2P_LOG: 3}
+_SOURCE_NAMES = {code: name for name, code in _SOURCE_CODES.items()}
+# 文件头：魔数 + 开始抓包时的墙钟时间；每条记录：相对开始的纳秒、来源、长度，后跟报文原文
+_FILE_HEAD = struct.Struct("<8sd")
+_RECORD_HEAD = struct.Struct("<QBI")
+_FLAG = struct.Struct("<I")
+
+
+@dataclass
+class CapturedPacket:
+    offset_s: float
+    source: str
+    payload: bytes
+
+
+def plain_transport_frame(raw: bytes, unpacked: bytes) -> bytes:
+    """加密报文改为记录解密后的报文体（保留加密头标志并修正长度），抓包文件不含会话密钥，
+    回放时配合恒等假加解密库即可走同一条解包路径。"""
+    if unpacked is raw or len(raw) < MSG_HEAD_LEN:
+        return raw
+    if _FLAG.unpack_from(raw, 0)[0] != HEADER_ENCRYPT_FLAG:
+        return raw
+    return raw[:4] + _FLAG.pack(len(unpacked)) + raw[8:MSG_HEAD_LEN] + bytes(unpacked)
+
+
+class PacketCapture:
+    """把收到的传输报文连同时间与来源追加写入紧凑的二进制抓包文件，供离线回放与基准测试。
+
+    在 SDK 回调线程中调用 record，写入带缓冲且加锁；超过 max_bytes 后停止记录。
+    """
+
+    def __init__(self, path: Path, max_bytes: int = CAPTURE_MAX_BYTES, clock=time.perf_counter_ns) -> None:
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._clock = clock
+        self._max_bytes = max(int(max_bytes), 0)
+        self._lock = threading.Lock()
+        self._handle = self.path.open("wb")
+        self._handle.write(_FILE_HEAD.pack(CAPTURE_MAGIC, time.time()))
+        self._started_ns = clock()
+        self.packets = 0
+        self.bytes_written = _FILE_HEAD.size
+        self._stopped = False
+        self._channels: Dict[str, CaptureChannel] = {}
+
+    @classmethod
+    def create(cls, directory: Path, name: str, **kwargs) -> "PacketCapture":
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        return cls(Path(directory).expanduser() / f"{name or 'capture'}_{stamp}{CAPTURE_SUFFIX}", **kwargs)
+
+    def elapsed_ns(self) -> int:
+        return max(self._clock() - self._started_ns, 0)
+
+    def record(self, source: str, payload: bytes, offset_ns: Optional[int] = None) -> None:
+        code = _SOURCE_CODES.get(source, 0)
+        if offset_ns is None:
+            offset_ns = self.elapsed_ns()
+        with self._lock:
+            if self._stopped:
+                return
+            size = _RECORD_HEAD.size + len(payload)
+            if self._max_bytes and self.bytes_written + size > self._max_bytes:
+                logging.warning("Packet capture reached %s bytes, recording stopped: %s", self._max_bytes, self.path)
+                self._stopped = True
+                return
+            try:
+                self._handle.write(_RECORD_HEAD.pack(offset_ns, code, len(payload)))
+                self._handle.write(payload)
+            except (OSError, ValueError) as exc:
+                logging.warning("Write packet capture failed: %s", exc)
+                self._stopped = True
+                return
+            self.packets += 1
+            self.bytes_written += size
+
+    def channel(self, protocol: str) -> "CaptureChannel":
+        """protocol=auto 竞速时每个协议尝试使用独立的抓包入口，由 select 决定哪一路写入文件。"""
+        with self._lock:
+            channel = self._channels.get(protocol)
+            if channel is None:
+                channel = self._channels[protocol] = CaptureChannel(self)
+            return channel
+
+    def select(self, protocol: str) -> None:
+        """保留胜出协议的报文，丢弃其余尝试，避免两种会话的报文混入同一文件。"""
+        with self._lock:
+            channels = dict(self._channels)
+        for name, channel in channels.items():
+            if name == protocol:
+                channel.commit()
+            else:
+                channel.discard()
+
+    def close(self) -> None:
+        with self._lock:
+            channels = list(self._channels.values())
+        for channel in channels:
+            channel.discard()
+        with self._lock:
+            self._stopped = True
+            try:
+                self._handle.close()
+            except OSError:
+                pass
+
+
+class CaptureChannel:
+    """竞速中的单个协议尝试的抓包入口：胜负未定前报文连同时间暂存在内存，
+    commit 后按原时间写入文件并直接透传后续报文，discard 后全部丢弃。"""
+
+    def __init__(self, capture: PacketCapture) -> None:
+        self._capture = capture
+        self._lock = threading.Lock()
+        self._pending = []
+        self._selected: Optional[bool] = None
+
+    @property
+    def path(self) -> Path:
+        return self._capture.path
+
+    def record(self, source: str, payload: bytes) -> None:
+        offset_ns = self._capture.elapsed_ns()
+        with self._lock:
+            if self._selected is None:
+                self._pending.append((source, bytes(payload), offset_ns))
+                return
+            if self._selected:
+                self._capture.record(source, payload, offset_ns)
+
+    def commit(self) -> None:
+        with self._lock:
+            if self._selected is not None:
+                return
+            self._selected = True
+            pending, self._pending = self._pending, []
+            for source, payload, offset_ns in pending:
+                self._capture.record(source, payload, offset_ns)
+
+    def discard(self) -> None:
+        with self._lock:
+            if self._selected is None:
+                self._selected = False
+            self._pending = []
+
+
+def iter_capture(path: Path) -> Iterator[CapturedPacket]:
+    """逐条读取抓包文件；抓包进程被强杀留下的不完整尾记录直接忽略。"""
+    with Path(path).open("rb") as reader:
+        head = reader.read(_FILE_HEAD.size)
+        if len(head) < _FILE_HEAD.size or _FILE_HEAD.unpack(head)[0] != CAPTURE_MAGIC:
+            raise ValueError(f"不是有效的抓包文件: {path}")
+        while True:
+            record_head = reader.read(_RECORD_HEAD.size)
+            if len(record_head) < _RECORD_HEAD.size:
+                return
+            offset_ns, code, length = _RECORD_HEAD.unpack(record_head)
+            payload = reader.read(length)
+            if len(payload) < length:
+                return
+            yield CapturedPacket(offset_ns / 1e9, _SOURCE_NAMES.get(code, ""), payload)
+
+
+def load_capture(path: Path) -> List[CapturedPacket]:
+    return list(iter_capture(path))
+
+
+def open_capture(directory: Optional[str], name: str) -> Optional[PacketCapture]:
+    if not directory:
+        return None
+    try:
+        return PacketCapture.create(Path(directory), name)
+    except OSError as exc:
+        logging.warning("Open packet capture failed: %s", exc)
+        return None
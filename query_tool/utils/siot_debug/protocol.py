@@ -1,6 +1,8 @@
 import ctypes
 import re
 import struct
+import threading
+from functools import lru_cache
 from typing import Optional, Tuple
 from xml.sax.saxutils import escape
 
@@ -14,10 +16,25 @@ MSG_HEAD_LEN = 12
 PAYLOAD_TYPE_XML = 0x01
 PAYLOAD_TYPE_JSON = 0x02
 
+CRYPT_BUFFER_MIN_SIZE = 1024
+_MSG_HEAD_STRUCT = struct.Struct("<IIBxxx")
+
 XML_END_TAG = b"</XML_TOPSEE>"
+XML_DECL_TAG = b"<?xml"
+XML_ROOT_TAG = b"<XML_TOPSEE>"
+BINARY_SEPARATOR = b"\x00\x00\x00\x00"
+
+_ATTR_RE = re.compile(r'([\w:.-]+)\s*=\s*"([^"]*)"')
+_MESSAGE_HEADER_RE = re.compile(r"<MESSAGE_HEADER\b([^>]*)>", re.IGNORECASE)
+_POS_RE = re.compile(r"<POS\b([^>]*)>", re.IGNORECASE)
+_RESPONSE_PARAM_RE = re.compile(r"<RESPONSE_PARAM\b[^>]*>(.*?)</RESPONSE_PARAM>", re.IGNORECASE | re.DOTALL)
+_MESSAGE_BODY_RE = re.compile(r"<MESSAGE_BODY\b[^>]*>(.*?)</MESSAGE_BODY>", re.IGNORECASE | re.DOTALL)
+_RESP_STR_RE = re.compile(r'RespStr="([^"]*)"')
 
 
 def decode_text(raw: bytes) -> str:
+    if raw.isascii():
+        return raw.decode("ascii")
     for encoding in ("utf-8", "gb18030", "latin-1"):
         try:
             return raw.decode(encoding)
@@ -26,19 +43,74 @@ def decode_text(raw: bytes) -> str:
     return raw.decode("utf-8", errors="replace")
 
 
-def _call_crypt(fn, method: int, payload: bytes, key: bytes, output_scale: int) -> bytes:
-    buffer = ctypes.create_string_buffer(max(len(payload) * output_scale, 1024))
+class CryptBuffer:
+    """会话级可复用的加解密输出缓冲，按见过的最大报文增长，避免每包重新分配。"""
+
+    def __init__(self, initial_size: int = CRYPT_BUFFER_MIN_SIZE) -> None:
+        self.lock = threading.Lock()
+        self.allocations = 0
+        self._buffer = self._allocate(max(int(initial_size), CRYPT_BUFFER_MIN_SIZE))
+
+    def _allocate(self, size: int):
+        self.allocations += 1
+        return ctypes.create_string_buffer(size)
+
+    def reserve(self, size: int):
+        """调用方需持有 lock；返回容量不小于 size 的缓冲。"""
+        if size > len(self._buffer):
+            self._buffer = self._allocate(max(size, len(self._buffer) * 2))
+        return self._buffer
+
+    @property
+    def buffer(self):
+        return self._buffer
+
+    @property
+    def capacity(self) -> int:
+        return len(self._buffer)
+
+
+def _bytes_address(data: bytes, offset: int = 0) -> int:
+    """bytes 内部数据地址（不拷贝）；调用期间 data 必须保持引用。"""
+    return ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p).value + offset
+
+
+def _crypt_into(fn, method: int, source_ptr, source_len: int, key: bytes, output, output_len: int) -> int:
     result_len = fn(
         method,
-        ctypes.c_char_p(payload),
-        len(payload),
-        buffer,
-        len(buffer),
+        source_ptr,
+        source_len,
+        output,
+        output_len,
         ctypes.c_char_p(key),
     )
     if result_len <= 0:
         raise RuntimeError(f"加解密接口返回异常: {result_len}")
-    return bytes(buffer[:result_len])
+    return result_len
+
+
+def _call_crypt(
+    fn,
+    method: int,
+    payload: bytes,
+    key: bytes,
+    output_scale: int,
+    *,
+    offset: int = 0,
+    length: Optional[int] = None,
+    crypt_buffer: Optional[CryptBuffer] = None,
+) -> bytes:
+    length = len(payload) - offset if length is None else length
+    source = ctypes.c_void_p(_bytes_address(payload, offset)) if offset else ctypes.c_char_p(payload)
+    output_size = max(length * output_scale, CRYPT_BUFFER_MIN_SIZE)
+    if crypt_buffer is None:
+        buffer = ctypes.create_string_buffer(output_size)
+        result_len = _crypt_into(fn, method, source, length, key, buffer, len(buffer))
+        return buffer[:result_len]
+    with crypt_buffer.lock:
+        buffer = crypt_buffer.reserve(output_size)
+        result_len = _crypt_into(fn, method, source, length, key, buffer, len(buffer))
+        return buffer[:result_len]
 
 
 def pack_message(
@@ -56,10 +128,54 @@ def pack_message(
     else:
         body = payload
         flag = HEADER_FLAG
-    return struct.pack("<IIBxxx", flag, len(body), payload_type) + body
+    return _MSG_HEAD_STRUCT.pack(flag, len(body), payload_type) + body
 
 
-def unpack_message(data: bytes, *, method: int, key: bytes, crypt_lib) -> Optional[bytes]:
+def pack_message_into(
+    crypt_buffer: CryptBuffer,
+    payload: bytes,
+    payload_type: int,
+    *,
+    encrypt: bool,
+    method: int,
+    key: bytes,
+    crypt_lib,
+) -> int:
+    """把报文头和（加密后的）报文体直接写入复用缓冲，返回报文总长度。
+
+    调用方需持有 crypt_buffer.lock，并在释放锁之前把缓冲内容发送出去。
+    """
+    if encrypt and method >= 1 and key:
+        capacity = MSG_HEAD_LEN + max(len(payload) * 2, CRYPT_BUFFER_MIN_SIZE)
+        buffer = crypt_buffer.reserve(capacity)
+        body_ptr = ctypes.c_void_p(ctypes.addressof(buffer) + MSG_HEAD_LEN)
+        body_len = _crypt_into(
+            crypt_lib.TpsProtocolEncode,
+            method,
+            ctypes.c_char_p(payload),
+            len(payload),
+            key,
+            body_ptr,
+            capacity - MSG_HEAD_LEN,
+        )
+        flag = HEADER_ENCRYPT_FLAG
+    else:
+        buffer = crypt_buffer.reserve(MSG_HEAD_LEN + len(payload))
+        ctypes.memmove(ctypes.addressof(buffer) + MSG_HEAD_LEN, payload, len(payload))
+        body_len = len(payload)
+        flag = HEADER_FLAG
+    _MSG_HEAD_STRUCT.pack_into(buffer, 0, flag, body_len, payload_type)
+    return MSG_HEAD_LEN + body_len
+
+
+def unpack_message(
+    data: bytes,
+    *,
+    method: int,
+    key: bytes,
+    crypt_lib,
+    crypt_buffer: Optional[CryptBuffer] = None,
+) -> Optional[bytes]:
     if len(data) < MSG_HEAD_LEN:
         return None
     flag, data_len, _ = struct.unpack_from("<IIB", data, 0)
@@ -68,13 +184,24 @@ def unpack_message(data: bytes, *, method: int, key: bytes, crypt_lib) -> Option
     if len(data) < MSG_HEAD_LEN + data_len:
         return None
 
-    body = data[MSG_HEAD_LEN: MSG_HEAD_LEN + data_len]
     if flag == HEADER_ENCRYPT_FLAG and method >= 1 and key:
+        # 密文直接按偏移传给解密接口，不再先切片拷贝报文体
+        if not isinstance(data, bytes):
+            data = bytes(data)
         try:
-            return _call_crypt(crypt_lib.TpsProtocolDecode, method, body, key, 2)
+            return _call_crypt(
+                crypt_lib.TpsProtocolDecode,
+                method,
+                data,
+                key,
+                2,
+                offset=MSG_HEAD_LEN,
+                length=data_len,
+                crypt_buffer=crypt_buffer,
+            )
         except RuntimeError:
             return None
-    return body
+    return bytes(memoryview(data)[MSG_HEAD_LEN: MSG_HEAD_LEN + data_len])
 
 
 def build_system_log_xml(command: str, channel: int = 0) -> bytes:
@@ -118,20 +245,41 @@ def build_auth_xml(password: str, sn: str, username: str, crypt_lib) -> bytes:
     return xml.encode("utf-8")
 
 
+@lru_cache(maxsize=64)
+def _xml_attr_pattern(element: str, attr: str) -> re.Pattern:
+    return re.compile(rf"<{element}\b[^>]*\b{attr}=\"([^\"]*)\"", re.IGNORECASE | re.DOTALL)
+
+
+@lru_cache(maxsize=64)
+def _xml_element_pattern(element: str) -> re.Pattern:
+    return re.compile(rf"<{element}\b[^>]*>(.*?)</{element}>", re.IGNORECASE | re.DOTALL)
+
+
 def extract_xml_attr(xml: str, element: str, attr: str) -> str:
-    pattern = re.compile(rf"<{element}\b[^>]*\b{attr}=\"([^\"]*)\"", re.IGNORECASE | re.DOTALL)
-    match = pattern.search(xml)
+    match = _xml_attr_pattern(element, attr).search(xml)
     return match.group(1) if match else ""
 
 
 def extract_xml_element(xml: str, element: str) -> str:
-    pattern = re.compile(rf"<{element}\b[^>]*>(.*?)</{element}>", re.IGNORECASE | re.DOTALL)
+    match = _xml_element_pattern(element).search(xml)
+    return match.group(1).strip() if match else ""
+
+
+def _parse_tag_attrs(pattern: re.Pattern, xml: str) -> dict:
+    """取首个匹配标签的全部属性，属性名统一小写，一次扫描代替逐个属性查找。"""
+    match = pattern.search(xml)
+    if not match:
+        return {}
+    return {name.lower(): value for name, value in _ATTR_RE.findall(match.group(1))}
+
+
+def _search_element(pattern: re.Pattern, xml: str) -> str:
     match = pattern.search(xml)
     return match.group(1).strip() if match else ""
 
 
 def extract_resp_str(text: str) -> Optional[str]:
-    matches = re.findall(r'RespStr="([^"]*)"', text)
+    matches = _RESP_STR_RE.findall(text)
     if not matches:
         return None
     if len(matches) == 1:
@@ -142,42 +290,79 @@ def extract_resp_str(text: str) -> Optional[str]:
     return "\n".join(non_empty)
 
 
-def _split_xml_and_binary(data: bytes) -> Tuple[str, bytes]:
-    xml_start = data.find(b"<?xml")
+def _locate_xml(data: bytes) -> Tuple[int, int, int]:
+    """返回 (xml_start, xml_end, tail_start)，未找到完整 XML 时 xml_start 为 -1。"""
+    xml_start = data.find(XML_DECL_TAG)
     if xml_start < 0:
-        xml_start = data.find(b"<XML_TOPSEE>")
+        xml_start = data.find(XML_ROOT_TAG)
     if xml_start < 0:
-        return decode_text(data), b""
+        return -1, len(data), len(data)
 
     xml_end = data.find(XML_END_TAG, xml_start)
     if xml_end < 0:
-        return decode_text(data), b""
+        return -1, len(data), len(data)
 
     xml_end += len(XML_END_TAG)
-    xml_bytes = data[xml_start:xml_end]
-    tail = data[xml_end:]
-    if tail.startswith(b"\x00\x00\x00\x00"):
-        tail = tail[4:]
-    return decode_text(xml_bytes), tail
+    tail_start = xml_end
+    if data.startswith(BINARY_SEPARATOR, xml_end):
+        tail_start += len(BINARY_SEPARATOR)
+    return xml_start, xml_end, tail_start
+
+
+def _split_xml_and_binary(data: bytes) -> Tuple[str, bytes]:
+    xml_start, xml_end, tail_start = _locate_xml(data)
+    if xml_start < 0:
+        return decode_text(data), b""
+    return decode_text(data[xml_start:xml_end]), data[tail_start:]
+
+
+def _to_int(value: Optional[str]) -> int:
+    try:
+        return int(value or "0")
+    except ValueError:
+        return 0
 
 
 def parse_device_payload(data: bytes) -> ParsedPayload:
-    xml_text, tail = _split_xml_and_binary(data)
-    response_param = extract_xml_element(xml_text, "RESPONSE_PARAM")
-    message_body = extract_xml_element(xml_text, "MESSAGE_BODY")
-    data_len = int(extract_xml_attr(xml_text, "POS", "DataLen") or "0")
-    binary_payload = tail[:data_len] if data_len > 0 else b""
+    xml_start, xml_end, tail_start = _locate_xml(data)
+    if xml_start < 0:
+        xml_text = decode_text(data)
+    else:
+        xml_text = decode_text(data[xml_start:xml_end])
+
+    header = _parse_tag_attrs(_MESSAGE_HEADER_RE, xml_text)
+    message_type = header.get("msg_type", "")
+    pos = _parse_tag_attrs(_POS_RE, xml_text)
+    data_len = _to_int(pos.get("datalen"))
+    binary_payload = b""
+    if data_len > 0 and xml_start >= 0:
+        binary_payload = data[tail_start: tail_start + data_len]
+
+    if message_type == "SYSTEM_LOG_DATA":
+        # 文件分片快速路径：只取报文头和 POS，分片不会走文本提取
+        return ParsedPayload(
+            message_type=message_type,
+            msg_code=header.get("msg_code", ""),
+            msg_flag=header.get("msg_flag", ""),
+            xml_text=xml_text,
+            filename=pos.get("filename") or None,
+            start_pos=_to_int(pos.get("startpos")),
+            data_len=data_len,
+            binary_payload=binary_payload,
+        )
 
+    response_param = _search_element(_RESPONSE_PARAM_RE, xml_text)
+    message_body = _search_element(_MESSAGE_BODY_RE, xml_text)
     return ParsedPayload(
-        message_type=extract_xml_attr(xml_text, "MESSAGE_HEADER", "Msg_type"),
-        msg_code=extract_xml_attr(xml_text, "MESSAGE_HEADER", "Msg_code"),
-        msg_flag=extract_xml_attr(xml_text, "MESSAGE_HEADER", "Msg_flag"),
+        message_type=message_type,
+        msg_code=header.get("msg_code", ""),
+        msg_flag=header.get("msg_flag", ""),
         xml_text=xml_text,
         response_param=response_param,
         message_body=message_body,
         resp_str=extract_resp_str(response_param or xml_text),
-        filename=extract_xml_attr(xml_text, "POS", "Filename") or None,
-        start_pos=int(extract_xml_attr(xml_text, "POS", "StartPos") or "0"),
+        filename=pos.get("filename") or None,
+        start_pos=_to_int(pos.get("startpos")),
         data_len=data_len,
         binary_payload=binary_payload,
     )
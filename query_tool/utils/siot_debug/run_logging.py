@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .config import RUN_LOG_DIR, RUN_LOG_PATH
+
+
+RUN_LOG_LEVEL_ENV_VAR = "SIOT_RUN_LOG_LEVEL"
+RUN_LOG_RETENTION_DAYS = 7
+RUN_LOG_SUFFIX = ".log"
+
+# 热路径逐包日志：每种消息类型先完整记录前 N 包，之后每隔 M 包记录一次
+PACKET_LOG_FIRST = 5
+PACKET_LOG_EVERY = 500
+
+# 每行以带毫秒的完整时间开头，合并时按字符串比较即为时间顺序
+_RUN_LOG_FORMAT = "%(asctime)s.%(msecs)03d %(process)d %(levelname)s:%(name)s:%(message)s"
+_RUN_LOG_DATEFMT = "%Y-%m-%d %H:%M:%S"
+_LINE_TIME_RE = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{3}) ")
+_LABEL_RE = re.compile(r"[^0-9A-Za-z_.-]+")
+
+
+def _resolve_level(environ=None) -> int:
+    raw = str((environ if environ is not None else os.environ).get(RUN_LOG_LEVEL_ENV_VAR) or "").strip().upper()
+    level = logging.getLevelName(raw) if raw else logging.INFO
+    return level if isinstance(level, int) else logging.INFO
+
+
+class RunnerLogWriter:
+    """runner 子进程的日志：根 logger 只挂 QueueHandler，由后台线程写入本进程独占的日志文件，
+    多个 runner 并发时不再争用同一个文件，SDK 回调线程也不会因磁盘写入阻塞。
+
+    bind(label) 之前的日志先留在队列里，绑定后写入 <label>_<时间>_<pid>.log；
+    未绑定就 close 时使用 runner 作为文件名。
+    """
+
+    def __init__(self, directory: Path = RUN_LOG_DIR, level: Optional[int] = None) -> None:
+        self.directory = Path(directory).expanduser()
+        self.level = _resolve_level() if level is None else level
+        self.path: Optional[Path] = None
+        self._queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._file_handler: Optional[logging.Handler] = None
+
+    def install(self) -> "RunnerLogWriter":
+        root_logger = logging.getLogger()
+        root_logger.handlers.clear()
+        root_logger.setLevel(self.level)
+        root_logger.addHandler(logging.handlers.QueueHandler(self._queue))
+        return self
+
+    def bind(self, label: str) -> Optional[Path]:
+        if self._listener is not None:
+            return self.path
+        label = _LABEL_RE.sub("_", str(label or "").strip()) or "runner"
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.directory / f"{label}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}{RUN_LOG_SUFFIX}"
+            handler: logging.Handler = logging.FileHandler(str(path), encoding="utf-8", delay=True)
+        except OSError:
+            path, handler = None, logging.NullHandler()
+        handler.setFormatter(logging.Formatter(_RUN_LOG_FORMAT, datefmt=_RUN_LOG_DATEFMT))
+        self.path = path
+        self._file_handler = handler
+        self._listener = logging.handlers.QueueListener(self._queue, handler)
+        self._listener.start()
+        return path
+
+    def close(self) -> None:
+        if self._listener is None:
+            self.bind("runner")
+        self._listener.stop()
+        self._file_handler.close()
+
+
+class PacketLogSampler:
+    """逐包日志采样：DEBUG 级别时每包都记录，否则同一 key 只记录前 first 包，之后每 every 包记录一次。
+
+    计数器用 itertools.count，在 SDK 多个回调线程上调用也无需加锁。
+    """
+
+    def __init__(self, first: int = PACKET_LOG_FIRST, every: int = PACKET_LOG_EVERY) -> None:
+        self._first = max(int(first), 0)
+        self._every = max(int(every), 1)
+        self._counters: Dict[str, Iterator[int]] = {}
+
+    def hit(self, key: str) -> int:
+        """返回该 key 的第几包（从 1 开始）；本包不需要记录时返回 0。"""
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters.setdefault(key, itertools.count(1))
+        index = next(counter)
+        if index <= self._first or index % self._every == 0 or logging.getLogger().isEnabledFor(logging.DEBUG):
+            return index
+        return 0
+
+
+def prune_run_logs(directory: Path = RUN_LOG_DIR, retention_days: float = RUN_LOG_RETENTION_DAYS) -> int:
+    """删除超过保留天数的 runner 日志，返回删除的文件数。"""
+    directory = Path(directory).expanduser()
+    if not directory.is_dir():
+        return 0
+    deadline = time.time() - retention_days * 86400
+    removed = 0
+    for path in directory.glob(f"*{RUN_LOG_SUFFIX}"):
+        try:
+            if path.stat().st_mtime < deadline:
+                path.unlink()
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+def _read_records(path: Path) -> Iterator[tuple]:
+    """按记录读取（异常堆栈等续行并入上一条），产出 (时间, 文件名, 记录文本)。"""
+    timestamp = ""
+    lines: List[str] = []
+    with Path(path).open("r", encoding="utf-8", errors="replace") as reader:
+        for line in reader:
+            match = _LINE_TIME_RE.match(line)
+            if match and lines:
+                yield timestamp, path.name, "".join(lines)
+                lines = []
+            if match:
+                timestamp = match.group(1)
+            lines.append(line if line.endswith("\n") else line + "\n")
+    if lines:
+        yield timestamp, path.name, "".join(lines)
+
+
+def merge_run_logs(
+    paths: Iterable[Path],
+    output: Path = RUN_LOG_PATH,
+    since: str = "",
+) -> int:
+    """把多个 runner 日志按时间归并成一个文件（每个文件本身已按时间有序），返回写入的记录数。"""
+    streams = [_read_records(Path(path)) for path in paths]
+    output = Path(output).expanduser()
+    output.parent.mkdir(parents=True, exist_ok=True)
+    written = 0
+    with output.open("w", encoding="utf-8") as writer:
+        for timestamp, name, record in heapq.merge(*streams, key=lambda item: (item[0], item[1])):
+            if since and timestamp < since:
+                continue
+            writer.write(f"[{Path(name).stem}] {record}")
+            written += 1
+    return written
@@ -7,13 +7,14 @@ import subprocess
 import threading
 import time
 import hashlib
-from typing import Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Tuple
 
 from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot
 
 from query_tool.utils.internal_launch import build_internal_command
 from query_tool.utils.logger import logger
-from query_tool.utils.runtime_credential_cache import get_shared_device_query
+from query_tool.utils.runtime_credential_cache import get_shared_device_query, load_device_context
 
 from .connect_payload import CloudCredentialPrefetcher, build_connect_payload
 from .config import DEFAULT_COMMAND_TIMEOUT_MS, DEVICE_USERNAME
@@ -24,6 +25,10 @@ ANSI_ESCAPE_RE = re.compile(r"\x1B\[[0-?]*[ -/]*[@-~]")
 _DEVICE_CONTEXT_CACHE = {}
 _DEVICE_CONTEXT_CACHE_LOCK = threading.RLock()
 _DEVICE_CONTEXT_CACHE_TTL_S = 5 * 60
+_PROTOCOL_HINT_CACHE = {}
+_PROTOCOL_HINT_TTL_S = 24 * 60 * 60
+SIOT_PLATFORM_CHECK_CHUNK = 50
+CREDENTIAL_PREFETCH_WORKERS = 8
 
 
 def _is_wakeup_failed_message(message: str) -> bool:
@@ -61,79 +66,197 @@ def validate_seetong_login(username: str, password: str) -> Tuple[bool, str]:
         return False, str(exc)
 
 
-def resolve_device_credentials(sn: str, env: str, username: str, password: str) -> Tuple[DeviceCredentials, Dict[str, str]]:
-    """通过设备查询接口按 SN 获取设备密码，并组装调试连接所需凭据。"""
+def _device_context_cache_key(sn: str, env: str, username: str, password: str) -> str:
     password_digest = hashlib.sha256((password or "").encode("utf-8")).hexdigest()
-    cache_key = f"{env}|{username}|{password_digest}|{sn.strip().upper()}"
-    now = time.time()
+    return f"{env}|{username}|{password_digest}|{sn.strip().upper()}"
+
+
+def _cached_device_context(cache_key: str, now: float):
     with _DEVICE_CONTEXT_CACHE_LOCK:
         entry = _DEVICE_CONTEXT_CACHE.get(cache_key)
         if entry and (now - entry["created_at"]) < _DEVICE_CONTEXT_CACHE_TTL_S:
-            context = dict(entry["context"])
-            return (
-                DeviceCredentials(
-                    sn=context["sn"],
-                    username=DEVICE_USERNAME,
-                    password=context["device_password"],
-                    dev_id=context.get("dev_id", ""),
-                    is_siot=context.get("is_siot"),
-                    protocol=context.get("protocol", "auto"),
-                ),
-                context,
-            )
+            return dict(entry["context"])
+    return None
+
+
+def _published_device_context(sn: str, env: str, username: str, password: str):
+    """设备页等查询结果发布的上下文；缺少 devId 或密码时视为不可用。"""
+    published = load_device_context(env, username, password, sn)
+    if not published or not published.get("dev_id") or not published.get("device_password"):
+        return None
+    record = {
+        "sn": published.get("sn") or sn.strip(),
+        "model": published.get("model") or "",
+        "dev_id": published["dev_id"],
+    }
+    return _build_device_context(record, published.get("is_siot"), published["device_password"])
 
-    query = get_shared_device_query(env, username, password)
-    if query.init_error:
-        raise RuntimeError(query.init_error)
 
+def _store_device_context(cache_key: str, context: dict, now: float) -> None:
+    with _DEVICE_CONTEXT_CACHE_LOCK:
+        _DEVICE_CONTEXT_CACHE[cache_key] = {
+            "context": dict(context),
+            "created_at": now,
+        }
+
+
+def _context_to_credentials(context: dict) -> DeviceCredentials:
+    return DeviceCredentials(
+        sn=context["sn"],
+        username=DEVICE_USERNAME,
+        password=context["device_password"],
+        dev_id=context.get("dev_id", ""),
+        is_siot=context.get("is_siot"),
+        protocol=context.get("protocol", "auto"),
+    )
+
+
+def _lookup_device_record(query, sn: str) -> dict:
     response = query.get_device_info(dev_sn=sn)
-    records = response.get("data", {}).get("records", [])
+    records = response.get("data", {}).get("records", []) if response else []
     if not records:
         raise RuntimeError(f"未找到设备：{sn}")
-
     record = records[0]
     dev_id = str(record.get("devId") or "").strip()
-    real_sn = str(record.get("devSN") or sn).strip()
-    is_siot = query.is_siot_platform_device(dev_id=dev_id, sn=real_sn)
-    protocol = "siot" if is_siot is True else "p2p" if is_siot is False else "auto"
-    model = str(
-        record.get("devModel")
-        or record.get("deviceModel")
-        or record.get("model")
-        or ""
-    ).strip()
     if not dev_id:
         raise RuntimeError("设备ID为空，无法获取设备密码")
+    return {
+        "sn": str(record.get("devSN") or sn).strip(),
+        "model": str(record.get("devModel") or record.get("deviceModel") or record.get("model") or "").strip(),
+        "dev_id": dev_id,
+    }
 
-    device_password = (query.get_cloud_password(dev_id) or "").strip()
-    if not device_password:
-        raise RuntimeError(f"未获取到设备密码：{real_sn}")
 
-    context = {
-        "sn": real_sn,
-        "model": model,
-        "dev_id": dev_id,
+def _build_device_context(record: dict, is_siot, device_password: str) -> dict:
+    device_password = (device_password or "").strip()
+    if not device_password:
+        raise RuntimeError(f"未获取到设备密码：{record['sn']}")
+    protocol = "siot" if is_siot is True else "p2p" if is_siot is False else _lookup_protocol_hint(record["sn"])
+    return {
+        "sn": record["sn"],
+        "model": record["model"],
+        "dev_id": record["dev_id"],
         "device_password": device_password,
         "is_siot": is_siot,
         "protocol": protocol,
     }
+
+
+def resolve_device_credentials(sn: str, env: str, username: str, password: str) -> Tuple[DeviceCredentials, Dict[str, str]]:
+    """通过设备查询接口按 SN 获取设备密码，并组装调试连接所需凭据。"""
+    cache_key = _device_context_cache_key(sn, env, username, password)
+    now = time.time()
+    context = _cached_device_context(cache_key, now)
+    if context is not None:
+        return _context_to_credentials(context), context
+    context = _published_device_context(sn, env, username, password)
+    if context is not None:
+        _store_device_context(cache_key, context, now)
+        return _context_to_credentials(context), context
+
+    query = get_shared_device_query(env, username, password)
+    if query.init_error:
+        raise RuntimeError(query.init_error)
+
+    record = _lookup_device_record(query, sn)
+    is_siot = query.is_siot_platform_device(dev_id=record["dev_id"], sn=record["sn"])
+    context = _build_device_context(record, is_siot, query.get_cloud_password(record["dev_id"]))
+    _store_device_context(cache_key, context, now)
+    return _context_to_credentials(context), context
+
+
+def prefetch_device_credentials(
+    sn_list: Iterable[str],
+    env: str,
+    username: str,
+    password: str,
+    *,
+    max_workers: int = CREDENTIAL_PREFETCH_WORKERS,
+    chunk_size: int = SIOT_PLATFORM_CHECK_CHUNK,
+) -> Dict[str, str]:
+    """批量预解析设备凭据并写入缓存：设备信息与云密码并发查询，siot 平台标记分块批量查询。
+
+    返回解析失败的 {SN: 错误信息}；失败的 SN 不写缓存，后续 resolve_device_credentials 会单独重试并报错。
+    """
+    now = time.time()
+    pending = []
+    seen = set()
+    for sn in sn_list or ():
+        sn = str(sn or "").strip()
+        if not sn or sn.upper() in seen:
+            continue
+        seen.add(sn.upper())
+        cache_key = _device_context_cache_key(sn, env, username, password)
+        if _cached_device_context(cache_key, now) is not None:
+            continue
+        context = _published_device_context(sn, env, username, password)
+        if context is not None:
+            _store_device_context(cache_key, context, now)
+            continue
+        pending.append(sn)
+    if not pending:
+        return {}
+
+    query = get_shared_device_query(env, username, password)
+    if query.init_error:
+        return {sn: query.init_error for sn in pending}
+
+    def lookup(sn: str):
+        record = _lookup_device_record(query, sn)
+        return record, query.get_cloud_password(record["dev_id"])
+
+    resolved = {}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(int(max_workers or 1), len(pending)))) as executor:
+        futures = {executor.submit(lookup, sn): sn for sn in pending}
+        for future in as_completed(futures):
+            sn = futures[future]
+            try:
+                resolved[sn] = future.result()
+            except Exception as exc:
+                errors[sn] = str(exc)
+
+    dev_ids = [record["dev_id"] for record, _ in resolved.values()]
+    platform_flags = {}
+    chunk_size = max(int(chunk_size or 1), 1)
+    for index in range(0, len(dev_ids), chunk_size):
+        try:
+            platform_flags.update(query.check_siot_platform(dev_ids[index:index + chunk_size]))
+        except Exception as exc:
+            logger.warning(f"批量查询 siot 平台标记失败: {exc}")
+
+    for sn, (record, device_password) in resolved.items():
+        try:
+            context = _build_device_context(record, platform_flags.get(record["dev_id"]), device_password)
+        except Exception as exc:
+            errors[sn] = str(exc)
+            continue
+        _store_device_context(_device_context_cache_key(sn, env, username, password), context, now)
+    return errors
+
+
+def record_device_protocol(sn: str, protocol: str) -> None:
+    """记录 auto 连接中胜出的协议，后续连接直接使用该协议，不再并发探测。"""
+    protocol = str(protocol or "").strip().lower()
+    sn_key = str(sn or "").strip().upper()
+    if not sn_key or protocol not in {"siot", "p2p"}:
+        return
     with _DEVICE_CONTEXT_CACHE_LOCK:
-        _DEVICE_CONTEXT_CACHE[cache_key] = {
-            "context": dict(context),
-            "created_at": now,
-        }
+        _PROTOCOL_HINT_CACHE[sn_key] = {"protocol": protocol, "created_at": time.time()}
+        for cache_key, entry in _DEVICE_CONTEXT_CACHE.items():
+            context = entry["context"]
+            if cache_key.rsplit("|", 1)[-1] == sn_key and context.get("protocol") == "auto":
+                context["protocol"] = protocol
 
-    return (
-        DeviceCredentials(
-            sn=real_sn,
-            username=DEVICE_USERNAME,
-            password=device_password,
-            dev_id=dev_id,
-            is_siot=is_siot,
-            protocol=protocol,
-        ),
-        context,
-    )
+
+def _lookup_protocol_hint(sn: str) -> str:
+    sn_key = str(sn or "").strip().upper()
+    with _DEVICE_CONTEXT_CACHE_LOCK:
+        entry = _PROTOCOL_HINT_CACHE.get(sn_key)
+        if entry and (time.time() - entry["created_at"]) < _PROTOCOL_HINT_TTL_S:
+            return entry["protocol"]
+        _PROTOCOL_HINT_CACHE.pop(sn_key, None)
+    return "auto"
 
 
 class SiotDebugWorker(QObject):
@@ -148,6 +271,7 @@ class SiotDebugWorker(QObject):
     command_progress = pyqtSignal(str, str)
     command_failed = pyqtSignal(str)
     command_finished = pyqtSignal()
+    transport_metrics = pyqtSignal(dict)
 
     def __init__(self):
         super().__init__()
@@ -384,9 +508,15 @@ class SiotDebugWorker(QObject):
             self.command_finished.emit()
             return
 
+        if event == "metrics":
+            self.transport_metrics.emit(payload)
+            return
+
         if event == "connected":
             self._connected = True
             self._context = self._pending_context or {}
+            if self._context.get("protocol") == "auto" and payload.get("protocol"):
+                record_device_protocol(self._context.get("sn", ""), payload.get("protocol"))
             self.connected.emit(self._context)
             self._closing = False
             return
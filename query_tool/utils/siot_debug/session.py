@@ -11,7 +11,7 @@ import time
 import urllib.parse
 import urllib.request
 import uuid
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from typing import Callable, Optional
 
 from query_tool.utils.internal_launch import build_internal_command
@@ -41,9 +41,17 @@ from .config import (
     DEFAULT_QUERY_DEVICE_DELAY_S,
     DEFAULT_TEXT_RESULT_SETTLE_S,
     DEVICE_GATEWAY_ID,
+    TRANSFER_SPOOL_DIR,
     resolve_sdk_bin_dir,
 )
+from .file_sink import FileChunkSink
+from .heartbeat import get_heartbeat_scheduler
+from .status_probe import probe_device_statuses
+from .telemetry import TransportMetrics
+from .timing import PhaseTimer
 from .models import CloudCredentials, CommandResult, DeviceCredentials, ParsedPayload, ProgressCallback, TransferProgress
+from .packet_capture import PacketCapture, plain_transport_frame
+from .run_logging import PacketLogSampler
 
 
 def _safe_log_text(value) -> str:
@@ -51,12 +59,14 @@ def _safe_log_text(value) -> str:
     return text.encode("utf-8", errors="backslashreplace").decode("utf-8")
 from .protocol import (
     PAYLOAD_TYPE_JSON,
+    CryptBuffer,
     build_auth_xml,
     build_system_log_xml,
     decode_secret_key,
     extract_printable_text,
     make_text_output,
     pack_message,
+    pack_message_into,
     parse_device_payload,
     unpack_message,
 )
@@ -109,9 +119,19 @@ TPSRTC_PROPERTY_P2P_KEEPALIVE = 11
 TPSRTC_PROPERTY_AUTO_TRANSPORT = 36
 
 ERR_P2P_USER_NOT_AUTH = 8
-HEARTBEAT_INTERVAL_S = 10.0
 FILE_IDLE_SETTLE_S = 0.35
+WAITER_STATE_PENDING = "pending"
+WAITER_STATE_ACK = "ack"
+WAITER_STATE_TEXT = "text"
+WAITER_STATE_FILE = "file"
+WAITER_STATE_DONE = "done"
+WAITER_STATE_TIMED_OUT = "timed_out"
+WAITER_TERMINAL_STATES = (WAITER_STATE_DONE, WAITER_STATE_TIMED_OUT)
+MIN_RESULT_SETTLE_S = 0.03
+SETTLE_GAP_FACTOR = 4.0
+SETTLE_GAP_EWMA_ALPHA = 0.3
 MAX_CLOUD_CREDENTIAL_REFRESH_RETRIES = 2
+PREFETCHED_DEVICE_STATUS_TTL_S = 30.0
 INTERACTIVE_COMMAND_START_TIMEOUT_MS = 5_000
 
 
@@ -235,6 +255,14 @@ def fetch_cloud_credentials(username: str, password: str, force_refresh: bool =
     return credentials
 
 
+def open_transfer_sink(device: Optional[DeviceCredentials], command: str) -> Optional[FileChunkSink]:
+    """GetSystemCfg 文件落盘；已知 SN 时使用可续传的固定临时文件。"""
+    device_sn = (device.sn if device else "") or ""
+    if device_sn:
+        return FileChunkSink.open_resumable(TRANSFER_SPOOL_DIR, device_sn, command)
+    return FileChunkSink.create(TRANSFER_SPOOL_DIR)
+
+
 @dataclass
 class _CommandWaiter:
     command: str
@@ -244,6 +272,8 @@ class _CommandWaiter:
     responses: list[ParsedPayload] = field(default_factory=list)
     text_parts: list[str] = field(default_factory=list)
     binary_chunks: bytearray = field(default_factory=bytearray)
+    file_sink: Optional[FileChunkSink] = None
+    transport_error: str = ""
     filename: Optional[str] = None
     file_started: bool = False
     file_finished: bool = False
@@ -252,11 +282,31 @@ class _CommandWaiter:
     received_bytes: int = 0
     last_activity: float = field(default_factory=time.monotonic)
     last_progress: float = field(default_factory=time.monotonic)
-    event: threading.Event = field(default_factory=threading.Event)
+    first_text_at: float = 0.0
+    gap_estimate: Optional[float] = None
+    state: str = WAITER_STATE_PENDING
+    _cond: threading.Condition = field(default_factory=threading.Condition, repr=False)
 
     def feed(self, payload: ParsedPayload) -> None:
-        self.responses.append(payload)
+        with self._cond:
+            if self.state in WAITER_TERMINAL_STATES:
+                return
+            self._feed_locked(payload)
+            self._cond.notify_all()
+
+    def set_transport_error(self, message: str) -> None:
+        with self._cond:
+            self.transport_error = message
+            self._cond.notify_all()
+
+    def _feed_locked(self, payload: ParsedPayload) -> None:
         now = time.monotonic()
+        text_gap = now - self.last_activity if self.text_parts else None
+        if self.file_sink is not None and payload.binary_payload:
+            # 落盘模式下分片已写入临时文件，responses 只保留报文头信息
+            self.responses.append(replace(payload, binary_payload=b""))
+        else:
+            self.responses.append(payload)
         self.last_activity = now
 
         if payload.filename:
@@ -264,35 +314,116 @@ class _CommandWaiter:
 
         if payload.message_type == "SYSTEM_LOG_DATA" or payload.data_len > 0:
             if not self.expects_file:
-                self.event.set()
                 return
+            self.state = WAITER_STATE_FILE
             self.file_started = True
             self.packet_count += 1
             if payload.data_len > 0 and payload.binary_payload:
-                self._append_chunk(payload.start_pos, payload.binary_payload[: payload.data_len])
+                self._write_chunk(payload.start_pos, payload.binary_payload[: payload.data_len])
                 self.received_bytes = max(self.received_bytes, payload.start_pos + payload.data_len)
                 self.last_progress = now
             else:
                 self.file_finished = True
+                if self.file_sink is not None:
+                    self.file_sink.mark_end(payload.start_pos)
             self._notify_progress(payload)
-            self.event.set()
             return
 
         text = extract_printable_text(payload).strip()
         if text:
+            if not self.text_parts:
+                self.first_text_at = now
+            if text_gap is not None:
+                # 只用多包文本应答的包间隔估计静默窗口，文件分片间隔过小不参与
+                if self.gap_estimate is None:
+                    self.gap_estimate = text_gap
+                else:
+                    self.gap_estimate += SETTLE_GAP_EWMA_ALPHA * (text_gap - self.gap_estimate)
             if not self.text_parts or self.text_parts[-1] != text:
                 self.text_parts.append(text)
             if payload.msg_flag and payload.msg_flag != "0":
                 self.has_error = True
-            self.event.set()
+            if self.state != WAITER_STATE_FILE:
+                self.state = WAITER_STATE_TEXT
             return
 
         if payload.msg_flag and payload.msg_flag != "0":
             self.has_error = True
-            self.event.set()
-            return
+        if self.state == WAITER_STATE_PENDING:
+            self.state = WAITER_STATE_ACK
 
-        self.event.set()
+    def text_settle_s(self) -> float:
+        """文本结果的静默等待：按观测到的包间隔自适应，不超过默认窗口。"""
+        if self.gap_estimate is None:
+            return DEFAULT_TEXT_RESULT_SETTLE_S
+        return min(max(self.gap_estimate * SETTLE_GAP_FACTOR, MIN_RESULT_SETTLE_S), DEFAULT_TEXT_RESULT_SETTLE_S)
+
+    def _completion_due(
+        self,
+        now: float,
+        file_idle_s: float,
+        ack_settle_s: float,
+        terminal_on_response: bool,
+    ) -> Optional[float]:
+        """返回命令可判定完成的时刻；None 表示需继续等待新报文。"""
+        if self.transport_error and (not self.responses or self.file_started):
+            return now
+        if self.expects_file:
+            if self.file_finished:
+                return now
+            if self.file_started:
+                return self.last_progress + file_idle_s
+            if self.text_parts:
+                # GetSystemCfg 未开始传输就收到文本，即为 file fail 等终止应答
+                return now
+        if terminal_on_response and self.responses:
+            return now
+        if self.text_parts:
+            if self.has_error:
+                return now
+            return min(self.last_activity + self.text_settle_s(), self.first_text_at + DEFAULT_TEXT_RESULT_SETTLE_S)
+        if not self.expects_file and self.has_ack_only():
+            return self.last_activity + ack_settle_s
+        return None
+
+    def wait_for_completion(
+        self,
+        timeout_s: float,
+        *,
+        file_idle_s: float = FILE_IDLE_SETTLE_S,
+        ack_settle_s: float = DEFAULT_EMPTY_RESULT_SETTLE_S,
+        terminal_on_response: bool = False,
+    ) -> bool:
+        """阻塞到命令完成或超时；报文到达时由 feed 通过条件变量唤醒，返回是否正常完成。"""
+        deadline = time.monotonic() + max(timeout_s, 0.0)
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                due = self._completion_due(now, file_idle_s, ack_settle_s, terminal_on_response)
+                if due is not None and due <= now:
+                    self.state = WAITER_STATE_DONE
+                    return True
+                wake_at = deadline if due is None else min(due, deadline)
+                if wake_at <= now:
+                    self.state = WAITER_STATE_TIMED_OUT
+                    if self.file_started and not self.file_finished and not self.transport_error:
+                        self.transport_error = "等待文件数据超时"
+                    return False
+                self._cond.wait(wake_at - now)
+
+    def _write_chunk(self, start_pos: int, chunk: bytes) -> None:
+        sink = self.file_sink
+        if sink is not None:
+            try:
+                if sink.write(start_pos, chunk):
+                    return
+            except OSError as exc:
+                # 磁盘写入失败时把已落盘内容搬回内存，后续分片继续走内存缓冲
+                logging.warning("Write file sink failed, falling back to memory buffer: %s", exc)
+                self.binary_chunks[:0] = sink.read_all()
+                sink.discard()
+                self.file_sink = None
+        self._append_chunk(start_pos, chunk)
 
     def _append_chunk(self, start_pos: int, chunk: bytes) -> None:
         offset = max(start_pos, 0)
@@ -304,11 +435,22 @@ class _CommandWaiter:
     def has_text(self) -> bool:
         return bool(self.text_parts)
 
+    def transfer_interrupted(self) -> bool:
+        return self.expects_file and self.file_started and not self.file_finished and bool(self.transport_error)
+
+    def has_binary(self) -> bool:
+        return bool(self.binary_chunks) or (self.file_sink is not None and self.file_sink.size > 0)
+
     def has_ack_only(self) -> bool:
-        return bool(self.responses) and not self.text_parts and not self.binary_chunks and not self.has_error
+        return bool(self.responses) and not self.text_parts and not self.has_binary() and not self.has_error
+
+    def discard_file_sink(self) -> None:
+        if self.file_sink is not None and not self.file_sink.finalized:
+            self.file_sink.discard()
 
     def build_result(self) -> CommandResult:
         if self.text_parts:
+            self.discard_file_sink()
             text = "\n".join(self.text_parts)
             return CommandResult(
                 command=self.command,
@@ -321,6 +463,55 @@ class _CommandWaiter:
                 responses=self.responses,
             )
 
+        if self.file_sink is not None and self.file_sink.size > 0 and not self.binary_chunks:
+            gaps = self.file_sink.missing()
+            if self.file_sink.resumable and (self.transfer_interrupted() or gaps):
+                reason = self.transport_error if self.transfer_interrupted() else f"缺少 {len(gaps)} 段数据"
+                kept_bytes = self.file_sink.suspend()
+                return CommandResult(
+                    command=self.command,
+                    command_kind=self.command_kind,
+                    success=False,
+                    display_text=f"文件传输中断（{reason}），已保留 {kept_bytes} 字节，重试时续传。",
+                    acknowledged=True,
+                    filename=self.filename,
+                    received_bytes=self.received_bytes,
+                    streamed_packets=self.packet_count,
+                    transfer_interrupted=True,
+                    responses=self.responses,
+                )
+            if gaps:
+                self.discard_file_sink()
+                return CommandResult(
+                    command=self.command,
+                    command_kind=self.command_kind,
+                    success=False,
+                    display_text=f"文件数据不完整（缺少 {len(gaps)} 段），请重试。",
+                    acknowledged=True,
+                    filename=self.filename,
+                    received_bytes=self.received_bytes,
+                    streamed_packets=self.packet_count,
+                    responses=self.responses,
+                )
+            total_bytes = self.file_sink.size
+            suppress_content = total_bytes > FILE_INLINE_OUTPUT_MAX_BYTES
+            text = "" if suppress_content else make_text_output(self.file_sink.read_all())
+            payload_path = self.file_sink.finalize()
+            return CommandResult(
+                command=self.command,
+                command_kind=self.command_kind,
+                success=not self.has_error,
+                display_text=text,
+                acknowledged=True,
+                payload_path=payload_path,
+                filename=self.filename,
+                received_bytes=max(self.received_bytes, total_bytes),
+                streamed_packets=self.packet_count,
+                content_suppressed=suppress_content,
+                responses=self.responses,
+            )
+
+        self.discard_file_sink()
         if self.binary_chunks:
             binary = bytes(self.binary_chunks)
             suppress_content = self.expects_file and len(binary) > FILE_INLINE_OUTPUT_MAX_BYTES
@@ -399,8 +590,10 @@ class DeviceSession:
         cloud_username: str,
         cloud_password: str,
         prefetched_cloud_credentials: Optional[CloudCredentials] = None,
+        prefetched_device_status: Optional[dict] = None,
+        sdk: Optional[SdkLibraries] = None,
     ) -> None:
-        self.sdk = SdkLibraries()
+        self.sdk = sdk if sdk is not None else SdkLibraries()
         self.lib = self.sdk.lib
         self.crypt = self.sdk.crypt
         self.device: Optional[DeviceCredentials] = None
@@ -408,6 +601,11 @@ class DeviceSession:
         self.cloud_username = cloud_username
         self.cloud_password = cloud_password
         self._prefetched_cloud_credentials = prefetched_cloud_credentials
+        self._prefetched_device_status = prefetched_device_status
+        self.connect_timer = PhaseTimer()
+        self.transport_metrics = TransportMetrics()
+        self.packet_capture: Optional[PacketCapture] = None
+        self._packet_log_sampler = PacketLogSampler()
 
         self._siot_conn = None
         self._peer_conn = None
@@ -418,6 +616,8 @@ class DeviceSession:
         self._peer_ready = threading.Event()
         self._stop_event = threading.Event()
         self._state_lock = threading.RLock()
+        self._encode_buffer = CryptBuffer()
+        self._decode_buffer = CryptBuffer()
 
         self._signal_connected = False
         self._device_online = False
@@ -433,13 +633,13 @@ class DeviceSession:
         self._cloud_net_type = -1
 
         self._active_waiter: Optional[_CommandWaiter] = None
+        self._packet_gap_estimate: Optional[float] = None
         self._waiter_lock = threading.Lock()
         self._stream_log_listener: Optional[Callable[[str], None]] = None
         self._stream_log_enabled = False
         self._interactive_command_ready = False
         self._interactive_command_keyword = ""
 
-        self._heartbeat_thread: Optional[threading.Thread] = None
         self._status_callback: Optional[Callable[[str], None]] = None
 
         self._cb_siot_event = TPSIOT_EventCallback(self._on_siot_event)
@@ -467,6 +667,7 @@ class DeviceSession:
     def connect(self, device: DeviceCredentials, status_callback: Optional[Callable[[str], None]] = None) -> None:
         self.device = device
         self._status_callback = status_callback
+        self.connect_timer = PhaseTimer()
         for retry_index in range(MAX_CLOUD_CREDENTIAL_REFRESH_RETRIES + 1):
             force_refresh = retry_index > 0
             try:
@@ -496,6 +697,8 @@ class DeviceSession:
     def _connect_once(self, force_refresh: bool) -> None:
         if self.device is None:
             raise SiotError("device credentials are missing")
+        # 只有显式连接才重新允许心跳，心跳重连路径不会清除关闭标志
+        self._stop_event.clear()
 
         self._gateway_id = DEVICE_GATEWAY_ID
         self._gateway_id_4g = ""
@@ -504,23 +707,33 @@ class DeviceSession:
         self._device_online = False
         self._device_is_4g = False
         self._emit_status("正在检查设备状态...")
-        self.cloud_credentials = self._load_cloud_credentials_for_connect(force_refresh)
-        status = self._probe_device_status_via_siot_helper(self.cloud_credentials)
+        timer = self.connect_timer
+        with timer.span("cloud_credentials"):
+            self.cloud_credentials = self._load_cloud_credentials_for_connect(force_refresh)
+        status = self._take_prefetched_device_status() if not force_refresh else None
+        if status is None:
+            with timer.span("status_probe"):
+                status = self._probe_device_status(self.cloud_credentials)
         self._apply_device_status(status)
         if self._is_device_offline(status):
             self._emit_status(f"设备：{self.device.sn}不在线")
             raise SiotError(f"设备：{self.device.sn}不在线")
         if self._is_device_sleeping(status):
             self._emit_status("设备休眠，正在唤醒...")
-            self._prepare_device_via_siot_helper()
+            with timer.span("wakeup"):
+                self._prepare_device_via_siot_helper()
             self._emit_status("唤醒成功，正在连接设备...")
         else:
             self._emit_status("设备已在线，正在连接设备...")
         self._emit_status("正在连接设备...")
-        self._connect_signaling()
-        self._query_device(wait_timeout=self._query_device_wait_timeout())
-        self._authenticate_via_signaling()
-        self._connect_peer()
+        with timer.span("signaling"):
+            self._connect_signaling()
+        with timer.span("query_device"):
+            self._query_device(wait_timeout=self._query_device_wait_timeout())
+        with timer.span("auth"):
+            self._authenticate_via_signaling()
+        with timer.span("peer_connect"):
+            self._connect_peer()
         self._invalidate_interactive_command_session()
         self._start_heartbeat_loop()
 
@@ -851,21 +1064,14 @@ class DeviceSession:
             raise SiotError("peer connection is not ready")
 
         xml = build_system_log_xml(command)
-        packed = pack_message(
-            xml,
-            payload_type=0x01,
-            encrypt=self._encrypt_method > 0 and bool(self._secret_key),
-            method=self._encrypt_method,
-            key=self._secret_key,
-            crypt_lib=self.crypt,
-        )
-        send_buffer = ctypes.create_string_buffer(packed, len(packed))
         is_file_command = is_getsystemcfg_command(command)
         waiter = _CommandWaiter(
             command=command,
             command_kind="system_log",
             expects_file=is_file_command,
             progress_callback=progress_callback,
+            file_sink=open_transfer_sink(self.device, command) if is_file_command else None,
+            gap_estimate=self._packet_gap_estimate,
         )
         log_level = parse_startlogp2p_level(command)
         enable_stream_log = is_startlogp2p_command(command) and log_level is not None and log_level != 0
@@ -876,105 +1082,80 @@ class DeviceSession:
 
         try:
             logging.info("Executing device command via P2P: %s", _safe_log_text(command))
-            ret = self.lib.TPSRTC_SendData(
-                self._peer_conn,
-                ctypes.cast(send_buffer, ctypes.c_void_p),
-                len(packed),
-                TPSRTC_FILE_STREAM,
-                b"",
-            )
+            with self._encode_buffer.lock:
+                packed_len = pack_message_into(
+                    self._encode_buffer,
+                    xml,
+                    payload_type=0x01,
+                    encrypt=self._encrypt_method > 0 and bool(self._secret_key),
+                    method=self._encrypt_method,
+                    key=self._secret_key,
+                    crypt_lib=self.crypt,
+                )
+                ret = self.lib.TPSRTC_SendData(
+                    self._peer_conn,
+                    ctypes.cast(self._encode_buffer.buffer, ctypes.c_void_p),
+                    packed_len,
+                    TPSRTC_FILE_STREAM,
+                    b"",
+                )
             if ret != 0:
                 raise SiotError(f"TPSRTC_SendData failed: {ret}")
 
-            deadline = time.monotonic() + timeout_ms / 1000.0
-            lowered = command.lower()
-
-            while time.monotonic() < deadline:
-                remaining = deadline - time.monotonic()
-                waiter.event.wait(timeout=min(0.5, max(remaining, 0.0)))
-                waiter.event.clear()
-
-                if waiter.has_text():
-                    settle_deadline = time.monotonic() + DEFAULT_TEXT_RESULT_SETTLE_S
-                    while time.monotonic() < settle_deadline:
-                        settle_remaining = settle_deadline - time.monotonic()
-                        waiter.event.wait(timeout=min(0.1, max(settle_remaining, 0.0)))
-                        waiter.event.clear()
-                    result = waiter.build_result()
-                    if enable_stream_log:
-                        self._stream_log_listener = stream_log_callback
-                        self._stream_log_enabled = True
-                        result.keep_listening = True
-                    elif disable_stream_log:
-                        self._stream_log_listener = None
-                        self._stream_log_enabled = False
-                    return result
-
-                if is_file_command and waiter.file_finished:
-                    result = waiter.build_result()
-                    if enable_stream_log:
-                        self._stream_log_listener = stream_log_callback
-                        self._stream_log_enabled = True
-                        result.keep_listening = True
-                    elif disable_stream_log:
-                        self._stream_log_listener = None
-                        self._stream_log_enabled = False
-                    return result
-
-                if is_file_command and waiter.file_started:
-                    if time.monotonic() - waiter.last_progress >= FILE_IDLE_SETTLE_S:
-                        result = waiter.build_result()
-                        if enable_stream_log:
-                            self._stream_log_listener = stream_log_callback
-                            self._stream_log_enabled = True
-                            result.keep_listening = True
-                        elif disable_stream_log:
-                            self._stream_log_listener = None
-                            self._stream_log_enabled = False
-                        return result
-
-                if not is_file_command and waiter.has_ack_only():
-                    settle_s = DEFAULT_EMPTY_RESULT_SETTLE_S
-                    if lowered == "syscmd start":
-                        settle_s = DEFAULT_TEXT_RESULT_SETTLE_S
-                    if time.monotonic() - waiter.last_activity >= settle_s:
-                        return waiter.build_result()
-
-                if lowered == "syscmd start" and waiter.responses:
-                    result = waiter.build_result()
-                    if enable_stream_log:
-                        self._stream_log_listener = stream_log_callback
-                        self._stream_log_enabled = True
-                        result.keep_listening = True
-                    elif disable_stream_log:
-                        self._stream_log_listener = None
-                        self._stream_log_enabled = False
-                    return result
-
+            waiter.wait_for_completion(
+                timeout_ms / 1000.0,
+                file_idle_s=FILE_IDLE_SETTLE_S,
+                ack_settle_s=DEFAULT_TEXT_RESULT_SETTLE_S if command.lower() == "syscmd start" else DEFAULT_EMPTY_RESULT_SETTLE_S,
+                terminal_on_response=command.lower() == "syscmd start",
+            )
+            if waiter.gap_estimate is not None:
+                self._packet_gap_estimate = waiter.gap_estimate
             result = waiter.build_result()
-            if enable_stream_log:
-                self._stream_log_listener = stream_log_callback
-                self._stream_log_enabled = True
-                result.keep_listening = True
-            elif disable_stream_log:
-                self._stream_log_listener = None
-                self._stream_log_enabled = False
+            self._apply_stream_log_state(result, enable_stream_log, disable_stream_log, stream_log_callback)
             return result
         finally:
             with self._waiter_lock:
                 if self._active_waiter is waiter:
                     self._active_waiter = None
+            waiter.discard_file_sink()
+
+    def _apply_stream_log_state(
+        self,
+        result: CommandResult,
+        enable_stream_log: bool,
+        disable_stream_log: bool,
+        stream_log_callback: Optional[Callable[[str], None]],
+    ) -> None:
+        if enable_stream_log:
+            self._stream_log_listener = stream_log_callback
+            self._stream_log_enabled = True
+            result.keep_listening = True
+        elif disable_stream_log:
+            self._stream_log_listener = None
+            self._stream_log_enabled = False
 
     def _handle_transport_packet(self, raw: bytes, source: str) -> None:
+        started_at = time.perf_counter()
         payload_type = self._get_payload_type(raw)
         unpacked = unpack_message(
             raw,
             method=self._encrypt_method,
             key=self._secret_key,
             crypt_lib=self.crypt,
+            crypt_buffer=self._decode_buffer,
         )
+        decrypt_s = time.perf_counter() - started_at
         if unpacked is None:
             unpacked = raw
+        capture = self.packet_capture
+        if capture is not None:
+            capture.record(source, plain_transport_frame(raw, unpacked))
+        try:
+            self._dispatch_transport_payload(payload_type, unpacked, source)
+        finally:
+            self.transport_metrics.record_packet(len(raw), decrypt_s, time.perf_counter() - started_at)
+
+    def _dispatch_transport_payload(self, payload_type: int, unpacked: bytes, source: str) -> None:
 
         if payload_type == PAYLOAD_TYPE_JSON:
             self._handle_json_payload(unpacked)
@@ -988,13 +1169,17 @@ class DeviceSession:
             return
 
         parsed = parse_device_payload(unpacked)
-        logging.info(
-            "Received %s payload type=%s flag=%s source=%s",
-            parsed.message_type,
-            parsed.msg_code,
-            parsed.msg_flag,
-            source,
-        )
+        # 文件分片、实时日志每包一条，按消息类型采样，避免大文件传输时日志拖慢接收
+        packet_index = self._packet_log_sampler.hit(parsed.message_type)
+        if packet_index:
+            logging.info(
+                "Received %s payload type=%s flag=%s source=%s #%s",
+                parsed.message_type,
+                parsed.msg_code,
+                parsed.msg_flag,
+                source,
+                packet_index,
+            )
         self._handle_xml_payload(parsed)
 
     def _handle_json_payload(self, payload: bytes) -> None:
@@ -1133,27 +1318,29 @@ class DeviceSession:
         self._auth_ready.set()
 
     def _start_heartbeat_loop(self) -> None:
-        if self._heartbeat_thread and self._heartbeat_thread.is_alive():
+        scheduler = get_heartbeat_scheduler()
+        if self._stop_event.is_set() or scheduler.is_registered(self):
             return
-        self._stop_event.clear()
-        self._heartbeat_thread = threading.Thread(
-            target=self._heartbeat_loop,
-            name="siot-heartbeat",
-            daemon=True,
+        scheduler.register(
+            self,
+            send=self._send_heartbeat,
+            needs_reconnect=self._heartbeat_needs_reconnect,
+            reconnect=self._heartbeat_reconnect,
         )
-        self._heartbeat_thread.start()
 
-    def _heartbeat_loop(self) -> None:
-        while not self._stop_event.wait(HEARTBEAT_INTERVAL_S):
-            try:
-                if not self._signal_connected or not self._authenticated or not self._peer_connected:
-                    self._ensure_ready()
-                self._send_heartbeat()
-            except Exception as exc:  # pragma: no cover
-                logging.warning("Heartbeat failed: %s", exc)
+    def _heartbeat_needs_reconnect(self) -> bool:
+        return not self._signal_connected or not self._authenticated or not self._peer_connected
+
+    def _heartbeat_reconnect(self) -> None:
+        # 在调度器的重连线程池中执行，会话关闭后不再重连
+        if self._stop_event.is_set():
+            return
+        self._ensure_ready()
+        if self._stop_event.is_set():
+            raise SiotError("session closed during heartbeat reconnect")
 
     def _send_heartbeat(self) -> None:
-        if not self._siot_conn or not self._authenticated or self.device is None:
+        if self._stop_event.is_set() or not self._siot_conn or not self._authenticated or self.device is None:
             return
         heartbeat_xml = _build_heartbeat_xml()
         packed = pack_message(
@@ -1237,6 +1424,10 @@ class DeviceSession:
             self._peer_connected = False
             self._invalidate_interactive_command_session()
             self._peer_ready.set()
+            with self._waiter_lock:
+                waiter = self._active_waiter
+            if waiter is not None:
+                waiter.set_transport_error("P2P数据通道已断开")
             logging.warning("P2P data channel closed or timeout: event=%s err=%s", event, err_code)
             return
 
@@ -1311,9 +1502,8 @@ class DeviceSession:
 
     def close(self) -> None:
         self._stop_event.set()
-        if self._heartbeat_thread and self._heartbeat_thread.is_alive():
-            self._heartbeat_thread.join(timeout=1.0)
-        self._heartbeat_thread = None
+        # 等正在执行的心跳或重连结束后再释放 SDK 连接
+        get_heartbeat_scheduler().unregister(self)
 
         with self._waiter_lock:
             self._active_waiter = None
@@ -1415,47 +1605,28 @@ class DeviceSession:
             raise SiotError(f"wakeup helper failed: {helper_error}")
         logging.info("libsiot prepare/login helper succeeded for %s", self.device.sn)
 
-    def _probe_device_status_via_siot_helper(self, credentials: CloudCredentials) -> dict:
+    def _take_prefetched_device_status(self) -> Optional[dict]:
+        """批量预探测得到的状态只用一次，且仅在有效期内使用。"""
+        status = self._prefetched_device_status
+        self._prefetched_device_status = None
+        if not isinstance(status, dict) or "probe_error" in status:
+            return None
+        if time.time() - float(status.get("probed_at") or 0) > PREFETCHED_DEVICE_STATUS_TTL_S:
+            return None
+        logging.info("Using prefetched device status for %s", self.device.sn if self.device else "")
+        return status
+
+    def _probe_device_status(self, credentials: CloudCredentials) -> dict:
         if self.device is None:
             raise SiotError("device session is not initialized")
 
-        logging.info("Probing device status via signaling helper: %s", self.device.sn)
-        probe_params = {
-            "access_node": credentials.access_node,
-            "access_token": credentials.access_jwt_token,
-            "client_id": credentials.client_id,
-            "key_version": credentials.jwt_key_version,
-            "sn": self.device.sn,
-        }
-        proc = subprocess.run(
-            build_internal_command(
-                "--siot-helper-probe",
-                str(resolve_sdk_bin_dir(SDK_BIN_DIR)),
-                json.dumps(probe_params, separators=(",", ":")),
-            ),
-            capture_output=True,
-            text=True,
-            timeout=40,
-        )
-        combined = "\n".join(part for part in (proc.stdout, proc.stderr) if part).strip()
-        if combined:
-            logging.info("Probe helper output:\n%s", combined)
-        if proc.returncode != 0:
-            raise SiotError(combined or "device status probe failed")
-
-        for line in reversed(proc.stdout.splitlines()):
-            line = line.strip()
-            if not line.startswith("{"):
-                continue
-            try:
-                payload = json.loads(line)
-            except Exception:
-                continue
-            if isinstance(payload, dict):
-                if "probe_error" in payload:
-                    raise SiotError(str(payload["probe_error"]))
-                return payload
-        raise SiotError("device status probe returned no valid payload")
+        logging.info("Probing device status in-process: %s", self.device.sn)
+        statuses = probe_device_statuses(self.lib, credentials, [self.device.sn])
+        status = statuses.get(self.device.sn) or {"probe_error": "device status probe returned no valid payload"}
+        logging.info("Device status probe result: %s", status)
+        if "probe_error" in status:
+            raise SiotError(str(status["probe_error"]))
+        return status
 
     @staticmethod
     def _is_device_sleeping(status: dict) -> bool:
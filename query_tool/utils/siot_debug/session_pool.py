@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Tuple
+
+
+SESSION_POOL_IDLE_S = 300.0
+SESSION_POOL_REAP_INTERVAL_S = 5.0
+SESSION_POOL_CLOSE_TIMEOUT_S = 5.0
+# 空闲期间出现这些事件说明子进程里的会话已失效
+_DEAD_EVENTS = ("disconnected", "connect_failed", "eof")
+
+
+@dataclass
+class PooledRunner:
+    """一个已登录的 runner 子进程：process 为 Popen，event_queue 为其输出读取线程解析出的事件队列。"""
+
+    sn: str
+    env: str
+    process: subprocess.Popen
+    event_queue: "queue.Queue[dict]"
+    protocol: str = ""
+    released_at: float = field(default=0.0)
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return session_pool_key(self.sn, self.env)
+
+
+def session_pool_key(sn: str, env: str) -> Tuple[str, str]:
+    return str(sn or "").strip().upper(), str(env or "").strip()
+
+
+class RunnerSessionPool:
+    """按 SN 保留已登录的 runner 子进程，下一批命令直接复用，跳过查密码、信令、认证与建链。
+
+    空闲期间由子进程内的心跳保活；空闲超过 idle_s、会话断开或子进程退出即关闭。
+    """
+
+    def __init__(self, idle_s: float = SESSION_POOL_IDLE_S, clock: Callable[[], float] = time.monotonic) -> None:
+        self._idle_s = max(float(idle_s), 0.0)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._runners: Dict[Tuple[str, str], PooledRunner] = {}
+        self._reaper: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+
+    @property
+    def idle_s(self) -> float:
+        return self._idle_s
+
+    def set_idle_s(self, idle_s: float) -> None:
+        self._idle_s = max(float(idle_s), 0.0)
+        self._wakeup.set()
+
+    def contains(self, sn: str, env: str) -> bool:
+        with self._lock:
+            return session_pool_key(sn, env) in self._runners
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._runners)
+
+    def acquire(self, sn: str, env: str) -> Optional[PooledRunner]:
+        """取出该 SN 的空闲会话；会话已过期或空闲期间已断开时关闭并返回 None。"""
+        with self._lock:
+            runner = self._runners.pop(session_pool_key(sn, env), None)
+        if runner is None:
+            return None
+        if self._is_expired(runner) or not self._drain_idle_events(runner):
+            self._close_async(runner)
+            return None
+        return runner
+
+    def release(self, runner: PooledRunner) -> bool:
+        """归还会话；池未启用或子进程已退出时直接关闭，返回是否已放回池中。"""
+        if self._idle_s <= 0 or runner.process.poll() is not None:
+            self._close_async(runner)
+            return False
+        runner.released_at = self._clock()
+        with self._lock:
+            previous = self._runners.pop(runner.key, None)
+            self._runners[runner.key] = runner
+            self._ensure_reaper()
+        if previous is not None and previous is not runner:
+            self._close_async(previous)
+        return True
+
+    def close_all(self, wait: bool = False) -> None:
+        with self._lock:
+            runners = list(self._runners.values())
+            self._runners.clear()
+        for runner in runners:
+            if wait:
+                close_runner(runner)
+            else:
+                self._close_async(runner)
+
+    def reap(self) -> int:
+        with self._lock:
+            expired = [key for key, runner in self._runners.items() if self._is_expired(runner)]
+            runners = [self._runners.pop(key) for key in expired]
+        for runner in runners:
+            self._close_async(runner)
+        return len(runners)
+
+    def _is_expired(self, runner: PooledRunner) -> bool:
+        if runner.process.poll() is not None:
+            return True
+        return self._clock() - runner.released_at >= self._idle_s
+
+    @staticmethod
+    def _drain_idle_events(runner: PooledRunner) -> bool:
+        while True:
+            try:
+                event = runner.event_queue.get_nowait()
+            except queue.Empty:
+                return runner.process.poll() is None
+            if event.get("event") in _DEAD_EVENTS:
+                return False
+
+    def _ensure_reaper(self) -> None:
+        if self._reaper is not None and self._reaper.is_alive():
+            return
+        self._reaper = threading.Thread(target=self._reap_loop, name="siot-session-pool", daemon=True)
+        self._reaper.start()
+
+    def _reap_loop(self) -> None:
+        while True:
+            self._wakeup.wait(min(SESSION_POOL_REAP_INTERVAL_S, max(self._idle_s, 0.1)))
+            self._wakeup.clear()
+            self.reap()
+            with self._lock:
+                if not self._runners:
+                    self._reaper = None
+                    return
+
+    @staticmethod
+    def _close_async(runner: PooledRunner) -> None:
+        threading.Thread(target=close_runner, args=(runner,), name=f"siot-pool-close-{runner.sn}", daemon=True).start()
+
+
+def close_runner(runner: PooledRunner) -> None:
+    """通知子进程注销并退出，超时则强杀。"""
+    process = runner.process
+    try:
+        if process.poll() is None and process.stdin is not None:
+            try:
+                process.stdin.write((json.dumps({"action": "disconnect"}) + "\n").encode("utf-8"))
+                process.stdin.flush()
+            except Exception:
+                pass
+            try:
+                process.stdin.close()
+            except Exception:
+                pass
+        try:
+            process.wait(timeout=SESSION_POOL_CLOSE_TIMEOUT_S)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    except Exception as exc:
+        logging.warning("Close pooled runner %s failed: %s", runner.sn, exc)
+
+
+_POOL: Optional[RunnerSessionPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_session_pool() -> RunnerSessionPool:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = RunnerSessionPool()
+        return _POOL
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import ctypes
+import json
+import logging
+import threading
+from typing import Dict, Iterable
+
+from .models import CloudCredentials
+from .siot_client import SiotError, TPSIOT_DeviceMessage, TPSIOT_EventCallback
+
+TPSIOT_ROLE_APP = 2
+TPSIOT_PROTOCOL_TCP = 2
+TPSIOT_TERMINAL_NORMAL = 0
+TPSIOT_CONN_CLOSED = 0
+TPSIOT_CONN_FAILED = 2
+TPSIOT_CONN_HANDSHAKED = 4
+TPSIOT_CONN_HANDSHAKED_FAILED = 5
+TPSIOT_CONN_APP_RECEIVED_DATA = 10
+TPSIOT_FB_QUERY_DEVICE = 0x1
+TPSIOT_FB_UNREACHABLE_DEVICE = 0x2
+TPSIOT_PROPERTY_ACCESS_ADDR = 0
+TPSIOT_PROPERTY_ACCESS_PROTOCOL = 1
+TPSIOT_PROPERTY_CLIENT_ID = 2
+TPSIOT_PROPERTY_TOKEN = 4
+TPSIOT_PROPERTY_KEY_INDEX = 5
+TPSRTC_PROPERTY_ENDPOINT = 0
+TPSRTC_PROPERTY_LOGLEVEL = 1
+
+PROBE_HANDSHAKE_TIMEOUT_S = 15.0
+PROBE_QUERY_TIMEOUT_S = 5.0
+PROBE_TIMEOUT_ERROR = "query_dev timeout"
+
+# TPSRTC_Startup/Cleanup 是进程级全局状态，同一进程内的探测必须串行
+_PROBE_LOCK = threading.Lock()
+
+
+def probe_device_statuses(
+    lib,
+    credentials: CloudCredentials,
+    sns: Iterable[str],
+    *,
+    handshake_timeout_s: float = PROBE_HANDSHAKE_TIMEOUT_S,
+    query_timeout_s: float = PROBE_QUERY_TIMEOUT_S,
+) -> Dict[str, dict]:
+    """复用一条信令连接批量查询设备在线状态，返回 {SN: 状态}，未应答的 SN 带 probe_error。
+
+    lib 需已由 SdkLibraries 绑定好函数签名；调用期间不能有同进程的 DeviceSession 处于信令连接中。
+    """
+    pending = {}
+    for sn in sns:
+        sn = str(sn or "").strip()
+        if sn:
+            pending.setdefault(sn.upper(), sn)
+    if not pending:
+        return {}
+
+    lock = threading.Lock()
+    handshake_event = threading.Event()
+    done_event = threading.Event()
+    state = {"handshake": False}
+    statuses: Dict[str, dict] = {}
+
+    def store(raw_sn, status: dict):
+        sn_key = (raw_sn or b"").decode("utf-8", errors="replace").strip().upper()
+        with lock:
+            if not sn_key and len(pending) == 1:
+                sn_key = next(iter(pending))
+            sn = pending.get(sn_key)
+            if sn is None or sn in statuses:
+                return
+            statuses[sn] = status
+            if len(statuses) >= len(pending):
+                done_event.set()
+
+    def on_event(conn, event, err_code, data_ptr, data_len, arg):
+        if event == TPSIOT_CONN_HANDSHAKED:
+            state["handshake"] = True
+            handshake_event.set()
+            return
+        if event in (TPSIOT_CONN_HANDSHAKED_FAILED, TPSIOT_CONN_CLOSED, TPSIOT_CONN_FAILED):
+            handshake_event.set()
+            return
+        if event != TPSIOT_CONN_APP_RECEIVED_DATA or not data_ptr:
+            return
+
+        message = ctypes.cast(data_ptr, ctypes.POINTER(TPSIOT_DeviceMessage)).contents
+        if message.feedbackCode == TPSIOT_FB_UNREACHABLE_DEVICE:
+            store(message.deviceSN, {"online": 0, "online4g": 0, "unreachable": 1})
+            return
+        if message.feedbackCode != TPSIOT_FB_QUERY_DEVICE or not message.buffer or message.len == 0:
+            return
+        raw = ctypes.string_at(message.buffer, message.len)
+        try:
+            payload = json.loads(raw.decode("utf-8"))
+        except Exception:
+            payload = {"probe_error": "invalid status payload"}
+        store(message.deviceSN, payload if isinstance(payload, dict) else {"probe_error": "invalid status payload"})
+
+    cb = TPSIOT_EventCallback(on_event)
+    with _PROBE_LOCK:
+        conn = None
+        try:
+            lib.TPSRTC_SetProperties(TPSRTC_PROPERTY_ENDPOINT, credentials.client_id.encode("utf-8"))
+            lib.TPSRTC_SetProperties(TPSRTC_PROPERTY_LOGLEVEL, b"off")
+            ret = lib.TPSRTC_Startup(None, None, None, 0, 0)
+            if ret != 0:
+                raise SiotError(f"TPSRTC_Startup failed: {ret}")
+
+            lib.TPSIOT_SetProperties(TPSIOT_PROPERTY_ACCESS_ADDR, credentials.access_node.encode("utf-8"))
+            lib.TPSIOT_SetProperties(TPSIOT_PROPERTY_ACCESS_PROTOCOL, b"2")
+            lib.TPSIOT_SetProperties(TPSIOT_PROPERTY_CLIENT_ID, credentials.client_id.encode("utf-8"))
+            lib.TPSIOT_SetProperties(TPSIOT_PROPERTY_TOKEN, credentials.access_jwt_token.encode("utf-8"))
+            lib.TPSIOT_SetProperties(TPSIOT_PROPERTY_KEY_INDEX, str(credentials.jwt_key_version).encode("utf-8"))
+
+            conn = lib.TPSIOT_Connect(TPSIOT_ROLE_APP, TPSIOT_PROTOCOL_TCP, TPSIOT_TERMINAL_NORMAL, cb, None)
+            if not conn:
+                raise SiotError("TPSIOT_Connect returned NULL")
+            if not handshake_event.wait(handshake_timeout_s) or not state["handshake"]:
+                raise SiotError("signaling handshake failed")
+
+            logging.info("Probing %s device status via one signaling connection", len(pending))
+            for sn in pending.values():
+                ret = lib.TPSIOT_AppSend(
+                    conn,
+                    TPSIOT_PROTOCOL_TCP,
+                    sn.encode("utf-8"),
+                    b"",
+                    None,
+                    0,
+                    b"query_dev",
+                    0,
+                    TPSIOT_FB_QUERY_DEVICE,
+                )
+                if ret != 0:
+                    logging.warning("TPSIOT_AppSend(query_dev) failed for %s: %s", sn, ret)
+            done_event.wait(query_timeout_s)
+        finally:
+            if conn:
+                try:
+                    lib.TPSIOT_Close(conn)
+                except Exception:
+                    pass
+            try:
+                lib.TPSRTC_Cleanup()
+            except Exception:
+                pass
+
+    with lock:
+        result = dict(statuses)
+    for sn in pending.values():
+        result.setdefault(sn, {"probe_error": PROBE_TIMEOUT_ERROR})
+    return result
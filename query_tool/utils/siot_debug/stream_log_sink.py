@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import io
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 仅开发环境可能缺失
+    zstandard = None
+
+
+STREAM_LOG_BUFFER_BYTES = 256 * 1024
+STREAM_LOG_FLUSH_INTERVAL_S = 1.0
+STREAM_LOG_SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+STREAM_LOG_SEGMENT_MAX_AGE_S = 60 * 60
+STREAM_LOG_ZSTD_LEVEL = 3
+SEGMENT_INDEX_SUFFIX = ".index.json"
+
+
+class RotatingStreamLogSink:
+    """实时日志落盘：块缓冲写入，按大小或时间切段，切出的旧段后台 zstd 压缩，并维护段起始时间索引。
+
+    第一段沿用 <base>.log，后续段为 <base>.<序号>.log；索引写在 <base>.index.json。
+    后台定时线程保证设备安静时缓冲中的日志也在 flush_interval_s 内落盘。
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        base_name: str,
+        *,
+        max_segment_bytes: int = STREAM_LOG_SEGMENT_MAX_BYTES,
+        max_segment_age_s: float = STREAM_LOG_SEGMENT_MAX_AGE_S,
+        flush_interval_s: float = STREAM_LOG_FLUSH_INTERVAL_S,
+        buffer_bytes: int = STREAM_LOG_BUFFER_BYTES,
+        compress: bool = True,
+        clock=time.monotonic,
+    ) -> None:
+        self.directory = Path(directory)
+        self.base_name = base_name
+        self._max_segment_bytes = max(int(max_segment_bytes), 1)
+        self._max_segment_age_s = max(float(max_segment_age_s), 0.0)
+        self._flush_interval_s = max(float(flush_interval_s), 0.0)
+        self._buffer_bytes = max(int(buffer_bytes), 1)
+        self._compress = compress and zstandard is not None
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._pending: List[str] = []
+        self._pending_bytes = 0
+        self._pending_since = 0.0
+        self._handle: Optional[io.TextIOWrapper] = None
+        self._segments: List[dict] = []
+        self._segment_bytes = 0
+        self._segment_opened_at = 0.0
+        self._last_flush_at = 0.0
+        self._compress_threads: List[threading.Thread] = []
+        self._flush_stop = threading.Event()
+        self._flush_thread: Optional[threading.Thread] = None
+
+    @property
+    def index_path(self) -> Path:
+        return self.directory / f"{self.base_name}{SEGMENT_INDEX_SUFFIX}"
+
+    @property
+    def current_path(self) -> Optional[Path]:
+        if not self._segments:
+            return None
+        return self.directory / self._segments[-1]["file"]
+
+    def open(self) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._open_segment()
+            path = self.directory / self._segments[-1]["file"]
+        if self._flush_interval_s > 0 and self._flush_thread is None:
+            self._flush_stop.clear()
+            self._flush_thread = threading.Thread(target=self._flush_loop, name="stream-log-flush", daemon=True)
+            self._flush_thread.start()
+        return path
+
+    def write_line(self, text: str) -> None:
+        data = text + "\n"
+        with self._lock:
+            if self._handle is None:
+                return
+            now = self._clock()
+            if not self._pending:
+                self._pending_since = now
+            self._pending.append(data)
+            self._pending_bytes += len(data.encode("utf-8"))
+            if self._pending_bytes >= self._buffer_bytes or now - self._last_flush_at >= self._flush_interval_s:
+                self._flush_locked(now)
+            if self._should_rotate(now):
+                self._rotate_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked(self._clock())
+
+    def close(self, wait: bool = True) -> Optional[Path]:
+        """关闭当前段，返回日志路径（发生过切段时为索引路径）；wait 为真时等待后台压缩完成。"""
+        self._flush_stop.set()
+        flush_thread, self._flush_thread = self._flush_thread, None
+        if flush_thread is not None:
+            flush_thread.join()
+        with self._lock:
+            if self._handle is None:
+                return None
+            self._flush_locked(self._clock())
+            self._close_segment_locked()
+            result_path = self.directory / self._segments[0]["file"]
+            if len(self._segments) > 1:
+                self._write_index_locked()
+                result_path = self.index_path
+            threads = list(self._compress_threads)
+        if wait:
+            for thread in threads:
+                thread.join()
+        return result_path
+
+    def segments(self) -> List[dict]:
+        with self._lock:
+            return [dict(segment) for segment in self._segments]
+
+    def _segment_name(self, index: int) -> str:
+        if index == 0:
+            return f"{self.base_name}.log"
+        return f"{self.base_name}.{index:03d}.log"
+
+    def _open_segment(self) -> None:
+        name = self._segment_name(len(self._segments))
+        self._handle = (self.directory / name).open("a", encoding="utf-8", buffering=self._buffer_bytes)
+        self._segments.append({"file": name, "started_at": datetime.now().isoformat(timespec="seconds"), "lines": 0})
+        self._segment_bytes = 0
+        self._segment_opened_at = self._clock()
+        self._last_flush_at = self._segment_opened_at
+
+    def _flush_loop(self) -> None:
+        """write_line 只在下一行到来时检查间隔，这里补上空闲时的按时落盘。"""
+        delay = self._flush_interval_s
+        while not self._flush_stop.wait(delay):
+            with self._lock:
+                if self._handle is None:
+                    return
+                now = self._clock()
+                if self._pending and now - self._pending_since >= self._flush_interval_s:
+                    self._flush_locked(now)
+                if self._pending:
+                    delay = max(self._pending_since + self._flush_interval_s - now, 0.01)
+                else:
+                    delay = self._flush_interval_s
+
+    def _flush_locked(self, now: float) -> None:
+        self._last_flush_at = now
+        if self._handle is None or not self._pending:
+            return
+        chunk = "".join(self._pending)
+        try:
+            self._handle.write(chunk)
+            self._handle.flush()
+        except Exception:
+            logging.exception("Write stream log segment failed")
+        self._segments[-1]["lines"] += len(self._pending)
+        self._segment_bytes += self._pending_bytes
+        self._pending.clear()
+        self._pending_bytes = 0
+
+    def _should_rotate(self, now: float) -> bool:
+        if self._segment_bytes + self._pending_bytes >= self._max_segment_bytes:
+            return True
+        return self._max_segment_age_s > 0 and now - self._segment_opened_at >= self._max_segment_age_s
+
+    def _rotate_locked(self) -> None:
+        self._flush_locked(self._clock())
+        self._close_segment_locked()
+        closed_segment = self._segments[-1]
+        self._open_segment()
+        if self._compress:
+            thread = threading.Thread(
+                target=self._compress_segment,
+                args=(closed_segment,),
+                name="stream-log-compress",
+                daemon=True,
+            )
+            self._compress_threads = [item for item in self._compress_threads if item.is_alive()]
+            self._compress_threads.append(thread)
+            thread.start()
+        self._write_index_locked()
+
+    def _close_segment_locked(self) -> None:
+        handle = self._handle
+        self._handle = None
+        if handle is not None:
+            try:
+                handle.close()
+            except Exception:
+                pass
+        self._segments[-1]["ended_at"] = datetime.now().isoformat(timespec="seconds")
+        self._segments[-1]["bytes"] = self._segment_bytes
+
+    def _compress_segment(self, segment: dict) -> None:
+        source = self.directory / segment["file"]
+        target = source.with_name(source.name + ".zst")
+        try:
+            compressor = zstandard.ZstdCompressor(level=STREAM_LOG_ZSTD_LEVEL)
+            with source.open("rb") as reader, target.open("wb") as writer:
+                compressor.copy_stream(reader, writer)
+            source.unlink()
+        except Exception:
+            logging.exception("Compress stream log segment failed: %s", source)
+            target.unlink(missing_ok=True)
+            return
+        with self._lock:
+            segment["file"] = target.name
+            self._write_index_locked()
+
+    def _write_index_locked(self) -> None:
+        try:
+            self.index_path.write_text(
+                json.dumps({"segments": self._segments}, ensure_ascii=False, indent=2),
+                encoding="utf-8",
+            )
+        except Exception:
+            logging.exception("Write stream log index failed")
+
+
+def load_segment_index(index_path: Path) -> List[dict]:
+    try:
+        payload = json.loads(Path(index_path).read_text(encoding="utf-8"))
+    except Exception:
+        return []
+    segments = payload.get("segments") if isinstance(payload, dict) else None
+    return [segment for segment in segments or [] if isinstance(segment, dict) and segment.get("file")]
+
+
+def find_segment(index_path: Path, when: datetime) -> Optional[Path]:
+    """按时间定位包含该时刻的段；早于第一段时返回第一段，晚于最后一段时返回最后一段。"""
+    segments = load_segment_index(index_path)
+    if not segments:
+        return None
+    chosen = segments[0]
+    for segment in segments:
+        try:
+            started_at = datetime.fromisoformat(segment["started_at"])
+        except (KeyError, ValueError):
+            continue
+        if started_at <= when:
+            chosen = segment
+    return Path(index_path).parent / chosen["file"]
+
+
+def read_segment_text(path: Path) -> str:
+    """读取日志段，.zst 段透明解压。"""
+    path = Path(path)
+    data = path.read_bytes()
+    if path.suffix == ".zst":
+        if zstandard is None:
+            raise RuntimeError("缺少 zstandard，无法读取压缩日志段")
+        data = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)).read()
+    return data.decode("utf-8", errors="replace")
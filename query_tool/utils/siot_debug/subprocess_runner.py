@@ -2,18 +2,29 @@ from __future__ import annotations
 
 import json
 import logging
+import os
 import sys
 import threading
 import time
-from typing import Callable
+from typing import TYPE_CHECKING, Callable
 from datetime import datetime
 from pathlib import Path
 
 from .command_catalog import is_getsystemcfg_command, is_startlogp2p_command, is_syscmd_family_command, parse_startlogp2p_level
-from .config import APP_LOG_DIR, DEFAULT_COMMAND_TIMEOUT_MS, RUN_LOG_PATH
+from .config import APP_LOG_DIR, DEFAULT_COMMAND_TIMEOUT_MS, TRANSFER_SPOOL_DIR
+from .content_store import ContentStore, hash_file
+from .file_sink import discard_spooled_file, move_spooled_file, prune_transfer_spool
 from .models import CloudCredentials, CommandResult, DeviceCredentials, TransferProgress
+from .packet_capture import CAPTURE_ENV_VAR, PacketCapture, open_capture
+from .run_logging import RunnerLogWriter, prune_run_logs
 from .p2p_session import P2PDeviceSession
 from .session import DeviceSession
+from .stream_log_sink import RotatingStreamLogSink
+from .telemetry import METRICS_INTERVAL_S, MetricsSampler, TransportMetrics
+from .timing import PhaseTimer
+
+if TYPE_CHECKING:
+    from .device_simulator import SimulatorProfile
 
 CONNECT_WAKEUP_ATTEMPTS = 1
 AUTH_RETRY_ATTEMPTS = 2
@@ -21,6 +32,8 @@ AUTH_RETRY_DELAY_S = 0.8
 INIT_START_TIMEOUT_MS = 5_000
 STREAM_LOG_FLUSH_INTERVAL_S = 0.2
 STREAM_LOG_MAX_BATCH = 50
+TRANSFER_RESUME_ATTEMPTS = 2
+PROTOCOL_RACE_STAGGER_S = 1.5
 
 
 def _is_auth_failed_message(message: str) -> bool:
@@ -36,6 +49,7 @@ def _is_empty_start_result(result: CommandResult) -> bool:
         and not result.responses
         and result.streamed_packets == 0
         and not result.binary_payload
+        and not result.payload_path
     )
 
 
@@ -44,8 +58,11 @@ class _StreamLogEmitter:
         self._lock = threading.Lock()
         self._buffer = []
         self._last_flush_at = 0.0
-        self._file_path = None
-        self._file_handle = None
+        self._sink = None
+        self._metrics = None
+
+    def bind_metrics(self, metrics: TransportMetrics | None):
+        self._metrics = metrics
 
     def start(self, device_sn: str, download_root: str):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -54,10 +71,9 @@ class _StreamLogEmitter:
         stream_log_dir = root / safe_sn
         stream_log_dir.mkdir(parents=True, exist_ok=True)
         self.stop(flush=False)
-        self._file_path = stream_log_dir / f"{safe_sn}_serial_{timestamp}.log"
-        self._file_handle = self._file_path.open("a", encoding="utf-8", buffering=1)
+        self._sink = RotatingStreamLogSink(stream_log_dir, f"{safe_sn}_serial_{timestamp}")
         self._last_flush_at = 0.0
-        return str(self._file_path)
+        return str(self._sink.open())
 
     def emit(self, message: str):
         text = str(message or "").strip()
@@ -65,6 +81,8 @@ class _StreamLogEmitter:
             return
         payload = None
         now = time.monotonic()
+        if self._metrics is not None:
+            self._metrics.record_stream_lines(text.count("\n") + 1)
         self._write_lines(text)
         with self._lock:
             self._buffer.append(text)
@@ -88,53 +106,78 @@ class _StreamLogEmitter:
     def stop(self, flush: bool = True):
         if flush:
             self.flush()
-        file_path = self._file_path
-        handle = self._file_handle
-        self._file_handle = None
-        self._file_path = None
-        if handle is not None:
-            try:
-                handle.close()
-            except Exception:
-                pass
+        sink = self._sink
+        self._sink = None
+        if sink is None:
+            return ""
+        try:
+            file_path = sink.close()
+        except Exception:
+            logging.exception("Close stream log file failed")
+            return ""
         return str(file_path) if file_path else ""
 
     def _write_lines(self, text: str):
-        handle = self._file_handle
-        if handle is None:
+        sink = self._sink
+        if sink is None:
             return
         try:
-            handle.write(text + "\n")
+            sink.write_line(text)
         except Exception:
             logging.exception("Write stream log file failed")
 
 
 _STREAM_LOG_EMITTER = _StreamLogEmitter()
+_EMIT_LOCK = threading.Lock()
 
 
-def _configure_runtime_logging():
-    APP_LOG_DIR.mkdir(parents=True, exist_ok=True)
+class _MetricsReporter:
+    """周期性采样会话收包计数并发送 metrics 事件；空闲后只补发一次归零数据。"""
 
-    root_logger = logging.getLogger()
-    root_logger.handlers.clear()
-    root_logger.setLevel(logging.INFO)
+    def __init__(self, metrics: TransportMetrics, interval_s: float = METRICS_INTERVAL_S):
+        self._sampler = MetricsSampler(metrics)
+        self._interval_s = interval_s
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._was_active = False
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="siot-metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def report_once(self):
+        sample = self._sampler.sample()
+        active = sample["packets_per_s"] > 0 or sample["stream_lines_per_s"] > 0
+        if active or self._was_active:
+            _emit("metrics", sent_at=time.time(), **sample)
+        self._was_active = active
+
+    def _run(self):
+        while not self._stop_event.wait(self._interval_s):
+            try:
+                self.report_once()
+            except Exception:
+                logging.exception("Emit transport metrics failed")
 
-    file_handler = logging.FileHandler(str(RUN_LOG_PATH), encoding="utf-8")
-    file_handler.setLevel(logging.INFO)
-    file_handler.setFormatter(
-        logging.Formatter(
-            "%(asctime)s %(levelname)s:%(name)s:%(message)s",
-            datefmt="%m-%d %H:%M:%S",
-        )
-    )
-    root_logger.addHandler(file_handler)
+
+def _configure_runtime_logging() -> RunnerLogWriter:
+    # 并发的 runner 各写各的文件，经队列由后台线程落盘；文件名在收到连接请求后按 SN 确定
+    writer = RunnerLogWriter().install()
+    prune_run_logs(writer.directory)
+    return writer
 
 
 def _emit(event: str, **payload):
     message = {"event": event}
     message.update(payload)
-    sys.stdout.write(json.dumps(message, ensure_ascii=False) + "\n")
-    sys.stdout.flush()
+    line = json.dumps(message, ensure_ascii=False) + "\n"
+    # 事件来自主线程、SDK 回调线程与采样线程，整行写出避免交错
+    with _EMIT_LOCK:
+        sys.stdout.write(line)
+        sys.stdout.flush()
 
 
 def _format_file_progress(progress: TransferProgress) -> str:
@@ -246,16 +289,37 @@ def _resolve_requested_filename(command: str) -> str:
     return Path(requested_path).name or "download.bin"
 
 
-def _save_getsystemcfg_file(command: str, result: CommandResult, download_root: str, device_sn: str) -> str:
-    if not result.binary_payload:
-        return ""
+def _save_getsystemcfg_file(
+    command: str,
+    result: CommandResult,
+    download_root: str,
+    device_sn: str,
+    dedup: bool = False,
+) -> tuple[str, str]:
+    """保存下载文件，返回 (路径, sha256)；dedup 为真时走内容寻址存储。"""
+    if not result.binary_payload and not result.payload_path:
+        return "", ""
 
     root = Path(download_root).expanduser()
     sn_dir = root / device_sn
     sn_dir.mkdir(parents=True, exist_ok=True)
     file_path = sn_dir / _resolve_output_filename(command, result)
-    file_path.write_bytes(result.binary_payload)
-    return str(file_path)
+    if dedup:
+        store = ContentStore(root)
+        if result.payload_path:
+            digest = store.put_file(Path(result.payload_path), file_path)
+            result.payload_path = None
+        else:
+            digest = store.put_bytes(result.binary_payload, file_path)
+        return str(file_path), digest
+    # 目标可能是去重模式留下的硬链接，原地覆写会改坏共享内容
+    discard_spooled_file(file_path)
+    if result.payload_path:
+        move_spooled_file(result.payload_path, file_path)
+        result.payload_path = None
+    else:
+        file_path.write_bytes(result.binary_payload)
+    return str(file_path), hash_file(file_path)
 
 
 def _extract_getsystemcfg_path(command: str) -> str:
@@ -306,12 +370,62 @@ def _build_session_factories(
     cloud_username: str,
     cloud_password: str,
     prefetched_cloud_credentials: CloudCredentials | None = None,
+    prefetched_device_status: dict | None = None,
+    packet_capture: PacketCapture | None = None,
+    simulator: SimulatorProfile | None = None,
+) -> list[tuple[str, Callable[[], object]]]:
+    factories = _build_protocol_factories(
+        credentials,
+        cloud_username,
+        cloud_password,
+        prefetched_cloud_credentials,
+        prefetched_device_status,
+        simulator,
+    )
+    if packet_capture is None:
+        return factories
+    if len(factories) == 1:
+        return [(name, _with_packet_capture(factory, packet_capture)) for name, factory in factories]
+    # 竞速时各协议先写入独立入口，连接胜出后由 packet_capture.select 只保留胜出方的报文
+    return [(name, _with_packet_capture(factory, packet_capture.channel(name))) for name, factory in factories]
+
+
+def _with_packet_capture(session_factory: Callable[[], object], packet_capture) -> Callable[[], object]:
+    def factory():
+        session = session_factory()
+        session.packet_capture = packet_capture
+        return session
+
+    return factory
+
+
+def _build_protocol_factories(
+    credentials: DeviceCredentials,
+    cloud_username: str,
+    cloud_password: str,
+    prefetched_cloud_credentials: CloudCredentials | None,
+    prefetched_device_status: dict | None,
+    simulator: SimulatorProfile | None = None,
 ) -> list[tuple[str, Callable[[], object]]]:
     protocol = _normalized_protocol(credentials)
     factories: list[tuple[str, Callable[[], object]]] = []
 
+    def siot_sdk():
+        if simulator is None:
+            return None
+        from .device_simulator import create_simulated_sdk
+
+        return create_simulated_sdk(simulator, "siot")
+
+    def simulated_p2p_session():
+        from .device_simulator import create_simulated_sdk
+
+        return P2PDeviceSession(sdk=create_simulated_sdk(simulator, "p2p"))
+
+    p2p_factory = simulated_p2p_session if simulator is not None else P2PDeviceSession
+
     if protocol == "p2p":
-        factories.append(("p2p", P2PDeviceSession))
+        factories.append(("p2p", p2p_factory))
         return factories
 
     if protocol == "siot":
@@ -324,6 +438,8 @@ def _build_session_factories(
                     cloud_username,
                     cloud_password,
                     prefetched_cloud_credentials=prefetched_cloud_credentials,
+                    prefetched_device_status=prefetched_device_status,
+                    sdk=siot_sdk(),
                 ),
             )
         )
@@ -337,10 +453,12 @@ def _build_session_factories(
                     cloud_username,
                     cloud_password,
                     prefetched_cloud_credentials=prefetched_cloud_credentials,
+                    prefetched_device_status=prefetched_device_status,
+                    sdk=siot_sdk(),
                 ),
             )
         )
-    factories.append(("p2p", P2PDeviceSession))
+    factories.append(("p2p", p2p_factory))
     return factories
 
 
@@ -348,6 +466,7 @@ def _handle_command(session, payload: dict):
     command = str(payload.get("command") or "").strip()
     timeout_ms = int(payload.get("timeout_ms") or DEFAULT_COMMAND_TIMEOUT_MS)
     download_root = str(payload.get("download_root") or "").strip()
+    dedup = bool(payload.get("dedup"))
 
     if not command:
         _emit("command_finished")
@@ -358,6 +477,7 @@ def _handle_command(session, payload: dict):
         _emit("command_finished")
         return
 
+    result = None
     try:
         stream_log_level = parse_startlogp2p_level(command)
         stream_log_path = ""
@@ -382,20 +502,34 @@ def _handle_command(session, payload: dict):
             progress_callback=progress_emitter.emit,
             stream_log_callback=_STREAM_LOG_EMITTER.emit,
         )
+        resume_attempt = 0
+        while result.transfer_interrupted and resume_attempt < TRANSFER_RESUME_ATTEMPTS:
+            resume_attempt += 1
+            progress_emitter.emit_message(f"{result.display_text}正在重连续传（第 {resume_attempt} 次）...")
+            result = session.execute_command(
+                command,
+                timeout_ms=timeout_ms,
+                progress_callback=progress_emitter.emit,
+                stream_log_callback=_STREAM_LOG_EMITTER.emit,
+            )
         if not is_startlogp2p_command(command) or stream_log_level == 0:
             _STREAM_LOG_EMITTER.flush()
         if _is_missing_file_result(command, result):
             _emit("command_failed", message=_format_missing_file_message(command, result))
             return
-        if is_getsystemcfg_command(command) and download_root and result.binary_payload:
-            saved_path = _save_getsystemcfg_file(
+        if result.transfer_interrupted:
+            _emit("command_failed", message=result.display_text)
+            return
+        if is_getsystemcfg_command(command) and download_root and (result.binary_payload or result.payload_path):
+            saved_path, digest = _save_getsystemcfg_file(
                 command,
                 result,
                 download_root=download_root,
                 device_sn=session.device.sn if session.device else "",
+                dedup=dedup,
             )
             if saved_path:
-                _emit("output", message=f"文件已下载到: {saved_path}")
+                _emit("output", message=f"文件已下载到: {saved_path}", sha256=digest)
         message = _format_command_result(command, result)
         if message:
             _emit("output", message=message)
@@ -413,12 +547,27 @@ def _handle_command(session, payload: dict):
         _STREAM_LOG_EMITTER.flush()
         _emit("command_failed", message=str(exc))
     finally:
+        if result is not None:
+            # 未保存（无下载目录 / 文件不存在 / 异常）的临时落盘文件直接清理
+            discard_spooled_file(result.payload_path)
         if not is_startlogp2p_command(command) or stream_log_level == 0:
             _STREAM_LOG_EMITTER.flush()
         _emit("command_finished")
 
 
-def _connect_with_retries(session_factory: Callable[[], object], credentials: DeviceCredentials):
+def _emit_status(message: str):
+    _emit("status", message=message)
+
+
+def _connect_with_retries(
+    session_factory: Callable[[], object],
+    credentials: DeviceCredentials,
+    status_callback: Callable[[str], None] = _emit_status,
+    timer: PhaseTimer | None = None,
+    protocol_name: str = "",
+):
+    """连接并初始化交互终端；传入 timer 时把各次尝试的阶段耗时汇总进去。"""
+    timer = timer if timer is not None else PhaseTimer()
     wakeup_failures = []
     last_connect_error = ""
 
@@ -426,13 +575,19 @@ def _connect_with_retries(session_factory: Callable[[], object], credentials: De
         for auth_retry_index in range(AUTH_RETRY_ATTEMPTS):
             session = session_factory()
             try:
-                session.connect(credentials, status_callback=lambda msg: _emit("status", message=msg))
-                init_result = session.execute_command(
-                    "syscmd start",
-                    timeout_ms=INIT_START_TIMEOUT_MS,
-                    progress_callback=None,
-                    stream_log_callback=None,
-                )
+                try:
+                    session.connect(credentials, status_callback=status_callback)
+                finally:
+                    session_timer = getattr(session, "connect_timer", None)
+                    if session_timer is not None:
+                        timer.extend(session_timer.spans(), protocol=protocol_name)
+                with timer.span("terminal_init", protocol=protocol_name):
+                    init_result = session.execute_command(
+                        "syscmd start",
+                        timeout_ms=INIT_START_TIMEOUT_MS,
+                        progress_callback=None,
+                        stream_log_callback=None,
+                    )
                 if not init_result.success and not _is_empty_start_result(init_result):
                     init_message = (init_result.display_text or _format_command_result("syscmd start", init_result)).strip()
                     raise RuntimeError(init_message or "初始化交互终端失败")
@@ -455,19 +610,125 @@ def _connect_with_retries(session_factory: Callable[[], object], credentials: De
 
                 wakeup_failures.append(f"第{attempt}轮唤醒失败")
                 if attempt < CONNECT_WAKEUP_ATTEMPTS:
-                    _emit("status", message=f"第{attempt}轮唤醒失败，准备第{attempt + 1}轮重试...")
+                    status_callback(f"第{attempt}轮唤醒失败，准备第{attempt + 1}轮重试...")
                     continue
                 raise RuntimeError("\n".join(wakeup_failures) or "唤醒失败")
 
     raise RuntimeError(last_connect_error or "登录设备失败")
 
 
+class _ProtocolRace:
+    """protocol=auto 时错峰并发尝试各协议（happy eyeballs），保留最先完成初始化的会话并关闭其余尝试。"""
+
+    def __init__(
+        self,
+        session_factories,
+        credentials: DeviceCredentials,
+        stagger_s: float = PROTOCOL_RACE_STAGGER_S,
+        timer: PhaseTimer | None = None,
+    ):
+        self._session_factories = list(session_factories)
+        self._credentials = credentials
+        self._timer = timer if timer is not None else PhaseTimer()
+        self._stagger_s = max(float(stagger_s), 0.0)
+        self._cond = threading.Condition()
+        self._winner = None
+        self._errors = {}
+
+    def run(self):
+        """返回 (protocol_name, session)；全部失败时抛出汇总后的错误。"""
+        total = len(self._session_factories)
+        for index, (protocol_name, session_factory) in enumerate(self._session_factories):
+            threading.Thread(
+                target=self._attempt,
+                args=(protocol_name, session_factory),
+                name=f"siot-connect-{protocol_name}",
+                daemon=True,
+            ).start()
+            if index == total - 1:
+                break
+            # 前一个尝试在错峰间隔内失败则立即启动下一个，成功则不再启动
+            deadline = time.monotonic() + self._stagger_s
+            with self._cond:
+                while self._winner is None and len(self._errors) <= index:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._winner is not None:
+                    break
+                if len(self._errors) <= index:
+                    _emit_status(f"{protocol_name.upper()}连接较慢，同时尝试{self._session_factories[index + 1][0].upper()}...")
+                else:
+                    _emit_status(f"{protocol_name.upper()}连接失败，正在尝试备用协议...")
+
+        started = min(index + 1, total)
+        with self._cond:
+            while self._winner is None and len(self._errors) < started:
+                self._cond.wait()
+            if self._winner is not None:
+                return self._winner
+        errors = [self._errors[name] for name, _ in self._session_factories if name in self._errors]
+        if len(errors) == 1:
+            raise RuntimeError(errors[0])
+        raise RuntimeError("\n".join(errors) or "登录设备失败")
+
+    def _attempt(self, protocol_name: str, session_factory: Callable[[], object]):
+        def guarded_factory():
+            # 已有胜出协议时不再发起新的重试
+            with self._cond:
+                if self._winner is not None:
+                    raise RuntimeError(f"{protocol_name.upper()}连接已被其他协议取代")
+            return session_factory()
+
+        def status_callback(message: str):
+            with self._cond:
+                if self._winner is not None:
+                    return
+            _emit_status(message)
+
+        try:
+            session = _connect_with_retries(
+                guarded_factory,
+                self._credentials,
+                status_callback=status_callback,
+                timer=self._timer,
+                protocol_name=protocol_name,
+            )
+        except Exception as exc:
+            with self._cond:
+                self._errors[protocol_name] = str(exc)
+                self._cond.notify_all()
+            return
+
+        with self._cond:
+            won = self._winner is None
+            if won:
+                self._winner = (protocol_name, session)
+            self._cond.notify_all()
+        if won:
+            return
+        # 连接过程中的 SDK 句柄不能跨线程关闭，落败方在自身连接结束后自行释放
+        logging.info("%s connected after another protocol won, closing", protocol_name)
+        try:
+            session.close()
+        except Exception:
+            pass
+
+
 def main():
     session = None
     connected = False
+    connect_timer = PhaseTimer()
+    timing_emitted = False
+    metrics_reporter = None
+    packet_capture = None
+    log_writer = None
 
     try:
-        _configure_runtime_logging()
+        log_writer = _configure_runtime_logging()
+        # 彻底失败的拉取留下的续传文件只有同一 SN+命令再次拉取才会清理，这里按有效期统一清掉
+        prune_transfer_spool(TRANSFER_SPOOL_DIR)
         first_line = sys.stdin.readline()
         if not first_line:
             return 1
@@ -487,6 +748,7 @@ def main():
             is_siot=device.get("is_siot"),
             protocol=str(device.get("protocol") or "").strip() or "auto",
         )
+        log_writer.bind(credentials.sn)
 
         cloud_username = str(cloud.get("username") or "").strip()
         cloud_password = str(cloud.get("password") or "").strip()
@@ -497,31 +759,48 @@ def main():
                 prefetched_cloud_credentials = CloudCredentials(**cloud_credentials_payload)
             except Exception:
                 prefetched_cloud_credentials = None
-        connect_errors = []
+        prefetched_device_status = device.get("status") if isinstance(device.get("status"), dict) else None
+        # 抓包：连接请求带 capture_dir 或设置了环境变量时，把收到的传输报文写入抓包文件供离线回放
+        capture_dir = str(first_payload.get("capture_dir") or os.environ.get(CAPTURE_ENV_VAR) or "").strip()
+        packet_capture = open_capture(capture_dir, credentials.sn)
+        # 模拟设备群：仅压测脚本在连接请求中显式携带 simulator 参数时，SDK 才由本地模拟实现替代
+        simulator = None
+        if first_payload.get("simulator"):
+            from .device_simulator import load_simulator_profile, simulated_cloud_credentials
+
+            simulator = load_simulator_profile(first_payload.get("simulator"))
+            prefetched_cloud_credentials = prefetched_cloud_credentials or simulated_cloud_credentials()
+            prefetched_device_status = None
+            _emit("status", message="模拟设备模式：SDK 由本地模拟实现替代，不连接真实设备")
+        if packet_capture is not None:
+            _emit("status", message=f"抓包写入: {packet_capture.path}")
         session_factories = _build_session_factories(
             credentials,
             cloud_username,
             cloud_password,
             prefetched_cloud_credentials=prefetched_cloud_credentials,
+            prefetched_device_status=prefetched_device_status,
+            packet_capture=packet_capture,
+            simulator=simulator,
         )
         if len(session_factories) > 1:
-            protocol_names = " -> ".join(name.upper() for name, _ in session_factories)
-            _emit("status", message=f"设备类型未明确，按 {protocol_names} 顺序尝试连接...")
-
-        for index, (protocol_name, session_factory) in enumerate(session_factories):
-            try:
-                session = _connect_with_retries(session_factory, credentials)
-                connected = True
-                _emit("connected")
-                break
-            except Exception as exc:
-                connect_errors.append(str(exc))
-                if index < len(session_factories) - 1:
-                    _emit("status", message=f"{protocol_name.upper()}连接失败，正在尝试备用协议...")
-                    continue
-                if len(connect_errors) > 1:
-                    raise RuntimeError("\n".join(connect_errors))
-                raise
+            protocol_names = " / ".join(name.upper() for name, _ in session_factories)
+            _emit("status", message=f"设备类型未明确，同时尝试 {protocol_names} 连接...")
+            protocol_name, session = _ProtocolRace(session_factories, credentials, timer=connect_timer).run()
+            if packet_capture is not None:
+                packet_capture.select(protocol_name)
+        else:
+            protocol_name, session_factory = session_factories[0]
+            session = _connect_with_retries(session_factory, credentials, timer=connect_timer, protocol_name=protocol_name)
+        connected = True
+        timing_emitted = True
+        _emit("timing", spans=connect_timer.spans(), protocol=protocol_name)
+        _emit("connected", protocol=protocol_name)
+        transport_metrics = getattr(session, "transport_metrics", None)
+        if transport_metrics is not None:
+            _STREAM_LOG_EMITTER.bind_metrics(transport_metrics)
+            metrics_reporter = _MetricsReporter(transport_metrics)
+            metrics_reporter.start()
 
         while True:
             line = sys.stdin.readline()
@@ -541,19 +820,28 @@ def main():
         return 0
     except Exception as exc:
         event = "connect_failed" if not connected else "command_failed"
+        if not connected and not timing_emitted and connect_timer.spans():
+            _emit("timing", spans=connect_timer.spans(), protocol="")
         _emit(event, message=str(exc))
         if connected:
             _emit("command_finished")
         return 1
     finally:
+        if metrics_reporter is not None:
+            metrics_reporter.stop()
         if session is not None:
             try:
                 _STREAM_LOG_EMITTER.stop(flush=True)
                 session.close()
             except Exception:
                 pass
+        if packet_capture is not None:
+            packet_capture.close()
+            logging.info("Packet capture saved: %s (%s packets)", packet_capture.path, packet_capture.packets)
         if connected:
             _emit("disconnected", message="连接已断开")
+        if log_writer is not None:
+            log_writer.close()
 
 
 if __name__ == "__main__":
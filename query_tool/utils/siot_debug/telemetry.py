@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable
+
+
+METRICS_INTERVAL_S = 1.0
+
+
+class TransportMetrics:
+    """会话级收包计数：包数、字节数、解密耗时、处理耗时与实时日志行数，均为累计值。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._packets = 0
+        self._bytes = 0
+        self._decrypt_s = 0.0
+        self._handle_s = 0.0
+        self._stream_lines = 0
+
+    def record_packet(self, size: int, decrypt_s: float = 0.0, handle_s: float = 0.0) -> None:
+        with self._lock:
+            self._packets += 1
+            self._bytes += max(int(size or 0), 0)
+            self._decrypt_s += max(decrypt_s, 0.0)
+            self._handle_s += max(handle_s, 0.0)
+
+    def record_stream_lines(self, count: int) -> None:
+        with self._lock:
+            self._stream_lines += max(int(count or 0), 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "packets": self._packets,
+                "bytes": self._bytes,
+                "decrypt_s": self._decrypt_s,
+                "handle_s": self._handle_s,
+                "stream_lines": self._stream_lines,
+            }
+
+
+class MetricsSampler:
+    """对 TransportMetrics 的累计值做差分，得到最近一个采样窗口的速率。"""
+
+    def __init__(self, metrics: TransportMetrics, clock: Callable[[], float] = time.monotonic) -> None:
+        self._metrics = metrics
+        self._clock = clock
+        self._last = metrics.snapshot()
+        self._last_at = clock()
+        self._active_s = 0.0
+
+    def sample(self) -> dict:
+        now = self._clock()
+        current = self._metrics.snapshot()
+        window_s = max(now - self._last_at, 1e-6)
+        packets = current["packets"] - self._last["packets"]
+        size = current["bytes"] - self._last["bytes"]
+        if packets > 0:
+            self._active_s += window_s
+        result = {
+            "window_s": round(window_s, 3),
+            "packets_per_s": round(packets / window_s, 1),
+            "bytes_per_s": round(size / window_s, 1),
+            "stream_lines_per_s": round((current["stream_lines"] - self._last["stream_lines"]) / window_s, 1),
+            "decrypt_ms_per_packet": round((current["decrypt_s"] - self._last["decrypt_s"]) * 1000 / packets, 3) if packets else 0.0,
+            "handle_ms_per_packet": round((current["handle_s"] - self._last["handle_s"]) * 1000 / packets, 3) if packets else 0.0,
+            "total_packets": current["packets"],
+            "total_bytes": current["bytes"],
+            "avg_bytes_per_s": round(current["bytes"] / self._active_s, 1) if self._active_s > 0 else 0.0,
+        }
+        self._last = current
+        self._last_at = now
+        return result
+
+
+def format_rate(bytes_per_s: float) -> str:
+    value = max(float(bytes_per_s or 0), 0.0)
+    if value >= 1024 * 1024:
+        return f"{value / (1024 * 1024):.2f} MB/s"
+    return f"{value / 1024:.1f} KB/s"
+
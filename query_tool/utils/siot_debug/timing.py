@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+
+CONNECT_PHASE_LABELS = {
+    "credential_lookup": "查询设备密码",
+    "cloud_credentials": "获取云凭证",
+    "status_probe": "设备状态探测",
+    "wakeup": "唤醒设备",
+    "signaling": "信令握手",
+    "query_device": "查询设备",
+    "auth": "设备认证",
+    "peer_connect": "建立数据通道",
+    "p2p_login": "P2P登录",
+    "terminal_init": "初始化终端",
+}
+HISTOGRAM_BUCKETS_MS = (100, 250, 500, 1000, 2000, 5000, 10000, 30000)
+
+
+def phase_label(phase: str) -> str:
+    return CONNECT_PHASE_LABELS.get(phase, phase)
+
+
+class PhaseTimer:
+    """记录一次连接中各阶段的耗时区间，线程安全，可被多个协议尝试共享。"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._spans: List[dict] = []
+
+    @contextmanager
+    def span(self, phase: str, protocol: str = ""):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - started_at, protocol=protocol)
+
+    def add(self, phase: str, duration_s: float, protocol: str = "") -> None:
+        span = {"phase": phase, "ms": round(max(float(duration_s), 0.0) * 1000, 1)}
+        if protocol:
+            span["protocol"] = protocol
+        with self._lock:
+            self._spans.append(span)
+
+    def extend(self, spans: Optional[Iterable[dict]], protocol: str = "") -> None:
+        for span in spans or ():
+            if not isinstance(span, dict) or not span.get("phase"):
+                continue
+            self.add(str(span["phase"]), float(span.get("ms") or 0) / 1000, protocol=span.get("protocol") or protocol)
+
+    def spans(self) -> List[dict]:
+        with self._lock:
+            return [dict(span) for span in self._spans]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+class PhaseHistogram:
+    """汇总批量设备的连接阶段耗时：每阶段的次数、分位数与分桶直方图。"""
+
+    def __init__(self, buckets_ms: Iterable[int] = HISTOGRAM_BUCKETS_MS) -> None:
+        self._buckets_ms = tuple(sorted(buckets_ms))
+        self._lock = threading.Lock()
+        self._samples: Dict[str, List[float]] = {}
+
+    def add_spans(self, spans: Optional[Iterable[dict]]) -> None:
+        with self._lock:
+            for span in spans or ():
+                if not isinstance(span, dict) or not span.get("phase"):
+                    continue
+                self._samples.setdefault(str(span["phase"]), []).append(max(float(span.get("ms") or 0), 0.0))
+
+    def summary(self) -> Dict[str, dict]:
+        with self._lock:
+            samples = {phase: sorted(values) for phase, values in self._samples.items() if values}
+        result = {}
+        for phase, values in samples.items():
+            buckets = {}
+            lower = 0
+            for upper in self._buckets_ms:
+                buckets[f"<={upper}ms"] = sum(1 for value in values if lower < value <= upper or (lower == 0 and value == 0))
+                lower = upper
+            buckets[f">{self._buckets_ms[-1]}ms"] = sum(1 for value in values if value > self._buckets_ms[-1])
+            result[phase] = {
+                "label": phase_label(phase),
+                "count": len(values),
+                "total_ms": round(sum(values), 1),
+                "p50_ms": _percentile(values, 0.5),
+                "p90_ms": _percentile(values, 0.9),
+                "max_ms": values[-1],
+                "buckets": buckets,
+            }
+        return result
+
+    def format_lines(self) -> List[str]:
+        lines = []
+        summary = self.summary()
+        for phase in sorted(summary, key=lambda name: summary[name]["total_ms"], reverse=True):
+            item = summary[phase]
+            buckets = " | ".join(f"{name} {count}" for name, count in item["buckets"].items() if count)
+            lines.append(
+                f"{item['label']}: {item['count']}次 "
+                f"p50 {_format_ms(item['p50_ms'])} p90 {_format_ms(item['p90_ms'])} "
+                f"最大 {_format_ms(item['max_ms'])}  [{buckets}]"
+            )
+        return lines
+
+
+def _percentile(sorted_values: List[float], ratio: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(ratio * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def _format_ms(value: float) -> str:
+    if value >= 1000:
+        return f"{value / 1000:.1f}s"
+    return f"{value:.0f}ms"
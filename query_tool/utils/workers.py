@@ -6,6 +6,7 @@ from PyQt5.QtCore import QObject, QThread, pyqtSignal
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from .device_query import DeviceQuery, wake_device_smart
 from .logger import logger
+from .runtime_credential_cache import publish_device_context
 from threading import Lock, Event
 
 
@@ -81,6 +82,11 @@ class QueryWorker(QObject):
                     extracted_model = version.split('-')[0].strip()
                     if extracted_model:
                         model = extracted_model
+
+                publish_device_context(
+                    self.env, self.username, self.password,
+                    sn=sn, dev_id=dev_id, device_password=password, is_siot=is_siot, model=model,
+                )
                 
                 return row, {
                     'device_name': device_name or '',
@@ -468,6 +474,13 @@ class PhoneQueryWorker(QObject):
                             extracted_model = version.split('-')[0].strip()
                             if extracted_model:
                                 model = extracted_model
+
+                    if dev_id:
+                        publish_device_context(
+                            self.env, self.username, self.password,
+                            sn=standard_sn, dev_id=dev_id, device_password=password, is_siot=is_siot,
+                            model=model if model not in ['设备不存在', '未知型号', '查询失败', '未找到'] else '',
+                        )
                     
                     return {
                         'device_name': device_name,
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from PyQt5.QtCore import Qt, QTimer, QUrl
+from PyQt5.QtGui import QDesktopServices, QKeySequence, QTextCursor
+from PyQt5.QtWidgets import (
+    QCheckBox,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QPlainTextEdit,
+    QPushButton,
+    QShortcut,
+    QSlider,
+)
+
+from .adaptive_dialog import AdaptiveDialog
+from .custom_widgets import set_dark_title_bar
+from query_tool.utils import StyleManager
+from query_tool.utils.siot_debug.output_spool import SPOOL_PAGE_BYTES, SPOOL_SEARCH_CHUNK_BYTES, SpooledOutput
+from query_tool.utils.theme_manager import t
+
+
+SLIDER_STEPS = 1000
+# 跳转到搜索结果时在匹配行之前保留的上下文字节数
+SEARCH_CONTEXT_BYTES = 2048
+
+
+def _format_size(size: int) -> str:
+    if size >= 1024 * 1024:
+        return f"{size / 1024 / 1024:.1f} MB"
+    return f"{size / 1024:.1f} KB"
+
+
+class LargeOutputViewerDialog(AdaptiveDialog):
+    """分页查看落盘的大段命令输出：只解码当前一页，搜索在后台分段推进，界面不会卡住。"""
+
+    def __init__(self, path: Path, title: str = "", parent=None):
+        super().__init__(parent)
+        self._output = SpooledOutput(path)
+        self._page_start = 0
+        self._page_end = 0
+        self._search = None
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(0)
+        self._search_timer.timeout.connect(self._search_step)
+        self.setWindowTitle(f"完整输出 - {title}" if title else "完整输出")
+        self.setWindowFlags(Qt.Dialog | Qt.WindowCloseButtonHint | Qt.WindowMaximizeButtonHint)
+        self.setAttribute(Qt.WA_DeleteOnClose, True)
+        self.init_ui()
+        self.load_page(0)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        set_dark_title_bar(self)
+
+    def closeEvent(self, event):
+        self._search_timer.stop()
+        self._search = None
+        self._output.close()
+        super().closeEvent(event)
+
+    def init_ui(self):
+        layout = self.init_dialog_layout(
+            (960, 640),
+            min_size=(640, 360),
+            layout_margins=(14, 14, 14, 14),
+            spacing=8,
+        )
+
+        search_layout = QHBoxLayout()
+        search_layout.setSpacing(8)
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("查找内容，回车查找下一个")
+        self.search_input.returnPressed.connect(lambda: self.start_search(backwards=False))
+        self.case_checkbox = QCheckBox("区分大小写")
+        self.prev_match_btn = self._create_button("上一个", lambda: self.start_search(backwards=True))
+        self.next_match_btn = self._create_button("下一个", lambda: self.start_search(backwards=False))
+        self.search_status_label = QLabel("")
+        self.search_status_label.setStyleSheet(f"color: {t('text_hint')}; border: none;")
+        search_layout.addWidget(self.search_input, 1)
+        search_layout.addWidget(self.case_checkbox)
+        search_layout.addWidget(self.prev_match_btn)
+        search_layout.addWidget(self.next_match_btn)
+        search_layout.addWidget(self.search_status_label)
+        layout.addLayout(search_layout)
+
+        self.text_view = QPlainTextEdit()
+        self.text_view.setReadOnly(True)
+        self.text_view.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.text_view.setUndoRedoEnabled(False)
+        self.text_view.setStyleSheet(StyleManager.get_PLAINTEXT_EDIT_TABLE())
+        layout.addWidget(self.text_view, 1)
+
+        page_layout = QHBoxLayout()
+        page_layout.setSpacing(8)
+        self.prev_page_btn = self._create_button("上一页", self.on_prev_page_clicked)
+        self.next_page_btn = self._create_button("下一页", self.on_next_page_clicked)
+        self.position_slider = QSlider(Qt.Horizontal)
+        self.position_slider.setRange(0, SLIDER_STEPS)
+        self.position_slider.setTracking(False)
+        self.position_slider.valueChanged.connect(self.on_position_changed)
+        self.page_label = QLabel("")
+        self.page_label.setStyleSheet(f"color: {t('text_hint')}; border: none;")
+        self.open_file_btn = self._create_button("打开文件", self.on_open_file_clicked)
+        page_layout.addWidget(self.prev_page_btn)
+        page_layout.addWidget(self.next_page_btn)
+        page_layout.addWidget(self.position_slider, 1)
+        page_layout.addWidget(self.page_label)
+        page_layout.addWidget(self.open_file_btn)
+        layout.addLayout(page_layout)
+
+        QShortcut(QKeySequence.Find, self, activated=self.search_input.setFocus)
+        QShortcut(QKeySequence.FindNext, self, activated=lambda: self.start_search(backwards=False))
+        QShortcut(QKeySequence.FindPrevious, self, activated=lambda: self.start_search(backwards=True))
+
+    def _create_button(self, text: str, handler):
+        button = QPushButton(text)
+        button.setStyleSheet(StyleManager.get_ACTION_BUTTON())
+        button.clicked.connect(handler)
+        return button
+
+    def load_page(self, offset: int):
+        self._page_start, self._page_end, text = self._output.read_page(offset, SPOOL_PAGE_BYTES)
+        self.text_view.setPlainText(text)
+        self.prev_page_btn.setEnabled(self._page_start > 0)
+        self.next_page_btn.setEnabled(self._page_end < self._output.size)
+        self.page_label.setText(
+            f"{_format_size(self._page_start)} - {_format_size(self._page_end)} / {_format_size(self._output.size)}"
+        )
+        self.position_slider.blockSignals(True)
+        self.position_slider.setValue(
+            int(self._page_start * SLIDER_STEPS / self._output.size) if self._output.size else 0
+        )
+        self.position_slider.blockSignals(False)
+
+    def on_prev_page_clicked(self):
+        self.load_page(self._output.previous_page_offset(self._page_start, SPOOL_PAGE_BYTES))
+        self.text_view.moveCursor(QTextCursor.End)
+
+    def on_next_page_clicked(self):
+        if self._page_end < self._output.size:
+            self.load_page(self._page_end)
+
+    def on_position_changed(self, value: int):
+        self.load_page(self._output.size * value // SLIDER_STEPS)
+
+    def on_open_file_clicked(self):
+        QDesktopServices.openUrl(QUrl.fromLocalFile(str(self._output.path)))
+
+    def start_search(self, backwards: bool = False):
+        query = self.search_input.text()
+        if not query:
+            return
+        cursor = self.text_view.textCursor()
+        if cursor.hasSelection():
+            anchor = self._page_start + len(self.text_view.toPlainText()[: cursor.selectionStart()].encode("utf-8"))
+            origin = anchor if backwards else anchor + 1
+        else:
+            origin = self._page_start + len(self.text_view.toPlainText()[: cursor.position()].encode("utf-8"))
+        self._search = {
+            "query": query,
+            "case_sensitive": self.case_checkbox.isChecked(),
+            "backwards": backwards,
+            "origin": origin,
+            "position": origin,
+            "wrapped": False,
+        }
+        self.search_status_label.setText("搜索中...")
+        self._search_timer.start()
+
+    def _search_step(self):
+        """每次只扫描一段，再把控制权交回事件循环。"""
+        state = self._search
+        if state is None:
+            return
+        size = self._output.size
+        if state["backwards"]:
+            lower = 0 if not state["wrapped"] else state["origin"]
+            start = max(state["position"] - SPOOL_SEARCH_CHUNK_BYTES, lower)
+            hit = self._output.rfind(state["query"], start, state["position"], state["case_sensitive"])
+            state["position"] = start
+            exhausted = start <= lower
+            scanned = (state["origin"] - start) if not state["wrapped"] else state["origin"] + size - start
+        else:
+            upper = size if not state["wrapped"] else state["origin"]
+            end = min(state["position"] + SPOOL_SEARCH_CHUNK_BYTES, upper)
+            hit = self._output.find(state["query"], state["position"], end, state["case_sensitive"])
+            state["position"] = end
+            exhausted = end >= upper
+            scanned = (end - state["origin"]) if not state["wrapped"] else size - state["origin"] + end
+
+        if hit >= 0:
+            self._search = None
+            self.search_status_label.setText("已从另一端继续查找" if state["wrapped"] else "")
+            self._show_match(hit, state["query"])
+            return
+        if exhausted:
+            if state["wrapped"]:
+                self._search = None
+                self.search_status_label.setText("未找到")
+                return
+            state["wrapped"] = True
+            state["position"] = size if state["backwards"] else 0
+        if size:
+            self.search_status_label.setText(f"搜索中 {min(scanned * 100 // size, 100)}%")
+        self._search_timer.start()
+
+    def _show_match(self, offset: int, query: str):
+        match_bytes = len(query.encode("utf-8"))
+        if not (self._page_start <= offset and offset + match_bytes <= self._page_end):
+            self.load_page(max(offset - SEARCH_CONTEXT_BYTES, 0))
+        start = len(self._output.decode(self._page_start, offset))
+        length = len(self._output.decode(offset, offset + match_bytes))
+        cursor = self.text_view.textCursor()
+        cursor.setPosition(start)
+        cursor.setPosition(start + length, QTextCursor.KeepAnchor)
+        self.text_view.setTextCursor(cursor)
+        self.text_view.centerCursor()
@@ -0,0 +1,186 @@
+"""
+SIOT/P2P 模拟设备群压测
+用进程内模拟 SDK 替代真实设备，驱动日志页的批量拉取线程（每台设备一个 runner 子进程），
+按不同并发数统计吞吐（台/分钟、MB/s）与各连接阶段耗时分布，无需真实设备、SDK 与云端账号
+
+用法:
+    python scripts/bench_siot_fleet.py
+    python scripts/bench_siot_fleet.py --devices 200 --concurrency 20,50,100
+    python scripts/bench_siot_fleet.py --protocol p2p --sleeping-rate 0.2 --wakeup-failure-rate 0.1
+    python scripts/bench_siot_fleet.py --profile '{"file_size": 8388608, "packet_interval_s": 0}'
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from PyQt5.QtCore import Qt  # noqa: E402
+
+from query_tool.pages import log_page  # noqa: E402
+from query_tool.utils.siot_debug import LaneScheduler  # noqa: E402
+from query_tool.utils.siot_debug.connect_payload import (  # noqa: E402
+    CloudCredentialPrefetcher,
+    DeviceStatusPrefetcher,
+)
+from query_tool.utils.siot_debug.device_simulator import (  # noqa: E402
+    SimulatorProfile,
+    simulated_cloud_credentials,
+    simulated_device_credentials,
+)
+
+_PROFILE_OPTIONS = (
+    "connect_latency_s",
+    "status_latency_s",
+    "auth_latency_s",
+    "peer_latency_s",
+    "wakeup_delay_s",
+    "command_latency_s",
+    "packet_interval_s",
+    "file_size",
+    "text_lines",
+    "sleeping_rate",
+    "offline_rate",
+    "wakeup_failure_rate",
+    "auth_failure_rate",
+    "file_missing_rate",
+    "seed",
+)
+
+
+class _SimulatedCloudPrefetcher(CloudCredentialPrefetcher):
+    def _prefetch(self) -> None:
+        self._credentials = simulated_cloud_credentials()
+
+
+class _SimulatedStatusPrefetcher(DeviceStatusPrefetcher):
+    def __init__(self, sn_list, cloud_prefetcher, profile: SimulatorProfile) -> None:
+        super().__init__(sn_list, cloud_prefetcher)
+        self._profile = profile
+
+    def _probe(self, sns):
+        time.sleep(self._profile.status_latency_s)
+        probed_at = time.time()
+        return {sn: {**self._profile.cloud_status(sn), "probed_at": probed_at} for sn in sns}
+
+
+def _install_page_stubs(profile: SimulatorProfile) -> None:
+    """日志页在主进程里查设备密码、记录协议，压测时改为返回模拟凭据，并在连接请求中启用模拟 SDK。"""
+    log_page.resolve_device_credentials = lambda sn, *args, **kwargs: (
+        simulated_device_credentials(sn, profile.protocol),
+        None,
+    )
+    log_page.prefetch_device_credentials = lambda *args, **kwargs: {}
+    log_page.record_device_protocol = lambda *args, **kwargs: None
+    build_connect_payload = log_page.build_connect_payload
+
+    # runner 子进程只认连接请求里显式携带的 simulator 参数，据此加载模拟 SDK
+    def build_simulated_connect_payload(**kwargs):
+        return {**build_connect_payload(**kwargs), "simulator": profile.to_dict()}
+
+    log_page.build_connect_payload = build_simulated_connect_payload
+
+
+def _build_profile(args) -> SimulatorProfile:
+    payload = json.loads(args.profile) if args.profile else {}
+    payload["protocol"] = args.protocol
+    for name in _PROFILE_OPTIONS:
+        value = getattr(args, name)
+        if value is not None:
+            payload[name] = value
+    return SimulatorProfile.from_dict(payload)
+
+
+def _directory_bytes(root: Path) -> int:
+    return sum(path.stat().st_size for path in root.rglob("*") if path.is_file())
+
+
+def _run_round(args, profile: SimulatorProfile, concurrency: int, download_root: Path) -> dict:
+    sn_list = [f"SIM{index:06d}" for index in range(args.devices)]
+    thread = log_page.BatchLogFetchThread(
+        sn_list,
+        args.commands,
+        str(download_root),
+        "simulator",
+        "admin",
+        "simulator",
+        "simulator",
+        "simulator",
+        max_workers=concurrency,
+        dedup_storage=args.dedup,
+        archive_output=args.archive,
+    )
+    thread._cloud_prefetcher = _SimulatedCloudPrefetcher("simulator", "simulator")
+    thread._status_prefetcher = _SimulatedStatusPrefetcher(sn_list, thread._cloud_prefetcher, profile)
+    if not args.retry:
+        thread._scheduler = LaneScheduler(concurrency, thread._scheduler._limits["sleeper"], retry_backoff_s=())
+
+    result = {}
+    statuses = {}
+    thread.summary_ready.connect(result.update, Qt.DirectConnection)
+    thread.error_signal.connect(lambda message: result.setdefault("error", message), Qt.DirectConnection)
+    thread.device_updated.connect(lambda item: statuses.__setitem__(item.get("sn"), item.get("status")), Qt.DirectConnection)
+    started_at = time.perf_counter()
+    # 直接在当前线程执行 run()，信号以 DirectConnection 同步回调，无需事件循环
+    thread.run()
+    result["elapsed_s"] = time.perf_counter() - started_at
+    result["bytes"] = _directory_bytes(download_root)
+    result["final_statuses"] = statuses
+    return result
+
+
+def _print_round(concurrency: int, result: dict) -> None:
+    elapsed = max(result["elapsed_s"], 1e-6)
+    done = result.get("success_devices", 0) + result.get("partial_devices", 0)
+    print(
+        f"并发 {concurrency}: {elapsed:.1f} 秒，完成 {done}/{result.get('total', 0)} 台"
+        f"（部分完成 {result.get('partial_devices', 0)}，失败 {result.get('failed_devices', 0)}，"
+        f"自动重试 {result.get('auto_retried', 0)}），"
+        f"{done * 60 / elapsed:.1f} 台/分钟，{result['bytes'] / 1024 / 1024 / elapsed:.2f} MB/s"
+    )
+    if result.get("error"):
+        print(f"  批量拉取异常: {result['error']}")
+    for line in result.get("phase_timing_lines") or []:
+        print(f"  {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SIOT/P2P 模拟设备群压测（日志页批量拉取）")
+    parser.add_argument("--devices", type=int, default=50, help="模拟设备数量")
+    parser.add_argument("--concurrency", default="20", help="并发数，逗号分隔时依次压测，如 20,50,100")
+    parser.add_argument("--protocol", choices=("siot", "p2p"), default="siot")
+    parser.add_argument(
+        "--commands",
+        nargs="+",
+        default=["GetSystemCfg /mnt/log/messages", "syscmd free"],
+        help="每台设备执行的命令",
+    )
+    parser.add_argument("--profile", default="", help="SimulatorProfile 参数 JSON，单项参数优先")
+    for name in _PROFILE_OPTIONS:
+        value_type = int if name in ("file_size", "text_lines", "seed") else float
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, type=value_type, default=None)
+    parser.add_argument("--output", default="", help="下载目录，默认使用临时目录并在结束后删除")
+    parser.add_argument("--dedup", action="store_true", help="启用内容寻址存储")
+    parser.add_argument("--archive", action="store_true", help="启用批次归档")
+    parser.add_argument("--retry", action="store_true", help="保留批次末尾的自动重试（默认关闭，避免退避等待计入耗时）")
+    args = parser.parse_args()
+
+    profile = _build_profile(args)
+    _install_page_stubs(profile)
+    concurrency_list = [int(item) for item in str(args.concurrency).split(",") if item.strip()]
+    print(f"模拟设备 {args.devices} 台，协议 {profile.protocol}，文件 {profile.file_size / 1024:.0f} KB，命令 {args.commands}")
+
+    with tempfile.TemporaryDirectory(prefix="siot-fleet-") as temp_dir:
+        base = Path(args.output).expanduser() if args.output else Path(temp_dir)
+        for concurrency in concurrency_list:
+            download_root = base / f"c{concurrency}_{time.strftime('%H%M%S')}"
+            download_root.mkdir(parents=True, exist_ok=True)
+            _print_round(concurrency, _run_round(args, profile, concurrency, download_root))
+
+
+if __name__ == "__main__":
+    main()
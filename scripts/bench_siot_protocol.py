@@ -0,0 +1,209 @@
+"""
+SIOT 调试协议解析微基准
+对比逐字段正则解析（旧实现）与预编译单次扫描解析（parse_device_payload）的耗时，
+以及每包新建缓冲与会话级复用缓冲（CryptBuffer）的解密开销
+
+用法:
+    python scripts/bench_siot_protocol.py
+    python scripts/bench_siot_protocol.py --packets captures/ --rounds 20000
+    python scripts/bench_siot_protocol.py --crypt --megabytes 64
+"""
+import argparse
+import ctypes
+import re
+import struct
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from query_tool.utils.siot_debug.protocol import (  # noqa: E402
+    HEADER_ENCRYPT_FLAG,
+    CryptBuffer,
+    parse_device_payload,
+    unpack_message,
+)
+
+_CRYPT_FN = ctypes.CFUNCTYPE(
+    ctypes.c_int,
+    ctypes.c_int,
+    ctypes.c_void_p,
+    ctypes.c_int,
+    ctypes.c_void_p,
+    ctypes.c_int,
+    ctypes.c_char_p,
+)
+
+
+def _identity_crypt(method, source, source_len, output, output_len, key):
+    ctypes.memmove(output, source, source_len)
+    return source_len
+
+
+class _IdentityCryptLib:
+    """以内存拷贝代替真实加解密，只衡量缓冲分配与拷贝开销"""
+    TpsProtocolEncode = _CRYPT_FN(_identity_crypt)
+    TpsProtocolDecode = _CRYPT_FN(_identity_crypt)
+
+
+def _legacy_decode_text(raw: bytes) -> str:
+    for encoding in ("utf-8", "gb18030", "latin-1"):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return raw.decode("utf-8", errors="replace")
+
+
+def _legacy_attr(xml: str, element: str, attr: str) -> str:
+    pattern = re.compile(rf"<{element}\b[^>]*\b{attr}=\"([^\"]*)\"", re.IGNORECASE | re.DOTALL)
+    match = pattern.search(xml)
+    return match.group(1) if match else ""
+
+
+def _legacy_element(xml: str, element: str) -> str:
+    pattern = re.compile(rf"<{element}\b[^>]*>(.*?)</{element}>", re.IGNORECASE | re.DOTALL)
+    match = pattern.search(xml)
+    return match.group(1).strip() if match else ""
+
+
+def _legacy_parse(data: bytes) -> dict:
+    xml_start = data.find(b"<?xml")
+    if xml_start < 0:
+        xml_start = data.find(b"<XML_TOPSEE>")
+    xml_end = data.find(b"</XML_TOPSEE>", max(xml_start, 0))
+    if xml_start < 0 or xml_end < 0:
+        xml_text, tail = _legacy_decode_text(data), b""
+    else:
+        xml_end += len(b"</XML_TOPSEE>")
+        xml_text = _legacy_decode_text(data[xml_start:xml_end])
+        tail = data[xml_end:]
+        if tail.startswith(b"\x00\x00\x00\x00"):
+            tail = tail[4:]
+    response_param = _legacy_element(xml_text, "RESPONSE_PARAM")
+    data_len = int(_legacy_attr(xml_text, "POS", "DataLen") or "0")
+    return {
+        "message_type": _legacy_attr(xml_text, "MESSAGE_HEADER", "Msg_type"),
+        "msg_code": _legacy_attr(xml_text, "MESSAGE_HEADER", "Msg_code"),
+        "msg_flag": _legacy_attr(xml_text, "MESSAGE_HEADER", "Msg_flag"),
+        "response_param": response_param,
+        "message_body": _legacy_element(xml_text, "MESSAGE_BODY"),
+        "resp_str": re.findall(r'RespStr="([^"]*)"', response_param or xml_text),
+        "filename": _legacy_attr(xml_text, "POS", "Filename"),
+        "start_pos": int(_legacy_attr(xml_text, "POS", "StartPos") or "0"),
+        "binary_payload": tail[:data_len] if data_len > 0 else b"",
+    }
+
+
+def _sample_packets() -> list:
+    """构造典型报文：文件分片、实时日志、命令文本应答"""
+    chunk = bytes(range(256)) * 64
+    data_packet = (
+        '<?xml version="1.0" encoding="GB2312" ?>\n<XML_TOPSEE>\n'
+        '  <MESSAGE_HEADER Msg_type="SYSTEM_LOG_DATA" Msg_code="1" Msg_flag="0"/>\n'
+        '  <MESSAGE_BODY>\n'
+        f'    <POS Filename="config.bin" StartPos="65536" DataLen="{len(chunk)}"/>\n'
+        '  </MESSAGE_BODY>\n</XML_TOPSEE>'
+    ).encode("ascii") + b"\x00\x00\x00\x00" + chunk
+    stream_log = (
+        '<?xml version="1.0" encoding="GB2312" ?>\n<XML_TOPSEE>\n'
+        '  <MESSAGE_HEADER Msg_type="SYSTEM_LOG_MESSAGE" Msg_code="1" Msg_flag="0"/>\n'
+        '  <MESSAGE_BODY>\n'
+        '    <RESPONSE_PARAM RespStr="[main] 12:00:01.123 video encoder restart, bitrate=2048kbps"/>\n'
+        '  </MESSAGE_BODY>\n</XML_TOPSEE>'
+    ).encode("ascii")
+    text_reply = (
+        '<?xml version="1.0" encoding="GB2312" ?>\n<XML_TOPSEE>\n'
+        '  <MESSAGE_HEADER Msg_type="SYSTEM_LOG_MESSAGE" Msg_code="1" Msg_flag="0"/>\n'
+        '  <MESSAGE_BODY>\n'
+        '    <RESPONSE_PARAM RespStr="Mem: 61440K used, 4096K free"/>\n'
+        '    <RESPONSE_PARAM RespStr="CPU:  12% usr   3% sys   0% nic  84% idle"/>\n'
+        '  </MESSAGE_BODY>\n</XML_TOPSEE>'
+    ).encode("gb2312")
+    return [data_packet, stream_log, text_reply]
+
+
+def _load_packets(packet_dir: str) -> list:
+    packets = [path.read_bytes() for path in sorted(Path(packet_dir).glob("*.bin"))]
+    if not packets:
+        raise SystemExit(f"目录中没有 .bin 报文: {packet_dir}")
+    return packets
+
+
+def _measure(parse, packets: list, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for packet in packets:
+            parse(packet)
+    return time.perf_counter() - start
+
+
+def _legacy_unpack(data: bytes, crypt_lib) -> bytes:
+    body = data[12: 12 + struct.unpack_from("<II", data, 0)[1]]
+    buffer = ctypes.create_string_buffer(max(len(body) * 2, 1024))
+    result_len = crypt_lib.TpsProtocolDecode(1, ctypes.c_char_p(body), len(body), buffer, len(buffer), b"key")
+    return bytes(buffer[:result_len])
+
+
+def _measure_crypt(unpack, packet: bytes, count: int) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(count):
+        unpack(packet)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def run_crypt_benchmark(megabytes: int, packet_size: int):
+    crypt_lib = _IdentityCryptLib()
+    body = bytes(range(256)) * (packet_size // 256)
+    packet = struct.pack("<IIBxxx", HEADER_ENCRYPT_FLAG, len(body), 0x01) + body
+    count = max(megabytes * 1024 * 1024 // len(body), 1)
+    crypt_buffer = CryptBuffer()
+
+    legacy_s, legacy_peak = _measure_crypt(lambda data: _legacy_unpack(data, crypt_lib), packet, count)
+    current_s, current_peak = _measure_crypt(
+        lambda data: unpack_message(data, method=1, key=b"key", crypt_lib=crypt_lib, crypt_buffer=crypt_buffer),
+        packet,
+        count,
+    )
+
+    print(f"解密报文: {count} 个 x {len(body)} 字节，共 {megabytes} MB")
+    print(f"每包新建缓冲: {legacy_s * 1000 / megabytes:.2f} ms/MB，缓冲分配 {count} 次，峰值 {legacy_peak / 1024:.0f} KB")
+    print(
+        f"复用缓冲:     {current_s * 1000 / megabytes:.2f} ms/MB，"
+        f"缓冲分配 {crypt_buffer.allocations} 次，峰值 {current_peak / 1024:.0f} KB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SIOT 协议解析微基准")
+    parser.add_argument("--packets", help="抓包目录，每个报文一个 .bin 文件（已解密的明文报文）")
+    parser.add_argument("--rounds", type=int, default=10000, help="每个报文的解析轮数")
+    parser.add_argument("--crypt", action="store_true", help="改为测试加密报文解包的缓冲分配开销")
+    parser.add_argument("--megabytes", type=int, default=32, help="--crypt 模式下解包的数据量")
+    parser.add_argument("--packet-size", type=int, default=16 * 1024, help="--crypt 模式下单包大小")
+    args = parser.parse_args()
+
+    if args.crypt:
+        run_crypt_benchmark(args.megabytes, args.packet_size)
+        return
+
+    packets = _load_packets(args.packets) if args.packets else _sample_packets()
+    total = len(packets) * args.rounds
+    legacy_s = _measure(_legacy_parse, packets, args.rounds)
+    current_s = _measure(parse_device_payload, packets, args.rounds)
+
+    print(f"报文数: {len(packets)}，总解析次数: {total}")
+    print(f"旧实现:   {legacy_s:.3f}s  ({total / legacy_s:,.0f} 包/秒)")
+    print(f"当前实现: {current_s:.3f}s  ({total / current_s:,.0f} 包/秒)")
+    print(f"加速比:   {legacy_s / current_s:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+SIOT runner 日志归并
+每个 runner 子进程写自己的日志文件（~/.TPQueryTool/logs/siot_runs/<SN>_<时间>_<pid>.log），
+排查并发问题时用本脚本按时间归并成一个文件，每条记录前标注来源文件
+
+用法:
+    python scripts/merge_siot_run_logs.py
+    python scripts/merge_siot_run_logs.py --sn SN123 --since "2026-01-01 12:00:00"
+    python scripts/merge_siot_run_logs.py --output merged.log
+"""
+import argparse
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from query_tool.utils.siot_debug.config import RUN_LOG_DIR, RUN_LOG_PATH  # noqa: E402
+from query_tool.utils.siot_debug.run_logging import RUN_LOG_SUFFIX, merge_run_logs  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按时间归并 SIOT runner 日志")
+    parser.add_argument("--directory", default=str(RUN_LOG_DIR), help="runner 日志目录")
+    parser.add_argument("--sn", nargs="*", default=[], help="只归并这些 SN 的日志")
+    parser.add_argument("--since", default="", help="只保留该时间之后的记录，格式 YYYY-MM-DD HH:MM:SS")
+    parser.add_argument("--output", default=str(RUN_LOG_PATH), help="归并输出文件")
+    args = parser.parse_args()
+
+    prefixes = tuple(f"{sn.strip()}_" for sn in args.sn if sn.strip())
+    paths = sorted(
+        path
+        for path in Path(args.directory).expanduser().glob(f"*{RUN_LOG_SUFFIX}")
+        if not prefixes or path.name.startswith(prefixes)
+    )
+    if not paths:
+        raise SystemExit(f"没有找到 runner 日志: {args.directory}")
+    written = merge_run_logs(paths, Path(args.output), since=args.since)
+    print(f"已归并 {len(paths)} 个文件、{written} 条记录到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+SIOT/P2P 抓包回放
+把 runner 抓包模式录下的 .siotcap 文件喂回离线会话对象（恒等假加解密库），
+统计接收路径（解包、解析、_CommandWaiter.feed）的吞吐，无需真实设备与 SDK
+
+用法:
+    python scripts/replay_siot_capture.py captures/SN123_20260101_120000.siotcap
+    python scripts/replay_siot_capture.py capture.siotcap --command "GetSystemCfg /tmp/log.tgz" --rounds 20
+    python scripts/replay_siot_capture.py capture.siotcap --speed 1
+    python scripts/replay_siot_capture.py --synthetic --megabytes 64
+"""
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from query_tool.utils.siot_debug.capture_replay import (  # noqa: E402
+    attach_waiter,
+    capture_protocol,
+    create_replay_session,
+    replay_packets,
+    synthetic_file_packets,
+)
+from query_tool.utils.siot_debug.command_catalog import is_getsystemcfg_command  # noqa: E402
+from query_tool.utils.siot_debug.packet_capture import load_capture  # noqa: E402
+
+
+def _load_packets(args) -> list:
+    if args.synthetic:
+        data = os.urandom(256 * 1024) * max(args.megabytes * 4, 1)
+        return synthetic_file_packets("synthetic.bin", data, args.chunk_size)
+    if not args.capture:
+        raise SystemExit("请指定抓包文件，或使用 --synthetic")
+    packets = load_capture(args.capture)
+    if not packets:
+        raise SystemExit(f"抓包文件中没有报文: {args.capture}")
+    return packets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SIOT/P2P 抓包回放与接收路径基准")
+    parser.add_argument("capture", nargs="?", help="runner 抓包模式生成的 .siotcap 文件")
+    parser.add_argument("--command", default="", help="回放时挂上的命令等待器，GetSystemCfg 命令按文件传输处理")
+    parser.add_argument("--speed", type=float, default=0.0, help="回放速度倍率，0 为全速（默认），1 为按录制间隔")
+    parser.add_argument("--rounds", type=int, default=1, help="回放轮数，每轮使用新的会话对象")
+    parser.add_argument("--synthetic", action="store_true", help="不读抓包文件，改用合成的文件传输报文")
+    parser.add_argument("--megabytes", type=int, default=16, help="--synthetic 模式下传输的数据量")
+    parser.add_argument("--chunk-size", type=int, default=16 * 1024, help="--synthetic 模式下单包数据大小")
+    parser.add_argument("--verbose", action="store_true", help="输出会话日志（默认关闭，避免日志开销影响计时）")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    packets = _load_packets(args)
+    try:
+        protocol = capture_protocol(packets)
+    except ValueError as exc:
+        raise SystemExit(f"{exc}: {args.capture}")
+    command = args.command or ("GetSystemCfg synthetic.bin" if args.synthetic else "")
+    print(f"报文数: {len(packets)}，共 {sum(len(p.payload) for p in packets) / 1024 / 1024:.2f} MB，会话类型: {protocol}")
+
+    total_s = 0.0
+    for round_index in range(max(args.rounds, 1)):
+        session = create_replay_session(protocol)
+        waiter = attach_waiter(session, command, expects_file=is_getsystemcfg_command(command)) if command else None
+        stats = replay_packets(session, packets, speed=args.speed)
+        total_s += stats.elapsed_s
+        metrics = session.transport_metrics.snapshot()
+        line = (
+            f"第 {round_index + 1} 轮: {stats.elapsed_s * 1000:.1f} ms，{stats.packets_per_s:,.0f} 包/秒，"
+            f"{stats.megabytes_per_s:.1f} MB/s，解包 {metrics['decrypt_s'] * 1000:.1f} ms"
+        )
+        if waiter is not None:
+            line += f"，等待器状态 {waiter.state}，收到 {waiter.received_bytes} 字节 / {len(waiter.text_parts)} 段文本"
+        print(line)
+    print(f"平均每轮: {total_s * 1000 / max(args.rounds, 1):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
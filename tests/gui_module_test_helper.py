@@ -284,10 +284,14 @@ def _install_debug_page_stubs(originals):
     siot_debug_stub = types.ModuleType("query_tool.utils.siot_debug")
     siot_debug_stub.DEFAULT_COMMAND_TIMEOUT_MS = 1000
     siot_debug_stub.SiotDebugWorker = type("SiotDebugWorker", (), {})
+    siot_debug_stub.format_rate = lambda *_args, **_kwargs: ""
     siot_debug_stub.is_getsystemcfg_command = lambda *_args, **_kwargs: False
     siot_debug_stub.is_startlogp2p_command = lambda *_args, **_kwargs: False
     siot_debug_stub.is_syscmd_family_command = lambda *_args, **_kwargs: False
     siot_debug_stub.parse_startlogp2p_level = lambda *_args, **_kwargs: None
+    siot_debug_stub.prune_output_spool = lambda *_args, **_kwargs: 0
+    siot_debug_stub.should_spool_output = lambda *_args, **_kwargs: False
+    siot_debug_stub.spool_output = lambda *_args, **_kwargs: None
     _swap_module("query_tool.utils.siot_debug", siot_debug_stub, originals)
 
     adaptive_dialog_stub = types.ModuleType("query_tool.widgets.adaptive_dialog")
@@ -309,14 +313,51 @@ def _install_log_page_stubs(originals):
 
     siot_debug_stub = types.ModuleType("query_tool.utils.siot_debug")
     siot_debug_stub.DEFAULT_COMMAND_TIMEOUT_MS = 1000
+    siot_debug_stub.BatchArchiveWriter = type("BatchArchiveWriter", (), {})
     siot_debug_stub.CloudCredentialPrefetcher = type("CloudCredentialPrefetcher", (), {})
+    siot_debug_stub.CommandOutputGrouper = type("CommandOutputGrouper", (), {})
+    siot_debug_stub.DeviceStatusPrefetcher = type("DeviceStatusPrefetcher", (), {})
+    siot_debug_stub.LaneScheduler = type("LaneScheduler", (), {})
+    siot_debug_stub.LogIndex = type("LogIndex", (), {})
+    siot_debug_stub.LogIndexer = type(
+        "LogIndexer",
+        (),
+        {
+            "__init__": lambda self, root: None,
+            "enqueue": lambda self, path: None,
+            "close": lambda self, timeout=None: None,
+        },
+    )
+    siot_debug_stub.PhaseHistogram = type(
+        "PhaseHistogram",
+        (),
+        {
+            "add_spans": lambda self, spans: None,
+            "summary": lambda self: {},
+            "format_lines": lambda self: [],
+        },
+    )
+    siot_debug_stub.ContentStore = type("ContentStore", (), {})
+    siot_debug_stub.PooledRunner = type("PooledRunner", (), {})
+    siot_debug_stub.SLEEPER_LANE_LIMIT = 1
     siot_debug_stub.build_connect_payload = lambda *args, **kwargs: {}
+    siot_debug_stub.compare_device_files = lambda *args, **kwargs: {}
+    siot_debug_stub.format_comparison_lines = lambda *args, **kwargs: []
+    siot_debug_stub.format_rate = lambda *_args, **_kwargs: ""
     siot_debug_stub.is_getsystemcfg_command = lambda *_args, **_kwargs: False
     siot_debug_stub.is_syscmd_family_command = lambda *_args, **_kwargs: False
+    siot_debug_stub.get_session_pool = lambda: types.SimpleNamespace(
+        close_all=lambda *args, **kwargs: None,
+        contains=lambda *args, **kwargs: False,
+        set_idle_s=lambda *args, **kwargs: None,
+    )
+    siot_debug_stub.save_comparison_report = lambda *args, **kwargs: None
     _swap_module("query_tool.utils.siot_debug", siot_debug_stub, originals)
 
     service_stub = types.ModuleType("query_tool.utils.siot_debug.service")
     service_stub.resolve_device_credentials = lambda *args, **kwargs: ({}, None)
+    service_stub.record_device_protocol = lambda *args, **kwargs: None
+    service_stub.prefetch_device_credentials = lambda *args, **kwargs: {}
     _swap_module("query_tool.utils.siot_debug.service", service_stub, originals)
 
     widgets_stub = types.ModuleType("query_tool.widgets")
@@ -0,0 +1,80 @@
+import unittest
+
+from PyQt5.QtWidgets import QApplication
+
+from query_tool.pages.debug_page import DebugConsoleEdit
+
+
+class DebugConsoleRenderingTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        self.console = DebugConsoleEdit()
+        self.console.set_input_enabled(True)
+        self.rebuilds = 0
+        rebuild = self.console._rebuild_document_with_scroll_restore
+
+        def counting_rebuild():
+            self.rebuilds += 1
+            rebuild()
+
+        self.console._rebuild_document_with_scroll_restore = counting_rebuild
+
+    def tearDown(self):
+        self.console.deleteLater()
+
+    def test_append_past_max_entries_trims_leading_blocks_like_full_rebuild(self):
+        self.console.MAX_ENTRIES = 5
+        for index in range(8):
+            self.console.append_message(f"line {index}")
+        self.console.set_current_input("free -m")
+        appended = self.console.toPlainText()
+
+        self.console._rebuild_document()
+
+        self.assertEqual(appended, self.console.toPlainText())
+        self.assertEqual(6, self.console.document().blockCount())
+        self.assertNotIn("line 2", appended)
+        self.assertIn("line 3", appended)
+        self.assertEqual("free -m", self.console.current_input())
+
+    def test_update_progress_rewrites_block_in_place_and_keeps_typed_input(self):
+        self.console.update_progress("download", "已接收 10%")
+        self.console.append_message("other output")
+        self.console.set_current_input("syscmd free")
+
+        self.console.update_progress("download", "已接收 55%")
+
+        text = self.console.toPlainText()
+        self.assertEqual(0, self.rebuilds)
+        self.assertIn("已接收 55%", text)
+        self.assertNotIn("已接收 10%", text)
+        self.assertEqual("syscmd free", self.console.current_input())
+        self.assertEqual(3, self.console.document().blockCount())
+
+        self.console.append_message("done")
+        self.console.update_progress("download", "已接收 100%")
+        self.assertEqual(0, self.rebuilds)
+        self.assertEqual("syscmd free", self.console.current_input())
+        rendered = self.console.toPlainText()
+        self.console._rebuild_document()
+        self.assertEqual(rendered, self.console.toPlainText())
+
+    def test_update_progress_falls_back_to_rebuild_when_block_was_trimmed(self):
+        self.console.MAX_STREAM_LOG_BLOCKS = 3
+        self.console.update_progress("download", "已接收 10%")
+        self.console.append_stream_log_batch("\n".join(f"serial {index}" for index in range(5)))
+        self.console.set_current_input("syscmd free")
+        self.assertNotIn("已接收 10%", self.console.toPlainText())
+
+        self.console.update_progress("download", "已接收 80%")
+
+        self.assertEqual(1, self.rebuilds)
+        self.assertIn("已接收 80%", self.console.toPlainText())
+        self.assertEqual("syscmd free", self.console.current_input())
+
+
+if __name__ == "__main__":
+    unittest.main()
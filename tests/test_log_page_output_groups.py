@@ -0,0 +1,62 @@
+import unittest
+from types import SimpleNamespace
+
+from tests.gui_module_test_helper import load_log_page
+
+
+LogPage = load_log_page()
+
+
+class _FakeGrouper:
+    def __init__(self):
+        self.version = 0
+
+    def snapshot(self):
+        return {"syscmd uptime": [{"index": 1, "devices": ["SN1"], "sample": "up 1 day"}]}
+
+
+class _FakeDetailView:
+    def __init__(self):
+        self.html_updates = 0
+
+    def setHtml(self, html):
+        self.html_updates += 1
+
+
+class LogPageOutputGroupRenderTests(unittest.TestCase):
+    def _make_page(self, grouper):
+        page = SimpleNamespace(
+            OUTPUT_GROUP_SHOWN_DEVICES=LogPage.OUTPUT_GROUP_SHOWN_DEVICES,
+            OUTPUT_GROUP_SAMPLE_CHARS=LogPage.OUTPUT_GROUP_SAMPLE_CHARS,
+            _output_groups=grouper,
+            _rendered_output_groups=None,
+            detail_view=_FakeDetailView(),
+        )
+        page._render_output_groups = lambda: LogPage._render_output_groups(page)
+        return page
+
+    def test_refresh_skips_render_until_groups_change(self):
+        grouper = _FakeGrouper()
+        page = self._make_page(grouper)
+
+        for _ in range(5):
+            LogPage._refresh_output_groups(page)
+        self.assertEqual(1, page.detail_view.html_updates)
+
+        grouper.version += 1
+        LogPage._refresh_output_groups(page)
+        LogPage._refresh_output_groups(page)
+        self.assertEqual(2, page.detail_view.html_updates)
+
+    def test_new_batch_grouper_is_rendered_even_at_same_version(self):
+        page = self._make_page(_FakeGrouper())
+        LogPage._refresh_output_groups(page)
+
+        page._output_groups = _FakeGrouper()
+        LogPage._refresh_output_groups(page)
+
+        self.assertEqual(2, page.detail_view.html_updates)
+
+
+if __name__ == "__main__":
+    unittest.main()
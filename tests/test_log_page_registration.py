@@ -0,0 +1,16 @@
+import unittest
+
+from query_tool.pages.log_page import LogPage, LogSearchThread
+from query_tool.pages.page_registry import PageRegistry
+
+
+class LogPageRegistrationTests(unittest.TestCase):
+    def test_command_menu_entry_creates_log_page(self):
+        entries = [page for page in PageRegistry.get_all_pages() if page["name"] == "命令"]
+
+        self.assertEqual([LogPage], [page["class"] for page in entries])
+        self.assertNotIn(LogSearchThread, [page["class"] for page in PageRegistry.get_all_pages()])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -93,11 +93,16 @@ class LogPageResetResultsTests(unittest.TestCase):
             result_selection_label=_FakeLabel(text="已选 1 / 2"),
             retry_btn=_FakeButton(enabled=True),
             reset_btn=_FakeButton(enabled=True),
+            output_groups_btn=_FakeButton(enabled=True),
+            export_groups_btn=_FakeButton(enabled=True),
+            _output_groups=object(),
+            _showing_output_groups=True,
             _selected_result_rows=lambda: [],
             _get_selected_retryable_sns=lambda: [],
             _apply_result_column_widths=lambda: None,
         )
         page._update_result_selection_state = lambda: LogPage._update_result_selection_state(page)
+        page._update_output_group_buttons = lambda: LogPage._update_output_group_buttons(page)
 
         LogPage._reset_result_view(page)
 
@@ -117,6 +122,10 @@ class LogPageResetResultsTests(unittest.TestCase):
         self.assertEqual("未选择设备", page.result_selection_label.text)
         self.assertFalse(page.retry_btn.enabled)
         self.assertFalse(page.reset_btn.enabled)
+        self.assertIsNone(page._output_groups)
+        self.assertFalse(page._showing_output_groups)
+        self.assertFalse(page.output_groups_btn.enabled)
+        self.assertFalse(page.export_groups_btn.enabled)
 
     def test_update_result_selection_state_enables_reset_when_has_results(self):
         page = SimpleNamespace(
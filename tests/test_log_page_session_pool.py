@@ -0,0 +1,123 @@
+import io
+import queue
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from query_tool.pages import log_page
+from query_tool.pages.log_page import BatchLogFetchThread
+from query_tool.utils.siot_debug import PooledRunner
+
+
+class _FakeProcess:
+    def __init__(self):
+        self.stdin = io.BytesIO()
+        self.returncode = None
+        self.killed = False
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        self.returncode = 0
+        return 0
+
+    def terminate(self):
+        self.killed = True
+        self.returncode = -15
+
+    def kill(self):
+        self.killed = True
+        self.returncode = -9
+
+
+class _FakePool:
+    def __init__(self, runner):
+        self.runner = runner
+        self.released = []
+
+    def acquire(self, sn, env):
+        runner, self.runner = self.runner, None
+        return runner
+
+    def release(self, runner):
+        self.released.append(runner)
+        return True
+
+
+class BatchLogFetchSessionPoolTests(unittest.TestCase):
+    def _make_thread(self, pool, run_command, commands=("syscmd free",)):
+        thread = BatchLogFetchThread(
+            ["SN001"],
+            list(commands),
+            tempfile.gettempdir(),
+            "prod",
+            "admin",
+            "",
+            "",
+            "",
+            session_pool=pool,
+        )
+        thread._run_command = run_command
+        thread._send_payload = lambda process, payload: None
+        thread._drain_until_disconnected = lambda event_queue, timeout_s: None
+        return thread
+
+    def test_pooled_runner_that_times_out_is_killed_instead_of_released(self):
+        runner = PooledRunner("SN001", "prod", _FakeProcess(), queue.Queue())
+        pool = _FakePool(runner)
+
+        def run_command(process, event_queue, command, metrics_callback=None):
+            if command == "syscmd uptime":
+                raise RuntimeError("命令执行超时")
+            return {"success": True, "message": "ok", "output": "ok"}
+
+        thread = self._make_thread(pool, run_command, commands=("syscmd free", "syscmd uptime"))
+        result = thread._process_single_device("SN001")
+
+        self.assertEqual("部分完成", result["status"])
+        self.assertEqual([], pool.released)
+        self.assertTrue(runner.process.killed)
+
+    def test_pooled_runner_is_released_after_commands_succeed(self):
+        runner = PooledRunner("SN001", "prod", _FakeProcess(), queue.Queue())
+        pool = _FakePool(runner)
+
+        def run_command(process, event_queue, command, metrics_callback=None):
+            return {"success": True, "message": "ok", "output": "ok"}
+
+        result = self._make_thread(pool, run_command)._process_single_device("SN001")
+
+        self.assertEqual("完成", result["status"])
+        self.assertEqual([runner], pool.released)
+        self.assertFalse(runner.process.killed)
+
+    def test_stale_pooled_runner_is_discarded_and_device_reconnects(self):
+        stale = PooledRunner("SN001", "prod", _FakeProcess(), queue.Queue())
+        fresh_process = _FakeProcess()
+        pool = _FakePool(stale)
+        used_processes = []
+
+        def run_command(process, event_queue, command, metrics_callback=None):
+            used_processes.append(process)
+            if process is stale.process:
+                raise RuntimeError("连接已断开")
+            return {"success": True, "message": "ok", "output": "ok"}
+
+        thread = self._make_thread(pool, run_command)
+        thread._start_process = lambda credentials, **kwargs: (fresh_process, queue.Queue())
+        thread._wait_for_connect = lambda event_queue, **kwargs: "p2p"
+        credentials = SimpleNamespace(sn="SN001", protocol="p2p")
+        with mock.patch.object(log_page, "resolve_device_credentials", return_value=(credentials, None)):
+            result = thread._process_single_device("SN001")
+
+        self.assertEqual("完成", result["status"])
+        self.assertEqual([stale.process, fresh_process], used_processes)
+        self.assertTrue(stale.process.killed)
+        self.assertEqual(1, len(pool.released))
+        self.assertIs(fresh_process, pool.released[0].process)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import importlib.util
+import subprocess
+import sys
+import tempfile
+import types
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+REPLAY_SCRIPT = REPO_ROOT / "scripts" / "replay_siot_capture.py"
+# 屏蔽 winreg，模拟在 Linux/CI 上运行回放脚本
+_RUN_WITHOUT_WINREG = (
+    "import runpy, sys; sys.modules['winreg'] = None; sys.argv = sys.argv[1:]; "
+    "runpy.run_path(sys.argv[0], run_name='__main__')"
+)
+
+
+def _ensure_test_packages():
+    import query_tool
+
+    if "query_tool.utils" not in sys.modules:
+        utils_pkg = types.ModuleType("query_tool.utils")
+        utils_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils")]
+        sys.modules["query_tool.utils"] = utils_pkg
+
+    if "query_tool.utils.device_query" not in sys.modules:
+        device_query_stub = types.ModuleType("query_tool.utils.device_query")
+
+        class DeviceQuery:
+            def __init__(self, *args, **kwargs):
+                self.init_error = None
+
+        device_query_stub.DeviceQuery = DeviceQuery
+        sys.modules["query_tool.utils.device_query"] = device_query_stub
+
+    if "query_tool.utils.siot_debug" not in sys.modules:
+        siot_debug_pkg = types.ModuleType("query_tool.utils.siot_debug")
+        siot_debug_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils" / "siot_debug")]
+        sys.modules["query_tool.utils.siot_debug"] = siot_debug_pkg
+
+
+def _load_module(module_name: str, relative_path: str):
+    _ensure_test_packages()
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    module_path = REPO_ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+packet_capture = _load_module(
+    "query_tool.utils.siot_debug.packet_capture",
+    "query_tool/utils/siot_debug/packet_capture.py",
+)
+capture_replay = _load_module(
+    "query_tool.utils.siot_debug.capture_replay",
+    "query_tool/utils/siot_debug/capture_replay.py",
+)
+
+
+class ReplayScriptTests(unittest.TestCase):
+    def _write_capture(self, directory: Path, packets) -> Path:
+        path = directory / "SN001.siotcap"
+        capture = packet_capture.PacketCapture(path)
+        for packet in packets:
+            capture.record(packet.source, packet.payload)
+        capture.close()
+        return path
+
+    def _run_replay(self, *args):
+        return subprocess.run(
+            [sys.executable, "-c", _RUN_WITHOUT_WINREG, str(REPLAY_SCRIPT), *args],
+            cwd=str(REPO_ROOT),
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+            timeout=120,
+        )
+
+    def test_replays_synthetic_capture_without_winreg(self):
+        packets = capture_replay.synthetic_file_packets("config.bin", bytes(range(256)) * 64, chunk_size=4096)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = self._write_capture(Path(temp_dir), packets)
+
+            result = self._run_replay(str(path), "--command", "GetSystemCfg config.bin", "--rounds", "2")
+
+        self.assertEqual(0, result.returncode, result.stderr)
+        self.assertIn(f"报文数: {len(packets)}", result.stdout)
+        self.assertIn("会话类型: siot", result.stdout)
+        self.assertIn("等待器状态 file，收到 16384 字节", result.stdout)
+        self.assertIn("第 2 轮", result.stdout)
+
+    def test_mixed_capture_exits_with_clear_error(self):
+        frames = capture_replay.synthetic_text_packets(["Mem: 61440K used"])
+        mixed = frames + [packet_capture.CapturedPacket(1.0, "p2p_log", b"<XML_TOPSEE/>")]
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = self._write_capture(Path(temp_dir), mixed)
+
+            result = self._run_replay(str(path))
+
+        self.assertNotEqual(0, result.returncode)
+        self.assertIn("同时包含 SIOT 与 P2P 报文", result.stderr)
+        self.assertNotIn("Traceback", result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
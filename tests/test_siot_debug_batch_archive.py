@@ -0,0 +1,129 @@
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import tarfile
+import tempfile
+import sys
+import types
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _ensure_test_packages():
+    import query_tool
+
+    if "query_tool.utils" not in sys.modules:
+        utils_pkg = types.ModuleType("query_tool.utils")
+        utils_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils")]
+        sys.modules["query_tool.utils"] = utils_pkg
+
+    if "query_tool.utils.device_query" not in sys.modules:
+        device_query_stub = types.ModuleType("query_tool.utils.device_query")
+
+        class DeviceQuery:
+            def __init__(self, *args, **kwargs):
+                self.init_error = None
+
+        device_query_stub.DeviceQuery = DeviceQuery
+        sys.modules["query_tool.utils.device_query"] = device_query_stub
+
+    if "query_tool.utils.siot_debug" not in sys.modules:
+        siot_debug_pkg = types.ModuleType("query_tool.utils.siot_debug")
+        siot_debug_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils" / "siot_debug")]
+        sys.modules["query_tool.utils.siot_debug"] = siot_debug_pkg
+
+
+def _load_module(module_name: str, relative_path: str):
+    _ensure_test_packages()
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    module_path = REPO_ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+
+batch_archive = _load_module(
+    "query_tool.utils.siot_debug.batch_archive",
+    "query_tool/utils/siot_debug/batch_archive.py",
+)
+
+
+def _read_archive(path: Path) -> dict:
+    data = path.read_bytes()
+    if batch_archive.zstandard is not None:
+        data = batch_archive.zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)).read()
+        mode = "r:"
+    else:
+        mode = "r:gz"
+    with tarfile.open(fileobj=io.BytesIO(data), mode=mode) as tar:
+        return {member.name: tar.extractfile(member).read() for member in tar.getmembers() if member.isfile()}
+
+
+class BatchArchiveWriterTests(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self._temp_dir.name)
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def _write(self, sn: str, name: str, payload: bytes) -> Path:
+        path = self.root / sn / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(payload)
+        return path
+
+    def test_devices_are_appended_with_manifest_at_the_end(self):
+        first = self._write("SN001", "sys.cfg", b"a=1\n")
+        second = self.root / "SN002" / "sys.cfg"
+        second.parent.mkdir()
+        os.link(first, second)
+        writer = batch_archive.BatchArchiveWriter(self.root, "batch")
+
+        writer.add_device("SN001", "完成", [str(first)])
+        writer.add_device("SN002", "完成", [str(second)])
+        writer.add_device("SN003", "设备离线", [], "设备离线")
+        archive_path = writer.close()
+
+        members = _read_archive(archive_path)
+        self.assertEqual(members["SN001/sys.cfg"], b"a=1\n")
+        self.assertEqual(members["SN002/sys.cfg"], b"a=1\n")
+        manifest = json.loads(members[batch_archive.ARCHIVE_MANIFEST_NAME])
+        self.assertEqual([device["sn"] for device in manifest["devices"]], ["SN001", "SN002", "SN003"])
+        self.assertEqual(manifest["devices"][1]["files"][0]["sha256"], hashlib.sha256(b"a=1\n").hexdigest())
+        self.assertEqual(manifest["devices"][2]["status"], "设备离线")
+        self.assertEqual(json.loads(writer.manifest_path.read_text(encoding="utf-8")), manifest)
+
+    def test_missing_file_is_recorded_without_breaking_archive(self):
+        kept = self._write("SN001", "kept.log", b"ok")
+        writer = batch_archive.BatchArchiveWriter(self.root, "batch")
+
+        writer.add_device("SN001", "部分完成", [str(self.root / "SN001" / "gone.log"), str(kept)])
+        archive_path = writer.close(cancelled=True)
+
+        members = _read_archive(archive_path)
+        manifest = json.loads(members[batch_archive.ARCHIVE_MANIFEST_NAME])
+        self.assertTrue(manifest["cancelled"])
+        self.assertIn("error", manifest["devices"][0]["files"][0])
+        self.assertEqual(members["SN001/kept.log"], b"ok")
+
+    def test_close_without_devices_creates_nothing(self):
+        writer = batch_archive.BatchArchiveWriter(self.root, "batch")
+
+        self.assertIsNone(writer.close())
+        self.assertFalse(writer.path.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
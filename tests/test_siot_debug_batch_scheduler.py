@@ -0,0 +1,131 @@
+import importlib.util
+import sys
+import types
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _ensure_test_packages():
+    import query_tool
+
+    if "query_tool.utils" not in sys.modules:
+        utils_pkg = types.ModuleType("query_tool.utils")
+        utils_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils")]
+        sys.modules["query_tool.utils"] = utils_pkg
+
+    if "query_tool.utils.device_query" not in sys.modules:
+        device_query_stub = types.ModuleType("query_tool.utils.device_query")
+
+        class DeviceQuery:
+            def __init__(self, *args, **kwargs):
+                self.init_error = None
+
+        device_query_stub.DeviceQuery = DeviceQuery
+        sys.modules["query_tool.utils.device_query"] = device_query_stub
+
+    if "query_tool.utils.siot_debug" not in sys.modules:
+        siot_debug_pkg = types.ModuleType("query_tool.utils.siot_debug")
+        siot_debug_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils" / "siot_debug")]
+        sys.modules["query_tool.utils.siot_debug"] = siot_debug_pkg
+
+
+def _load_module(module_name: str, relative_path: str):
+    _ensure_test_packages()
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    module_path = REPO_ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+
+batch_scheduler = _load_module(
+    "query_tool.utils.siot_debug.batch_scheduler",
+    "query_tool/utils/siot_debug/batch_scheduler.py",
+)
+
+ONLINE = {"online": 1}
+SLEEPING = {"online": 0, "online4g": 1}
+OFFLINE = {"online": 0, "online4g": 0}
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _drain(scheduler):
+    items = []
+    while True:
+        item = scheduler.next_ready()
+        if item is None:
+            return items
+        items.append(item)
+
+
+class LaneSchedulerTests(unittest.TestCase):
+    def test_online_devices_run_first_and_sleepers_use_their_own_lane(self):
+        scheduler = batch_scheduler.LaneScheduler(online_limit=2, sleeper_limit=1)
+        scheduler.add("SN_OFF", OFFLINE)
+        scheduler.add("SN_UNKNOWN", None)
+        scheduler.add("SN_SLEEP1", SLEEPING)
+        scheduler.add("SN_SLEEP2", SLEEPING)
+        scheduler.add("SN_ON", ONLINE)
+
+        self.assertEqual(
+            [("SN_ON", "online"), ("SN_UNKNOWN", "online"), ("SN_SLEEP1", "sleeper")],
+            _drain(scheduler),
+        )
+        scheduler.finish("SN_ON", "online", retryable=False)
+        self.assertEqual([("SN_OFF", "online")], _drain(scheduler))
+
+    def test_transient_failures_are_retried_after_main_queue_with_backoff(self):
+        clock = _Clock()
+        scheduler = batch_scheduler.LaneScheduler(
+            online_limit=1,
+            sleeper_limit=1,
+            retry_backoff_s=(10.0,),
+            clock=clock,
+        )
+        scheduler.add("SN001", OFFLINE)
+        scheduler.add("SN002", ONLINE)
+        scheduler.close_input()
+
+        self.assertEqual([("SN002", "online")], _drain(scheduler))
+        self.assertIsNone(scheduler.finish("SN002", "online", retryable=False))
+        self.assertEqual([("SN001", "online")], _drain(scheduler))
+        self.assertEqual(10.0, scheduler.finish("SN001", "online", retryable=True))
+
+        self.assertEqual([], _drain(scheduler))
+        clock.now = 10.0
+        self.assertEqual([("SN001", "online")], _drain(scheduler))
+        self.assertEqual(2, scheduler.attempts("SN001"))
+        self.assertIsNone(scheduler.finish("SN001", "online", retryable=True))
+        self.assertFalse(scheduler.has_work())
+
+    def test_retries_wait_until_input_is_closed(self):
+        clock = _Clock()
+        scheduler = batch_scheduler.LaneScheduler(online_limit=2, retry_backoff_s=(0.0,), clock=clock)
+        scheduler.add("SN001", ONLINE)
+        _drain(scheduler)
+        scheduler.finish("SN001", "online", retryable=True)
+
+        self.assertEqual([], _drain(scheduler))
+        self.assertTrue(scheduler.has_work())
+        scheduler.close_input()
+        self.assertEqual([("SN001", "online")], _drain(scheduler))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import importlib.util
+import sys
+import threading
+import time
+import types
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _ensure_test_packages():
+    import query_tool
+
+    if "query_tool.utils" not in sys.modules:
+        utils_pkg = types.ModuleType("query_tool.utils")
+        utils_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils")]
+        sys.modules["query_tool.utils"] = utils_pkg
+
+    if "query_tool.utils.device_query" not in sys.modules:
+        device_query_stub = types.ModuleType("query_tool.utils.device_query")
+
+        class DeviceQuery:
+            def __init__(self, *args, **kwargs):
+                self.init_error = None
+
+        device_query_stub.DeviceQuery = DeviceQuery
+        sys.modules["query_tool.utils.device_query"] = device_query_stub
+
+    if "query_tool.utils.siot_debug" not in sys.modules:
+        siot_debug_pkg = types.ModuleType("query_tool.utils.siot_debug")
+        siot_debug_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils" / "siot_debug")]
+        sys.modules["query_tool.utils.siot_debug"] = siot_debug_pkg
+
+
+def _load_module(module_name: str, relative_path: str):
+    _ensure_test_packages()
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    module_path = REPO_ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+models = _load_module("query_tool.utils.siot_debug.models", "query_tool/utils/siot_debug/models.py")
+session = _load_module("query_tool.utils.siot_debug.session", "query_tool/utils/siot_debug/session.py")
+ParsedPayload = models.ParsedPayload
+
+
+def _text_packet(text: str, msg_flag: str = "0") -> ParsedPayload:
+    return ParsedPayload(message_type="SYSTEM_LOG_MESSAGE", msg_flag=msg_flag, resp_str=text)
+
+
+def _feed_later(waiter, payloads, delay_s: float = 0.02):
+    def run():
+        for payload in payloads:
+            time.sleep(delay_s)
+            waiter.feed(payload)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+class CommandWaiterCompletionTests(unittest.TestCase):
+    def test_ack_only_completes_after_ack_settle(self):
+        waiter = session._CommandWaiter(command="syscmd ls", command_kind="system_log")
+        _feed_later(waiter, [ParsedPayload(message_type="SYSTEM_LOG_MESSAGE", msg_flag="0")])
+
+        started = time.monotonic()
+        completed = waiter.wait_for_completion(5.0, ack_settle_s=0.05)
+
+        self.assertTrue(completed)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(session.WAITER_STATE_DONE, waiter.state)
+        self.assertTrue(waiter.build_result().acknowledged)
+
+    def test_text_settle_adapts_to_observed_packet_gap(self):
+        waiter = session._CommandWaiter(command="syscmd ls", command_kind="system_log", gap_estimate=0.001)
+
+        self.assertEqual(session.MIN_RESULT_SETTLE_S, waiter.text_settle_s())
+        self.assertEqual(
+            session.DEFAULT_TEXT_RESULT_SETTLE_S,
+            session._CommandWaiter(command="syscmd ls", command_kind="system_log").text_settle_s(),
+        )
+
+    def test_multi_packet_text_is_collected_before_completion(self):
+        waiter = session._CommandWaiter(command="syscmd ls", command_kind="system_log")
+        _feed_later(waiter, [_text_packet("line1"), _text_packet("line2")], delay_s=0.01)
+
+        self.assertTrue(waiter.wait_for_completion(5.0))
+
+        self.assertEqual("line1\nline2", waiter.build_result().display_text)
+        self.assertIsNotNone(waiter.gap_estimate)
+
+    def test_file_command_text_reply_is_terminal(self):
+        waiter = session._CommandWaiter(
+            command="GetSystemCfg /tmp/missing.bin",
+            command_kind="system_log",
+            expects_file=True,
+        )
+        waiter.feed(_text_packet("file fail"))
+
+        started = time.monotonic()
+        self.assertTrue(waiter.wait_for_completion(5.0))
+        self.assertLess(time.monotonic() - started, 0.05)
+
+    def test_transport_error_wakes_waiter(self):
+        waiter = session._CommandWaiter(command="syscmd ls", command_kind="system_log")
+        threading.Timer(0.02, waiter.set_transport_error, args=("连接已断开",)).start()
+
+        started = time.monotonic()
+        self.assertTrue(waiter.wait_for_completion(5.0))
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_timeout_marks_started_transfer_interrupted(self):
+        waiter = session._CommandWaiter(
+            command="GetSystemCfg /tmp/config.bin",
+            command_kind="system_log",
+            expects_file=True,
+        )
+        waiter.feed(
+            ParsedPayload(
+                message_type="SYSTEM_LOG_DATA",
+                filename="config.bin",
+                start_pos=0,
+                data_len=3,
+                binary_payload=b"abc",
+            )
+        )
+
+        self.assertFalse(waiter.wait_for_completion(0.05, file_idle_s=10.0))
+
+        self.assertEqual(session.WAITER_STATE_TIMED_OUT, waiter.state)
+        self.assertTrue(waiter.transfer_interrupted())
+        waiter.feed(_text_packet("late"))
+        self.assertEqual([], waiter.text_parts)
+
+
+if __name__ == "__main__":
+    unittest.main()
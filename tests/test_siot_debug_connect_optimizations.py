@@ -1,5 +1,7 @@
 import importlib.util
 import sys
+import threading
+import time
 import types
 import unittest
 from pathlib import Path
@@ -88,6 +90,7 @@ subprocess_runner = _load_module(
     "query_tool.utils.siot_debug.subprocess_runner",
     "query_tool/utils/siot_debug/subprocess_runner.py",
 )
+timing = _load_module("query_tool.utils.siot_debug.timing", "query_tool/utils/siot_debug/timing.py")
 
 CloudCredentials = models.CloudCredentials
 CommandResult = models.CommandResult
@@ -182,6 +185,66 @@ class _FakeConnectSession:
         return None
 
 
+class _RaceSession(_FakeConnectSession):
+    def __init__(self, delay_s=0.0, error=""):
+        super().__init__()
+        self.delay_s = delay_s
+        self.error = error
+        self.closed = threading.Event()
+
+    def connect(self, credentials, status_callback=None):
+        super().connect(credentials, status_callback)
+        time.sleep(self.delay_s)
+        if self.error:
+            raise RuntimeError(self.error)
+
+    def close(self):
+        self.closed.set()
+
+
+class _TimedSession(_FakeConnectSession):
+    def __init__(self, error=""):
+        super().__init__()
+        self.error = error
+        self.connect_timer = timing.PhaseTimer()
+
+    def connect(self, credentials, status_callback=None):
+        super().connect(credentials, status_callback)
+        self.connect_timer.add("signaling", 0.12)
+        if self.error:
+            raise RuntimeError(self.error)
+        self.connect_timer.add("peer_connect", 0.3)
+
+
+class _UnknownPlatformQuery(_FakeQuery):
+    def is_siot_platform_device(self, dev_id=None, sn=None):
+        return None
+
+
+class _BulkQuery(_FakeQuery):
+    def __init__(self):
+        self.platform_checks = []
+        self.password_calls = 0
+        self.lock = threading.Lock()
+
+    def get_device_info(self, dev_sn=None, dev_id=None):
+        if dev_sn == "MISSING":
+            return {"data": {"records": []}}
+        return {"data": {"records": [{"devId": f"DEV-{dev_sn}", "devSN": dev_sn}]}}
+
+    def check_siot_platform(self, dev_ids):
+        self.platform_checks.append(list(dev_ids))
+        return {dev_id: dev_id.endswith("1") for dev_id in dev_ids}
+
+    def is_siot_platform_device(self, dev_id=None, sn=None):
+        raise AssertionError("prefetched devices should not be checked one by one")
+
+    def get_cloud_password(self, dev_id):
+        with self.lock:
+            self.password_calls += 1
+        return f"pwd-{dev_id}"
+
+
 class SiotDebugConnectOptimizationTests(unittest.TestCase):
     def test_build_connect_payload_includes_prefetched_credentials(self):
         credentials = DeviceCredentials(
@@ -310,6 +373,171 @@ class SiotDebugConnectOptimizationTests(unittest.TestCase):
         self.assertEqual(1, fake_session.connect_calls)
         self.assertEqual(1, fake_session.execute_calls)
 
+    def _auto_credentials(self):
+        return DeviceCredentials(
+            sn="SN001",
+            username="admin",
+            password="device-password",
+            dev_id="DEV001",
+            is_siot=None,
+            protocol="auto",
+        )
+
+    def test_protocol_race_keeps_first_connected_session_and_closes_loser(self):
+        slow_siot = _RaceSession(delay_s=0.3)
+        fast_p2p = _RaceSession()
+        factories = [("siot", lambda: slow_siot), ("p2p", lambda: fast_p2p)]
+
+        with mock.patch.object(subprocess_runner, "_emit"):
+            race = subprocess_runner._ProtocolRace(factories, self._auto_credentials(), stagger_s=0.05)
+            protocol_name, returned = race.run()
+            self.assertTrue(slow_siot.closed.wait(2.0))
+
+        self.assertEqual("p2p", protocol_name)
+        self.assertIs(fast_p2p, returned)
+        self.assertFalse(fast_p2p.closed.is_set())
+
+    def test_protocol_race_starts_fallback_immediately_when_first_attempt_fails(self):
+        failing_siot = _RaceSession(error="signaling failed")
+        p2p = _RaceSession()
+        factories = [("siot", lambda: failing_siot), ("p2p", lambda: p2p)]
+
+        started_at = time.monotonic()
+        with mock.patch.object(subprocess_runner, "_emit"):
+            protocol_name, returned = subprocess_runner._ProtocolRace(
+                factories,
+                self._auto_credentials(),
+                stagger_s=5.0,
+            ).run()
+
+        self.assertLess(time.monotonic() - started_at, 2.0)
+        self.assertEqual("p2p", protocol_name)
+        self.assertIs(p2p, returned)
+
+    def test_protocol_race_reports_all_errors_when_every_protocol_fails(self):
+        factories = [
+            ("siot", lambda: _RaceSession(error="signaling failed")),
+            ("p2p", lambda: _RaceSession(error="p2p failed")),
+        ]
+
+        with mock.patch.object(subprocess_runner, "_emit"):
+            race = subprocess_runner._ProtocolRace(factories, self._auto_credentials(), stagger_s=0.0)
+            with self.assertRaises(RuntimeError) as ctx:
+                race.run()
+
+        self.assertEqual("signaling failed\np2p failed", str(ctx.exception))
+
+    def test_connect_with_retries_collects_session_phase_spans(self):
+        timer = timing.PhaseTimer()
+
+        subprocess_runner._connect_with_retries(
+            lambda: _TimedSession(),
+            self._auto_credentials(),
+            timer=timer,
+            protocol_name="siot",
+        )
+
+        spans = timer.spans()
+        self.assertEqual(["signaling", "peer_connect", "terminal_init"], [span["phase"] for span in spans])
+        self.assertEqual({"siot"}, {span["protocol"] for span in spans})
+        self.assertEqual(120.0, spans[0]["ms"])
+
+        failed_timer = timing.PhaseTimer()
+        with self.assertRaises(RuntimeError):
+            subprocess_runner._connect_with_retries(
+                lambda: _TimedSession(error="signaling failed"),
+                self._auto_credentials(),
+                timer=failed_timer,
+            )
+        self.assertEqual(["signaling"], [span["phase"] for span in failed_timer.spans()])
+
+    def test_phase_histogram_summarizes_percentiles_and_buckets(self):
+        histogram = timing.PhaseHistogram()
+        histogram.add_spans([{"phase": "signaling", "ms": value} for value in (80, 300, 450, 1200, 40000)])
+        histogram.add_spans([{"phase": "auth", "ms": 50}, {"ms": 10}, "bad"])
+
+        summary = histogram.summary()
+
+        self.assertEqual({"signaling", "auth"}, set(summary))
+        signaling = summary["signaling"]
+        self.assertEqual(5, signaling["count"])
+        self.assertEqual(450, signaling["p50_ms"])
+        self.assertEqual(40000, signaling["p90_ms"])
+        self.assertEqual(1, signaling["buckets"]["<=100ms"])
+        self.assertEqual(2, signaling["buckets"]["<=500ms"])
+        self.assertEqual(1, signaling["buckets"][">30000ms"])
+        self.assertEqual("信令握手", signaling["label"])
+        self.assertTrue(histogram.format_lines()[0].startswith("信令握手: 5次"))
+
+    def test_prefetch_device_credentials_fills_cache_with_chunked_platform_checks(self):
+        service._DEVICE_CONTEXT_CACHE.clear()
+        self.addCleanup(service._DEVICE_CONTEXT_CACHE.clear)
+        query = _BulkQuery()
+
+        with mock.patch.object(service, "get_shared_device_query", return_value=query):
+            errors = service.prefetch_device_credentials(
+                ["SN1", "SN2", "SN3", "MISSING", "sn1"],
+                "prod",
+                "user",
+                "pass",
+                chunk_size=2,
+            )
+            credentials, context = service.resolve_device_credentials("SN1", "prod", "user", "pass")
+            p2p_credentials, _ = service.resolve_device_credentials("SN2", "prod", "user", "pass")
+
+        self.assertEqual(["MISSING"], list(errors))
+        self.assertEqual([2, 1], [len(chunk) for chunk in query.platform_checks])
+        self.assertEqual(3, query.password_calls)
+        self.assertEqual("pwd-DEV-SN1", credentials.password)
+        self.assertEqual("siot", context["protocol"])
+        self.assertEqual("p2p", p2p_credentials.protocol)
+
+    def test_resolve_uses_published_device_page_context_without_queries(self):
+        service._DEVICE_CONTEXT_CACHE.clear()
+        self.addCleanup(service._DEVICE_CONTEXT_CACHE.clear)
+        runtime_cache = sys.modules[service.load_device_context.__module__]
+        runtime_cache.publish_device_context(
+            "prod",
+            "user",
+            "pass",
+            sn="PUB001",
+            dev_id="DEV-PUB",
+            device_password="published-pwd",
+            is_siot=False,
+            model="TS8864G",
+        )
+        # 后续部分失败的查询不应覆盖已知字段
+        runtime_cache.publish_device_context("prod", "user", "pass", sn="pub001", device_password="")
+
+        with mock.patch.object(service, "get_shared_device_query", side_effect=AssertionError("should not query")):
+            credentials, context = service.resolve_device_credentials("pub001", "prod", "user", "pass")
+            errors = service.prefetch_device_credentials(["PUB001"], "prod", "user", "pass")
+
+        self.assertEqual({}, errors)
+        self.assertEqual("published-pwd", credentials.password)
+        self.assertEqual("DEV-PUB", credentials.dev_id)
+        self.assertEqual("p2p", credentials.protocol)
+        self.assertEqual("TS8864G", context["model"])
+
+    def test_recorded_race_winner_is_used_for_next_resolve(self):
+        service._DEVICE_CONTEXT_CACHE.clear()
+        service._PROTOCOL_HINT_CACHE.clear()
+        self.addCleanup(service._DEVICE_CONTEXT_CACHE.clear)
+        self.addCleanup(service._PROTOCOL_HINT_CACHE.clear)
+
+        with mock.patch.object(service, "get_shared_device_query", return_value=_UnknownPlatformQuery()):
+            credentials, _ = service.resolve_device_credentials("SN001", "prod", "user", "pass")
+            self.assertEqual("auto", credentials.protocol)
+
+            service.record_device_protocol("sn001", "p2p")
+            cached, _ = service.resolve_device_credentials("SN001", "prod", "user", "pass")
+            service._DEVICE_CONTEXT_CACHE.clear()
+            fresh, context = service.resolve_device_credentials("SN001", "prod", "user", "pass")
+
+        self.assertEqual("p2p", cached.protocol)
+        self.assertEqual("p2p", fresh.protocol)
+        self.assertEqual("p2p", context["protocol"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,108 @@
+import importlib.util
+import tempfile
+import sys
+import types
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _ensure_test_packages():
+    import query_tool
+
+    if "query_tool.utils" not in sys.modules:
+        utils_pkg = types.ModuleType("query_tool.utils")
+        utils_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils")]
+        sys.modules["query_tool.utils"] = utils_pkg
+
+    if "query_tool.utils.device_query" not in sys.modules:
+        device_query_stub = types.ModuleType("query_tool.utils.device_query")
+
+        class DeviceQuery:
+            def __init__(self, *args, **kwargs):
+                self.init_error = None
+
+        device_query_stub.DeviceQuery = DeviceQuery
+        sys.modules["query_tool.utils.device_query"] = device_query_stub
+
+    if "query_tool.utils.siot_debug" not in sys.modules:
+        siot_debug_pkg = types.ModuleType("query_tool.utils.siot_debug")
+        siot_debug_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils" / "siot_debug")]
+        sys.modules["query_tool.utils.siot_debug"] = siot_debug_pkg
+
+
+def _load_module(module_name: str, relative_path: str):
+    _ensure_test_packages()
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    module_path = REPO_ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+
+content_store = _load_module(
+    "query_tool.utils.siot_debug.content_store",
+    "query_tool/utils/siot_debug/content_store.py",
+)
+
+
+class ContentStoreTests(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self._temp_dir.name)
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def test_identical_payloads_share_one_blob(self):
+        store = content_store.ContentStore(self.root)
+        spool = self.root / "spool.part"
+        spool.write_bytes(b"config=1\n")
+
+        first = store.put_file(spool, self.root / "SN001" / "sys.cfg")
+        second = store.put_bytes(b"config=1\n", self.root / "SN002" / "sys.cfg")
+
+        self.assertEqual(first, second)
+        self.assertFalse(spool.exists())
+        blobs = [path for path in (self.root / content_store.CONTENT_STORE_DIRNAME).rglob("*") if path.is_file()]
+        self.assertEqual(blobs, [store.blob_path(first)])
+        self.assertEqual((self.root / "SN002" / "sys.cfg").read_bytes(), b"config=1\n")
+        manifest = content_store.load_content_manifest(self.root / "SN001")
+        self.assertEqual(manifest["sys.cfg"]["sha256"], first)
+
+    def test_replacing_a_linked_file_does_not_touch_other_devices(self):
+        store = content_store.ContentStore(self.root)
+        store.put_bytes(b"old", self.root / "SN001" / "sys.cfg")
+        store.put_bytes(b"old", self.root / "SN002" / "sys.cfg")
+
+        store.put_bytes(b"new", self.root / "SN001" / "sys.cfg")
+
+        self.assertEqual((self.root / "SN001" / "sys.cfg").read_bytes(), b"new")
+        self.assertEqual((self.root / "SN002" / "sys.cfg").read_bytes(), b"old")
+
+    def test_compare_device_files_reports_outliers(self):
+        report = content_store.compare_device_files(
+            {
+                "SN001": {"sys.cfg": "aaa", "only.log": "ccc"},
+                "SN002": {"sys.cfg": "aaa"},
+                "SN003": {"sys.cfg": "bbb"},
+            }
+        )
+
+        self.assertEqual(list(report), ["sys.cfg"])
+        self.assertEqual(report["sys.cfg"]["groups"][0], {"sha256": "aaa", "devices": ["SN001", "SN002"]})
+        self.assertEqual(report["sys.cfg"]["outliers"], ["SN003"])
+        lines = content_store.format_comparison_lines(report)
+        self.assertIn("SN003", lines[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
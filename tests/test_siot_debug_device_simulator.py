@@ -0,0 +1,131 @@
+import importlib.util
+import json
+import sys
+import types
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _ensure_test_packages():
+    import query_tool
+
+    if "query_tool.utils" not in sys.modules:
+        utils_pkg = types.ModuleType("query_tool.utils")
+        utils_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils")]
+        sys.modules["query_tool.utils"] = utils_pkg
+
+    if "query_tool.utils.device_query" not in sys.modules:
+        device_query_stub = types.ModuleType("query_tool.utils.device_query")
+
+        class DeviceQuery:
+            def __init__(self, *args, **kwargs):
+                self.init_error = None
+
+        device_query_stub.DeviceQuery = DeviceQuery
+        sys.modules["query_tool.utils.device_query"] = device_query_stub
+
+    if "query_tool.utils.siot_debug" not in sys.modules:
+        siot_debug_pkg = types.ModuleType("query_tool.utils.siot_debug")
+        siot_debug_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils" / "siot_debug")]
+        sys.modules["query_tool.utils.siot_debug"] = siot_debug_pkg
+
+
+def _load_module(module_name: str, relative_path: str):
+    _ensure_test_packages()
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    module_path = REPO_ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+
+device_simulator = _load_module(
+    "query_tool.utils.siot_debug.device_simulator",
+    "query_tool/utils/siot_debug/device_simulator.py",
+)
+session_module = sys.modules["query_tool.utils.siot_debug.session"]
+p2p_session_module = sys.modules["query_tool.utils.siot_debug.p2p_session"]
+
+
+def _fast_profile(**overrides):
+    values = {
+        "connect_latency_s": 0.0,
+        "status_latency_s": 0.0,
+        "auth_latency_s": 0.0,
+        "peer_latency_s": 0.0,
+        "wakeup_delay_s": 0.0,
+        "command_latency_s": 0.0,
+        "packet_interval_s": 0.0,
+        "file_size": 50_000,
+        "text_lines": 3,
+    }
+    values.update(overrides)
+    return device_simulator.SimulatorProfile(**values)
+
+
+class DeviceSimulatorTests(unittest.TestCase):
+    def test_profile_state_is_stable_per_sn_and_loaded_from_connect_payload(self):
+        profile = device_simulator.SimulatorProfile(sleeping_rate=0.3, offline_rate=0.3, seed=7)
+        sns = [f"SIM{index:04d}" for index in range(200)]
+
+        states = [profile.device_state(sn) for sn in sns]
+
+        self.assertEqual(states, [profile.device_state(sn.lower()) for sn in sns])
+        self.assertEqual({"online", "sleeping", "offline"}, set(states))
+        offline_sn = sns[states.index("offline")]
+        self.assertEqual({"online": 0, "online4g": 0, "netType": 1}, profile.cloud_status(offline_sn))
+        loaded = device_simulator.load_simulator_profile(json.loads(json.dumps(profile.to_dict())))
+        self.assertEqual(profile, loaded)
+        self.assertIsNone(device_simulator.load_simulator_profile(None))
+        self.assertEqual(device_simulator.SimulatorProfile(), device_simulator.load_simulator_profile(True))
+
+    def test_siot_session_connects_and_downloads_file_from_simulated_device(self):
+        profile = _fast_profile()
+        session = session_module.DeviceSession(
+            "simulator",
+            "simulator",
+            prefetched_cloud_credentials=device_simulator.simulated_cloud_credentials(),
+            sdk=device_simulator.create_simulated_sdk(profile, "siot"),
+        )
+        try:
+            session.connect(device_simulator.simulated_device_credentials("SIM0001"))
+            file_result = session.execute_command("GetSystemCfg /mnt/log/messages", timeout_ms=5000)
+            text_result = session.execute_command("syscmd free", timeout_ms=5000)
+        finally:
+            session.close()
+
+        self.assertTrue(file_result.success)
+        self.assertEqual("messages", file_result.filename)
+        self.assertEqual(profile.file_size, file_result.received_bytes)
+        self.assertIn("SIM0001 syscmd free line 2", text_result.display_text)
+
+    def test_p2p_session_reports_offline_and_runs_commands_when_online(self):
+        offline = p2p_session_module.P2PDeviceSession(
+            sdk=device_simulator.create_simulated_sdk(_fast_profile(offline_rate=1.0), "p2p")
+        )
+        with self.assertRaises(Exception):
+            offline.connect(device_simulator.simulated_device_credentials("SIM0002", "p2p"))
+        offline.close()
+
+        session = p2p_session_module.P2PDeviceSession(sdk=device_simulator.create_simulated_sdk(_fast_profile(), "p2p"))
+        try:
+            session.connect(device_simulator.simulated_device_credentials("SIM0003", "p2p"))
+            result = session.execute_command("syscmd uptime", timeout_ms=5000)
+        finally:
+            session.close()
+
+        self.assertTrue(result.success)
+        self.assertIn("SIM0003 syscmd uptime line 0", result.display_text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,440 @@
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+import types
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _ensure_test_packages():
+    import query_tool
+
+    if "query_tool.utils" not in sys.modules:
+        utils_pkg = types.ModuleType("query_tool.utils")
+        utils_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils")]
+        sys.modules["query_tool.utils"] = utils_pkg
+
+    if "query_tool.utils.device_query" not in sys.modules:
+        device_query_stub = types.ModuleType("query_tool.utils.device_query")
+
+        class DeviceQuery:
+            def __init__(self, *args, **kwargs):
+                self.init_error = None
+
+        device_query_stub.DeviceQuery = DeviceQuery
+        sys.modules["query_tool.utils.device_query"] = device_query_stub
+
+    if "query_tool.utils.siot_debug" not in sys.modules:
+        siot_debug_pkg = types.ModuleType("query_tool.utils.siot_debug")
+        siot_debug_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils" / "siot_debug")]
+        sys.modules["query_tool.utils.siot_debug"] = siot_debug_pkg
+
+
+def _load_module(module_name: str, relative_path: str):
+    _ensure_test_packages()
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    module_path = REPO_ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+models = _load_module("query_tool.utils.siot_debug.models", "query_tool/utils/siot_debug/models.py")
+file_sink = _load_module("query_tool.utils.siot_debug.file_sink", "query_tool/utils/siot_debug/file_sink.py")
+session = _load_module("query_tool.utils.siot_debug.session", "query_tool/utils/siot_debug/session.py")
+subprocess_runner = _load_module(
+    "query_tool.utils.siot_debug.subprocess_runner",
+    "query_tool/utils/siot_debug/subprocess_runner.py",
+)
+CommandResult = models.CommandResult
+ParsedPayload = models.ParsedPayload
+
+
+def _data_packet(start_pos: int, data: bytes) -> ParsedPayload:
+    return ParsedPayload(
+        message_type="SYSTEM_LOG_DATA",
+        filename="config.bin",
+        start_pos=start_pos,
+        data_len=len(data),
+        binary_payload=data,
+    )
+
+
+class ReceivedRangesTests(unittest.TestCase):
+    def test_add_merges_overlapping_and_adjacent_ranges(self):
+        ranges = file_sink.ReceivedRanges()
+        ranges.add(10, 20)
+        ranges.add(30, 40)
+        ranges.add(20, 30)
+        ranges.add(50, 60)
+
+        self.assertEqual([[10, 40], [50, 60]], ranges.to_list())
+        self.assertEqual(40, ranges.covered_bytes)
+        self.assertEqual(60, ranges.high_water)
+        self.assertEqual(0, ranges.contiguous_prefix())
+        self.assertEqual([(0, 10), (40, 50), (60, 64)], ranges.missing(64))
+        self.assertTrue(ranges.contains(12, 38))
+        self.assertFalse(ranges.contains(38, 52))
+
+
+class FileChunkSinkTests(unittest.TestCase):
+    def test_out_of_order_chunks_are_written_at_their_offsets(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            sink = file_sink.FileChunkSink.create(Path(temp_dir), prefix="case_")
+            self.assertIsNotNone(sink)
+            sink.write(4, b"5678")
+            sink.write(0, b"1234")
+            sink.write(8, b"9")
+
+            path = Path(sink.finalize())
+
+            self.assertEqual(b"123456789", path.read_bytes())
+            self.assertTrue(sink.finalized)
+
+    def test_discard_removes_spooled_file(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            sink = file_sink.FileChunkSink.create(Path(temp_dir))
+            sink.write(0, b"abc")
+            sink.discard()
+
+            self.assertFalse(sink.path.exists())
+            self.assertFalse(sink.write(3, b"def"))
+
+
+class ResumableFileChunkSinkTests(unittest.TestCase):
+    def test_suspended_transfer_resumes_with_kept_ranges(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            spool_dir = Path(temp_dir)
+            sink = file_sink.FileChunkSink.open_resumable(spool_dir, "SN001", "GetSystemCfg /tmp/config.bin")
+            sink.write(0, b"abcd")
+            sink.write(4, b"efgh")
+            self.assertEqual(8, sink.suspend())
+            self.assertTrue(sink.state_path.exists())
+
+            resumed = file_sink.FileChunkSink.open_resumable(spool_dir, "SN001", "GetSystemCfg /tmp/config.bin")
+            self.assertEqual(8, resumed.resumed_bytes)
+            self.assertTrue(resumed.write(0, b"abcd"))
+            resumed.write(8, b"ij")
+            path = Path(resumed.finalize())
+
+            self.assertEqual(b"abcdefghij", path.read_bytes())
+            self.assertFalse(resumed.state_path.exists())
+
+    def test_changed_content_drops_kept_ranges(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            spool_dir = Path(temp_dir)
+            sink = file_sink.FileChunkSink.open_resumable(spool_dir, "SN001", "GetSystemCfg /tmp/config.bin")
+            sink.write(0, b"old-data")
+            sink.suspend()
+
+            resumed = file_sink.FileChunkSink.open_resumable(spool_dir, "SN001", "GetSystemCfg /tmp/config.bin")
+            resumed.write(0, b"new")
+
+            self.assertEqual([[0, 3]], resumed.ranges.to_list())
+            self.assertEqual(b"new", Path(resumed.finalize()).read_bytes())
+
+    def test_shorter_resumed_transfer_drops_stale_tail(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            spool_dir = Path(temp_dir)
+            content = bytes(range(256)) * 3
+            sink = file_sink.FileChunkSink.open_resumable(spool_dir, "SN001", "GetSystemCfg /tmp/config.bin")
+            sink.write(0, content)
+            sink.suspend()
+
+            # 设备上的文件变短但前缀相同：重发的前 500 字节校验一致，结束包给出新长度
+            resumed = file_sink.FileChunkSink.open_resumable(spool_dir, "SN001", "GetSystemCfg /tmp/config.bin")
+            resumed.write(0, content[:500])
+            resumed.mark_end(500)
+
+            self.assertEqual(500, resumed.size)
+            self.assertEqual(content[:500], Path(resumed.finalize()).read_bytes())
+            self.assertEqual([[0, 500]], resumed.ranges.to_list())
+
+    def test_finalize_refuses_incomplete_transfer(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            sink = file_sink.FileChunkSink.create(Path(temp_dir))
+            sink.write(0, b"abcd")
+            sink.write(8, b"ijkl")
+
+            self.assertFalse(sink.complete)
+            self.assertEqual([(4, 8)], sink.missing())
+            with self.assertRaises(ValueError):
+                sink.finalize()
+
+            sink.write(4, b"efgh")
+            sink.mark_end(16)
+            self.assertEqual([(12, 16)], sink.missing())
+            with self.assertRaises(ValueError):
+                sink.finalize()
+            sink.discard()
+
+    def test_other_remote_path_does_not_reuse_state(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            spool_dir = Path(temp_dir)
+            sink = file_sink.FileChunkSink.open_resumable(spool_dir, "SN001", "GetSystemCfg /tmp/a.bin")
+            sink.write(0, b"abcd")
+            sink.suspend()
+
+            other = file_sink.FileChunkSink.open_resumable(spool_dir, "SN001", "GetSystemCfg /tmp/b.bin")
+
+            self.assertEqual(0, other.resumed_bytes)
+            other.discard()
+
+    def test_concurrent_fetch_of_same_file_gets_private_temp_file(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            spool_dir = Path(temp_dir)
+            first = file_sink.FileChunkSink.open_resumable(spool_dir, "SN001", "GetSystemCfg /tmp/config.bin")
+            second = file_sink.FileChunkSink.open_resumable(spool_dir, "SN001", "GetSystemCfg /tmp/config.bin")
+
+            self.assertTrue(first.resumable)
+            self.assertFalse(second.resumable)
+            self.assertNotEqual(first.path, second.path)
+            first.write(0, b"first")
+            second.write(0, b"other")
+            self.assertEqual(b"first", Path(first.finalize()).read_bytes())
+            second.discard()
+
+            third = file_sink.FileChunkSink.open_resumable(spool_dir, "SN001", "GetSystemCfg /tmp/config.bin")
+            self.assertTrue(third.resumable)
+            third.discard()
+
+    def test_stale_lock_from_dead_runner_is_taken_over(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            spool_dir = Path(temp_dir)
+            abandoned = file_sink.FileChunkSink.open_resumable(spool_dir, "SN001", "GetSystemCfg /tmp/config.bin")
+            abandoned.write(0, b"abcd")
+            abandoned.checkpoint()
+            old = time.time() - file_sink.RESUME_LOCK_STALE_S - 1
+            os.utime(abandoned.lock_path, (old, old))
+
+            resumed = file_sink.FileChunkSink.open_resumable(spool_dir, "SN001", "GetSystemCfg /tmp/config.bin")
+
+            self.assertTrue(resumed.resumable)
+            self.assertEqual(4, resumed.resumed_bytes)
+            resumed.discard()
+
+    def test_prune_removes_expired_transfer_state_only(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            spool_dir = Path(temp_dir)
+            sink = file_sink.FileChunkSink.open_resumable(spool_dir, "SN001", "GetSystemCfg /tmp/old.bin")
+            sink.write(0, b"abcd")
+            sink.suspend()
+            old = time.time() - file_sink.RESUME_STATE_MAX_AGE_S - 60
+            for path in (sink.path, sink.state_path):
+                os.utime(path, (old, old))
+            fresh = file_sink.FileChunkSink.open_resumable(spool_dir, "SN002", "GetSystemCfg /tmp/new.bin")
+            fresh.write(0, b"efgh")
+            fresh.checkpoint()
+            (spool_dir / "notes.txt").write_text("keep", encoding="utf-8")
+            os.utime(spool_dir / "notes.txt", (old, old))
+
+            removed = file_sink.prune_transfer_spool(spool_dir)
+
+            self.assertEqual(2, removed)
+            self.assertFalse(sink.path.exists())
+            self.assertFalse(sink.state_path.exists())
+            self.assertTrue(fresh.path.exists())
+            self.assertTrue(fresh.state_path.exists())
+            self.assertTrue((spool_dir / "notes.txt").exists())
+            fresh.discard()
+
+
+class CommandWaiterFileSinkTests(unittest.TestCase):
+    def test_waiter_spools_chunks_and_strips_raw_payloads(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            waiter = session._CommandWaiter(
+                command="GetSystemCfg /tmp/config.bin",
+                command_kind="system_log",
+                expects_file=True,
+                file_sink=file_sink.FileChunkSink.create(Path(temp_dir)),
+            )
+            waiter.feed(_data_packet(0, b"hello "))
+            waiter.feed(_data_packet(6, b"world"))
+            waiter.feed(ParsedPayload(message_type="SYSTEM_LOG_DATA", filename="config.bin", start_pos=11))
+
+            result = waiter.build_result()
+
+            self.assertEqual(b"", result.binary_payload)
+            self.assertEqual(b"hello world", Path(result.payload_path).read_bytes())
+            self.assertEqual(11, result.received_bytes)
+            self.assertEqual("hello world", result.display_text)
+            self.assertTrue(all(not payload.binary_payload for payload in result.responses))
+
+    def test_interrupted_transfer_keeps_spooled_prefix(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            sink = file_sink.FileChunkSink.open_resumable(Path(temp_dir), "SN001", "GetSystemCfg /tmp/config.bin")
+            waiter = session._CommandWaiter(
+                command="GetSystemCfg /tmp/config.bin",
+                command_kind="system_log",
+                expects_file=True,
+                file_sink=sink,
+            )
+            waiter.feed(_data_packet(0, b"hello "))
+            waiter.transport_error = "P2P数据通道已断开"
+
+            result = waiter.build_result()
+
+            self.assertTrue(result.transfer_interrupted)
+            self.assertFalse(result.success)
+            self.assertIsNone(result.payload_path)
+            self.assertEqual(b"hello ", sink.path.read_bytes()[:6])
+            self.assertTrue(sink.state_path.exists())
+
+    def test_finished_transfer_with_gap_is_kept_for_resume(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            sink = file_sink.FileChunkSink.open_resumable(Path(temp_dir), "SN001", "GetSystemCfg /tmp/config.bin")
+            waiter = session._CommandWaiter(
+                command="GetSystemCfg /tmp/config.bin",
+                command_kind="system_log",
+                expects_file=True,
+                file_sink=sink,
+            )
+            waiter.feed(_data_packet(0, b"hello "))
+            waiter.feed(ParsedPayload(message_type="SYSTEM_LOG_DATA", filename="config.bin", start_pos=11))
+
+            result = waiter.build_result()
+
+            self.assertTrue(result.transfer_interrupted)
+            self.assertFalse(result.success)
+            self.assertIsNone(result.payload_path)
+            self.assertTrue(sink.state_path.exists())
+
+    def test_waiter_discards_sink_for_text_reply(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            sink = file_sink.FileChunkSink.create(Path(temp_dir))
+            waiter = session._CommandWaiter(
+                command="GetSystemCfg /tmp/missing.bin",
+                command_kind="system_log",
+                expects_file=True,
+                file_sink=sink,
+            )
+            waiter.feed(ParsedPayload(message_type="SYSTEM_LOG", resp_str="file fail"))
+
+            result = waiter.build_result()
+
+            self.assertIsNone(result.payload_path)
+            self.assertFalse(sink.path.exists())
+
+
+class RunnerSpooledFileTests(unittest.TestCase):
+    def test_runner_moves_spooled_file_into_download_root(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            spooled_path = Path(temp_dir) / "spool.part"
+            spooled_path.write_bytes(b"payload")
+            download_root = Path(temp_dir) / "downloads"
+
+            fake_session = SimpleNamespace(
+                device=SimpleNamespace(sn="SN001"),
+                execute_command=lambda command, **kwargs: CommandResult(
+                    command=command,
+                    command_kind="system_log",
+                    success=True,
+                    display_text="",
+                    acknowledged=True,
+                    payload_path=str(spooled_path),
+                    filename="config.bin",
+                    received_bytes=7,
+                    streamed_packets=1,
+                ),
+            )
+
+            with mock.patch.object(subprocess_runner, "_emit"):
+                subprocess_runner._handle_command(
+                    fake_session,
+                    {
+                        "command": "GetSystemCfg /tmp/config.bin",
+                        "timeout_ms": 2000,
+                        "download_root": str(download_root),
+                    },
+                )
+
+            self.assertEqual(b"payload", (download_root / "SN001" / "config.bin").read_bytes())
+            self.assertFalse(spooled_path.exists())
+
+    def test_runner_retries_interrupted_transfer(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            spooled_path = Path(temp_dir) / "spool.part"
+            spooled_path.write_bytes(b"payload")
+            download_root = Path(temp_dir) / "downloads"
+            results = [
+                CommandResult(
+                    command="GetSystemCfg /tmp/config.bin",
+                    command_kind="system_log",
+                    success=False,
+                    display_text="文件传输中断，",
+                    acknowledged=True,
+                    transfer_interrupted=True,
+                ),
+                CommandResult(
+                    command="GetSystemCfg /tmp/config.bin",
+                    command_kind="system_log",
+                    success=True,
+                    display_text="",
+                    acknowledged=True,
+                    payload_path=str(spooled_path),
+                    filename="config.bin",
+                ),
+            ]
+            calls = []
+
+            def execute_command(command, **kwargs):
+                calls.append(command)
+                return results[len(calls) - 1]
+
+            fake_session = SimpleNamespace(device=SimpleNamespace(sn="SN001"), execute_command=execute_command)
+            events = []
+
+            with mock.patch.object(subprocess_runner, "_emit", side_effect=lambda event, **payload: events.append(event)):
+                subprocess_runner._handle_command(
+                    fake_session,
+                    {
+                        "command": "GetSystemCfg /tmp/config.bin",
+                        "timeout_ms": 2000,
+                        "download_root": str(download_root),
+                    },
+                )
+
+            self.assertEqual(2, len(calls))
+            self.assertNotIn("command_failed", events)
+            self.assertEqual(b"payload", (download_root / "SN001" / "config.bin").read_bytes())
+
+    def test_runner_discards_spooled_file_without_download_root(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            spooled_path = Path(temp_dir) / "spool.part"
+            spooled_path.write_bytes(b"payload")
+            fake_session = SimpleNamespace(
+                device=SimpleNamespace(sn="SN001"),
+                execute_command=lambda command, **kwargs: CommandResult(
+                    command=command,
+                    command_kind="system_log",
+                    success=True,
+                    display_text="",
+                    acknowledged=True,
+                    payload_path=str(spooled_path),
+                    filename="config.bin",
+                ),
+            )
+
+            with mock.patch.object(subprocess_runner, "_emit"):
+                subprocess_runner._handle_command(
+                    fake_session,
+                    {"command": "GetSystemCfg /tmp/config.bin", "timeout_ms": 2000, "download_root": ""},
+                )
+
+            self.assertFalse(spooled_path.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,213 @@
+import importlib.util
+import sys
+import threading
+import time
+import types
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _ensure_test_packages():
+    import query_tool
+
+    if "query_tool.utils" not in sys.modules:
+        utils_pkg = types.ModuleType("query_tool.utils")
+        utils_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils")]
+        sys.modules["query_tool.utils"] = utils_pkg
+
+    if "query_tool.utils.device_query" not in sys.modules:
+        device_query_stub = types.ModuleType("query_tool.utils.device_query")
+
+        class DeviceQuery:
+            def __init__(self, *args, **kwargs):
+                self.init_error = None
+
+        device_query_stub.DeviceQuery = DeviceQuery
+        sys.modules["query_tool.utils.device_query"] = device_query_stub
+
+    if "query_tool.utils.siot_debug" not in sys.modules:
+        siot_debug_pkg = types.ModuleType("query_tool.utils.siot_debug")
+        siot_debug_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils" / "siot_debug")]
+        sys.modules["query_tool.utils.siot_debug"] = siot_debug_pkg
+
+
+def _load_module(module_name: str, relative_path: str):
+    _ensure_test_packages()
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    module_path = REPO_ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+
+heartbeat = _load_module("query_tool.utils.siot_debug.heartbeat", "query_tool/utils/siot_debug/heartbeat.py")
+session_module = _load_module("query_tool.utils.siot_debug.session", "query_tool/utils/siot_debug/session.py")
+
+
+class _Session:
+    def __init__(self, needs_reconnect=False, reconnect_gate=None, send_gate=None):
+        self.sent = 0
+        self.sending = threading.Event()
+        self.reconnecting = threading.Event()
+        self._send_gate = send_gate
+        self.send_threads = set()
+        self.reconnects = 0
+        self._needs_reconnect = needs_reconnect
+        self._reconnect_gate = reconnect_gate
+
+    def register(self, scheduler):
+        scheduler.register(
+            self,
+            send=self.send,
+            needs_reconnect=lambda: self._needs_reconnect,
+            reconnect=self.reconnect,
+        )
+
+    def send(self):
+        self.sending.set()
+        if self._send_gate is not None:
+            self._send_gate.wait(5.0)
+        self.sent += 1
+        self.send_threads.add(threading.current_thread().name)
+
+    def reconnect(self):
+        self.reconnects += 1
+        self.reconnecting.set()
+        if self._reconnect_gate is not None:
+            self._reconnect_gate.wait(5.0)
+        self._needs_reconnect = False
+
+
+def _wait_until(predicate, timeout_s=2.0):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class HeartbeatSchedulerTests(unittest.TestCase):
+    def test_one_scheduler_thread_sends_heartbeats_for_all_sessions(self):
+        scheduler = heartbeat.HeartbeatScheduler(interval_s=0.02)
+        sessions = [_Session() for _ in range(20)]
+        for session in sessions:
+            session.register(scheduler)
+
+        self.assertTrue(_wait_until(lambda: all(session.sent >= 3 for session in sessions)))
+        self.assertEqual({"siot-heartbeat"}, set().union(*(session.send_threads for session in sessions)))
+        self.assertEqual(20, scheduler.session_count())
+
+    def test_stuck_reconnect_does_not_delay_other_sessions(self):
+        scheduler = heartbeat.HeartbeatScheduler(interval_s=0.02, reconnect_workers=1)
+        gate = threading.Event()
+        stuck = _Session(needs_reconnect=True, reconnect_gate=gate)
+        healthy = _Session()
+        stuck.register(scheduler)
+        healthy.register(scheduler)
+
+        try:
+            self.assertTrue(_wait_until(lambda: healthy.sent >= 5))
+            self.assertEqual(1, stuck.reconnects)
+            self.assertEqual(0, stuck.sent)
+        finally:
+            gate.set()
+        # 重连完成后立即补发一次心跳，之后回到调度线程
+        self.assertTrue(_wait_until(lambda: stuck.sent >= 2))
+        self.assertEqual(1, stuck.reconnects)
+
+    def test_unregistered_session_stops_receiving_heartbeats(self):
+        scheduler = heartbeat.HeartbeatScheduler(interval_s=0.02)
+        session = _Session()
+        session.register(scheduler)
+        self.assertTrue(_wait_until(lambda: session.sent >= 1))
+
+        scheduler.unregister(session)
+        sent = session.sent
+        time.sleep(0.1)
+
+        self.assertEqual(sent, session.sent)
+        self.assertFalse(scheduler.is_registered(session))
+
+    def _unregister_in_background(self, scheduler, session):
+        thread = threading.Thread(target=scheduler.unregister, args=(session,), daemon=True)
+        thread.start()
+        return thread
+
+    def test_unregister_waits_for_in_flight_heartbeat(self):
+        scheduler = heartbeat.HeartbeatScheduler(interval_s=0.02)
+        gate = threading.Event()
+        session = _Session(send_gate=gate)
+        session.register(scheduler)
+        self.assertTrue(session.sending.wait(2.0))
+
+        unregister = self._unregister_in_background(scheduler, session)
+        unregister.join(0.1)
+        self.assertTrue(unregister.is_alive())
+        gate.set()
+        unregister.join(2.0)
+
+        self.assertFalse(unregister.is_alive())
+        sent = session.sent
+        time.sleep(0.1)
+        self.assertEqual(sent, session.sent)
+
+    def test_unregister_waits_for_reconnect_and_skips_follow_up_heartbeat(self):
+        scheduler = heartbeat.HeartbeatScheduler(interval_s=0.02)
+        gate = threading.Event()
+        session = _Session(needs_reconnect=True, reconnect_gate=gate)
+        session.register(scheduler)
+        self.assertTrue(session.reconnecting.wait(2.0))
+
+        unregister = self._unregister_in_background(scheduler, session)
+        unregister.join(0.1)
+        self.assertTrue(unregister.is_alive())
+        gate.set()
+        unregister.join(2.0)
+
+        self.assertFalse(unregister.is_alive())
+        time.sleep(0.1)
+        self.assertEqual(0, session.sent)
+        self.assertEqual(1, session.reconnects)
+
+
+def _device_session():
+    session = session_module.DeviceSession.__new__(session_module.DeviceSession)
+    session._stop_event = threading.Event()
+    return session
+
+
+class DeviceSessionHeartbeatTests(unittest.TestCase):
+    def test_stopped_session_is_not_revived_by_heartbeat_reconnect(self):
+        session = _device_session()
+        session._stop_event.set()
+
+        def ensure_ready():
+            session._start_heartbeat_loop()
+
+        session._ensure_ready = ensure_ready
+        session._heartbeat_reconnect()
+        session._start_heartbeat_loop()
+
+        self.assertTrue(session._stop_event.is_set())
+        self.assertFalse(heartbeat.get_heartbeat_scheduler().is_registered(session))
+
+    def test_close_during_reconnect_aborts_follow_up_heartbeat(self):
+        session = _device_session()
+        session._ensure_ready = session._stop_event.set
+
+        with self.assertRaises(session_module.SiotError):
+            session._heartbeat_reconnect()
+
+
+if __name__ == "__main__":
+    unittest.main()
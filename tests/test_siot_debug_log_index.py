@@ -0,0 +1,131 @@
+import importlib.util
+import tempfile
+import sys
+import types
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _ensure_test_packages():
+    import query_tool
+
+    if "query_tool.utils" not in sys.modules:
+        utils_pkg = types.ModuleType("query_tool.utils")
+        utils_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils")]
+        sys.modules["query_tool.utils"] = utils_pkg
+
+    if "query_tool.utils.device_query" not in sys.modules:
+        device_query_stub = types.ModuleType("query_tool.utils.device_query")
+
+        class DeviceQuery:
+            def __init__(self, *args, **kwargs):
+                self.init_error = None
+
+        device_query_stub.DeviceQuery = DeviceQuery
+        sys.modules["query_tool.utils.device_query"] = device_query_stub
+
+    if "query_tool.utils.siot_debug" not in sys.modules:
+        siot_debug_pkg = types.ModuleType("query_tool.utils.siot_debug")
+        siot_debug_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils" / "siot_debug")]
+        sys.modules["query_tool.utils.siot_debug"] = siot_debug_pkg
+
+
+def _load_module(module_name: str, relative_path: str):
+    _ensure_test_packages()
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    module_path = REPO_ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+
+_load_module("query_tool.utils.siot_debug.protocol", "query_tool/utils/siot_debug/protocol.py")
+stream_log_sink = _load_module(
+    "query_tool.utils.siot_debug.stream_log_sink",
+    "query_tool/utils/siot_debug/stream_log_sink.py",
+)
+log_index = _load_module("query_tool.utils.siot_debug.log_index", "query_tool/utils/siot_debug/log_index.py")
+
+
+class LogIndexTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        (self.root / "SN001").mkdir()
+        (self.root / "SN002").mkdir()
+        (self.root / "SN001" / "SN001_serial_20260101_000000.log").write_text(
+            "[main] 01:59:59 boot ok\n[main] 02:10:00 sensor error X\n  detail line\n[main] 03:30:00 sensor error X\n",
+            encoding="utf-8",
+        )
+        (self.root / "SN002" / "dmsg1.txt").write_text("02:59:00 ERROR X in dmsg\n23:30:00 错误 重启\n", encoding="utf-8")
+        (self.root / "SN002" / "config.bin").write_bytes(b"\x00\x01error X")
+        self.index = log_index.LogIndex(self.root)
+
+    def tearDown(self):
+        self.index.close()
+        self._tmp.cleanup()
+
+    def test_scan_is_incremental_and_records_time_ranges(self):
+        self.assertEqual(3, self.index.scan())
+        self.assertEqual(0, self.index.scan())
+
+        ranges = {Path(item["path"]).name: item for item in self.index.file_ranges()}
+        serial = ranges["SN001_serial_20260101_000000.log"]
+        self.assertEqual(("SN001", "serial", "01:59:59", "03:30:00"), (serial["sn"], serial["kind"], serial["first_ts"], serial["last_ts"]))
+        self.assertEqual(0, ranges["config.bin"]["line_count"])
+
+        (self.root / "SN002" / "dmsg1.txt").write_text("04:00:00 replaced\n", encoding="utf-8")
+        (self.root / "SN001" / "SN001_serial_20260101_000000.log").unlink()
+        self.assertEqual(1, self.index.scan())
+        self.assertEqual([], self.index.search("sensor"))
+        self.assertEqual(1, len(self.index.search("replaced")))
+
+    def test_search_filters_by_time_window_across_devices(self):
+        self.index.scan()
+
+        hits = self.index.search("error X", time_from="02:00", time_to="03:00")
+
+        self.assertEqual([("SN001", 2, "02:10:00"), ("SN002", 1, "02:59:00")], [(hit.sn, hit.line_no, hit.ts) for hit in hits])
+        self.assertEqual(["SN001"], [hit.sn for hit in self.index.search("error", sn="SN001", time_from="03")])
+        # 续行沿用上一行的时间
+        self.assertEqual("02:10:00", self.index.search("detail")[0].ts)
+
+    def test_search_handles_short_tokens_and_midnight_window(self):
+        self.index.scan()
+
+        hits = self.index.search("错误", time_from="23:00", time_to="01:00")
+
+        self.assertEqual([("SN002", "23:30:00")], [(hit.sn, hit.ts) for hit in hits])
+        self.assertEqual([], self.index.search("   "))
+
+    @unittest.skipIf(stream_log_sink.zstandard is None, "zstandard not installed")
+    def test_compressed_stream_log_segments_are_indexed(self):
+        sink = stream_log_sink.RotatingStreamLogSink(
+            self.root / "SN003",
+            "SN003_serial_x",
+            max_segment_bytes=32,
+            flush_interval_s=0.0,
+        )
+        sink.open()
+        for index in range(4):
+            sink.write_line(f"[main] 05:00:0{index} segment line {index}")
+        sink.close()
+
+        self.index.scan()
+
+        hits = self.index.search("segment line")
+        self.assertEqual(4, len(hits))
+        self.assertTrue(any(hit.path.endswith(".zst") for hit in hits))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import importlib.util
+import csv
+import sys
+import tempfile
+import types
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _ensure_test_packages():
+    import query_tool
+
+    if "query_tool.utils" not in sys.modules:
+        utils_pkg = types.ModuleType("query_tool.utils")
+        utils_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils")]
+        sys.modules["query_tool.utils"] = utils_pkg
+
+    if "query_tool.utils.device_query" not in sys.modules:
+        device_query_stub = types.ModuleType("query_tool.utils.device_query")
+
+        class DeviceQuery:
+            def __init__(self, *args, **kwargs):
+                self.init_error = None
+
+        device_query_stub.DeviceQuery = DeviceQuery
+        sys.modules["query_tool.utils.device_query"] = device_query_stub
+
+    if "query_tool.utils.siot_debug" not in sys.modules:
+        siot_debug_pkg = types.ModuleType("query_tool.utils.siot_debug")
+        siot_debug_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils" / "siot_debug")]
+        sys.modules["query_tool.utils.siot_debug"] = siot_debug_pkg
+
+
+def _load_module(module_name: str, relative_path: str):
+    _ensure_test_packages()
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    module_path = REPO_ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+
+output_groups = _load_module(
+    "query_tool.utils.siot_debug.output_groups",
+    "query_tool/utils/siot_debug/output_groups.py",
+)
+
+MEMINFO = "MemTotal:  61440 kB\r\nMemFree:   1024 kB\r\n"
+
+
+class CommandOutputGrouperTests(unittest.TestCase):
+    def test_outputs_differing_only_in_whitespace_share_a_group(self):
+        grouper = output_groups.CommandOutputGrouper()
+
+        first = grouper.add("syscmd cat /proc/meminfo", "SN1", MEMINFO)
+        second = grouper.add("syscmd cat /proc/meminfo", "SN2", "\n\x1b[0mMemTotal: 61440 kB\nMemFree:\t1024 kB   \n\n")
+        third = grouper.add("syscmd cat /proc/meminfo", "SN3", "MemTotal: 61440 kB\nMemFree: 2048 kB")
+
+        self.assertEqual(first["index"], second["index"])
+        self.assertEqual(2, second["count"])
+        self.assertNotEqual(first["index"], third["index"])
+        groups = grouper.snapshot()["syscmd cat /proc/meminfo"]
+        self.assertEqual([["SN1", "SN2"], ["SN3"]], [group["devices"] for group in groups])
+        self.assertEqual("MemTotal: 61440 kB\nMemFree: 1024 kB", groups[0]["sample"])
+        self.assertEqual(
+            ["syscmd cat /proc/meminfo: 2 种输出，2 台与多数一致，1 台不同: SN3"],
+            grouper.format_lines(),
+        )
+
+    def test_retried_device_moves_group_and_empty_groups_are_dropped(self):
+        grouper = output_groups.CommandOutputGrouper()
+        grouper.add("syscmd uptime", "SN1", "up 1 day")
+        grouper.add("syscmd uptime", "SN2", "timeout")
+        grouper.add("syscmd free", "SN2", "ok")
+
+        moved = grouper.add("syscmd uptime", "SN2", "up 1 day")
+        repeated = grouper.add("syscmd uptime", "SN2", "up  1 day")
+
+        self.assertEqual(2, moved["count"])
+        self.assertEqual(moved, repeated)
+        self.assertEqual(2, grouper.group_count())
+        self.assertEqual(4, grouper.version)
+        self.assertEqual(["SN1", "SN2"], grouper.snapshot()["syscmd uptime"][0]["devices"])
+
+    def test_export_writes_one_row_per_group_with_sn_list(self):
+        grouper = output_groups.CommandOutputGrouper()
+        for index in range(5):
+            grouper.add("syscmd cat /proc/meminfo", f"SN{index}", MEMINFO if index < 4 else "MemTotal: 0 kB")
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = grouper.export_csv(Path(temp_dir) / "groups.csv")
+            with path.open("r", encoding="utf-8-sig", newline="") as handle:
+                rows = list(csv.reader(handle))
+
+        self.assertEqual(["命令", "分组", "设备数", "SN", "输出"], rows[0])
+        self.assertEqual(3, len(rows))
+        self.assertEqual(["4", "SN0 SN1 SN2 SN3"], rows[1][2:4])
+        self.assertEqual(["1", "SN4", "MemTotal: 0 kB"], rows[2][2:])
+
+
+if __name__ == "__main__":
+    unittest.main()
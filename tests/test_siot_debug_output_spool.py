@@ -0,0 +1,114 @@
+import importlib.util
+import os
+import sys
+import tempfile
+import types
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _ensure_test_packages():
+    import query_tool
+
+    if "query_tool.utils" not in sys.modules:
+        utils_pkg = types.ModuleType("query_tool.utils")
+        utils_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils")]
+        sys.modules["query_tool.utils"] = utils_pkg
+
+    if "query_tool.utils.device_query" not in sys.modules:
+        device_query_stub = types.ModuleType("query_tool.utils.device_query")
+
+        class DeviceQuery:
+            def __init__(self, *args, **kwargs):
+                self.init_error = None
+
+        device_query_stub.DeviceQuery = DeviceQuery
+        sys.modules["query_tool.utils.device_query"] = device_query_stub
+
+    if "query_tool.utils.siot_debug" not in sys.modules:
+        siot_debug_pkg = types.ModuleType("query_tool.utils.siot_debug")
+        siot_debug_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils" / "siot_debug")]
+        sys.modules["query_tool.utils.siot_debug"] = siot_debug_pkg
+
+
+def _load_module(module_name: str, relative_path: str):
+    _ensure_test_packages()
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    module_path = REPO_ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+
+output_spool = _load_module(
+    "query_tool.utils.siot_debug.output_spool",
+    "query_tool/utils/siot_debug/output_spool.py",
+)
+
+
+class OutputSpoolTests(unittest.TestCase):
+    def test_spool_output_normalizes_newlines_and_prune_removes_expired_files(self):
+        self.assertFalse(output_spool.should_spool_output("short\n" * 10))
+        self.assertTrue(output_spool.should_spool_output("x" * (output_spool.SPOOL_OUTPUT_MIN_CHARS + 1)))
+        self.assertTrue(output_spool.should_spool_output("a\n" * output_spool.SPOOL_OUTPUT_MIN_LINES))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = output_spool.spool_output("第一行\r\nsecond\r\n", label="SN/01", directory=Path(temp_dir))
+            self.assertTrue(path.name.startswith("SN_01_"))
+            self.assertEqual("第一行\nsecond\n".encode("utf-8"), path.read_bytes())
+
+            expired = Path(temp_dir) / f"old{output_spool.OUTPUT_SPOOL_SUFFIX}"
+            expired.write_text("old", encoding="utf-8")
+            os.utime(expired, (0, 0))
+            self.assertEqual(1, output_spool.prune_output_spool(Path(temp_dir), retention_days=1))
+            self.assertFalse(expired.exists())
+            self.assertTrue(path.exists())
+
+    def test_read_page_aligns_to_whole_lines(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "out.txt"
+            path.write_bytes(b"alpha\nbravo\ncharlie\n" + "长行".encode("utf-8") * 10)
+            with output_spool.SpooledOutput(path) as output:
+                self.assertEqual((0, 12, "alpha\nbravo\n"), output.read_page(0, max_bytes=15))
+                self.assertEqual((6, 20, "bravo\ncharlie\n"), output.read_page(8, max_bytes=16))
+                self.assertEqual(6, output.previous_page_offset(20, max_bytes=16))
+                self.assertEqual(0, output.previous_page_offset(6, max_bytes=16))
+
+                # 单行超过一页时不截断在多字节字符中间
+                start, end, text = output.read_page(20, max_bytes=8)
+                self.assertEqual((20, 26), (start, end))
+                self.assertEqual("长行", text)
+
+            empty = Path(temp_dir) / "empty.txt"
+            empty.write_bytes(b"")
+            with output_spool.SpooledOutput(empty) as output:
+                self.assertEqual((0, 0, ""), output.read_page(0))
+                self.assertEqual(-1, output.find("x"))
+
+    def test_find_scans_ranges_and_matches_across_range_end(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "out.txt"
+            path.write_bytes(b"head ERROR one\nmiddle error two\ntail Error three\n")
+            with output_spool.SpooledOutput(path) as output:
+                self.assertEqual(5, output.find("error"))
+                self.assertEqual(22, output.find("error", start=6))
+                self.assertEqual(37, output.find("Error", start=6, case_sensitive=True))
+                # 匹配起点在范围内即可，允许跨越范围终点
+                self.assertEqual(22, output.find("error", start=6, end=23))
+                self.assertEqual(-1, output.find("error", start=6, end=22))
+                self.assertEqual(37, output.rfind("ERROR"))
+                self.assertEqual(5, output.rfind("ERROR", end=22))
+                self.assertEqual(-1, output.rfind("ERROR", start=6, case_sensitive=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
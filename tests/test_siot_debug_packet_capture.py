@@ -0,0 +1,167 @@
+import importlib.util
+import struct
+import sys
+import tempfile
+import types
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _ensure_test_packages():
+    import query_tool
+
+    if "query_tool.utils" not in sys.modules:
+        utils_pkg = types.ModuleType("query_tool.utils")
+        utils_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils")]
+        sys.modules["query_tool.utils"] = utils_pkg
+
+    if "query_tool.utils.device_query" not in sys.modules:
+        device_query_stub = types.ModuleType("query_tool.utils.device_query")
+
+        class DeviceQuery:
+            def __init__(self, *args, **kwargs):
+                self.init_error = None
+
+        device_query_stub.DeviceQuery = DeviceQuery
+        sys.modules["query_tool.utils.device_query"] = device_query_stub
+
+    if "query_tool.utils.siot_debug" not in sys.modules:
+        siot_debug_pkg = types.ModuleType("query_tool.utils.siot_debug")
+        siot_debug_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils" / "siot_debug")]
+        sys.modules["query_tool.utils.siot_debug"] = siot_debug_pkg
+
+
+def _load_module(module_name: str, relative_path: str):
+    _ensure_test_packages()
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    module_path = REPO_ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+
+protocol = _load_module("query_tool.utils.siot_debug.protocol", "query_tool/utils/siot_debug/protocol.py")
+packet_capture = _load_module(
+    "query_tool.utils.siot_debug.packet_capture",
+    "query_tool/utils/siot_debug/packet_capture.py",
+)
+capture_replay = _load_module(
+    "query_tool.utils.siot_debug.capture_replay",
+    "query_tool/utils/siot_debug/capture_replay.py",
+)
+
+
+class PacketCaptureTests(unittest.TestCase):
+    def test_capture_round_trip_ignores_truncated_tail(self):
+        ticks = iter([0, 1_000_000, 2_500_000_000])
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "dev.siotcap"
+            capture = packet_capture.PacketCapture(path, clock=lambda: next(ticks))
+            capture.record("signaling", b"first")
+            capture.record("p2p_log", b"second")
+            capture.close()
+            with path.open("ab") as handle:
+                handle.write(b"\x00\x01\x02")
+
+            packets = packet_capture.load_capture(path)
+
+        self.assertEqual(["signaling", "p2p_log"], [packet.source for packet in packets])
+        self.assertEqual([b"first", b"second"], [packet.payload for packet in packets])
+        self.assertAlmostEqual(2.5, packets[1].offset_s)
+        self.assertEqual(2, capture.packets)
+
+    def test_encrypted_frame_is_recorded_as_plaintext_with_encrypt_flag(self):
+        body = b"<XML_TOPSEE>plain</XML_TOPSEE>"
+        raw = struct.pack("<IIBxxx", protocol.HEADER_ENCRYPT_FLAG, 64, protocol.PAYLOAD_TYPE_XML) + b"\xaa" * 64
+
+        frame = packet_capture.plain_transport_frame(raw, body)
+
+        self.assertEqual(protocol.HEADER_ENCRYPT_FLAG, struct.unpack_from("<I", frame, 0)[0])
+        replayed = protocol.unpack_message(
+            frame,
+            method=capture_replay.REPLAY_ENCRYPT_METHOD,
+            key=capture_replay.REPLAY_SECRET_KEY,
+            crypt_lib=capture_replay.FakeCryptLib(),
+        )
+        self.assertEqual(body, replayed)
+        plain = struct.pack("<IIBxxx", protocol.HEADER_FLAG, len(body), protocol.PAYLOAD_TYPE_XML) + body
+        self.assertIs(plain, packet_capture.plain_transport_frame(plain, body))
+
+    def test_replay_feeds_file_transfer_into_command_waiter(self):
+        data = bytes(range(256)) * 200
+        packets = capture_replay.synthetic_file_packets("config.bin", data, chunk_size=4096)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "dev.siotcap"
+            capture = packet_capture.PacketCapture(path)
+            for packet in packets:
+                capture.record(packet.source, packet.payload)
+            capture.close()
+            loaded = packet_capture.load_capture(path)
+
+        session = capture_replay.create_replay_session("siot")
+        waiter = capture_replay.attach_waiter(session, "GetSystemCfg config.bin", expects_file=True)
+        stats = capture_replay.replay_packets(session, loaded)
+
+        self.assertEqual(len(packets), stats.packets)
+        self.assertTrue(waiter.file_finished)
+        self.assertEqual("config.bin", waiter.filename)
+        self.assertEqual(data, bytes(waiter.binary_chunks))
+        self.assertEqual(len(packets), session.transport_metrics.snapshot()["packets"])
+
+    def test_p2p_replay_reaches_waiter_and_honours_recorded_timing(self):
+        frames = capture_replay.synthetic_text_packets(["Mem: 61440K used", "CPU: 12% usr"], interval_s=0.5)
+        packets = [
+            packet_capture.CapturedPacket(frame.offset_s + 3.0, "p2p_log", frame.payload[protocol.MSG_HEAD_LEN:])
+            for frame in frames
+        ]
+        delays = []
+        session = capture_replay.create_replay_session("p2p")
+        waiter = capture_replay.attach_waiter(session, "free")
+
+        capture_replay.replay_packets(session, packets, speed=1.0, sleep=delays.append)
+
+        self.assertEqual(["Mem: 61440K used", "CPU: 12% usr"], waiter.text_parts)
+        self.assertEqual(1, len(delays))
+        self.assertGreater(delays[0], 0.4)
+
+    def test_protocol_race_keeps_only_winning_channel(self):
+        ticks = iter(range(0, 10_000_000_000, 1_000_000_000))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "dev.siotcap"
+            capture = packet_capture.PacketCapture(path, clock=lambda: next(ticks))
+            siot_channel = capture.channel("siot")
+            p2p_channel = capture.channel("p2p")
+            siot_channel.record("signaling", b"login")
+            p2p_channel.record("p2p_log", b"hello")
+            capture.select("siot")
+            siot_channel.record("p2p", b"reply")
+            p2p_channel.record("p2p_log", b"late")
+            capture.close()
+
+            packets = packet_capture.load_capture(path)
+
+        self.assertEqual([b"login", b"reply"], [packet.payload for packet in packets])
+        self.assertAlmostEqual(1.0, packets[0].offset_s)
+        self.assertEqual("siot", capture_replay.capture_protocol(packets))
+
+    def test_mixed_capture_is_rejected_instead_of_misrouted(self):
+        frames = capture_replay.synthetic_text_packets(["Mem: 61440K used"])
+        mixed = frames + [packet_capture.CapturedPacket(1.0, "p2p_log", frames[0].payload[protocol.MSG_HEAD_LEN:])]
+
+        with self.assertRaises(ValueError):
+            capture_replay.capture_protocol(mixed)
+        with self.assertRaises(ValueError):
+            capture_replay.replay_packets(capture_replay.create_replay_session("siot"), mixed)
+
+
+if __name__ == "__main__":
+    unittest.main()
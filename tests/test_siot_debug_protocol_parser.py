@@ -0,0 +1,206 @@
+import ctypes
+import importlib.util
+import sys
+import types
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _ensure_test_packages():
+    import query_tool
+
+    if "query_tool.utils" not in sys.modules:
+        utils_pkg = types.ModuleType("query_tool.utils")
+        utils_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils")]
+        sys.modules["query_tool.utils"] = utils_pkg
+
+    if "query_tool.utils.device_query" not in sys.modules:
+        device_query_stub = types.ModuleType("query_tool.utils.device_query")
+
+        class DeviceQuery:
+            def __init__(self, *args, **kwargs):
+                self.init_error = None
+
+        device_query_stub.DeviceQuery = DeviceQuery
+        sys.modules["query_tool.utils.device_query"] = device_query_stub
+
+    if "query_tool.utils.siot_debug" not in sys.modules:
+        siot_debug_pkg = types.ModuleType("query_tool.utils.siot_debug")
+        siot_debug_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils" / "siot_debug")]
+        sys.modules["query_tool.utils.siot_debug"] = siot_debug_pkg
+
+
+def _load_module(module_name: str, relative_path: str):
+    _ensure_test_packages()
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    module_path = REPO_ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+models = _load_module("query_tool.utils.siot_debug.models", "query_tool/utils/siot_debug/models.py")
+protocol = _load_module("query_tool.utils.siot_debug.protocol", "query_tool/utils/siot_debug/protocol.py")
+
+
+def _xml_packet(header: str, body: str, encoding: str = "ascii") -> bytes:
+    return (
+        '<?xml version="1.0" encoding="GB2312" ?>\n<XML_TOPSEE>\n'
+        f"  {header}\n  <MESSAGE_BODY>\n    {body}\n  </MESSAGE_BODY>\n</XML_TOPSEE>"
+    ).encode(encoding)
+
+
+class ParseDevicePayloadTests(unittest.TestCase):
+    def test_file_chunk_fast_path_extracts_pos_and_binary(self):
+        chunk = b"\x00\x01binary\xff" * 4
+        packet = _xml_packet(
+            '<MESSAGE_HEADER Msg_type="SYSTEM_LOG_DATA" Msg_code="1" Msg_flag="0"/>',
+            f'<POS Filename="config.bin" StartPos="4096" DataLen="{len(chunk)}"/>',
+        ) + b"\x00\x00\x00\x00" + chunk + b"trailing"
+
+        parsed = protocol.parse_device_payload(packet)
+
+        self.assertEqual("SYSTEM_LOG_DATA", parsed.message_type)
+        self.assertEqual("1", parsed.msg_code)
+        self.assertEqual("0", parsed.msg_flag)
+        self.assertEqual("config.bin", parsed.filename)
+        self.assertEqual(4096, parsed.start_pos)
+        self.assertEqual(len(chunk), parsed.data_len)
+        self.assertEqual(chunk, parsed.binary_payload)
+
+    def test_text_reply_joins_resp_str_and_keeps_elements(self):
+        packet = _xml_packet(
+            '<MESSAGE_HEADER Msg_type="SYSTEM_LOG_MESSAGE" Msg_code="1" Msg_flag="0"/>',
+            '<RESPONSE_PARAM RespStr="内存 61440K"/>',
+            encoding="gb2312",
+        )
+
+        parsed = protocol.parse_device_payload(packet)
+
+        self.assertEqual("SYSTEM_LOG_MESSAGE", parsed.message_type)
+        self.assertEqual("内存 61440K", parsed.resp_str)
+        self.assertIn("RESPONSE_PARAM", parsed.message_body)
+        self.assertIsNone(parsed.filename)
+        self.assertEqual(b"", parsed.binary_payload)
+
+    def test_header_attributes_are_case_insensitive(self):
+        packet = _xml_packet(
+            '<message_header MSG_TYPE="TPS_COMMON_MESSAGE" msg_code="7" Msg_Flag="-12"/>',
+            "",
+        )
+
+        parsed = protocol.parse_device_payload(packet)
+
+        self.assertEqual("TPS_COMMON_MESSAGE", parsed.message_type)
+        self.assertEqual("7", parsed.msg_code)
+        self.assertEqual("-12", parsed.msg_flag)
+
+    def test_legacy_extract_helpers_still_work(self):
+        xml = '<POS Filename="a.bin" StartPos="12"/><MESSAGE_BODY> body </MESSAGE_BODY>'
+
+        self.assertEqual("12", protocol.extract_xml_attr(xml, "POS", "StartPos"))
+        self.assertEqual("body", protocol.extract_xml_element(xml, "MESSAGE_BODY"))
+
+
+_CRYPT_FN = ctypes.CFUNCTYPE(
+    ctypes.c_int,
+    ctypes.c_int,
+    ctypes.c_void_p,
+    ctypes.c_int,
+    ctypes.c_void_p,
+    ctypes.c_int,
+    ctypes.c_char_p,
+)
+
+
+def _xor_crypt(method, source, source_len, output, output_len, key):
+    data = bytes(byte ^ 0x5A for byte in ctypes.string_at(source, source_len))
+    if len(data) > output_len:
+        return -1
+    ctypes.memmove(output, data, len(data))
+    return len(data)
+
+
+class _FakeCryptLib:
+    TpsProtocolEncode = _CRYPT_FN(_xor_crypt)
+    TpsProtocolDecode = _CRYPT_FN(_xor_crypt)
+
+
+class CryptBufferReuseTests(unittest.TestCase):
+    def test_pack_into_and_unpack_round_trip_with_reused_buffers(self):
+        crypt_lib = _FakeCryptLib()
+        encode_buffer = protocol.CryptBuffer()
+        decode_buffer = protocol.CryptBuffer()
+
+        allocations = None
+        for size in (600, 10, 300, 600):
+            payload = bytes(range(256)) * (size // 256) + b"x" * (size % 256)
+            packed_len = protocol.pack_message_into(
+                encode_buffer,
+                payload,
+                0x01,
+                encrypt=True,
+                method=1,
+                key=b"key",
+                crypt_lib=crypt_lib,
+            )
+            packed = ctypes.string_at(encode_buffer.buffer, packed_len)
+            self.assertEqual(
+                packed,
+                protocol.pack_message(payload, 0x01, encrypt=True, method=1, key=b"key", crypt_lib=crypt_lib),
+            )
+
+            unpacked = protocol.unpack_message(
+                packed,
+                method=1,
+                key=b"key",
+                crypt_lib=crypt_lib,
+                crypt_buffer=decode_buffer,
+            )
+            self.assertEqual(payload, unpacked)
+            if allocations is None:
+                allocations = (encode_buffer.allocations, decode_buffer.allocations)
+
+        self.assertEqual(allocations, (encode_buffer.allocations, decode_buffer.allocations))
+
+    def test_buffer_grows_for_larger_packets(self):
+        crypt_buffer = protocol.CryptBuffer()
+        payload = b"a" * 4096
+        packed = protocol.pack_message(payload, 0x01, encrypt=True, method=1, key=b"k", crypt_lib=_FakeCryptLib())
+
+        unpacked = protocol.unpack_message(
+            packed,
+            method=1,
+            key=b"k",
+            crypt_lib=_FakeCryptLib(),
+            crypt_buffer=crypt_buffer,
+        )
+
+        self.assertEqual(payload, unpacked)
+        self.assertGreaterEqual(crypt_buffer.capacity, len(payload) * 2)
+
+    def test_plain_message_is_sliced_without_crypt(self):
+        packed = protocol.pack_message(b"<XML_TOPSEE/>", 0x01, encrypt=False, method=0, key=b"", crypt_lib=None)
+        crypt_buffer = protocol.CryptBuffer()
+
+        packed_len = protocol.pack_message_into(
+            crypt_buffer, b"<XML_TOPSEE/>", 0x01, encrypt=False, method=0, key=b"", crypt_lib=None
+        )
+
+        self.assertEqual(packed, ctypes.string_at(crypt_buffer.buffer, packed_len))
+        self.assertEqual(
+            b"<XML_TOPSEE/>",
+            protocol.unpack_message(packed + b"trailing", method=0, key=b"", crypt_lib=None),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
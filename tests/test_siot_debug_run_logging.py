@@ -0,0 +1,128 @@
+import importlib.util
+import logging
+import os
+import sys
+import tempfile
+import types
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _ensure_test_packages():
+    import query_tool
+
+    if "query_tool.utils" not in sys.modules:
+        utils_pkg = types.ModuleType("query_tool.utils")
+        utils_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils")]
+        sys.modules["query_tool.utils"] = utils_pkg
+
+    if "query_tool.utils.device_query" not in sys.modules:
+        device_query_stub = types.ModuleType("query_tool.utils.device_query")
+
+        class DeviceQuery:
+            def __init__(self, *args, **kwargs):
+                self.init_error = None
+
+        device_query_stub.DeviceQuery = DeviceQuery
+        sys.modules["query_tool.utils.device_query"] = device_query_stub
+
+    if "query_tool.utils.siot_debug" not in sys.modules:
+        siot_debug_pkg = types.ModuleType("query_tool.utils.siot_debug")
+        siot_debug_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils" / "siot_debug")]
+        sys.modules["query_tool.utils.siot_debug"] = siot_debug_pkg
+
+
+def _load_module(module_name: str, relative_path: str):
+    _ensure_test_packages()
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    module_path = REPO_ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+
+run_logging = _load_module(
+    "query_tool.utils.siot_debug.run_logging",
+    "query_tool/utils/siot_debug/run_logging.py",
+)
+
+
+class RunLoggingTests(unittest.TestCase):
+    def setUp(self):
+        root_logger = logging.getLogger()
+        self._saved = (list(root_logger.handlers), root_logger.level)
+
+    def tearDown(self):
+        root_logger = logging.getLogger()
+        root_logger.handlers[:] = self._saved[0]
+        root_logger.setLevel(self._saved[1])
+
+    def test_writer_keeps_records_logged_before_bind_in_per_process_file(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            writer = run_logging.RunnerLogWriter(Path(temp_dir), level=logging.INFO).install()
+            logging.info("before bind")
+            path = writer.bind("SN 001/a")
+            logging.info("after bind")
+            logging.debug("filtered out")
+            writer.close()
+
+            self.assertEqual(Path(temp_dir), path.parent)
+            self.assertTrue(path.name.startswith("SN_001_a_"))
+            self.assertTrue(path.name.endswith(f"_{os.getpid()}.log"))
+            lines = path.read_text(encoding="utf-8").splitlines()
+
+        self.assertEqual(2, len(lines))
+        self.assertTrue(lines[0].endswith("INFO:root:before bind"))
+        self.assertTrue(lines[1].endswith("INFO:root:after bind"))
+        self.assertRegex(lines[0], r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{3} ")
+
+    def test_packet_sampler_logs_head_then_every_nth_unless_debug(self):
+        logging.getLogger().setLevel(logging.INFO)
+        sampler = run_logging.PacketLogSampler(first=2, every=5)
+
+        hits = [sampler.hit("SYSTEM_LOG_DATA") for _ in range(10)]
+
+        self.assertEqual([1, 2, 0, 0, 5, 0, 0, 0, 0, 10], hits)
+        self.assertEqual(1, sampler.hit("SYSTEM_LOG_MESSAGE"))
+        logging.getLogger().setLevel(logging.DEBUG)
+        self.assertEqual(11, sampler.hit("SYSTEM_LOG_DATA"))
+
+    def test_merge_orders_records_by_time_and_keeps_continuation_lines(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            first = Path(temp_dir) / "SN1_20260101_120000_10.log"
+            second = Path(temp_dir) / "SN2_20260101_120000_11.log"
+            first.write_text(
+                "2026-01-01 12:00:00.100 10 INFO:root:a1\n"
+                "2026-01-01 12:00:00.300 10 ERROR:root:a2\nTraceback (most recent call last):\n  boom\n",
+                encoding="utf-8",
+            )
+            second.write_text("2026-01-01 12:00:00.200 11 INFO:root:b1\n2026-01-01 12:00:00.400 11 INFO:root:b2", encoding="utf-8")
+            output = Path(temp_dir) / "merged.log"
+
+            written = run_logging.merge_run_logs([first, second], output, since="2026-01-01 12:00:00.150")
+            merged = output.read_text(encoding="utf-8").splitlines()
+
+        self.assertEqual(3, written)
+        self.assertEqual(
+            [
+                "[SN2_20260101_120000_11] 2026-01-01 12:00:00.200 11 INFO:root:b1",
+                "[SN1_20260101_120000_10] 2026-01-01 12:00:00.300 10 ERROR:root:a2",
+                "Traceback (most recent call last):",
+                "  boom",
+                "[SN2_20260101_120000_11] 2026-01-01 12:00:00.400 11 INFO:root:b2",
+            ],
+            merged,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
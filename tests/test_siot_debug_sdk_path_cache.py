@@ -0,0 +1,122 @@
+import importlib.util
+import os
+import sys
+import tempfile
+import types
+import unittest
+from unittest import mock
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _ensure_test_packages():
+    import query_tool
+
+    if "query_tool.utils" not in sys.modules:
+        utils_pkg = types.ModuleType("query_tool.utils")
+        utils_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils")]
+        sys.modules["query_tool.utils"] = utils_pkg
+
+    if "query_tool.utils.device_query" not in sys.modules:
+        device_query_stub = types.ModuleType("query_tool.utils.device_query")
+
+        class DeviceQuery:
+            def __init__(self, *args, **kwargs):
+                self.init_error = None
+
+        device_query_stub.DeviceQuery = DeviceQuery
+        sys.modules["query_tool.utils.device_query"] = device_query_stub
+
+    if "query_tool.utils.siot_debug" not in sys.modules:
+        siot_debug_pkg = types.ModuleType("query_tool.utils.siot_debug")
+        siot_debug_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils" / "siot_debug")]
+        sys.modules["query_tool.utils.siot_debug"] = siot_debug_pkg
+
+
+def _load_module(module_name: str, relative_path: str):
+    _ensure_test_packages()
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    module_path = REPO_ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+
+config = _load_module("query_tool.utils.siot_debug.config", "query_tool/utils/siot_debug/config.py")
+
+
+def _make_sdk_dir(root: Path) -> Path:
+    sdk_dir = root / "bin"
+    sdk_dir.mkdir()
+    (sdk_dir / "libsiot.dll").write_bytes(b"")
+    (sdk_dir / "libtps_crypt.dll").write_bytes(b"")
+    return sdk_dir
+
+
+class SdkPathCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self._temp_dir.name)
+        patchers = [
+            mock.patch.object(config, "SDK_PATH_CACHE_PATH", self.root / "sdk_paths.json"),
+            mock.patch.dict(config._SDK_PATH_MEMO, clear=True),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self._temp_dir.cleanup)
+
+    def test_resolved_dir_is_reused_from_cache_file_without_rescanning(self):
+        sdk_dir = _make_sdk_dir(self.root)
+        scan = mock.Mock(return_value=sdk_dir)
+
+        first = config.resolve_sdk_dir_cached("siot", self.root / "missing", "UNUSED_ENV", config._is_sdk_bin_dir, scan)
+        config._SDK_PATH_MEMO.clear()
+        second = config.resolve_sdk_dir_cached("siot", self.root / "missing", "UNUSED_ENV", config._is_sdk_bin_dir, scan)
+
+        self.assertEqual(sdk_dir, first)
+        self.assertEqual(sdk_dir, second)
+        self.assertEqual(1, scan.call_count)
+        self.assertIn(str(sdk_dir), config.SDK_PATH_CACHE_PATH.read_text(encoding="utf-8"))
+
+    def test_stale_entry_or_changed_executable_triggers_rescan(self):
+        sdk_dir = _make_sdk_dir(self.root)
+        scan = mock.Mock(return_value=sdk_dir)
+        resolve = lambda: config.resolve_sdk_dir_cached("siot", None, "UNUSED_ENV", config._is_sdk_bin_dir, scan)
+
+        resolve()
+        (sdk_dir / "libsiot.dll").unlink()
+        resolve()
+        (sdk_dir / "libsiot.dll").write_bytes(b"")
+        executable = self.root / "TPQueryTool.exe"
+        executable.write_bytes(b"")
+        with mock.patch.object(config.sys, "executable", str(executable)):
+            resolve()
+            resolve()
+
+        self.assertEqual(3, scan.call_count)
+
+    def test_valid_preferred_dir_skips_cache_and_invalid_result_is_not_cached(self):
+        sdk_dir = _make_sdk_dir(self.root)
+        scan = mock.Mock(return_value=self.root / "nowhere")
+
+        self.assertEqual(sdk_dir.resolve(), config.resolve_sdk_dir_cached("siot", sdk_dir, "UNUSED_ENV", config._is_sdk_bin_dir, scan))
+        self.assertEqual(self.root / "nowhere", config.resolve_sdk_dir_cached("siot", None, "UNUSED_ENV", config._is_sdk_bin_dir, scan))
+        self.assertEqual(1, scan.call_count)
+        self.assertFalse(config.SDK_PATH_CACHE_PATH.exists())
+        default_key = config._sdk_path_cache_key("siot", None, "UNUSED_ENV")
+        with mock.patch.dict(os.environ, {"UNUSED_ENV": str(sdk_dir)}):
+            self.assertNotEqual(default_key, config._sdk_path_cache_key("siot", None, "UNUSED_ENV"))
+        self.assertNotEqual(default_key, config._sdk_path_cache_key("p2p", None, "UNUSED_ENV"))
+
+
+if __name__ == "__main__":
+    unittest.main()
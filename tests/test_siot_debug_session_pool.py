@@ -0,0 +1,141 @@
+import importlib.util
+import io
+import queue
+import threading
+import sys
+import types
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _ensure_test_packages():
+    import query_tool
+
+    if "query_tool.utils" not in sys.modules:
+        utils_pkg = types.ModuleType("query_tool.utils")
+        utils_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils")]
+        sys.modules["query_tool.utils"] = utils_pkg
+
+    if "query_tool.utils.device_query" not in sys.modules:
+        device_query_stub = types.ModuleType("query_tool.utils.device_query")
+
+        class DeviceQuery:
+            def __init__(self, *args, **kwargs):
+                self.init_error = None
+
+        device_query_stub.DeviceQuery = DeviceQuery
+        sys.modules["query_tool.utils.device_query"] = device_query_stub
+
+    if "query_tool.utils.siot_debug" not in sys.modules:
+        siot_debug_pkg = types.ModuleType("query_tool.utils.siot_debug")
+        siot_debug_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils" / "siot_debug")]
+        sys.modules["query_tool.utils.siot_debug"] = siot_debug_pkg
+
+
+def _load_module(module_name: str, relative_path: str):
+    _ensure_test_packages()
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    module_path = REPO_ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+
+session_pool = _load_module(
+    "query_tool.utils.siot_debug.session_pool",
+    "query_tool/utils/siot_debug/session_pool.py",
+)
+
+
+class _RecordingStdin(io.BytesIO):
+    def __init__(self):
+        super().__init__()
+        self.written = b""
+
+    def close(self):
+        self.written = self.getvalue()
+        super().close()
+
+
+class _FakeProcess:
+    def __init__(self):
+        self.stdin = _RecordingStdin()
+        self.returncode = None
+        self.closed = threading.Event()
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        self.returncode = 0
+        self.closed.set()
+        return 0
+
+    def kill(self):
+        self.returncode = -9
+        self.closed.set()
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def _runner(sn="SN001"):
+    return session_pool.PooledRunner(sn, "prod", _FakeProcess(), queue.Queue())
+
+
+class RunnerSessionPoolTests(unittest.TestCase):
+    def test_released_runner_is_reused_and_idle_events_are_drained(self):
+        pool = session_pool.RunnerSessionPool(idle_s=60)
+        runner = _runner()
+        runner.event_queue.put({"event": "metrics", "bytes_per_s": 0})
+
+        self.assertTrue(pool.release(runner))
+        self.assertTrue(pool.contains("sn001", "prod"))
+        self.assertFalse(pool.contains("SN001", "test"))
+
+        self.assertIs(runner, pool.acquire("SN001", "prod"))
+        self.assertTrue(runner.event_queue.empty())
+        self.assertEqual(0, pool.size())
+
+    def test_expired_or_disconnected_runner_is_closed_instead_of_reused(self):
+        clock = _Clock()
+        pool = session_pool.RunnerSessionPool(idle_s=60, clock=clock)
+        expired = _runner("SN001")
+        dropped = _runner("SN002")
+        pool.release(expired)
+        pool.release(dropped)
+        dropped.event_queue.put({"event": "disconnected", "message": "连接已断开"})
+
+        self.assertIsNone(pool.acquire("SN002", "prod"))
+        clock.now += 61
+        self.assertIsNone(pool.acquire("SN001", "prod"))
+
+        for runner in (expired, dropped):
+            self.assertTrue(runner.process.closed.wait(2.0))
+            self.assertIn(b'"disconnect"', runner.process.stdin.written)
+
+    def test_disabled_pool_closes_released_runner(self):
+        pool = session_pool.RunnerSessionPool(idle_s=0)
+        runner = _runner()
+
+        self.assertFalse(pool.release(runner))
+        self.assertTrue(runner.process.closed.wait(2.0))
+        self.assertEqual(0, pool.size())
+
+
+if __name__ == "__main__":
+    unittest.main()
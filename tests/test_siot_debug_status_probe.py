@@ -0,0 +1,267 @@
+import ctypes
+import importlib.util
+import json
+import sys
+import threading
+import time
+import types
+import unittest
+from pathlib import Path
+from unittest import mock
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _ensure_test_packages():
+    import query_tool
+
+    if "query_tool.utils" not in sys.modules:
+        utils_pkg = types.ModuleType("query_tool.utils")
+        utils_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils")]
+        sys.modules["query_tool.utils"] = utils_pkg
+
+    if "query_tool.utils.device_query" not in sys.modules:
+        device_query_stub = types.ModuleType("query_tool.utils.device_query")
+
+        class DeviceQuery:
+            def __init__(self, *args, **kwargs):
+                self.init_error = None
+
+        device_query_stub.DeviceQuery = DeviceQuery
+        sys.modules["query_tool.utils.device_query"] = device_query_stub
+
+    if "query_tool.utils.siot_debug" not in sys.modules:
+        siot_debug_pkg = types.ModuleType("query_tool.utils.siot_debug")
+        siot_debug_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils" / "siot_debug")]
+        sys.modules["query_tool.utils.siot_debug"] = siot_debug_pkg
+
+
+def _load_module(module_name: str, relative_path: str):
+    _ensure_test_packages()
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    module_path = REPO_ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+
+models = _load_module("query_tool.utils.siot_debug.models", "query_tool/utils/siot_debug/models.py")
+siot_client = _load_module("query_tool.utils.siot_debug.siot_client", "query_tool/utils/siot_debug/siot_client.py")
+status_probe = _load_module("query_tool.utils.siot_debug.status_probe", "query_tool/utils/siot_debug/status_probe.py")
+session = _load_module("query_tool.utils.siot_debug.session", "query_tool/utils/siot_debug/session.py")
+connect_payload = _load_module(
+    "query_tool.utils.siot_debug.connect_payload",
+    "query_tool/utils/siot_debug/connect_payload.py",
+)
+CloudCredentials = models.CloudCredentials
+DeviceCredentials = models.DeviceCredentials
+
+
+def _cloud_credentials():
+    return CloudCredentials(
+        client_id="cid",
+        access_node="access-node",
+        access_jwt_token="access-token",
+        relay_jwt_token="",
+        relay_nodes="",
+        vip_relay_nodes="",
+        jwt_key_version=1,
+    )
+
+
+class _FakeSignalingLib:
+    """模拟 libsiot：握手立即成功，按 statuses 对 query_dev 回包，未登记的 SN 不应答。"""
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.connect_calls = 0
+        self.queried = []
+        self.closed = False
+        self.cleanup_calls = 0
+        self._callback = None
+        self._keepalive = []
+
+    def TPSRTC_SetProperties(self, key, value):
+        return 0
+
+    def TPSIOT_SetProperties(self, key, value):
+        return 0
+
+    def TPSRTC_Startup(self, *args):
+        return 0
+
+    def TPSRTC_Cleanup(self):
+        self.cleanup_calls += 1
+
+    def TPSIOT_Connect(self, role, protocol, terminal, callback, arg):
+        self.connect_calls += 1
+        self._callback = callback
+        callback(None, status_probe.TPSIOT_CONN_HANDSHAKED, 0, None, 0, None)
+        return 1
+
+    def TPSIOT_AppSend(self, conn, protocol, sn, gateway, buffer, length, topic, flag, feedback):
+        self.queried.append(sn.decode("utf-8"))
+        status = self.statuses.get(sn.decode("utf-8").upper())
+        if status is None:
+            return 0
+        raw = json.dumps(status).encode("utf-8")
+        data = ctypes.create_string_buffer(raw, len(raw))
+        message = siot_client.TPSIOT_DeviceMessage(
+            sn,
+            ctypes.cast(data, ctypes.POINTER(ctypes.c_uint8)),
+            len(raw),
+            status_probe.TPSIOT_FB_QUERY_DEVICE,
+        )
+        self._keepalive.extend([data, message])
+        self._callback(
+            conn,
+            status_probe.TPSIOT_CONN_APP_RECEIVED_DATA,
+            0,
+            ctypes.cast(ctypes.pointer(message), ctypes.POINTER(ctypes.c_uint8)),
+            ctypes.sizeof(message),
+            None,
+        )
+        return 0
+
+    def TPSIOT_Close(self, conn):
+        self.closed = True
+        return 0
+
+
+class StatusProbeTests(unittest.TestCase):
+    def test_batch_probe_uses_single_signaling_connection(self):
+        lib = _FakeSignalingLib(
+            {
+                "SN001": {"online": 1, "online4g": 0},
+                "SN002": {"online": 0, "online4g": 1},
+            }
+        )
+
+        statuses = status_probe.probe_device_statuses(lib, _cloud_credentials(), ["SN001", "sn002", "SN001"])
+
+        self.assertEqual(1, lib.connect_calls)
+        self.assertEqual(["SN001", "sn002"], lib.queried)
+        self.assertEqual({"online": 1, "online4g": 0}, statuses["SN001"])
+        self.assertEqual({"online": 0, "online4g": 1}, statuses["sn002"])
+        self.assertTrue(lib.closed)
+        self.assertEqual(1, lib.cleanup_calls)
+
+    def test_unanswered_sn_is_reported_as_timeout(self):
+        lib = _FakeSignalingLib({"SN001": {"online": 1}})
+
+        statuses = status_probe.probe_device_statuses(
+            lib,
+            _cloud_credentials(),
+            ["SN001", "SN404"],
+            query_timeout_s=0.05,
+        )
+
+        self.assertEqual({"online": 1}, statuses["SN001"])
+        self.assertEqual(status_probe.PROBE_TIMEOUT_ERROR, statuses["SN404"]["probe_error"])
+
+    def test_device_session_prefers_fresh_prefetched_status(self):
+        device_session = session.DeviceSession.__new__(session.DeviceSession)
+        device_session.device = DeviceCredentials(sn="SN001", username="admin", password="pwd")
+        device_session._prefetched_device_status = {"online": 1, "online4g": 0, "probed_at": time.time()}
+
+        self.assertEqual(1, device_session._take_prefetched_device_status()["online"])
+        self.assertIsNone(device_session._take_prefetched_device_status())
+
+        device_session._prefetched_device_status = {
+            "online": 1,
+            "probed_at": time.time() - session.PREFETCHED_DEVICE_STATUS_TTL_S - 1,
+        }
+        self.assertIsNone(device_session._take_prefetched_device_status())
+
+
+class _StaticCloudPrefetcher:
+    def get(self, *, require=False):
+        return _cloud_credentials()
+
+
+class DeviceStatusPrefetcherTests(unittest.TestCase):
+    def test_get_probes_following_sns_in_one_chunk(self):
+        prefetcher = connect_payload.DeviceStatusPrefetcher(
+            ["SN001", "SN002", "SN003", "SN004"],
+            _StaticCloudPrefetcher(),
+            chunk_size=3,
+        )
+        probed = []
+
+        def fake_probe(sns):
+            probed.append(list(sns))
+            return {sn: {"online": 1, "probed_at": time.time()} for sn in sns}
+
+        with mock.patch.object(prefetcher, "_probe", side_effect=fake_probe):
+            self.assertEqual(1, prefetcher.get("SN002")["online"])
+            self.assertEqual(1, prefetcher.get("sn003")["online"])
+            self.assertEqual(1, prefetcher.get("SN001")["online"])
+
+        self.assertEqual([["SN002", "SN003", "SN004"], ["SN001"]], probed)
+
+    def test_concurrent_get_waits_for_inflight_chunk(self):
+        prefetcher = connect_payload.DeviceStatusPrefetcher(["SN001", "SN002"], _StaticCloudPrefetcher())
+        release = threading.Event()
+        probed = []
+
+        def slow_probe(sns):
+            probed.append(list(sns))
+            release.wait(2.0)
+            return {sn: {"online": 0, "online4g": 1, "probed_at": time.time()} for sn in sns}
+
+        results = {}
+        with mock.patch.object(prefetcher, "_probe", side_effect=slow_probe):
+            first = threading.Thread(target=lambda: results.setdefault("SN001", prefetcher.get("SN001")))
+            first.start()
+            while not probed:
+                time.sleep(0.01)
+            second = threading.Thread(target=lambda: results.setdefault("SN002", prefetcher.get("SN002")))
+            second.start()
+            release.set()
+            first.join(2.0)
+            second.join(2.0)
+
+        self.assertEqual([["SN001", "SN002"]], probed)
+        self.assertEqual(1, results["SN002"]["online4g"])
+
+    def test_probe_all_reports_each_chunk_and_keeps_statuses_for_get(self):
+        prefetcher = connect_payload.DeviceStatusPrefetcher(
+            ["SN001", "SN002", "SN003"],
+            _StaticCloudPrefetcher(),
+            chunk_size=2,
+        )
+        reported = []
+
+        def fake_probe(sns):
+            return {sn: {"online": 1, "probed_at": time.time()} for sn in sns if sn != "SN003"}
+
+        with mock.patch.object(prefetcher, "_probe", side_effect=fake_probe) as probe:
+            prefetcher.probe_all(on_chunk=lambda chunk, statuses: reported.append((chunk, sorted(statuses))))
+            self.assertEqual(1, prefetcher.get("SN002")["online"])
+
+        self.assertEqual(
+            [(["SN001", "SN002"], ["SN001", "SN002"]), (["SN003"], [])],
+            sorted(reported),
+        )
+        self.assertEqual(2, probe.call_count)
+
+    def test_connect_payload_carries_device_status(self):
+        payload = connect_payload.build_connect_payload(
+            device_credentials=DeviceCredentials(sn="SN001", username="admin", password="pwd"),
+            cloud_username="cloud-user",
+            cloud_password="cloud-pass",
+            device_status={"online": 1, "probed_at": 1.0},
+        )
+
+        self.assertEqual({"online": 1, "probed_at": 1.0}, payload["device"]["status"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+import importlib.util
+import tempfile
+import sys
+import time
+import types
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _ensure_test_packages():
+    import query_tool
+
+    if "query_tool.utils" not in sys.modules:
+        utils_pkg = types.ModuleType("query_tool.utils")
+        utils_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils")]
+        sys.modules["query_tool.utils"] = utils_pkg
+
+    if "query_tool.utils.device_query" not in sys.modules:
+        device_query_stub = types.ModuleType("query_tool.utils.device_query")
+
+        class DeviceQuery:
+            def __init__(self, *args, **kwargs):
+                self.init_error = None
+
+        device_query_stub.DeviceQuery = DeviceQuery
+        sys.modules["query_tool.utils.device_query"] = device_query_stub
+
+    if "query_tool.utils.siot_debug" not in sys.modules:
+        siot_debug_pkg = types.ModuleType("query_tool.utils.siot_debug")
+        siot_debug_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils" / "siot_debug")]
+        sys.modules["query_tool.utils.siot_debug"] = siot_debug_pkg
+
+
+def _load_module(module_name: str, relative_path: str):
+    _ensure_test_packages()
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    module_path = REPO_ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+
+stream_log_sink = _load_module(
+    "query_tool.utils.siot_debug.stream_log_sink",
+    "query_tool/utils/siot_debug/stream_log_sink.py",
+)
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class RotatingStreamLogSinkTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_lines_are_buffered_until_size_or_interval_flush(self):
+        clock = _FakeClock()
+        sink = stream_log_sink.RotatingStreamLogSink(
+            self.directory,
+            "SN001_serial_x",
+            flush_interval_s=1.0,
+            buffer_bytes=1024,
+            clock=clock,
+        )
+        path = sink.open()
+        sink.write_line("first")
+        self.assertEqual("", path.read_text(encoding="utf-8"))
+
+        clock.now += 1.5
+        sink.write_line("second")
+        self.assertEqual("first\nsecond\n", path.read_text(encoding="utf-8"))
+
+        sink.write_line("third")
+        self.assertEqual(path, sink.close())
+        self.assertEqual("first\nsecond\nthird\n", path.read_text(encoding="utf-8"))
+        self.assertFalse(sink.index_path.exists())
+
+    def test_idle_lines_reach_disk_within_flush_interval(self):
+        sink = stream_log_sink.RotatingStreamLogSink(
+            self.directory,
+            "SN001_serial_x",
+            flush_interval_s=0.05,
+            buffer_bytes=1024,
+        )
+        path = sink.open()
+        sink.write_line("only line")
+        written_at = time.monotonic()
+
+        text = ""
+        while time.monotonic() - written_at < 2.0:
+            text = path.read_text(encoding="utf-8")
+            if text:
+                break
+            time.sleep(0.01)
+        elapsed = time.monotonic() - written_at
+        sink.close()
+
+        self.assertEqual("only line\n", text)
+        self.assertLess(elapsed, 0.5)
+
+    def test_rotates_by_size_and_compresses_closed_segments(self):
+        sink = stream_log_sink.RotatingStreamLogSink(
+            self.directory,
+            "SN001_serial_x",
+            max_segment_bytes=64,
+            flush_interval_s=0.0,
+        )
+        sink.open()
+        lines = [f"line {index:04d} {'x' * 20}" for index in range(10)]
+        for line in lines:
+            sink.write_line(line)
+
+        result = sink.close()
+
+        self.assertEqual(sink.index_path, result)
+        segments = stream_log_sink.load_segment_index(sink.index_path)
+        self.assertGreater(len(segments), 2)
+        self.assertTrue(all(segment["file"].endswith(".zst") for segment in segments[:-1]))
+        self.assertTrue(segments[-1]["file"].endswith(".log"))
+        text = "".join(stream_log_sink.read_segment_text(self.directory / segment["file"]) for segment in segments)
+        self.assertEqual(lines, text.splitlines())
+        self.assertEqual(len(lines), sum(segment["lines"] for segment in segments))
+        self.assertEqual(len(segments), len(list(self.directory.iterdir())) - 1)
+
+    def test_rotates_by_age_and_finds_segment_by_time(self):
+        clock = _FakeClock()
+        sink = stream_log_sink.RotatingStreamLogSink(
+            self.directory,
+            "SN001_serial_x",
+            max_segment_age_s=60,
+            flush_interval_s=0.0,
+            compress=False,
+            clock=clock,
+        )
+        sink.open()
+        sink.write_line("a")
+        clock.now += 61
+        sink.write_line("b")
+        sink.write_line("c")
+        sink.close()
+
+        segments = stream_log_sink.load_segment_index(sink.index_path)
+        self.assertEqual(["SN001_serial_x.log", "SN001_serial_x.001.log"], [segment["file"] for segment in segments])
+        later = datetime.fromisoformat(segments[-1]["started_at"]) + timedelta(seconds=1)
+        self.assertEqual(self.directory / "SN001_serial_x.001.log", stream_log_sink.find_segment(sink.index_path, later))
+        self.assertEqual(
+            self.directory / "SN001_serial_x.log",
+            stream_log_sink.find_segment(sink.index_path, datetime(2000, 1, 1)),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import importlib.util
+import sys
+import types
+import unittest
+from pathlib import Path
+from unittest import mock
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _ensure_test_packages():
+    import query_tool
+
+    if "query_tool.utils" not in sys.modules:
+        utils_pkg = types.ModuleType("query_tool.utils")
+        utils_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils")]
+        sys.modules["query_tool.utils"] = utils_pkg
+
+    if "query_tool.utils.device_query" not in sys.modules:
+        device_query_stub = types.ModuleType("query_tool.utils.device_query")
+
+        class DeviceQuery:
+            def __init__(self, *args, **kwargs):
+                self.init_error = None
+
+        device_query_stub.DeviceQuery = DeviceQuery
+        sys.modules["query_tool.utils.device_query"] = device_query_stub
+
+    if "query_tool.utils.siot_debug" not in sys.modules:
+        siot_debug_pkg = types.ModuleType("query_tool.utils.siot_debug")
+        siot_debug_pkg.__path__ = [str(REPO_ROOT / "query_tool" / "utils" / "siot_debug")]
+        sys.modules["query_tool.utils.siot_debug"] = siot_debug_pkg
+
+
+def _load_module(module_name: str, relative_path: str):
+    _ensure_test_packages()
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    module_path = REPO_ROOT / relative_path
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+
+telemetry = _load_module("query_tool.utils.siot_debug.telemetry", "query_tool/utils/siot_debug/telemetry.py")
+subprocess_runner = _load_module(
+    "query_tool.utils.siot_debug.subprocess_runner",
+    "query_tool/utils/siot_debug/subprocess_runner.py",
+)
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class SiotDebugTelemetryTests(unittest.TestCase):
+    def test_sampler_reports_window_rates_and_active_average(self):
+        metrics = telemetry.TransportMetrics()
+        clock = _FakeClock()
+        sampler = telemetry.MetricsSampler(metrics, clock=clock)
+
+        for _ in range(4):
+            metrics.record_packet(512 * 1024, decrypt_s=0.002, handle_s=0.005)
+        metrics.record_stream_lines(10)
+        clock.now += 2.0
+        first = sampler.sample()
+
+        self.assertEqual(2.0, first["packets_per_s"])
+        self.assertEqual(1024 * 1024, first["bytes_per_s"])
+        self.assertEqual(5.0, first["stream_lines_per_s"])
+        self.assertEqual(2.0, first["decrypt_ms_per_packet"])
+        self.assertEqual(5.0, first["handle_ms_per_packet"])
+        self.assertEqual(4, first["total_packets"])
+
+        clock.now += 8.0
+        idle = sampler.sample()
+
+        self.assertEqual(0.0, idle["bytes_per_s"])
+        self.assertEqual(0.0, idle["decrypt_ms_per_packet"])
+        # 空闲窗口不计入平均速率
+        self.assertEqual(1024 * 1024, idle["avg_bytes_per_s"])
+        self.assertEqual("1.00 MB/s", telemetry.format_rate(idle["avg_bytes_per_s"]))
+        self.assertEqual("2.0 KB/s", telemetry.format_rate(2048))
+
+    def test_metrics_reporter_emits_while_active_and_once_after_idle(self):
+        metrics = telemetry.TransportMetrics()
+        reporter = subprocess_runner._MetricsReporter(metrics, interval_s=60)
+        events = []
+
+        with mock.patch.object(subprocess_runner, "_emit", side_effect=lambda event, **payload: events.append(payload)):
+            reporter.report_once()
+            metrics.record_packet(1000)
+            reporter.report_once()
+            reporter.report_once()
+            reporter.report_once()
+
+        self.assertEqual(2, len(events))
+        self.assertEqual(1, events[0]["total_packets"])
+        self.assertGreater(events[0]["packets_per_s"], 0)
+        self.assertEqual(0.0, events[1]["packets_per_s"])
+        self.assertIn("sent_at", events[0])
+
+    def test_stream_log_emitter_counts_lines_into_bound_metrics(self):
+        metrics = telemetry.TransportMetrics()
+        emitter = subprocess_runner._StreamLogEmitter()
+        emitter.bind_metrics(metrics)
+
+        with mock.patch.object(subprocess_runner, "_emit"):
+            emitter.emit("line 1\nline 2")
+            emitter.emit("   ")
+
+        self.assertEqual(2, metrics.snapshot()["stream_lines"])
+
+
+if __name__ == "__main__":
+    unittest.main()